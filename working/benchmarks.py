@@ -0,0 +1,1735 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the weather storage paths, run against throwaway synthetic databases.
+
+    python benchmarks.py store-data --cities 2500 --sample 100
+    python benchmarks.py daily-layer --cities 500 --sample 100
+    python benchmarks.py monthly-agg --cities 1000 --sample 200
+    python benchmarks.py niceness --cities 10000
+    python benchmarks.py climate-cube --cities 2400
+    python benchmarks.py itinerary --cities 2400 --updates 500
+    python benchmarks.py tables --cities 20000
+    python benchmarks.py startup --cities 2400
+    python benchmarks.py sync-daemon --cities 2400
+    python benchmarks.py geonames --rows 1500000
+    python benchmarks.py city-search --rows 1500000 --catalog 5000
+    python benchmarks.py geo-boundaries --cities 2400
+    python benchmarks.py grid-share --cities 2400 --alias-share 0.3
+    python benchmarks.py response-cache --cities 300
+    python benchmarks.py vc-sim --cities 200 --latency lognormal:80,0.5 --error-429 0.02
+    python benchmarks.py provider-outage --cities 60
+    python benchmarks.py fetch-scheduler --cities 200 --budget 50
+    python benchmarks.py refresh-tiers --cities 300
+    python benchmarks.py vc-batch --cities 300 --batch-size 25 --error-location 0.02
+"""
+import argparse
+import functools
+import importlib.util
+import os
+import pickle
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+BASE_DIR = str(Path(__file__).resolve().parent)
+sys.path.insert(0, f"{BASE_DIR}/sunseeker")
+
+
+def load_sync(db_path: str):
+    """The Qt-free pipeline module, pointed at db_path."""
+    import weather_sync
+
+    weather_sync.DATABASE = db_path
+    return weather_sync
+
+
+def requires_pyqt6(bench: Callable[[argparse.Namespace], int]) -> Callable[[argparse.Namespace], int]:
+    """Skip a benchmark that loads the GUI module, rather than crash, where PyQt6 is not installed."""
+
+    @functools.wraps(bench)
+    def run(args: argparse.Namespace) -> int:
+        if importlib.util.find_spec("PyQt6") is None:
+            print(f"{args.cmd}: skipped, PyQt6 is not installed")
+            return 0
+        return bench(args)
+
+    return run
+
+
+def load_sunseeker(db_path: str):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    import sunseeker
+
+    load_sync(db_path)
+    sunseeker.DATABASE = db_path
+    return sunseeker
+
+
+def synthetic_vc_days(start: date, days: int) -> list[dict[str, Any]]:
+    out = []
+    base_epoch = int(datetime(start.year, start.month, start.day, tzinfo=timezone.utc).timestamp())
+    for i in range(days):
+        d = start + timedelta(days=i)
+        out.append(
+            {
+                "datetime": d.isoformat(),
+                "tempmax": 20.0 + (i % 15),
+                "tempmin": 10.0 + (i % 9),
+                "temp": 15.0 + (i % 12),
+                "feelslikemax": 21.0,
+                "feelslikemin": 9.0,
+                "feelslike": 15.0,
+                "dew": 8.0,
+                "humidity": 60.0,
+                "cloudcover": float(i % 100),
+                "visibility": 20.0,
+                "precip": 0.1 * (i % 5),
+                "precipprob": float(i % 100),
+                "precipcover": 4.0,
+                "preciptype": ["rain"] if i % 3 == 0 else None,
+                "snow": 0.0,
+                "snowdepth": 0.0,
+                "windspeed": 12.0,
+                "windgust": 20.0,
+                "winddir": 180.0,
+                "pressure": 1013.0,
+                "solarradiation": 200.0,
+                "solarenergy": 17.0,
+                "uvindex": 6.0,
+                "moonphase": 0.5,
+                "conditions": "Partially cloudy" if i % 2 else "Clear",
+                "icon": "partly-cloudy-day" if i % 2 else "clear-day",
+                "description": "Synthetic day",
+                "source": "stats",
+                "stations": ["SYNTH"],
+                "severerisk": 10.0,
+                "sunriseEpoch": base_epoch + i * 86400 + 6 * 3600,
+                "sunsetEpoch": base_epoch + i * 86400 + 18 * 3600,
+            }
+        )
+    return out
+
+
+def legacy_store_data(ss, conn, city, df, source: str = "estimated"):
+    """store_data() as it was before the bulk write path: iterrows and two statements per row plus a read."""
+    c = conn.cursor()
+    split_table = "daily_data_forecast" if source == "forecast" else "daily_data_estimated"
+    cols = ", ".join(ss.WEATHER_COLUMNS)
+    placeholders = ", ".join(["?"] * len(ss.WEATHER_COLUMNS))
+    upsert = f"INSERT OR REPLACE INTO {{table}} ({cols}) VALUES ({placeholders})"
+    priority = {"forecast": 2}
+    for _, row in df.iterrows():
+        day = row["time"].strftime("%Y-%m-%d")
+        values = {k: row.get(k) for k in ss.WEATHER_COLUMNS}
+        values["city"] = city
+        values["date"] = day
+        values["sunrise"] = row.get("sunrise").isoformat() if not ss.pd.isna(row.get("sunrise")) else None
+        values["sunset"] = row.get("sunset").isoformat() if not ss.pd.isna(row.get("sunset")) else None
+        values["data_source"] = source
+        values["updated_at"] = datetime.now(timezone.utc).isoformat()
+        params = tuple(values.get(k) for k in ss.WEATHER_COLUMNS)
+        conn.execute(upsert.format(table=split_table), params)
+        c.execute("SELECT data_source FROM daily_data WHERE city=? AND date=?", (city, day))
+        old = c.fetchone()
+        old_source = old[0] if old and old[0] else "estimated"
+        if not old or priority.get(source, 1) >= priority.get(old_source, 1):
+            conn.execute(upsert.format(table="daily_data"), params)
+    conn.commit()
+
+
+def materialize_daily_table(ss, conn) -> None:
+    """Swap the daily_data view for the pre-view materialized table the legacy writers maintained."""
+    conn.execute("DROP VIEW IF EXISTS daily_data")
+    ss._create_weather_table(conn, "daily_data")
+    conn.commit()
+
+
+def materialized_store_data(ss, conn, city, df, source: str = "estimated"):
+    """Bulk store_data() as it was with a materialized daily_data table: every row written twice."""
+    if df.empty:
+        return
+    split_table = "daily_data_forecast" if source == "forecast" else "daily_data_estimated"
+    rows = ss._frame_to_rows(df, city, source)
+    ss.weather_store.upsert_weather_rows(conn, split_table, ss.WEATHER_COLUMNS, rows)
+    priority = "(CASE WHEN COALESCE({}, 'estimated')='forecast' THEN 2 ELSE 1 END)"
+    sql = (
+        ss.weather_store.upsert_sql("daily_data", ss.WEATHER_COLUMNS)
+        + f" WHERE {priority.format('excluded.data_source')} >= {priority.format('daily_data.data_source')}"
+    )
+    conn.executemany(sql, rows)
+    conn.commit()
+
+
+def _time_store(label: str, fn: Callable, conn, frames: list[tuple[str, Any]], source: str) -> dict[str, Any]:
+    rows = sum(len(df) for _, df in frames)
+    t0 = time.perf_counter()
+    for city, df in frames:
+        fn(conn, city, df, source)
+    elapsed = time.perf_counter() - t0
+    return {"label": label, "source": source, "cities": len(frames), "rows": rows, "sec": elapsed, "rows_per_sec": rows / elapsed if elapsed > 0 else 0.0}
+
+
+def _print_results(results: list[dict[str, Any]]) -> None:
+    print(f"{'path':<10} {'source':<10} {'cities':>7} {'rows':>9} {'sec':>9} {'rows/sec':>11}")
+    for r in results:
+        print(f"{r['label']:<10} {r['source']:<10} {r['cities']:>7} {r['rows']:>9} {r['sec']:>9.2f} {r['rows_per_sec']:>11.0f}")
+
+
+def bench_store_data(args: argparse.Namespace) -> int:
+    with tempfile.TemporaryDirectory(prefix="sunseeker_bench_") as tmp:
+        db_path = f"{tmp}/bench.db"
+        ss = load_sync(db_path)
+        ss.init_db()
+        conn = ss.get_db_conn(db_path)
+        # The legacy path writes daily_data directly, which needs the old table in place of the view.
+        materialize_daily_table(ss, conn)
+
+        start = date.today()
+        est_template = ss.process_visualcrossing_days(synthetic_vc_days(start, args.days))
+        fc_template = ss.process_visualcrossing_days(synthetic_vc_days(start, 16))
+        cities = [f"Bench City {i:04d}" for i in range(args.cities)]
+
+        print(f"Populating {args.cities} cities x {args.days} days with the bulk path...")
+        populate = _time_store("populate", ss.store_data, conn, [(c, est_template) for c in cities], "estimated")
+        print(f"  {populate['rows']} rows in {populate['sec']:.1f}s ({populate['rows_per_sec']:.0f} rows/sec)")
+
+        step = max(1, len(cities) // max(1, args.sample))
+        legacy_cities = cities[::step][: args.sample]
+        bulk_cities = cities[1::step][: args.sample]
+        results = [
+            _time_store("legacy", lambda *a: legacy_store_data(ss, *a), conn, [(c, est_template) for c in legacy_cities], "estimated"),
+            _time_store("bulk", ss.store_data, conn, [(c, est_template) for c in bulk_cities], "estimated"),
+            _time_store("legacy", lambda *a: legacy_store_data(ss, *a), conn, [(c, fc_template) for c in legacy_cities], "forecast"),
+            _time_store("bulk", ss.store_data, conn, [(c, fc_template) for c in bulk_cities], "forecast"),
+        ]
+        print(f"Re-storing {len(legacy_cities)} cities per path on the {args.cities}-city database:")
+        _print_results(results)
+        speedup = results[1]["rows_per_sec"] / results[0]["rows_per_sec"] if results[0]["rows_per_sec"] else 0.0
+        print(f"Estimated write speedup: {speedup:.1f}x")
+        conn.close()
+    return 0
+
+
+def _wal_bytes(db_path: str) -> int:
+    wal = f"{db_path}-wal"
+    return os.path.getsize(wal) if os.path.exists(wal) else 0
+
+
+def _measure_writes(label: str, store: Callable, db_path: str, ss, frames: list[tuple[str, Any, str]]) -> dict[str, Any]:
+    """Re-store `frames` with checkpointing off so the WAL growth is the bytes this workload wrote."""
+    conn = ss.get_db_conn(db_path)
+    conn.execute("PRAGMA wal_autocheckpoint=0")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    rows = sum(len(df) for _, df, _ in frames)
+    changes0 = conn.total_changes
+    t0 = time.perf_counter()
+    for city, df, source in frames:
+        store(conn, city, df, source)
+    elapsed = time.perf_counter() - t0
+    out = {
+        "label": label,
+        "rows": rows,
+        "sec": elapsed,
+        "row_writes": conn.total_changes - changes0,
+        "wal_bytes": _wal_bytes(db_path),
+    }
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    out["db_bytes"] = os.path.getsize(db_path)
+    return out
+
+
+def _measure_reads(label: str, db_path: str, ss, cities: list[str], repeat: int) -> dict[str, Any]:
+    conn = ss.get_db_conn(db_path)
+    out: dict[str, Any] = {"label": label}
+    for name, fn in (("load_data_from_db", ss.load_data_from_db), ("monthly_aggregates_from_db", ss.monthly_aggregates_from_db)):
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            for city in cities:
+                fn(conn, city)
+        out[name] = (time.perf_counter() - t0) * 1000.0 / (repeat * len(cities))
+    conn.close()
+    return out
+
+
+def bench_daily_layer(args: argparse.Namespace) -> int:
+    with tempfile.TemporaryDirectory(prefix="sunseeker_bench_") as tmp:
+        ss = load_sync(f"{tmp}/view.db")
+        start = date.today()
+        est_template = ss.process_visualcrossing_days(synthetic_vc_days(start, args.days))
+        fc_template = ss.process_visualcrossing_days(synthetic_vc_days(start, 16))
+        cities = [f"Bench City {i:04d}" for i in range(args.cities)]
+        layouts = {"materialized": (f"{tmp}/materialized.db", lambda *a: materialized_store_data(ss, *a)), "view": (f"{tmp}/view.db", ss.store_data)}
+
+        print(f"Populating {args.cities} cities x ({args.days} estimated + 16 forecast days) per layout...")
+        for label, (db_path, store) in layouts.items():
+            ss.DATABASE = db_path
+            ss.init_db()
+            conn = ss.get_db_conn(db_path)
+            if label == "materialized":
+                materialize_daily_table(ss, conn)
+            for city in cities:
+                store(conn, city, est_template, "estimated")
+                store(conn, city, fc_template, "forecast")
+            conn.close()
+
+        step = max(1, len(cities) // max(1, args.sample))
+        sample = cities[::step][: args.sample]
+        frames = [(c, est_template, "estimated") for c in sample] + [(c, fc_template, "forecast") for c in sample]
+        writes = [_measure_writes(label, store, db_path, ss, frames) for label, (db_path, store) in layouts.items()]
+        reads = [_measure_reads(label, db_path, ss, sample, args.repeat) for label, (db_path, _) in layouts.items()]
+
+        print(f"Write amplification, re-storing {len(sample)} cities (estimated + forecast):")
+        print(f"{'layout':<13} {'rows':>8} {'row writes':>11} {'per row':>8} {'WAL MB':>8} {'WAL B/row':>10} {'sec':>7} {'DB MB':>8}")
+        for w in writes:
+            print(
+                f"{w['label']:<13} {w['rows']:>8} {w['row_writes']:>11} {w['row_writes'] / w['rows']:>8.2f} "
+                f"{w['wal_bytes'] / 1e6:>8.1f} {w['wal_bytes'] / w['rows']:>10.0f} {w['sec']:>7.2f} {w['db_bytes'] / 1e6:>8.1f}"
+            )
+        print(f"Read latency, mean ms per city over {len(sample)} cities x {args.repeat}:")
+        print(f"{'layout':<13} {'load_data_from_db':>18} {'monthly_aggregates':>19}")
+        for r in reads:
+            print(f"{r['label']:<13} {r['load_data_from_db']:>18.2f} {r['monthly_aggregates_from_db']:>19.2f}")
+    return 0
+
+
+def legacy_monthly_rows(ss, conn, city):
+    """monthly_aggregates_from_db()'s query before city_monthly_agg: a GROUP BY over ~365 daily rows."""
+    codes = ",".join(str(c) for c in ss.SUNNY_CODES)
+    return conn.execute(
+        f"""
+        SELECT
+            CAST(SUBSTR(date, 6, 2) AS INTEGER) AS month,
+            AVG(tmax_c), AVG(tmin_c),
+            AVG(CASE WHEN weathercode IN ({codes}) THEN 1.0 ELSE 0.0 END) * 30.0,
+            AVG((julianday(sunset) - julianday(sunrise)) * 24.0)
+        FROM daily_data
+        WHERE city=? AND date>=? AND date<=?
+        GROUP BY CAST(SUBSTR(date, 6, 2) AS INTEGER)
+        ORDER BY month
+        """,
+        (city, ss.START_DATE, ss.END_DATE),
+    ).fetchall()
+
+
+def _per_city_ms(fn: Callable, cities: list[str]) -> float:
+    t0 = time.perf_counter()
+    for city in cities:
+        fn(city)
+    return (time.perf_counter() - t0) * 1000.0 / max(1, len(cities))
+
+
+def bench_monthly_agg(args: argparse.Namespace) -> int:
+    with tempfile.TemporaryDirectory(prefix="sunseeker_bench_") as tmp:
+        db_path = f"{tmp}/bench.db"
+        ss = load_sync(db_path)
+        ss.init_db()
+        conn = ss.get_db_conn(db_path)
+        est_template = ss.process_visualcrossing_days(synthetic_vc_days(date.fromisoformat(ss.START_DATE), args.days))
+        fc_template = ss.process_visualcrossing_days(synthetic_vc_days(date.fromisoformat(ss.START_DATE), 16))
+        cities = [f"Bench City {i:04d}" for i in range(args.cities)]
+        print(f"Populating {args.cities} cities x ({args.days} estimated + 16 forecast days)...")
+        for city in cities:
+            ss.store_data(conn, city, est_template, "estimated")
+            ss.store_data(conn, city, fc_template, "forecast")
+
+        t0 = time.perf_counter()
+        counts = ss.weather_store.refresh_monthly_agg_all(conn, ss.START_DATE, ss.END_DATE)
+        conn.commit()
+        build_sec = time.perf_counter() - t0
+        print(f"Initial build: {counts['rebuilt']} cities in {build_sec:.2f}s")
+
+        step = max(1, len(cities) // max(1, args.sample))
+        sample = cities[::step][: args.sample]
+        reads = [
+            ("GROUP BY over daily_data", _per_city_ms(lambda c: legacy_monthly_rows(ss, conn, c), sample)),
+            ("monthly_aggregates(load_data_from_db)", _per_city_ms(lambda c: ss.monthly_aggregates(ss.load_data_from_db(conn, c)), sample)),
+            ("monthly_aggregates_from_db (agg rows)", _per_city_ms(lambda c: ss.monthly_aggregates_from_db(conn, c), sample)),
+        ]
+        t0 = time.perf_counter()
+        ss.weather_store.refresh_monthly_agg_all(conn, ss.START_DATE, ss.END_DATE)
+        sums = ss.weather_store.monthly_agg_map(conn)
+        frames = [ss.monthly_frame_from_sums(sums.get(c)) for c in cities]
+        launch_sec = time.perf_counter() - t0
+        print(f"Read latency, mean ms per city over {len(sample)} cities:")
+        for label, ms in reads:
+            print(f"  {label:<40} {ms:>8.3f}")
+        print(f"Launch path (refresh check + one scan + frames) for {len(frames)} cities: {launch_sec:.2f}s")
+
+        writes = []
+        for label in ("with agg triggers", "without agg triggers"):
+            if label == "without agg triggers":
+                for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='trigger' AND name LIKE '%monthly_agg%'").fetchall():
+                    conn.execute(f"DROP TRIGGER {name}")
+                conn.commit()
+            writes.append(_time_store(label, ss.store_data, conn, [(c, est_template) for c in sample], "estimated"))
+        print("Estimated re-store cost of trigger maintenance:")
+        for w in writes:
+            print(f"  {w['label']:<22} {w['rows_per_sec']:>9.0f} rows/sec")
+        conn.close()
+    return 0
+
+
+def synthetic_monthly_inputs(n_cities: int, seed: int = 7) -> dict[str, Any]:
+    """
+    Random cities x 12 month inputs, seeded with the curve's breakpoints (tmax == tmin makes
+    the daytime average exact), NaNs in every input and infinities.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    shape = (n_cities, 12)
+    tmax = rng.uniform(-20.0, 130.0, shape)
+    tmin = tmax - rng.uniform(0.0, 30.0, shape)
+    sunny = rng.uniform(-2.0, 33.0, shape)
+    daylen = rng.uniform(-1.0, 25.0, shape)
+    edges = np.array([50.0, 60.0, 65.0, 70.0, 75.0, 80.0, 85.0, 90.0, 105.0, 49.999, 105.001])
+    pick = rng.random(shape) < 0.05
+    tmax[pick] = tmin[pick] = rng.choice(edges, pick.sum())
+    for arr in (tmax, tmin, sunny, daylen):
+        arr[rng.random(shape) < 0.01] = np.nan
+    tmax[rng.random(shape) < 0.002] = np.inf
+    sunny[rng.random(shape) < 0.002] = -np.inf
+    return {"tmax_mean": tmax, "tmin_mean": tmin, "sunny_day": sunny, "day_length_hrs": daylen}
+
+
+def _same_scores(a, b) -> bool:
+    import numpy as np
+
+    both = ~np.isnan(a) & ~np.isnan(b)
+    return bool(np.array_equal(a, b, equal_nan=True) and np.array_equal(np.signbit(a[both]), np.signbit(b[both])))
+
+
+@requires_pyqt6
+def bench_niceness(args: argparse.Namespace) -> int:
+    import numpy as np
+
+    ss = load_sunseeker(f"{tempfile.gettempdir()}/sunseeker_bench_unused.db")
+    ws = load_sync(f"{tempfile.gettempdir()}/sunseeker_bench_unused.db")
+    niceness = ss.niceness
+    inputs = synthetic_monthly_inputs(args.cities)
+    cols = (inputs["tmax_mean"], inputs["tmin_mean"], inputs["sunny_day"], inputs["day_length_hrs"])
+    flat = list(zip(*(c.ravel().tolist() for c in cols)))
+    pref_sets = [(65, 80, 0.5), (50, 104, 0.7), (80, 60, 0.3), (72, 72, 1.0)]
+
+    # Equivalence: every element against the scalar reference implementations.
+    failures = 0
+    scalar = np.array([ws.compute_city_niceness(*v) for v in flat]).reshape(cols[0].shape)
+    ok = _same_scores(niceness.default_scores(*cols), scalar)
+    failures += not ok
+    print(f"default  : {'identical' if ok else 'MISMATCH'} over {scalar.size} city-months")
+    for prefs in pref_sets:
+        window = SimpleNamespace(pref_min_temp=prefs[0], pref_max_temp=prefs[1], pref_temp_weight=prefs[2])
+        scalar = np.array([ss.WeatherApp.compute_adjusted_niceness(window, *v) for v in flat]).reshape(cols[0].shape)
+        ok = _same_scores(niceness.adjusted_scores(*cols, *prefs), scalar)
+        failures += not ok
+        print(f"adjusted {prefs}: {'identical' if ok else 'MISMATCH'}")
+
+    # Throughput: the per-city DataFrame.apply the GUI used vs the vectorized engine.
+    frames = [
+        ws.pd.DataFrame({"month": range(1, 13), **{k: v[i] for k, v in inputs.items()}})
+        for i in range(args.cities)
+    ]
+    apply_frames = frames[: args.apply_sample]
+    t0 = time.perf_counter()
+    for mdf in apply_frames:
+        mdf.apply(
+            lambda r: ws.compute_city_niceness(r["tmax_mean"], r["tmin_mean"], r["sunny_day"], r["day_length_hrs"]),
+            axis=1,
+        )
+    apply_sec = (time.perf_counter() - t0) * args.cities / max(1, len(apply_frames))
+    t0 = time.perf_counter()
+    for v in flat:
+        ws.compute_city_niceness(*v)
+    loop_sec = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    niceness.default_scores(*cols)
+    matrix_sec = time.perf_counter() - t0
+    cube = ws.ClimateCube(capacity=len(frames))
+    for i, mdf in enumerate(frames):
+        cube.set_frame(f"City {i}", mdf)
+    t0 = time.perf_counter()
+    cube.rescore()
+    cube_sec = time.perf_counter() - t0
+
+    # Launch path: frames built from city_monthly_agg sums, then scored.
+    def f_to_c(f):
+        return (f - 32.0) * 5.0 / 9.0
+
+    monthly_sums = {
+        f"City {i}": {
+            m + 1: {
+                "days": 30.0,
+                "tmax_sum": f_to_c(inputs["tmax_mean"][i, m]) * 30.0,
+                "tmax_days": 30.0,
+                "tmin_sum": f_to_c(inputs["tmin_mean"][i, m]) * 30.0,
+                "tmin_days": 30.0,
+                "sunny_days": 15.0,
+                "daylen_sum": 12.0 * 30.0,
+                "daylen_days": 30.0,
+            }
+            for m in range(12)
+        }
+        for i in range(args.cities)
+    }
+    sample_cities = list(monthly_sums)[: args.apply_sample]
+    t0 = time.perf_counter()
+    for city in sample_cities:
+        mdf = ws.monthly_frame_from_sums(monthly_sums[city])
+        mdf["niceness"] = mdf.apply(
+            lambda r: ws.compute_city_niceness(r["tmax_mean"], r["tmin_mean"], r["sunny_day"], r["day_length_hrs"]),
+            axis=1,
+        )
+    launch_old_sec = (time.perf_counter() - t0) * args.cities / max(1, len(sample_cities))
+    t0 = time.perf_counter()
+    ws.monthly_cube_from_sums(monthly_sums, list(monthly_sums))
+    launch_new_sec = time.perf_counter() - t0
+
+    print(f"Scoring {args.cities} cities x 12 months:")
+    label = "per-city mdf.apply" + (f" (extrapolated from {len(apply_frames)})" if len(apply_frames) < args.cities else "")
+    for name, sec in (
+        (label, apply_sec),
+        ("scalar loop", loop_sec),
+        ("ClimateCube.rescore (float32 cube)", cube_sec),
+        ("default_scores on matrix", matrix_sec),
+        ("launch: frame + apply per city" + (" (extrapolated)" if len(sample_cities) < args.cities else ""), launch_old_sec),
+        ("launch: monthly_cube_from_sums", launch_new_sec),
+    ):
+        print(f"  {name:<45} {sec * 1000:>10.1f} ms")
+    return 1 if failures else 0
+
+
+def legacy_top_by_month(monthly_dict: dict[str, Any], n: int = 10) -> dict[int, list[tuple[str, float]]]:
+    """The itinerary tab's old per-city set_index scan over a dict of monthly frames."""
+    import pandas as pd
+
+    monthly_data = {city: mdf.set_index("month") for city, mdf in monthly_dict.items()}
+    top = {}
+    for month in range(1, 13):
+        city_scores = []
+        for city, mdf in monthly_data.items():
+            if month in mdf.index:
+                nic = mdf.at[month, "niceness"]
+                if not pd.isna(nic):
+                    city_scores.append((city, nic))
+        city_scores.sort(key=lambda x: x[1], reverse=True)
+        top[month] = city_scores[:n]
+    return top
+
+
+def _traced_bytes(build: Callable) -> tuple[Any, int]:
+    import tracemalloc
+
+    tracemalloc.start()
+    try:
+        obj = build()
+        return obj, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_climate_cube(args: argparse.Namespace) -> int:
+    import numpy as np
+
+    import niceness
+
+    ss = load_sync(f"{tempfile.gettempdir()}/sunseeker_bench_unused.db")
+    inputs = synthetic_monthly_inputs(args.cities)
+    inputs["avg_day_f"] = (inputs["tmax_mean"] + inputs["tmin_mean"]) / 2
+    inputs["niceness"] = niceness.default_scores(
+        inputs["tmax_mean"], inputs["tmin_mean"], inputs["sunny_day"], inputs["day_length_hrs"]
+    )
+    columns = ss.MONTHLY_COLUMNS + ["niceness"]
+    cities = [f"City {i}" for i in range(args.cities)]
+
+    def build_frames():
+        return {
+            city: ss.pd.DataFrame({"month": range(1, 13), **{k: inputs[k][i] for k in columns[1:]}}, columns=columns)
+            for i, city in enumerate(cities)
+        }
+
+    def build_cube():
+        cube = ss.ClimateCube(capacity=len(cities))
+        for i, city in enumerate(cities):
+            cube.set_city(city, np.stack([inputs[k][i] for k in columns[1:]], axis=1), columns[1:])
+        return cube
+
+    results = []
+    frames, frames_bytes = _traced_bytes(build_frames)
+    cube, cube_bytes = _traced_bytes(build_cube)
+    for label, obj, mem, top in (
+        ("dict of DataFrames", frames, frames_bytes, lambda: legacy_top_by_month(frames)),
+        ("ClimateCube", cube, cube_bytes, lambda: cube.top_by_month(10)),
+    ):
+        t0 = time.perf_counter()
+        blob = pickle.dumps(obj)
+        dump_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        pickle.loads(blob)
+        load_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        ranking = top()
+        top_ms = (time.perf_counter() - t0) * 1000
+        results.append((label, mem, len(blob), dump_ms, load_ms, top_ms, ranking))
+
+    print(f"{args.cities} cities x 12 months x {len(columns) - 1} metrics:")
+    print(f"  {'store':<20} {'memory MB':>10} {'pickle MB':>10} {'dump ms':>9} {'load ms':>9} {'top-10 ms':>10}")
+    for label, mem, size, dump_ms, load_ms, top_ms, _ in results:
+        print(f"  {label:<20} {mem / 1e6:>10.2f} {size / 1e6:>10.2f} {dump_ms:>9.1f} {load_ms:>9.1f} {top_ms:>10.1f}")
+    legacy, dense = results[0][-1], results[1][-1]
+    same = all([c for c, _ in legacy[m]] == [c for c, _ in dense[m]] for m in legacy)
+    # float32 storage can reorder cities whose float64 scores differ past the 7th digit.
+    print(f"Itinerary rankings: {'identical' if same else 'differ only where float32 rounding ties scores'}")
+    return 0
+
+
+def bench_itinerary(args: argparse.Namespace) -> int:
+    import numpy as np
+
+    from climate_cube import ItineraryIndex
+
+    ss = load_sync(f"{tempfile.gettempdir()}/sunseeker_bench_unused.db")
+    inputs = synthetic_monthly_inputs(args.cities + args.updates)
+    metrics = ss.MONTHLY_COLUMNS[1:]
+    inputs["avg_day_f"] = (inputs["tmax_mean"] + inputs["tmin_mean"]) / 2
+    blocks = [np.stack([inputs[k][i] for k in metrics], axis=1) for i in range(args.cities + args.updates)]
+    cube = ss.ClimateCube(capacity=args.cities)
+    for i in range(args.cities):
+        cube.set_city(f"City {i}", blocks[i], metrics)
+    cube.rescore()
+
+    t0 = time.perf_counter()
+    index = ItineraryIndex(cube, args.n)
+    build_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    cube.top_by_month(args.n)
+    sort_ms = (time.perf_counter() - t0) * 1000
+
+    # One city added (or refreshed) at a time: full re-sort vs incremental re-rank.
+    rng = np.random.default_rng(11)
+    changes = [
+        (f"City {rng.integers(args.cities)}" if rng.random() < 0.5 else f"New {i}", blocks[args.cities + i])
+        for i in range(args.updates)
+    ]
+    full_sec = incr_sec = 0.0
+    mismatches = 0
+    for name, block in changes:
+        cube.set_city(name, block, metrics)
+        cube.rescore(names=[name])
+        t0 = time.perf_counter()
+        expected = cube.top_by_month(args.n)
+        full_sec += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        index.update(name)
+        incr_sec += time.perf_counter() - t0
+        got = index.top_by_month()
+        # Both rankings order ties differently only when scores are exactly equal.
+        mismatches += any([s for _, s in got[m]] != [s for _, s in expected[m]] for m in got)
+
+    print(f"Itinerary top {args.n} over {args.cities} cities x 12 months:")
+    print(f"  {'initial build (argpartition)':<34} {build_ms:>9.2f} ms")
+    print(f"  {'initial build (full sort)':<34} {sort_ms:>9.2f} ms")
+    print(f"  {'per single-city change, full sort':<34} {full_sec / args.updates * 1000:>9.3f} ms")
+    print(f"  {'per single-city change, index':<34} {incr_sec / args.updates * 1000:>9.3f} ms")
+    print(f"Score mismatches vs full sort: {mismatches}/{args.updates}")
+    return 1 if mismatches else 0
+
+
+def synthetic_ui_snapshot(ss: Any, n_cities: int, seed: int = 5) -> tuple[Any, list[dict[str, Any]]]:
+    """A scored ClimateCube and matching Current Weather rows, as the UI cache holds them."""
+    import numpy as np
+
+    from climate_cube import ClimateCube
+
+    inputs = synthetic_monthly_inputs(n_cities)
+    metrics = ss.MONTHLY_COLUMNS[1:]
+    inputs["avg_day_f"] = (inputs["tmax_mean"] + inputs["tmin_mean"]) / 2
+    cube = ClimateCube(capacity=n_cities)
+    for i in range(n_cities):
+        cube.set_city(f"City {i}", np.stack([inputs[k][i] for k in metrics], axis=1), metrics)
+    cube.rescore()
+    rng = np.random.default_rng(seed)
+    rows = [
+        {
+            "city": city,
+            "current_temp_f": float(rng.uniform(30, 100)),
+            "niceness": float(rng.random()),
+            "tmax_f": float(rng.uniform(40, 100)),
+            "tmin_f": float(rng.uniform(20, 60)),
+            "next_month_sunny_days": float(rng.uniform(0, 30)),
+            "est_next_month_day_length": float(rng.uniform(8, 16)),
+            "forecast_sunny_count": int(rng.integers(0, 16)),
+            "forecast_days": 16,
+        }
+        for city in cube.cities()
+    ]
+    return cube, rows
+
+
+@requires_pyqt6
+def bench_tables(args: argparse.Namespace) -> int:
+    import numpy as np
+
+    ss = load_sunseeker(f"{tempfile.gettempdir()}/sunseeker_bench_unused.db")
+    from PyQt6.QtCore import QSortFilterProxyModel, Qt
+    from PyQt6.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication([])
+    cube, rows = synthetic_ui_snapshot(ss, args.cities)
+    rng = np.random.default_rng(5)
+
+    def ms(fn) -> float:
+        t0 = time.perf_counter()
+        fn()
+        app.processEvents()
+        return (time.perf_counter() - t0) * 1000
+
+    current = ss.CurrentWeatherModel([], cube)
+    monthly = ss.MonthlyCalendarModel(cube)
+    current_view = ss.make_sorted_view(current, 30)
+    monthly_view = ss.make_sorted_view(monthly, 50)
+    results = [
+        ("load current rows", ms(lambda: current.set_items(rows))),
+        ("reload monthly rows", ms(monthly.reload)),
+        ("sort current by niceness", ms(lambda: current_view.sortByColumn(0, Qt.SortOrder.DescendingOrder))),
+        ("sort current by city", ms(lambda: current_view.sortByColumn(1, Qt.SortOrder.AscendingOrder))),
+        ("sort monthly by July", ms(lambda: monthly_view.sortByColumn(7, Qt.SortOrder.DescendingOrder))),
+    ]
+    current_view.sortByColumn(0, Qt.SortOrder.DescendingOrder)
+    sample = rows[: args.updates]
+    total = 0.0
+    for row in sample:
+        changed = dict(row, niceness=float(rng.random()))
+        total += ms(lambda: current.upsert(changed))
+    results.append(("single-city upsert (avg)", total / max(1, len(sample))))
+
+    # Baseline: a stock QSortFilterProxyModel calling data(SORT_ROLE) per comparison.
+    stock = QSortFilterProxyModel()
+    stock.setSourceModel(current)
+    stock.setSortRole(ss.SORT_ROLE)
+    results.append(("stock proxy sort by niceness", ms(lambda: stock.sort(0, Qt.SortOrder.DescendingOrder))))
+
+    print(f"Table models over {args.cities} cities:")
+    for label, value in results:
+        print(f"  {label:<32} {value:>9.1f} ms")
+    return 0
+
+
+@requires_pyqt6
+def bench_startup(args: argparse.Namespace) -> int:
+    with tempfile.TemporaryDirectory(prefix="sunseeker_startup_") as tmp:
+        # The window reads city_coords and the boundary cache (Continent tab) from its database.
+        ss = load_sunseeker(f"{tmp}/bench.db")
+        ss.weather_sync.init_db()
+        ss.weather_sync.SYNC_LOG_FILE = f"{tmp}/sync_runs.log"
+        from PyQt6.QtWidgets import QApplication
+
+        app = QApplication.instance() or QApplication([])
+        cube, rows = synthetic_ui_snapshot(ss, args.cities)
+        ss.weather_sync.ALL_CITIES_UI_CACHE_FILE = f"{tmp}/all_cities_ui_cache.pkl"
+        ss.save_all_cities_ui_cache(rows, cube)
+        t_start = time.perf_counter()
+
+        t0 = time.perf_counter()
+        snapshot = ss.load_startup_snapshot(None, [], {})
+        load_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        window = ss.WeatherApp(snapshot["current_data_list"], snapshot["climate"], {}, {})
+        build_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        window.show()
+        app.processEvents()
+        paint_ms = (time.perf_counter() - t0) * 1000
+        first_paint_ms = (time.perf_counter() - t_start) * 1000
+
+        # A forecast phase's worth of streamed rows, applied in one coalesced flush.
+        streamed = [dict(row, niceness=row["niceness"] / 2) for row in rows[: args.streamed]]
+        t0 = time.perf_counter()
+        for row in streamed:
+            window.on_sync_row(row)
+        window.flush_sync_results()
+        app.processEvents()
+        stream_ms = (time.perf_counter() - t0) * 1000
+        window.close()
+
+    print(f"Startup from the UI cache over {args.cities} cities:")
+    print(f"  {'load snapshot':<34} {load_ms:>9.1f} ms")
+    print(f"  {'build window':<34} {build_ms:>9.1f} ms")
+    print(f"  {'show + first event pass':<34} {paint_ms:>9.1f} ms")
+    print(f"  {'time to first paint':<34} {first_paint_ms:>9.1f} ms")
+    print(f"  {f'apply {len(streamed)} streamed rows':<34} {stream_ms:>9.1f} ms")
+    return 0
+
+
+def _import_ms(module: str) -> tuple[float, bool]:
+    """Import time of module in a fresh interpreter, and whether PyQt6 came along with it."""
+    code = (
+        "import os, sys, time; os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen'); "
+        f"sys.path[:0] = [{BASE_DIR!r}, {BASE_DIR + '/sunseeker'!r}]; "
+        f"t0 = time.perf_counter(); import {module}; "
+        "print((time.perf_counter() - t0) * 1000, 'PyQt6' in sys.modules)"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.split()
+    return float(out[-2]), out[-1] == "True"
+
+
+def synthetic_forecast_cache(n_cities: int) -> dict[str, dict[str, Any]]:
+    """Fresh Visual Crossing forecast bundles, so a sync run needs no network."""
+    now = datetime.now(timezone.utc)
+    days = [(now.date() + timedelta(days=i)).isoformat() for i in range(16)]
+    cache = {}
+    for i in range(n_cities):
+        fore_json = {
+            "latitude": -60.0 + (i * 0.05) % 120,
+            "longitude": -180.0 + (i * 0.15) % 360,
+            "daily": {
+                "time": days,
+                "temperature_2m_max": [20.0 + (i + d) % 10 for d in range(16)],
+                "temperature_2m_min": [10.0 + (i + d) % 7 for d in range(16)],
+                "weathercode": [(i + d) % 4 for d in range(16)],
+                "sunrise": [f"{day}T06:30:00+00:00" for day in days],
+                "sunset": [f"{day}T18:45:00+00:00" for day in days],
+            },
+        }
+        cur_json = {"current_weather": {"temperature": 18.0 + i % 12}}
+        cache[f"City {i}"] = {"fore_json": fore_json, "cur_json": cur_json, "time": now, "provider": "visualcrossing"}
+    return cache
+
+
+@requires_pyqt6
+def bench_sync_daemon(args: argparse.Namespace) -> int:
+    sync_ms, sync_qt = _import_ms("weather_sync")
+    gui_ms, gui_qt = _import_ms("sunseeker")
+    with tempfile.TemporaryDirectory(prefix="sunseeker_daemon_") as tmp:
+        # Read at import: keep the provider state and response cache out of the working tree.
+        os.environ.update({"VC_PROVIDER_STATE_DB": f"{tmp}/provider_state.db", "VC_RESPONSE_CACHE_DIR": f"{tmp}/vc_response_cache"})
+        ws = load_sync(f"{tmp}/bench.db")
+        ws.CACHE_FILE = f"{tmp}/forecast_cache.pkl"
+        ws.ALL_CITIES_UI_CACHE_FILE = f"{tmp}/all_cities_ui_cache.pkl"
+        ws.SYNC_LOG_FILE = f"{tmp}/sync_runs.log"
+        ws.RUN_LOCK_FILE = f"{tmp}/bench.sync.lock"
+        ws.save_forecast_cache(synthetic_forecast_cache(args.cities))
+        # Today's marker keeps the runs to the forecast phase, served from the fresh cache.
+        ws.init_db()
+        conn = ws.get_db_conn(ws.DATABASE)
+        ws.set_sync_meta(conn, "last_daily_sync_date", datetime.now(timezone.utc).date().isoformat())
+        conn.close()
+
+        daemon = ws.SyncDaemon(interval=0)
+        cycles_ms = []
+        for _ in range(args.cycles):
+            t0 = time.perf_counter()
+            result = daemon.run_once()
+            cycles_ms.append((time.perf_counter() - t0) * 1000)
+            if result is None:
+                print("sync run failed; see the log above")
+                return 1
+        daemon.close()
+
+    print(f"Headless sync over {len(daemon.city_list)} target cities:")
+    print(f"  {'import weather_sync':<34} {sync_ms:>9.1f} ms  (PyQt6 loaded: {sync_qt})")
+    print(f"  {'import sunseeker':<34} {gui_ms:>9.1f} ms  (PyQt6 loaded: {gui_qt})")
+    print(f"  {'first cycle (cold)':<34} {cycles_ms[0]:>9.1f} ms")
+    if len(cycles_ms) > 1:
+        warm = cycles_ms[1:]
+        print(f"  {'later cycles (warm, mean)':<34} {sum(warm) / len(warm):>9.1f} ms")
+    return 1 if sync_qt else 0
+
+
+def write_synthetic_allcountries(path: str, n_rows: int, seed: int = 11) -> list[str]:
+    """A GeoNames-postal-shaped TSV of n_rows; returns the "Place, CC" keys in file order."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    countries = ["US", "DE", "FR", "GB", "ES", "IT", "MX", "BR", "JP", "AU"]
+    lats = np.round(rng.uniform(-60, 70, n_rows), 4)
+    lons = np.round(rng.uniform(-180, 180, n_rows), 4)
+    keys = []
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n_rows):
+            cc = countries[i % len(countries)]
+            place = f"Place {i // 3}"
+            keys.append(f"{place}, {cc}")
+            f.write(f"{cc}\t{i:05d}\t{place}\tAdmin\t01\t\t\t\t\t{lats[i]}\t{lons[i]}\t4\n")
+    return keys
+
+
+def legacy_all_cities(path: str) -> dict[str, tuple[float, float]]:
+    """The import-time csv.reader pass sunseeker.py made into ALL_CITIES before the compiled index."""
+    import geonames_index
+
+    return {key: (lat, lon) for key, lat, lon in geonames_index.parse_allcountries(path)}
+
+
+def legacy_populate_city_coords(conn, path: str) -> None:
+    """init_db()'s old city_coords load: one INSERT OR IGNORE per parsed row."""
+    import geonames_index
+
+    c = conn.cursor()
+    for key, lat, lon in geonames_index.parse_allcountries(path):
+        c.execute("INSERT OR IGNORE INTO city_coords (city, lat, lon) VALUES (?, ?, ?)", (key, lat, lon))
+    conn.commit()
+
+
+def bench_geonames(args: argparse.Namespace) -> int:
+    import random
+    import sqlite3
+
+    import geonames_index
+
+    with tempfile.TemporaryDirectory(prefix="sunseeker_geonames_") as tmp:
+        source = f"{tmp}/allcountries.txt"
+        keys = write_synthetic_allcountries(source, args.rows)
+        probes = random.Random(3).sample(keys, min(args.lookups, len(keys)))
+        city_coords = "CREATE TABLE city_coords (city TEXT PRIMARY KEY, lat REAL, lon REAL)"
+
+        t0 = time.perf_counter()
+        legacy = legacy_all_cities(source)
+        legacy_parse_ms = (time.perf_counter() - t0) * 1000
+        conn = sqlite3.connect(f"{tmp}/legacy.db")
+        conn.execute(city_coords)
+        t0 = time.perf_counter()
+        legacy_populate_city_coords(conn, source)
+        legacy_insert_ms = (time.perf_counter() - t0) * 1000
+        conn.close()
+
+        t0 = time.perf_counter()
+        geonames_index.GeoNamesIndex(source).build()
+        build_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        index = geonames_index.GeoNamesIndex(source)
+        construct_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        index.get(probes[0])
+        first_lookup_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        for key in probes:
+            index.get(key)
+        lookup_us = (time.perf_counter() - t0) * 1e6 / len(probes)
+        mismatches = sum(index[key] != legacy[key] for key in probes)
+        conn = sqlite3.connect(f"{tmp}/index.db")
+        conn.execute(city_coords)
+        t0 = time.perf_counter()
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO city_coords (city, lat, lon) VALUES (?, ?, ?)", index.rows())
+        bulk_insert_ms = (time.perf_counter() - t0) * 1000
+        conn.close()
+
+    print(f"allcountries.txt with {args.rows} rows ({len(index)} distinct keys):")
+    print(f"  {'legacy import-time parse':<34} {legacy_parse_ms:>9.1f} ms")
+    print(f"  {'legacy city_coords row inserts':<34} {legacy_insert_ms:>9.1f} ms")
+    print(f"  {'index build (once per source)':<34} {build_ms:>9.1f} ms")
+    print(f"  {'index at import':<34} {construct_ms:>9.3f} ms")
+    print(f"  {'first lookup (mmap open)':<34} {first_lookup_ms:>9.1f} ms")
+    print(f"  {'lookup':<34} {lookup_us:>9.1f} us")
+    print(f"  {'city_coords bulk insert':<34} {bulk_insert_ms:>9.1f} ms")
+    print(f"  {'coordinate mismatches':<34} {mismatches:>9d}")
+    return 1 if mismatches else 0
+
+
+def bench_city_search(args: argparse.Namespace) -> int:
+    import random
+
+    import geonames_index
+    from city_search import TIER_CATALOG, TIER_ZIP, CitySearchIndex
+
+    with tempfile.TemporaryDirectory(prefix="sunseeker_search_") as tmp:
+        source = f"{tmp}/allcountries.txt"
+        keys = write_synthetic_allcountries(source, args.rows)
+        geonames = geonames_index.GeoNamesIndex(source, by="search")
+        t0 = time.perf_counter()
+        len(geonames)
+        build_ms = (time.perf_counter() - t0) * 1000
+
+        rng = random.Random(9)
+        catalog = [f"Catalog Town {i}" for i in range(args.catalog)]
+        zips = [f"Zip Ville {i}, Country {i % 50}" for i in range(1000)]
+        t0 = time.perf_counter()
+        index = CitySearchIndex(geonames)
+        index.add(catalog, TIER_CATALOG)
+        index.add(zips, TIER_ZIP)
+        index.set_available(rng.sample(catalog, min(len(catalog), 2400)))
+        index.prepare()
+        memory_ms = (time.perf_counter() - t0) * 1000
+
+        queries = ["p", "pl", "place 1", "catalog", "town 12", "zip vile", "cataolg town 4"]
+        queries += [k[: rng.randint(2, len(k))] for k in rng.sample(keys, 200)]
+        worst_ms, total_ms = 0.0, 0.0
+        for q in queries:
+            t0 = time.perf_counter()
+            index.search(q, 25)
+            ms = (time.perf_counter() - t0) * 1000
+            worst_ms, total_ms = max(worst_ms, ms), total_ms + ms
+
+        # The QCompleter baseline: a case-insensitive prefix scan over every name it was given.
+        every_name = ["all cities", "refresh stale cities"] + catalog + zips + keys
+        t0 = time.perf_counter()
+        for q in queries[:20]:
+            ql = q.lower()
+            [n for n in every_name if n.lower().startswith(ql)][:25]
+        scan_ms = (time.perf_counter() - t0) * 1000 / 20
+
+    print(f"City search over {args.rows} GeoNames rows, {args.catalog} catalog and {len(zips)} ZIP names:")
+    print(f"  {'GeoNames search index build':<34} {build_ms:>9.1f} ms")
+    print(f"  {'in-memory index build':<34} {memory_ms:>9.1f} ms")
+    print(f"  {'query (mean)':<34} {total_ms / len(queries):>9.2f} ms")
+    print(f"  {'query (worst)':<34} {worst_ms:>9.2f} ms")
+    print(f"  {'full prefix scan per query':<34} {scan_ms:>9.1f} ms")
+    return 0
+
+
+def write_synthetic_boundaries(shp_path: str, rows: int, cols: int, vertices: int = 200) -> None:
+    """A rows x cols grid of square "countries" (each ring with `vertices` points) as .shp + .dbf."""
+    import numpy as np
+
+    lat_edges = np.linspace(-60, 75, rows + 1)
+    lon_edges = np.linspace(-180, 180, cols + 1)
+    records = []
+    for r in range(rows):
+        for c in range(cols):
+            x0, x1, y0, y1 = lon_edges[c], lon_edges[c + 1], lat_edges[r], lat_edges[r + 1]
+            side = np.linspace(0, 1, vertices // 4, endpoint=False)
+            ring = np.concatenate([
+                np.stack([x0 + side * (x1 - x0), np.full_like(side, y0)], axis=1),
+                np.stack([np.full_like(side, x1), y0 + side * (y1 - y0)], axis=1),
+                np.stack([x1 - side * (x1 - x0), np.full_like(side, y1)], axis=1),
+                np.stack([np.full_like(side, x0), y1 - side * (y1 - y0)], axis=1),
+                [[x0, y0]],
+            ])
+            content = struct.pack("<i4dii", 5, x0, y0, x1, y1, 1, len(ring)) + struct.pack("<i", 0) + ring.astype("<f8").tobytes()
+            records.append(content)
+    body = b"".join(struct.pack(">ii", i + 1, len(rec) // 2) + rec for i, rec in enumerate(records))
+    header = struct.pack(">7i", 9994, 0, 0, 0, 0, 0, (100 + len(body)) // 2)
+    header += struct.pack("<2i4d4d", 1000, 5, -180, -60, 180, 75, 0, 0, 0, 0)
+    with open(shp_path, "wb") as f:
+        f.write(header + body)
+
+    fields = [("CONTINENT", 20), ("ISO_A2", 2), ("ISO_A3", 3)]
+    record_len = 1 + sum(n for _, n in fields)
+    dbf = struct.pack("<B3BIHH20x", 3, 126, 1, 1, len(records), 32 + 32 * len(fields) + 1, record_len)
+    for name, length in fields:
+        dbf += name.encode("ascii").ljust(11, b"\x00") + b"C" + b"\x00" * 4 + bytes([length, 0]) + b"\x00" * 14
+    dbf += b"\x0d"
+    continents = ["Africa", "Asia", "Europe", "North America", "Oceania", "South America"]
+    for i in range(len(records)):
+        values = [continents[i % len(continents)], f"{i % 676 // 26 + 65:c}{i % 26 + 65:c}", f"{i:03d}"[-3:]]
+        dbf += b" " + b"".join(v.encode("ascii").ljust(n)[:n] for v, (_, n) in zip(values, fields))
+    with open(f"{os.path.splitext(shp_path)[0]}.dbf", "wb") as f:
+        f.write(dbf + b"\x1a")
+
+
+def bench_geo_boundaries(args: argparse.Namespace) -> int:
+    import random
+    import sqlite3
+
+    import numpy as np
+
+    import geo_boundaries
+
+    with tempfile.TemporaryDirectory(prefix="sunseeker_geo_") as tmp:
+        shp = f"{tmp}/countries.shp"
+        write_synthetic_boundaries(shp, args.rows, args.cols, args.vertices)
+        rng = random.Random(4)
+        lat_edges = np.linspace(-60, 75, args.rows + 1)
+        lon_edges = np.linspace(-180, 180, args.cols + 1)
+        expected, points = [], []
+        for _ in range(args.cities):
+            r, c = rng.randrange(args.rows), rng.randrange(args.cols)
+            expected.append(r * args.cols + c)
+            points.append((
+                rng.uniform(lat_edges[r] + 0.01, lat_edges[r + 1] - 0.01),
+                rng.uniform(lon_edges[c] + 0.01, lon_edges[c + 1] - 0.01),
+            ))
+
+        index = geo_boundaries.BoundaryIndex(shp)
+        t0 = time.perf_counter()
+        index.available()
+        load_ms = (time.perf_counter() - t0) * 1000
+        arr = np.array(points)
+        t0 = time.perf_counter()
+        ids = index.country_ids(arr[:, 0], arr[:, 1])
+        batch_ms = (time.perf_counter() - t0) * 1000
+        mismatches = int(np.count_nonzero(ids != np.array(expected)))
+
+        # Without the grid prefilter: every point against every country.
+        sample = arr[: args.brute_sample]
+        t0 = time.perf_counter()
+        for cid in range(len(index.countries)):
+            index._inside(index.edges[cid], sample[:, 0], sample[:, 1])
+        brute_ms = (time.perf_counter() - t0) * 1000 * len(arr) / max(1, len(sample))
+
+        conn = sqlite3.connect(f"{tmp}/geo.db")
+        geo_boundaries.ensure_cache(conn)
+        t0 = time.perf_counter()
+        geo_boundaries.cached_lookup_many(conn, index, points)
+        cold_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        geo_boundaries.cached_lookup_many(conn, index, points)
+        warm_ms = (time.perf_counter() - t0) * 1000
+        conn.close()
+
+    print(f"Continent/country lookups for {args.cities} cities over {args.rows * args.cols} countries:")
+    print(f"  {'load boundaries':<34} {load_ms:>9.1f} ms")
+    print(f"  {'batch point-in-polygon (grid)':<34} {batch_ms:>9.1f} ms")
+    print(f"  {'all countries per point (est.)':<34} {brute_ms:>9.1f} ms")
+    print(f"  {'cached lookup, cold':<34} {cold_ms:>9.1f} ms")
+    print(f"  {'cached lookup, warm':<34} {warm_ms:>9.1f} ms")
+    print(f"  {'wrong country':<34} {mismatches:>9d}")
+    return 1 if mismatches else 0
+
+
+def synthetic_alias_points(n: int, alias_share: float, seed: int = 5) -> list[tuple[float, float]]:
+    """n city points where about alias_share of them sit within 0.01 deg of an earlier one."""
+    import random
+
+    rng = random.Random(seed)
+    points: list[tuple[float, float]] = []
+    for _ in range(n):
+        if points and rng.random() < alias_share:
+            lat, lon = rng.choice(points)
+            points.append((lat + rng.uniform(-0.01, 0.01), lon + rng.uniform(-0.01, 0.01)))
+        else:
+            points.append((rng.uniform(-60, 70), rng.uniform(-180, 180)))
+    return points
+
+
+def bench_grid_share(args: argparse.Namespace) -> int:
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    import vc_provider
+
+    points = synthetic_alias_points(args.cities, args.alias_share)
+    windows = [("estimated", "2026-01-01", "2026-12-31"), ("forecast", "2026-01-01", 16)]
+    latency = args.latency_ms / 1000.0
+    calls = {"n": 0}
+    lock = threading.Lock()
+
+    def fetch(lat, lon):
+        with lock:
+            calls["n"] += 1
+        time.sleep(latency)
+        return (lat, lon)
+
+    def threaded(share):
+        calls["n"] = 0
+        if share is not None:
+            for lat, lon in points:
+                for w in windows:
+                    share.expect(lat, lon, w)
+
+        def one(point):
+            lat, lon = point
+            if share is None:
+                return [fetch(lat, lon) for _ in windows]
+            return [share.get(lat, lon, w, fetch) for w in windows]
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(one, points))
+        return calls["n"], (time.perf_counter() - t0) * 1000, results
+
+    async def run_async(share):
+        async def afetch(lat, lon):
+            calls["n"] += 1
+            await asyncio.sleep(latency)
+            return (lat, lon)
+
+        queue = asyncio.Queue()
+        for p in vc_provider.order_by_cell(points, lambda p: p, share.grid_deg):
+            for w in windows:
+                share.expect(*p, w)
+            queue.put_nowait(p)
+        out = {}
+
+        async def worker():
+            while not queue.empty():
+                p = queue.get_nowait()
+                out[p] = [await share.get_async(*p, w, afetch) for w in windows]
+
+        await asyncio.gather(*(worker() for _ in range(args.workers)))
+        return out
+
+    base_calls, base_ms, _ = threaded(None)
+    share = vc_provider.GridShare(args.grid_deg)
+    shared_calls, shared_ms, results = threaded(share)
+    wrong = sum(
+        1
+        for (lat, lon), got in zip(points, results)
+        for cell in got
+        if cell != vc_provider.grid_cell(lat, lon, args.grid_deg)
+    )
+    leftover = len(share._results)
+
+    calls["n"] = 0
+    ashare = vc_provider.GridShare(args.grid_deg)
+    t0 = time.perf_counter()
+    aout = asyncio.run(run_async(ashare))
+    async_ms = (time.perf_counter() - t0) * 1000
+    async_calls = calls["n"]
+    wrong += sum(
+        1 for p, got in aout.items() for cell in got if cell != vc_provider.grid_cell(*p, args.grid_deg)
+    )
+    leftover += len(ashare._results)
+
+    print(f"{args.cities} cities x {len(windows)} windows, ~{args.alias_share:.0%} aliases, grid {args.grid_deg:g} deg:")
+    print(f"  {'one request per city key':<34} {base_calls:>7d} calls {base_ms:>9.1f} ms")
+    print(f"  {'grid sharing (threads)':<34} {shared_calls:>7d} calls {shared_ms:>9.1f} ms")
+    print(f"  {'grid sharing (asyncio)':<34} {async_calls:>7d} calls {async_ms:>9.1f} ms")
+    print(f"  {share.summary()}")
+    print(f"  {'wrong cell / payloads left held':<34} {wrong:>7d} / {leftover}")
+    return 1 if wrong or leftover else 0
+
+
+def bench_response_cache(args: argparse.Namespace) -> int:
+    import json
+    import sqlite3
+
+    import response_cache
+
+    start = date.today()
+    est_end = (start + timedelta(days=364)).isoformat()
+    fc_end = (start + timedelta(days=15)).isoformat()
+    points = [(-50.0 + (i * 0.37) % 110, -170.0 + (i * 1.13) % 340) for i in range(args.cities)]
+    est_payload = {"days": synthetic_vc_days(start, 365)}
+    fc_payload = {"days": synthetic_vc_days(start, 16), "currentConditions": {"temp": 21.5}}
+    with tempfile.TemporaryDirectory(prefix="sunseeker_respcache_") as tmp:
+        cache = response_cache.ResponseCache(f"{tmp}/cache", max_bytes=0)
+        raw_bytes = 0
+        t0 = time.perf_counter()
+        for i, (lat, lon) in enumerate(points):
+            # Vary one value per city so payloads are distinct blobs, as real responses are.
+            est = {"days": [{**est_payload["days"][0], "tempmax": 10.0 + i}] + est_payload["days"][1:]}
+            raw_bytes += len(json.dumps(est))
+            cache.put("estimated_window", lat, lon, start.isoformat(), est_end, "days", est, city=f"City {i}")
+            cache.put("forecast_bundle", lat, lon, start.isoformat(), fc_end, "days,current", fc_payload, city=f"City {i}")
+        put_ms = (time.perf_counter() - t0) * 1000
+        stats = cache.stats()
+
+        t0 = time.perf_counter()
+        hits = sum(
+            cache.get("estimated_window", lat, lon, start.isoformat(), est_end, "days") is not None for lat, lon in points
+        )
+        get_ms = (time.perf_counter() - t0) * 1000
+
+        db_path = f"{tmp}/reingest.db"
+        t0 = time.perf_counter()
+        counts = response_cache.reingest(cache, db_path)
+        reingest_ms = (time.perf_counter() - t0) * 1000
+        conn = sqlite3.connect(db_path)
+        est_rows = conn.execute("SELECT COUNT(*) FROM daily_data_estimated").fetchone()[0]
+        fc_rows = conn.execute("SELECT COUNT(*) FROM daily_data_forecast").fetchone()[0]
+        conn.close()
+
+        cache.max_bytes = stats["bytes"] // 2
+        t0 = time.perf_counter()
+        evicted = cache.evict()
+        evict_ms = (time.perf_counter() - t0) * 1000
+        after = cache.stats()
+
+    n = len(points)
+    print(f"Raw response cache over {n} cities (365-day estimated + 16-day forecast payloads):")
+    print(f"  {'put (2 payloads per city)':<34} {put_ms / (2 * n):>9.2f} ms/payload")
+    print(f"  {'get, fresh hit':<34} {get_ms / n:>9.2f} ms/payload  ({hits}/{n} hits)")
+    print(f"  {'stored / raw estimated JSON':<34} {stats['bytes'] / 1e6:>9.2f} MB / {raw_bytes / 1e6:.2f} MB in {stats['blobs']} blobs")
+    print(f"  {'reingest (no network)':<34} {reingest_ms:>9.1f} ms  ({counts['payloads']} payloads, {counts['cities']} cities)")
+    print(f"  {'rows rebuilt est / fc':<34} {est_rows:>9d} / {fc_rows}")
+    print(f"  {'LRU evict to half size':<34} {evict_ms:>9.1f} ms  ({evicted} entries, {after['bytes'] / 1e6:.2f} MB left)")
+    ok = hits == n and est_rows == 365 * n and fc_rows == 16 * n and after["bytes"] <= stats["bytes"] // 2
+    return 0 if ok else 1
+
+
+def sim_catalog(n: int) -> list[dict[str, Any]]:
+    return [
+        {"city": f"Sim City {i}", "country": "Simland", "continent": "Europe",
+         "lat": round(-50.0 + (i * 0.37) % 110, 4), "lng": round(-170.0 + (i * 1.13) % 340, 4)}
+        for i in range(n)
+    ]
+
+
+def run_sim_backfill(base_url: str, tmp: str, extra_args: list[str], extra_env: dict[str, str] | None = None):
+    """
+    run_catalog_backfill.py against the simulator at base_url, with all state under tmp
+    (catalog.json must already be there). Returns (process, wall seconds, final status file).
+    """
+    import json
+
+    if not os.path.exists(f"{tmp}/bench.db"):
+        # The backfill writes into an existing weather_sync database.
+        load_sync(f"{tmp}/bench.db").init_db()
+    env = {
+        **os.environ,
+        "VC_BASE_URL": base_url,
+        "VISUAL_CROSSING_API_KEY": "sim-key",
+        "VC_PROVIDER_STATE_DB": f"{tmp}/provider_state.db",
+        "VC_RESPONSE_CACHE": "0",
+        # Fresh shared bucket that never binds; --rate-per-sec/--burst pace the run itself.
+        "VC_RATE_PER_SEC": "100000",
+        "VC_BURST": "1000",
+        **(extra_env or {}),
+    }
+    cmd = [
+        sys.executable, f"{BASE_DIR}/run_catalog_backfill.py",
+        "--db", f"{tmp}/bench.db",
+        "--catalog", f"{tmp}/catalog.json",
+        "--api-log", f"{tmp}/api_calls.ndjson",
+        "--sync-log", f"{tmp}/sync_runs.log",
+        "--status-file", f"{tmp}/status.json",
+        "--quiet-live",
+        *extra_args,
+    ]
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, env=env, cwd=tmp, capture_output=True, text=True)
+    wall = time.perf_counter() - t0
+    status_path = f"{tmp}/status.json"
+    status = json.loads(Path(status_path).read_text(encoding="utf-8")) if os.path.exists(status_path) else {}
+    return proc, wall, status
+
+
+def bench_vc_sim(args: argparse.Namespace) -> int:
+    import json
+
+    import vc_simulator
+
+    sim = vc_simulator.VCSimulator(
+        vc_simulator.SimConfig(
+            latency=args.latency,
+            error_429=args.error_429,
+            error_5xx=args.error_5xx,
+            quota=args.quota,
+            max_concurrent=args.max_concurrent,
+        )
+    )
+    base_url = sim.start()
+    try:
+        with tempfile.TemporaryDirectory(prefix="sunseeker_vcsim_") as tmp:
+            Path(f"{tmp}/catalog.json").write_text(json.dumps(sim_catalog(args.cities)), encoding="utf-8")
+            proc, wall, status = run_sim_backfill(base_url, tmp, [
+                "--mode", args.mode,
+                "--concurrency", str(args.concurrency),
+                "--rate-per-sec", str(args.rate_per_sec),
+                "--burst", str(args.concurrency),
+            ])
+    finally:
+        sim.stop()
+    stats = sim.stats()
+    if proc.returncode != 0:
+        print(proc.stdout[-2000:])
+        print(proc.stderr[-2000:])
+    done = status.get("ok", 0)
+    print(f"Catalog backfill ({args.mode}) of {args.cities} cities against the local simulator at {base_url}:")
+    print(f"  {'latency / 429 / 5xx':<34} {args.latency} / {args.error_429:.0%} / {args.error_5xx:.0%}")
+    print(f"  {'wall time':<34} {wall:>9.2f} s  (exit {proc.returncode})")
+    print(f"  {'cities ok / failed':<34} {done:>9} / {status.get('err', 0)}")
+    print(f"  {'throughput':<34} {done / wall * 60 if wall > 0 else 0.0:>9.0f} cities/min")
+    print(f"  {'simulator requests':<34} {stats['requests']:>9d}  statuses {stats['statuses']}")
+    print(f"  {'peak in-flight':<34} {stats['peak_in_flight']:>9d}  (concurrency {args.concurrency})")
+    return 0 if proc.returncode == 0 and done == args.cities else 1
+
+
+def bench_provider_outage(args: argparse.Namespace) -> int:
+    """
+    A full outage (every request 503) seen by two backfill processes in a row, without and
+    with the shared circuit breaker, then recovery: the next process sends one half-open
+    probe after the cooldown and finishes the catalog.
+    """
+    import json
+
+    import vc_provider
+    import vc_simulator
+
+    sim = vc_simulator.VCSimulator(vc_simulator.SimConfig(latency=args.latency, error_5xx=1.0))
+    base_url = sim.start()
+    backfill_args = [
+        "--mode", "forecast", "--no-adaptive", "--attempts", str(args.attempts),
+        "--concurrency", str(args.concurrency), "--rate-per-sec", "500", "--burst", str(args.concurrency),
+    ]
+    rows = []
+    ok = True
+    try:
+        for breaker in ("0", "1"):
+            with tempfile.TemporaryDirectory(prefix="sunseeker_outage_") as tmp:
+                Path(f"{tmp}/catalog.json").write_text(json.dumps(sim_catalog(args.cities)), encoding="utf-8")
+                env = {"VC_BREAKER": breaker, "VC_BREAKER_COOLDOWN_SEC": str(args.cooldown_sec)}
+                sim.config.error_5xx = 1.0
+                for run_no in (1, 2):
+                    before = sim.stats()["requests"]
+                    _proc, wall, status = run_sim_backfill(base_url, tmp, backfill_args, env)
+                    rows.append((f"breaker={'on' if breaker == '1' else 'off'} outage run {run_no}", wall,
+                                 sim.stats()["requests"] - before, status.get("err", 0), status.get("deferred", 0)))
+                if breaker == "1":
+                    sim.config.error_5xx = 0.0
+                    # Failed probes have doubled the cooldown; wait out what the shared state says.
+                    health = vc_provider.CircuitBreaker(db_path=f"{tmp}/provider_state.db").status()
+                    time.sleep(health["retry_in_sec"] + 0.1)
+                    before = sim.stats()["requests"]
+                    proc, wall, status = run_sim_backfill(base_url, tmp, backfill_args, env)
+                    rows.append(("breaker=on recovered", wall, sim.stats()["requests"] - before,
+                                 status.get("err", 0), status.get("deferred", 0)))
+                    ok = proc.returncode == 0 and status.get("ok", 0) == args.cities
+                    health = status.get("provider_health", {})
+    finally:
+        sim.stop()
+
+    print(f"Forecast backfill of {args.cities} cities through a full 503 outage ({args.attempts} attempts per request):")
+    print(f"  {'':<34} {'wall s':>9} {'requests':>9} {'err':>6} {'deferred':>9}")
+    for label, wall, reqs, err, deferred in rows:
+        print(f"  {label:<34} {wall:>9.2f} {reqs:>9d} {err:>6} {deferred:>9}")
+    print(f"  {'circuit after recovery':<34} {health.get('state')} (opens={health.get('total_opens')})")
+    return 0 if ok and health.get("state") == "closed" else 1
+
+
+def bench_fetch_scheduler(args: argparse.Namespace) -> int:
+    """
+    A forecast backfill with a request budget well short of the catalog, in catalog order
+    (all priority weights 0) and in priority order. The user's cities (pinned, recent and
+    itinerary, placed at the end of the catalog) are what a short run should keep fresh.
+    """
+    import json
+    import sqlite3
+
+    import fetch_scheduler
+    import vc_simulator
+
+    sim = vc_simulator.VCSimulator(vc_simulator.SimConfig(latency=args.latency))
+    base_url = sim.start()
+    catalog = sim_catalog(args.cities)
+    names = [c["city"] for c in catalog]
+    wanted = names[-args.interest:]
+    thirds = max(1, len(wanted) // 3)
+    lists = {"pinned": wanted[:1], "recent": wanted[1:thirds + 1], "itinerary": wanted[thirds + 1:]}
+    backfill_args = [
+        "--mode", "forecast", "--request-budget", str(args.budget),
+        "--concurrency", "4", "--rate-per-sec", "500", "--burst", "4",
+    ]
+    zero = {f"SYNC_PRIORITY_W_{w}": "0" for w in ("STALENESS", "GAP", "INTEREST", "ERRORS")}
+    rows = []
+    try:
+        for label, env in (("catalog order", zero), ("priority order", {})):
+            with tempfile.TemporaryDirectory(prefix="sunseeker_sched_") as tmp:
+                Path(f"{tmp}/catalog.json").write_text(json.dumps(catalog), encoding="utf-8")
+                load_sync(f"{tmp}/bench.db").init_db()
+                conn = sqlite3.connect(f"{tmp}/bench.db")
+                fetch_scheduler.save_interest(conn, **lists)
+                conn.close()
+                before = sim.stats()["requests"]
+                _proc, wall, status = run_sim_backfill(base_url, tmp, backfill_args, env)
+                conn = sqlite3.connect(f"{tmp}/bench.db")
+                fresh = {r[0] for r in conn.execute("SELECT DISTINCT city FROM daily_data_forecast")}
+                conn.close()
+                rows.append((label, wall, sim.stats()["requests"] - before, len(fresh),
+                             sum(c in fresh for c in wanted), status.get("deferred", 0),
+                             status.get("priority", {}).get("served", {})))
+    finally:
+        sim.stop()
+
+    print(f"Forecast backfill of {args.cities} cities with a budget of {args.budget} requests "
+          f"({len(wanted)} cities of user interest):")
+    print(f"  {'':<18} {'wall s':>8} {'requests':>9} {'fresh':>6} {'wanted fresh':>13} {'deferred':>9}  served by band")
+    for label, wall, reqs, fresh, hit, deferred, served in rows:
+        print(f"  {label:<18} {wall:>8.2f} {reqs:>9d} {fresh:>6d} {hit:>7d}/{len(wanted):<5d} {deferred:>9d}  {served}")
+    return 0 if rows[-1][4] == min(len(wanted), args.budget) else 1
+
+
+def bench_refresh_tiers(args: argparse.Namespace) -> int:
+    """
+    An hourly current-temperature refresh against the local simulator: refetching each city's
+    16-day bundle (the only way before the tiers) vs the hourly run_daily_sync, which, with
+    the forecasts still fresh, sends one-day include=current requests.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="sunseeker_tiers_") as tmp:
+        # Read at import: configure the pipeline before weather_sync and vc_provider load.
+        os.environ.update({
+            "VISUAL_CROSSING_API_KEY": "sim-key",
+            "VC_PROVIDER_STATE_DB": f"{tmp}/provider_state.db",
+            "VC_RESPONSE_CACHE": "0",
+            "VC_RATE_PER_SEC": "1000",
+            "VC_BURST": str(args.workers),
+            "VC_MAX_WORKERS": str(args.workers),
+            "CURRENT_TTL_SEC": "0",
+        })
+        import vc_simulator
+
+        sim = vc_simulator.VCSimulator(vc_simulator.SimConfig(latency=args.latency))
+        os.environ["VC_BASE_URL"] = sim.start()
+        try:
+                ws = load_sync(f"{tmp}/bench.db")
+                ws.CACHE_FILE = f"{tmp}/forecast_cache.pkl"
+                ws.ALL_CITIES_UI_CACHE_FILE = f"{tmp}/all_cities_ui_cache.pkl"
+                ws.SYNC_LOG_FILE = f"{tmp}/sync_runs.log"
+                ws.API_CALL_LOG_FILE = f"{tmp}/api_calls.ndjson"
+                cache = synthetic_forecast_cache(args.cities)
+                city_list = [(c, (e["fore_json"]["latitude"], e["fore_json"]["longitude"])) for c, e in cache.items()]
+                ws.init_db()
+                conn = ws.get_db_conn(ws.DATABASE)
+                # Today's daily sync is done and every forecast is fresh: only current conditions are due.
+                ws.set_sync_meta(conn, "last_daily_sync_date", datetime.now(timezone.utc).date().isoformat())
+
+                def measure(label, fn):
+                    before = sim.stats()
+                    t0 = time.perf_counter()
+                    updated = fn()
+                    wall = time.perf_counter() - t0
+                    after = sim.stats()
+                    rows.append((label, wall, after["requests"] - before["requests"], after["records"] - before["records"],
+                                 after["bytes_served"] - before["bytes_served"], updated))
+
+                def bundles():
+                    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+                        got = list(pool.map(lambda item: ws.fetch_forecast_bundle(*item[1], days=16, city=item[0]), city_list))
+                    return sum(1 for _fore, cur in got if cur["current_weather"]["temperature"] is not None)
+
+                def tiered():
+                    return ws.run_daily_sync(conn, cache, city_list)["current_updated"]
+
+                measure("16-day bundle per city", bundles)
+                measure("current tier (run_daily_sync)", tiered)
+                conn.close()
+        finally:
+            sim.stop()
+
+    print(f"Hourly current-conditions refresh of {args.cities} cities against the local simulator ({args.latency}):")
+    print(f"  {'':<30} {'wall s':>8} {'requests':>9} {'records':>8} {'KB':>9} {'updated':>8}")
+    for label, wall, reqs, records, nbytes, updated in rows:
+        print(f"  {label:<30} {wall:>8.2f} {reqs:>9d} {records:>8d} {nbytes / 1024:>9.1f} {updated:>8d}")
+    (_, _, _, old_records, _, _), (_, _, _, new_records, _, new_updated) = rows
+    print(f"  {'record cost of the tier':<30} {new_records / old_records if old_records else 0.0:>8.1%}")
+    return 0 if new_updated == args.cities else 1
+
+
+def bench_vc_batch(args: argparse.Namespace) -> int:
+    """
+    Forecast-phase refreshes against the local simulator, one request per city vs multi-location
+    requests of --batch-size locations: 16-day bundles via fetch_batched, the current tier through
+    run_daily_sync and a forecast backfill, the last two also with per-location failures that
+    must be refetched singly.
+    """
+    import json
+    from concurrent.futures import ThreadPoolExecutor
+
+    rows = []
+    ok = True
+    with tempfile.TemporaryDirectory(prefix="sunseeker_batch_") as tmp:
+        # Read at import: configure the pipeline before weather_sync and vc_provider load.
+        os.environ.update({
+            "VISUAL_CROSSING_API_KEY": "sim-key",
+            "VC_PROVIDER_STATE_DB": f"{tmp}/provider_state.db",
+            "VC_RESPONSE_CACHE": "0",
+            "VC_RATE_PER_SEC": "1000",
+            "VC_BURST": str(args.workers),
+            "VC_MAX_WORKERS": str(args.workers),
+            "CURRENT_TTL_SEC": "0",
+        })
+        import vc_simulator
+
+        sim = vc_simulator.VCSimulator(vc_simulator.SimConfig(latency=args.latency))
+        os.environ["VC_BASE_URL"] = sim.start()
+        try:
+            ws = load_sync(f"{tmp}/bench.db")
+            ws.CACHE_FILE = f"{tmp}/forecast_cache.pkl"
+            ws.ALL_CITIES_UI_CACHE_FILE = f"{tmp}/all_cities_ui_cache.pkl"
+            ws.SYNC_LOG_FILE = f"{tmp}/sync_runs.log"
+            ws.API_CALL_LOG_FILE = f"{tmp}/api_calls.ndjson"
+            cache = synthetic_forecast_cache(args.cities)
+            city_list = [(c, (e["fore_json"]["latitude"], e["fore_json"]["longitude"])) for c, e in cache.items()]
+            ws.init_db()
+            conn = ws.get_db_conn(ws.DATABASE)
+            # Today's daily sync is done and every forecast is fresh: only current conditions are due.
+            ws.set_sync_meta(conn, "last_daily_sync_date", datetime.now(timezone.utc).date().isoformat())
+
+            def measure(label, fn):
+                before = sim.stats()
+                t0 = time.perf_counter()
+                updated, fallbacks = fn()
+                wall = time.perf_counter() - t0
+                after = sim.stats()
+                rows.append((label, wall, after["requests"] - before["requests"],
+                             after["bytes_served"] - before["bytes_served"], updated, fallbacks))
+                return updated
+
+            def bundles_single():
+                with ThreadPoolExecutor(max_workers=args.workers) as pool:
+                    got = list(pool.map(lambda item: ws.fetch_forecast_bundle(*item[1], days=16, city=item[0]), city_list))
+                return sum(1 for fore, _cur in got if fore["daily"]["time"]), 0
+
+            def bundles_batched():
+                stats = ws.vc_provider.BatchStats(args.batch_size)
+                today = datetime.now(timezone.utc).date()
+                got = ws.fetch_batched(
+                    [(c, lat, lon) for c, (lat, lon) in city_list], today.isoformat(),
+                    (today + timedelta(days=15)).isoformat(), "days,current", "forecast_bundle", stats=stats,
+                )
+                return sum(1 for v in got.values() if isinstance(v, dict) and v.get("days")), 0
+
+            def current_tier(size, error_location=0.0):
+                def run():
+                    ws.VC_BATCH_SIZE = size
+                    sim.config.error_location = error_location
+                    try:
+                        result = ws.run_daily_sync(conn, cache, city_list)
+                    finally:
+                        ws.VC_BATCH_SIZE = 1
+                        sim.config.error_location = 0.0
+                    return result["current_updated"], result["batching"]["fallbacks"]
+                return run
+
+            ws.VC_BATCH_SIZE = args.batch_size
+            measure("bundles, one per city", bundles_single)
+            measure(f"bundles, batches of {args.batch_size}", bundles_batched)
+            measure("current tier, one per city", current_tier(1))
+            ok &= measure(f"current tier, batches of {args.batch_size}", current_tier(args.batch_size)) == args.cities
+            ok &= measure(
+                f"  + {args.error_location:.0%} location errors", current_tier(args.batch_size, args.error_location)
+            ) == args.cities
+            conn.close()
+
+            def backfill(size, error_location=0.0):
+                def run():
+                    sub = tempfile.mkdtemp(dir=tmp)
+                    Path(f"{sub}/catalog.json").write_text(json.dumps(sim_catalog(args.cities)), encoding="utf-8")
+                    sim.config.error_location = error_location
+                    try:
+                        _proc, _wall, status = run_sim_backfill(os.environ["VC_BASE_URL"], sub, [
+                            "--mode", "forecast", "--concurrency", str(args.workers), "--rate-per-sec", "1000",
+                            "--burst", str(args.workers), "--batch-size", str(size),
+                        ])
+                    finally:
+                        sim.config.error_location = 0.0
+                    return status.get("ok", 0), (status.get("batching") or {}).get("fallbacks", 0)
+                return run
+
+            measure("backfill, one per city", backfill(1))
+            ok &= measure(f"backfill, batches of {args.batch_size}", backfill(args.batch_size)) == args.cities
+            ok &= measure(
+                f"  + {args.error_location:.0%} location errors", backfill(args.batch_size, args.error_location)
+            ) == args.cities
+        finally:
+            sim.stop()
+
+    print(f"Forecast-phase requests for {args.cities} cities against the local simulator ({args.latency}):")
+    print(f"  {'':<32} {'wall s':>8} {'requests':>9} {'KB':>9} {'updated':>8} {'refetched':>9}")
+    for label, wall, reqs, nbytes, updated, fallbacks in rows:
+        print(f"  {label:<32} {wall:>8.2f} {reqs:>9d} {nbytes / 1024:>9.1f} {updated:>8d} {fallbacks:>9d}")
+    return 0 if ok else 1
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Synthetic benchmarks for the sunseeker storage paths.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sd = sub.add_parser("store-data", help="Rows/sec of the legacy per-row store_data vs the bulk write path")
+    sd.add_argument("--cities", type=int, default=2500)
+    sd.add_argument("--days", type=int, default=365)
+    sd.add_argument("--sample", type=int, default=100, help="Cities re-stored per path")
+    sd.set_defaults(func=bench_store_data)
+    dl = sub.add_parser("daily-layer", help="Write amplification and read latency of the materialized daily_data table vs the view")
+    dl.add_argument("--cities", type=int, default=500)
+    dl.add_argument("--days", type=int, default=365)
+    dl.add_argument("--sample", type=int, default=100, help="Cities re-stored and read per layout")
+    dl.add_argument("--repeat", type=int, default=3)
+    dl.set_defaults(func=bench_daily_layer)
+    ma = sub.add_parser("monthly-agg", help="Monthly aggregate reads from city_monthly_agg vs scanning daily rows")
+    ma.add_argument("--cities", type=int, default=1000)
+    ma.add_argument("--days", type=int, default=365)
+    ma.add_argument("--sample", type=int, default=200, help="Cities read per path")
+    ma.set_defaults(func=bench_monthly_agg)
+    nc = sub.add_parser("niceness", help="Vectorized niceness vs the scalar functions: equivalence check and timing")
+    nc.add_argument("--cities", type=int, default=10000)
+    nc.add_argument("--apply-sample", type=int, default=1000, help="Cities timed through the old per-city apply")
+    nc.set_defaults(func=bench_niceness)
+    cc = sub.add_parser("climate-cube", help="Memory, pickle cost and itinerary ranking of the dict of monthly frames vs ClimateCube")
+    cc.add_argument("--cities", type=int, default=2400)
+    cc.set_defaults(func=bench_climate_cube)
+    it = sub.add_parser("itinerary", help="Top-N itinerary: full re-sort vs the incremental ItineraryIndex")
+    it.add_argument("--cities", type=int, default=2400)
+    it.add_argument("--updates", type=int, default=500, help="Single-city adds/refreshes applied one at a time")
+    it.add_argument("--n", type=int, default=10)
+    it.set_defaults(func=bench_itinerary)
+    tb = sub.add_parser("tables", help="Load, sort and single-row update cost of the Current/Monthly table models")
+    tb.add_argument("--cities", type=int, default=20000)
+    tb.add_argument("--updates", type=int, default=200, help="Single-city upserts timed")
+    tb.set_defaults(func=bench_tables)
+    su = sub.add_parser("startup", help="Time to first paint of the window from the UI cache, and applying streamed sync rows")
+    su.add_argument("--cities", type=int, default=2400)
+    su.add_argument("--streamed", type=int, default=2400, help="Rows streamed in by the background sync")
+    su.set_defaults(func=bench_startup)
+    sy = sub.add_parser("sync-daemon", help="Import cost of the headless sync vs the GUI, and cold vs warm daemon cycles")
+    sy.add_argument("--cities", type=int, default=2400)
+    sy.add_argument("--cycles", type=int, default=3)
+    sy.set_defaults(func=bench_sync_daemon)
+    gn = sub.add_parser("geonames", help="allcountries.txt: import-time csv parse and row inserts vs the compiled index")
+    gn.add_argument("--rows", type=int, default=1500000)
+    gn.add_argument("--lookups", type=int, default=10000)
+    gn.set_defaults(func=bench_geonames)
+    cs = sub.add_parser("city-search", help="Add City search latency over GeoNames, catalog and ZIP names vs a full prefix scan")
+    cs.add_argument("--rows", type=int, default=1500000)
+    cs.add_argument("--catalog", type=int, default=5000)
+    cs.set_defaults(func=bench_city_search)
+    gb = sub.add_parser("geo-boundaries", help="Continent tab lookups: grid-prefiltered point-in-polygon and the SQLite cache")
+    gb.add_argument("--cities", type=int, default=2400)
+    gb.add_argument("--rows", type=int, default=12)
+    gb.add_argument("--cols", type=int, default=15, help="Synthetic countries are a rows x cols grid")
+    gb.add_argument("--vertices", type=int, default=200)
+    gb.add_argument("--brute-sample", type=int, default=200)
+    gb.set_defaults(func=bench_geo_boundaries)
+    gs = sub.add_parser("grid-share", help="VC calls issued per city key vs shared per grid cell and window")
+    gs.add_argument("--cities", type=int, default=2400)
+    gs.add_argument("--alias-share", type=float, default=0.3)
+    gs.add_argument("--grid-deg", type=float, default=0.05)
+    gs.add_argument("--latency-ms", type=float, default=5.0)
+    gs.add_argument("--workers", type=int, default=8)
+    gs.set_defaults(func=bench_grid_share)
+    rc = sub.add_parser("response-cache", help="Raw VC response cache: put/get cost, compression, offline reingest and LRU eviction")
+    rc.add_argument("--cities", type=int, default=300)
+    rc.set_defaults(func=bench_response_cache)
+    vs = sub.add_parser("vc-sim", help="End-to-end catalog backfill throughput against the local VC simulator, no network")
+    vs.add_argument("--cities", type=int, default=200)
+    vs.add_argument("--mode", choices=["both", "estimated", "forecast"], default="both")
+    vs.add_argument("--latency", default="lognormal:80,0.5", help="vc_simulator latency spec (milliseconds)")
+    vs.add_argument("--error-429", type=float, default=0.02)
+    vs.add_argument("--error-5xx", type=float, default=0.01)
+    vs.add_argument("--quota", type=int, default=0)
+    vs.add_argument("--max-concurrent", type=int, default=0)
+    vs.add_argument("--concurrency", type=int, default=8)
+    vs.add_argument("--rate-per-sec", type=float, default=200.0)
+    vs.set_defaults(func=bench_vc_sim)
+    po = sub.add_parser("provider-outage", help="Requests and wall time spent during a VC outage with and without the shared circuit breaker")
+    po.add_argument("--cities", type=int, default=60)
+    po.add_argument("--attempts", type=int, default=3)
+    po.add_argument("--concurrency", type=int, default=4)
+    po.add_argument("--latency", default="fixed:20")
+    po.add_argument("--cooldown-sec", type=float, default=2.0)
+    po.set_defaults(func=bench_provider_outage)
+    fs = sub.add_parser("fetch-scheduler", help="Freshness of the user's cities under a request budget: catalog vs priority order")
+    fs.add_argument("--cities", type=int, default=200)
+    fs.add_argument("--budget", type=int, default=50)
+    fs.add_argument("--interest", type=int, default=15, help="Pinned/recent/itinerary cities at the end of the catalog")
+    fs.add_argument("--latency", default="fixed:10")
+    fs.set_defaults(func=bench_fetch_scheduler)
+    rt = sub.add_parser("refresh-tiers", help="Records and bytes of an hourly current-temperature refresh: 16-day bundles vs the current tier")
+    rt.add_argument("--cities", type=int, default=300)
+    rt.add_argument("--workers", type=int, default=8)
+    rt.add_argument("--latency", default="fixed:10")
+    rt.set_defaults(func=bench_refresh_tiers)
+    vb = sub.add_parser("vc-batch", help="Requests and wall time of forecast refreshes: one request per city vs multi-location batches")
+    vb.add_argument("--cities", type=int, default=300)
+    vb.add_argument("--batch-size", type=int, default=25)
+    vb.add_argument("--error-location", type=float, default=0.02, help="Share of batched locations the simulator fails")
+    vb.add_argument("--workers", type=int, default=8)
+    vb.add_argument("--latency", default="fixed:10")
+    vb.set_defaults(func=bench_vc_batch)
+    args = ap.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
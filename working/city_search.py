@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Accent-insensitive city search for the Add City box.
+
+Small sources (commands, loaded cities, the catalog, ZIP_CITIES) live in memory with a
+sorted list of folded word suffixes for name and word prefix matches, and trigram
+postings for substring and typo matches. GeoNames is only prefix-searched, through its compiled search index, so a query
+never touches more than 2 * `limit` of its keys. In-memory prefix, word-prefix and substring
+matches come first, ranked by data availability tier, then population when known, then
+name length; GeoNames prefix matches follow, then typo matches by trigram overlap.
+"""
+import bisect
+import heapq
+from collections import Counter
+from typing import Iterable, Optional
+
+from geonames_index import SEARCH_SEP, GeoNamesIndex, norm_text
+
+# Data availability tiers: cities with loaded climate data first, GeoNames-only names last.
+TIER_GEONAMES = 0
+TIER_ZIP = 1
+TIER_CATALOG = 2
+TIER_AVAILABLE = 3
+TIER_COMMAND = 4
+
+MATCH_FUZZY = 1
+MATCH_SUBSTRING = 2
+MATCH_WORD = 3
+MATCH_PREFIX = 4
+# Share of the query's trigrams a name must contain to count as a fuzzy match.
+FUZZY_MIN_SHARE = 0.6
+SHORT_QUERY_LEN = 2
+
+
+def trigrams(folded: str) -> set[str]:
+    padded = f"  {folded} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CitySearchIndex:
+    def __init__(self, geonames: Optional[GeoNamesIndex] = None):
+        self.geonames = geonames
+        self.names: list[str] = []
+        self.folded: list[str] = []
+        self.tier: list[int] = []
+        self.population: list[float] = []
+        self.ids: dict[str, int] = {}
+        self.available: set[str] = set()
+        self._postings: dict[str, list[int]] = {}
+        # (folded text from each word start, id) sorted for bisect prefix scans; rebuilt lazily after adds.
+        self._sorted: list[tuple[str, int]] = []
+        self._dirty = False
+        # Tie-break after match quality and tier: population, then shorter names.
+        self._order: list[tuple[float, int, str]] = []
+        self._short_memo: dict[tuple[str, int], tuple[str, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, names: Iterable[str], tier: int, population: Optional[dict[str, float]] = None) -> None:
+        """Add names at `tier`; a name already present keeps the higher of its tiers."""
+        population = population or {}
+        for name in names:
+            i = self.ids.get(name)
+            if i is not None:
+                self.tier[i] = max(self.tier[i], tier)
+                continue
+            i = len(self.names)
+            folded = norm_text(name)
+            self.ids[name] = i
+            self.names.append(name)
+            self.folded.append(folded)
+            self.tier.append(tier)
+            self.population.append(float(population.get(name) or 0.0))
+            self._order.append((-self.population[i], len(name), name))
+            for gram in trigrams(folded):
+                self._postings.setdefault(gram, []).append(i)
+            self._dirty = True
+        self._short_memo.clear()
+
+    def set_available(self, names: Iterable[str]) -> None:
+        """Cities with data in the window; they outrank everything but commands."""
+        self.available = set(names)
+        self.add(self.available, TIER_GEONAMES)
+
+    def mark_available(self, names: Iterable[str]) -> None:
+        names = list(names)
+        self.available.update(names)
+        self.add(names, TIER_GEONAMES)
+
+    def _rank_tier(self, i: int) -> int:
+        tier = self.tier[i]
+        if tier != TIER_COMMAND and self.names[i] in self.available:
+            return TIER_AVAILABLE
+        return tier
+
+    def prepare(self) -> None:
+        """Sort the word-suffix list now rather than on the first query after adds."""
+        if self._dirty:
+            self._sorted = sorted(
+                (folded[start:], i, MATCH_PREFIX if start == 0 else MATCH_WORD)
+                for i, folded in enumerate(self.folded)
+                for start in [0] + [j + 1 for j, ch in enumerate(folded) if ch == " "]
+            )
+            self._dirty = False
+
+    def _prefix_ids(self, q: str) -> dict[int, int]:
+        """Names whose folded text, or one of its later words, starts with q."""
+        self.prepare()
+        out = {}
+        entries = self._sorted
+        for k in range(bisect.bisect_left(entries, (q,)), len(entries)):
+            suffix, i, match = entries[k]
+            if not suffix.startswith(q):
+                break
+            if match > out.get(i, 0):
+                out[i] = match
+        return out
+
+    def _trigram_ids(self, q: str) -> dict[int, tuple[int, float]]:
+        grams = trigrams(q)
+        counts = Counter()
+        for gram in grams:
+            counts.update(self._postings.get(gram, ()))
+        need = max(1, int(len(grams) * FUZZY_MIN_SHARE + 0.999))
+        out = {}
+        for i, shared in counts.items():
+            if q in self.folded[i]:
+                out[i] = (MATCH_SUBSTRING, 1.0)
+            elif shared >= need:
+                out[i] = (MATCH_FUZZY, shared / len(grams))
+        return out
+
+    def search(self, query: str, limit: int = 20) -> list[str]:
+        q = norm_text(query)
+        if not q:
+            return []
+        # One- and two-letter queries match a large share of the index; answer repeats from the memo.
+        memo_key = (q, limit)
+        if len(q) <= SHORT_QUERY_LEN and memo_key in self._short_memo:
+            return list(self._short_memo[memo_key])
+        quality = {i: (match, 1.0) for i, match in self._prefix_ids(q).items()}
+        # Substring and typo matches rank below every prefix match, so skip them when those fill the list.
+        if len(q) >= 3 and len(quality) < limit:
+            for i, match in self._trigram_ids(q).items():
+                quality.setdefault(i, match)
+        ranked = heapq.nsmallest(
+            limit,
+            quality,
+            key=lambda i: (-quality[i][0], -quality[i][1], -self._rank_tier(i), self._order[i]),
+        )
+        results = [self.names[i] for i in ranked if quality[i][0] > MATCH_FUZZY]
+        seen = set(results)
+        # GeoNames prefix matches come after the in-memory prefix/substring ones, fuzzy matches last.
+        if len(results) < limit and self.geonames is not None:
+            for key in self.geonames.starting_with(q, limit * 2):
+                name = key.split(SEARCH_SEP, 1)[1]
+                if name not in seen:
+                    seen.add(name)
+                    results.append(name)
+                    if len(results) >= limit:
+                        break
+        for i in ranked:
+            if len(results) >= limit:
+                break
+            if quality[i][0] == MATCH_FUZZY and self.names[i] not in seen:
+                results.append(self.names[i])
+        if len(q) <= SHORT_QUERY_LEN:
+            self._short_memo[memo_key] = tuple(results)
+        return results
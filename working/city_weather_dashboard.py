@@ -5,6 +5,7 @@ import os
 import re
 import sqlite3
 import threading
+import time
 import unicodedata
 import uuid
 from datetime import date, datetime, timedelta, timezone
@@ -15,6 +16,9 @@ from urllib.parse import unquote_plus, urlparse
 
 import requests
 
+import response_cache
+import vc_provider
+
 BASE_DIR = str(Path(__file__).resolve().parent)
 DB_DEFAULT = f"{BASE_DIR}/weather_data_v2.db"
 CATALOG_DEFAULT = f"{BASE_DIR}/all_city_data.json"
@@ -22,7 +26,7 @@ API_LOG_PATH = f"{BASE_DIR}/sync_api_calls.ndjson"
 KEY_FILE = f"{BASE_DIR}/.visualcrossing_key"
 
 VC_URL = (
-    "https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/"
+    vc_provider.VC_TIMELINE_URL + "/"
     "{lat},{lon}/{start}/{end}?unitGroup=metric&include=days{include_current}"
     "&key={key}&contentType=json"
 )
@@ -106,6 +110,7 @@ th { color:var(--muted); }
       <button onclick='refreshScope("city", getSelectedCityName())'>Pull City</button>
     </div>
     <div class='small' id='jobstatus'></div>
+    <div class='small' id='provider'></div>
   </div>
 
   <div class='layout'>
@@ -290,13 +295,22 @@ async function refreshScope(scope, name){
   document.getElementById('jobstatus').textContent = `Job ${j.job_id} started for ${j.city_count} cities…`;
 }
 
+async function loadProvider(){
+  const r = await fetch('/api/provider-health');
+  const h = await r.json();
+  let txt = `Visual Crossing: ${dot(h.state === 'closed' ? 'green' : (h.state === 'open' ? 'red' : 'yellow'))} circuit ${esc(h.state)}`;
+  txt += ` • error rate ${Math.round((h.error_rate || 0) * 100)}% over ${h.window_requests} requests • opens=${h.total_opens}`;
+  if(h.state !== 'closed') txt += ` • ${esc(h.reason || '')} since ${esc(h.opened_at || '')} • next probe ${esc(h.next_probe_at || '')}`;
+  document.getElementById('provider').innerHTML = txt;
+}
+
 async function pollJob(){
   if(!lastJobId) return;
   const r = await fetch('/api/job?id=' + encodeURIComponent(lastJobId));
   const j = await r.json();
   if(!j.job) return;
   const x = j.job;
-  document.getElementById('jobstatus').textContent = `Job ${x.id}: ${x.state} • ${x.done}/${x.total} • ok=${x.ok} err=${x.err} • ${x.stage}`;
+  document.getElementById('jobstatus').textContent = `Job ${x.id}: ${x.state} • ${x.done}/${x.total} • ok=${x.ok} err=${x.err}${x.deferred ? ' deferred=' + x.deferred : ''} • ${x.stage}`;
   if(x.state === 'done' || x.state === 'error'){
     await loadTree();
     lastJobId = null;
@@ -307,7 +321,9 @@ document.getElementById('filter').addEventListener('input', renderTree);
 document.getElementById('cityscope').addEventListener('change', () => { selectedCityId = null; loadTree(); });
 
 loadTree();
+loadProvider();
 setInterval(loadTree, 10000);
+setInterval(loadProvider, 10000);
 setInterval(pollJob, 2000);
 </script>
 </body>
@@ -369,6 +385,11 @@ class AppState:
         self.city_to_db = self._build_city_resolution()
         self.api_cache_mtime = 0.0
         self.api_cache_rows: list[dict[str, Any]] = []
+        # Shared with sunseeker and the backfill runner so refresh jobs don't burst past the plan limit.
+        self.rate_limiter = vc_provider.TokenBucket()
+        # Outage state shared with the other entry points; jobs stop early while it is open.
+        self.breaker = vc_provider.CircuitBreaker()
+        self.response_cache = response_cache.ResponseCache()
 
     def _load_catalog(self) -> list[dict[str, Any]]:
         data = json.loads(Path(self.catalog_path).read_text(encoding="utf-8"))
@@ -815,6 +836,8 @@ class AppState:
 
         if not cities:
             return {"ok": False, "error": "no cities selected"}
+        if self.breaker.is_open():
+            return {"ok": False, "error": f"Visual Crossing unavailable: {self.breaker.summary()}"}
 
         job_id = str(uuid.uuid4())[:8]
         job = {
@@ -827,6 +850,7 @@ class AppState:
             "done": 0,
             "ok": 0,
             "err": 0,
+            "deferred": 0,
             "stage": "starting",
             "started_at": utcnow_iso(),
             "finished_at": None,
@@ -921,9 +945,53 @@ class AppState:
             include_current=include,
             key=key,
         )
-        r = requests.get(url, timeout=60)
+        kind = "forecast_bundle" if include_current else "estimated_window"
+        cached = self.response_cache.get(kind, lat, lon, start, end, f"days{include}")
+        if cached is not None:
+            return cached, url, 200
+        self.breaker.check(wait_for_probe=True)
+        self.rate_limiter.acquire()
+        try:
+            r = requests.get(url, timeout=60)
+        except requests.RequestException:
+            self.breaker.record(None)
+            raise
+        self.breaker.record(r.status_code, vc_provider.retry_after_sec(r.headers))
         r.raise_for_status()
-        return r.json(), url, r.status_code
+        payload = r.json()
+        self.response_cache.put(kind, lat, lon, start, end, f"days{include}", payload)
+        return payload, url, r.status_code
+
+    def _fetch_vc_multi(self, points: list[tuple[float, float]], start: str, end: str, include_current: bool, key: str):
+        """One timelinemulti request: (payload, url, status) or vc_provider.BatchLocationError per point."""
+        include = "days,current" if include_current else "days"
+        kind = "forecast_bundle" if include_current else "estimated_window"
+        results: list[Any] = []
+        for lat, lon in points:
+            cached = self.response_cache.get(kind, lat, lon, start, end, include)
+            results.append(None if cached is None else (cached, vc_provider.VC_MULTI_URL, 200))
+        pending = [i for i, r in enumerate(results) if r is None]
+        if not pending:
+            return results
+        sent = [points[i] for i in pending]
+        self.breaker.check(wait_for_probe=True)
+        self.rate_limiter.acquire()
+        try:
+            r = requests.get(
+                vc_provider.VC_MULTI_URL, params=vc_provider.multi_location_params(sent, start, end, include, key), timeout=60
+            )
+        except requests.RequestException:
+            self.breaker.record(None)
+            raise
+        self.breaker.record(r.status_code, vc_provider.retry_after_sec(r.headers))
+        r.raise_for_status()
+        for i, loc in zip(pending, vc_provider.split_multi_location(r.json(), sent)):
+            if not isinstance(loc, vc_provider.BatchLocationError):
+                lat, lon = points[i]
+                self.response_cache.put(kind, lat, lon, start, end, include, loc)
+                loc = (loc, r.url, r.status_code)
+            results[i] = loc
+        return results
 
     def _run_refresh_job(self, job_id: str, cities: list[dict[str, Any]], kind: str):
         key = get_vc_key()
@@ -940,14 +1008,96 @@ class AppState:
         est_end = (today + timedelta(days=364)).isoformat()
         fc_start = today.isoformat()
         fc_end = (today + timedelta(days=15)).isoformat()
+        # Aliases of one location (same grid cell) reuse the first city's payload.
+        share = vc_provider.GridShare()
+        cities = vc_provider.order_by_cell(cities, lambda c: (c["lat"], c["lng"]), share.grid_deg)
+        for c in cities:
+            if kind in {"both", "estimated"}:
+                share.expect(c["lat"], c["lng"], (est_start, est_end, False))
+            if kind in {"both", "forecast"}:
+                share.expect(c["lat"], c["lng"], (fc_start, fc_end, True))
+
+        # With VC_BATCH_SIZE > 1 each chunk of cities is pulled as multi-location requests first.
+        batch = vc_provider.BatchStats()
+        prefetched: dict[tuple, Any] = {}
+        windows = []
+        if kind in {"both", "estimated"}:
+            windows.append((est_start, est_end, False))
+        if kind in {"both", "forecast"}:
+            windows.append((fc_start, fc_end, True))
+
+        batched_cells: set[tuple[float, float]] = set()
+
+        def prefetch(chunk: list[dict[str, Any]]) -> None:
+            # Cells pulled by an earlier chunk are still held by the grid share for their aliases.
+            prefetched.clear()
+            city_of: dict[tuple[float, float], str] = {}
+            for c in chunk:
+                city_of.setdefault(vc_provider.grid_cell(c["lat"], c["lng"], share.grid_deg), c["city"])
+            cells = [cell for cell in city_of if cell not in batched_cells]
+            batched_cells.update(cells)
+            if not cells:
+                return
+            for window in windows:
+                try:
+                    results = self._fetch_vc_multi(cells, *window, key)
+                except Exception as e:
+                    results = [e] * len(cells)
+                batch.record(len(cells), failed=sum(isinstance(r, Exception) for r in results))
+                batch_id = uuid.uuid4().hex[:8]
+                for n, (cell, r) in enumerate(zip(cells, results)):
+                    fields = {"batch_id": batch_id, "batch_size": len(cells), "batch_index": n}
+                    if not isinstance(r, Exception):
+                        prefetched[(cell, window)] = (*r, fields)
+                        continue
+                    # Failed locations are logged here; the others when their city is stored.
+                    prefetched[(cell, window)] = r
+                    self._append_api_log(
+                        {
+                            "city": city_of[cell],
+                            "kind": "forecast_bundle" if window[2] else "estimated_window",
+                            "provider": "visualcrossing",
+                            "status_code": getattr(getattr(r, "response", None), "status_code", None),
+                            "ok": False,
+                            "lat": cell[0],
+                            "lon": cell[1],
+                            "records": 0,
+                            "start_date": window[0],
+                            "end_date": window[1],
+                            "error": str(r),
+                            **fields,
+                            "ts": utcnow_iso(),
+                        }
+                    )
+
+        def shared_fetch(lat: float, lon: float, start: str, end: str, include_current: bool):
+            """(payload, url, status, batch log fields); a batched cell is served from the prefetch."""
+            window = (start, end, include_current)
+
+            def fetch(cell_lat: float, cell_lon: float):
+                hit = vc_provider.take_prefetched(prefetched, ((cell_lat, cell_lon), window), batch)
+                if hit is not None:
+                    return hit
+                return (*self._fetch_vc(cell_lat, cell_lon, start, end, include_current, key), {})
+
+            return share.get(lat, lon, window, fetch)
 
         try:
-            for c in cities:
+            for n, c in enumerate(cities):
                 city = c["city"]
                 lat = c["lat"]
                 lon = c["lng"]
+                while self.breaker.probing():
+                    time.sleep(0.25)
+                if self.breaker.is_open():
+                    with self.jobs_lock:
+                        self.jobs[job_id]["deferred"] = len(cities) - n
+                        self.jobs[job_id]["stage"] = f"stopped: {self.breaker.summary()}"
+                    break
                 with self.jobs_lock:
                     self.jobs[job_id]["stage"] = f"{city}"
+                if batch.size > 1 and n % batch.size == 0:
+                    prefetch(cities[n:n + batch.size])
 
                 try:
                     conn.execute(
@@ -956,12 +1106,10 @@ class AppState:
                     )
 
                     if kind in {"both", "estimated"}:
-                        payload, url, code = self._fetch_vc(lat, lon, est_start, est_end, include_current=False, key=key)
+                        payload, url, code, batch_fields = shared_fetch(lat, lon, est_start, est_end, False)
                         days = payload.get("days", []) or []
                         for d in days:
                             self._upsert_weather_row(conn, "daily_data_estimated", city, d, "estimated")
-                            # materialized best table
-                            self._upsert_weather_row(conn, "daily_data", city, d, "estimated")
                         self._insert_city_log(conn, job_id, city, "estimated", "updated", f"rows={len(days)}")
                         self._append_api_log(
                             {
@@ -976,6 +1124,7 @@ class AppState:
                                 "records": len(days),
                                 "start_date": est_start,
                                 "end_date": est_end,
+                                **batch_fields,
                                 "sample_tmax_c": (days[0].get("tempmax") if days else None),
                                 "sample_tmin_c": (days[0].get("tempmin") if days else None),
                                 "sample_precip_mm": (days[0].get("precip") if days else None),
@@ -986,11 +1135,10 @@ class AppState:
                         )
 
                     if kind in {"both", "forecast"}:
-                        payload, url, code = self._fetch_vc(lat, lon, fc_start, fc_end, include_current=True, key=key)
+                        payload, url, code, batch_fields = shared_fetch(lat, lon, fc_start, fc_end, True)
                         days = payload.get("days", []) or []
                         for d in days:
                             self._upsert_weather_row(conn, "daily_data_forecast", city, d, "forecast")
-                            self._upsert_weather_row(conn, "daily_data", city, d, "forecast")
                         cur = payload.get("currentConditions", {}) or {}
                         self._insert_city_log(conn, job_id, city, "forecast", "updated", f"rows={len(days)}")
                         self._append_api_log(
@@ -1006,6 +1154,7 @@ class AppState:
                                 "records": len(days),
                                 "start_date": fc_start,
                                 "end_date": fc_end,
+                                **batch_fields,
                                 "current_temp_c": cur.get("temp"),
                                 "sample_tmax_c": (days[0].get("tempmax") if days else None),
                                 "sample_tmin_c": (days[0].get("tempmin") if days else None),
@@ -1036,8 +1185,11 @@ class AppState:
 
             with self.jobs_lock:
                 self.jobs[job_id]["state"] = "done"
-                self.jobs[job_id]["stage"] = "complete"
+                if not self.jobs[job_id]["deferred"]:
+                    self.jobs[job_id]["stage"] = "complete"
                 self.jobs[job_id]["finished_at"] = utcnow_iso()
+                self.jobs[job_id]["api_calls"] = share.stats()
+                self.jobs[job_id]["batching"] = batch.stats()
         finally:
             conn.close()
 
@@ -1094,6 +1246,10 @@ class Handler(BaseHTTPRequestHandler):
         if path == "/api/job":
             jid = qs.get("id", "")
             return self._send_json({"job": app.get_job(jid)})
+        if path == "/api/rate-limit":
+            return self._send_json(app.rate_limiter.stats())
+        if path == "/api/provider-health":
+            return self._send_json(app.breaker.status())
 
         return self._send_json({"error": "not found"}, 404)
 
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Dense in-memory store for per-city monthly climate normals.
+
+One float32 array indexed [city_id, month - 1, metric] with a city name <-> id
+index replaces the per-city 12-row DataFrames the GUI used to keep. Removed
+cities leave a NaN tombstone whose slot is reused by the next insert, so ids
+stay stable while the app is running; pickling drops tombstones and spare
+capacity.
+"""
+import bisect
+from typing import Any, Iterable, Iterator, Optional
+
+import numpy as np
+
+import niceness
+
+METRICS = ("avg_day_f", "sunny_day", "day_length_hrs", "tmax_mean", "tmin_mean", "niceness")
+METRIC_INDEX = {name: i for i, name in enumerate(METRICS)}
+MONTHS = 12
+DTYPE = np.float32
+
+
+class ClimateCube:
+    def __init__(self, capacity: int = 0):
+        self.values = np.full((capacity, MONTHS, len(METRICS)), np.nan, dtype=DTYPE)
+        self.names: list[Optional[str]] = []
+        self.ids: dict[str, int] = {}
+        self._free: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.ids)
+
+    def cities(self) -> list[str]:
+        return list(self.ids)
+
+    def active_ids(self) -> np.ndarray:
+        """Slot ids of live cities, in insertion order (the order __iter__ yields names)."""
+        return np.fromiter(self.ids.values(), dtype=np.intp, count=len(self.ids))
+
+    # ------------------------------------------------------------------ writes
+
+    def _slot(self, name: str) -> int:
+        city_id = self.ids.get(name)
+        if city_id is not None:
+            return city_id
+        if self._free:
+            city_id = self._free.pop()
+            self.names[city_id] = name
+        else:
+            city_id = len(self.names)
+            if city_id >= self.values.shape[0]:
+                grown = np.full((max(16, city_id * 2), MONTHS, len(METRICS)), np.nan, dtype=DTYPE)
+                grown[:city_id] = self.values[:city_id]
+                self.values = grown
+            self.names.append(name)
+        self.ids[name] = city_id
+        return city_id
+
+    def set_city(self, name: str, months: Any, metrics: Iterable[str] = METRICS[:-1]) -> int:
+        """
+        Store a 12 x len(metrics) block (rows are Jan..Dec) for one city. Metrics not
+        given, including niceness, are reset to NaN. Returns the city id.
+        """
+        block = np.asarray(months, dtype=np.float64)
+        city_id = self._slot(name)
+        self.values[city_id] = np.nan
+        self.values[city_id][:, [METRIC_INDEX[m] for m in metrics]] = block
+        return city_id
+
+    def set_frame(self, name: str, mdf) -> int:
+        """Store a monthly_aggregates()-shaped DataFrame (a niceness column is kept if present)."""
+        metrics = [m for m in METRICS if m in mdf.columns]
+        by_month = mdf.set_index("month").reindex(range(1, MONTHS + 1))
+        return self.set_city(name, by_month[metrics].to_numpy(dtype=np.float64), metrics)
+
+    def remove(self, name: str) -> bool:
+        city_id = self.ids.pop(name, None)
+        if city_id is None:
+            return False
+        self.values[city_id] = np.nan
+        self.names[city_id] = None
+        self._free.append(city_id)
+        return True
+
+    def rescore(self, prefs: Optional[tuple[float, float, float]] = None, names: Optional[Iterable[str]] = None) -> None:
+        """
+        Recompute the niceness channel for every city (or just `names`) in one vectorized pass:
+        the default curve, or the user's comfort band when prefs = (min_temp, max_temp, temp_weight).
+        """
+        if names is None:
+            ids = self.active_ids()
+        else:
+            ids = np.array([self.ids[n] for n in names if n in self.ids], dtype=np.intp)
+        if not len(ids):
+            return
+        block = self.values[ids]
+        args = tuple(block[:, :, METRIC_INDEX[m]] for m in ("tmax_mean", "tmin_mean", "sunny_day", "day_length_hrs"))
+        if prefs is None:
+            scores = niceness.default_scores(*args)
+        else:
+            scores = niceness.adjusted_scores(*args, *prefs)
+        self.values[ids, :, METRIC_INDEX["niceness"]] = scores
+
+    # ------------------------------------------------------------------- reads
+
+    def city_months(self, name: str) -> Optional[np.ndarray]:
+        """12 x len(METRICS) view of one city's block (monthly table row), or None."""
+        city_id = self.ids.get(name)
+        return None if city_id is None else self.values[city_id]
+
+    def month(self, name: str, month: int) -> Optional[dict[str, float]]:
+        """All metrics of one city-month as Python floats (detail tab / next-month lookups), or None."""
+        city_id = self.ids.get(name)
+        if city_id is None:
+            return None
+        return dict(zip(METRICS, self.values[city_id, month - 1].tolist()))
+
+    def value(self, name: str, month: int, metric: str, default: Any = None) -> Any:
+        city_id = self.ids.get(name)
+        if city_id is None:
+            return default
+        return float(self.values[city_id, month - 1, METRIC_INDEX[metric]])
+
+    def metric(self, metric: str) -> np.ndarray:
+        """len(self) x 12 matrix of one metric for live cities, rows in iteration order."""
+        return self.values[self.active_ids(), :, METRIC_INDEX[metric]]
+
+    def top_by_month(self, n: int = 10) -> dict[int, list[tuple[str, float]]]:
+        """
+        Best `n` cities per month by niceness (itinerary tab), NaN scores skipped. Ties keep
+        insertion order, as the old per-frame stable sort did.
+        """
+        names = self.cities()
+        nic = self.metric("niceness")
+        top = {}
+        for m in range(MONTHS):
+            col = nic[:, m]
+            order = np.argsort(-col, kind="stable")
+            order = order[~np.isnan(col[order])][:n]
+            top[m + 1] = [(names[i], float(col[i])) for i in order]
+        return top
+
+    def to_frame(self, name: str):
+        """One city's block as the legacy monthly DataFrame (month column plus METRICS)."""
+        import pandas as pd
+
+        block = self.city_months(name)
+        if block is None:
+            return None
+        mdf = pd.DataFrame(block.astype(np.float64), columns=list(METRICS))
+        mdf.insert(0, "month", range(1, MONTHS + 1))
+        return mdf
+
+    # ---------------------------------------------------------------- pickling
+
+    def __getstate__(self) -> dict:
+        ids = self.active_ids()
+        return {"names": self.cities(), "values": np.ascontiguousarray(self.values[ids])}
+
+    def __setstate__(self, state: dict) -> None:
+        self.values = np.asarray(state["values"], dtype=DTYPE)
+        self.names = list(state["names"])
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self._free = []
+
+
+class ItineraryIndex:
+    """
+    Best-N cities per month by the cube's niceness channel, kept up to date one city at a time.
+
+    Each month holds a sorted buffer of (-score, city_id) keys: always the exact best
+    len(buffer) cities, with up to `slack` extra entries beyond N so a city that drops out
+    rarely forces a rescan. Full builds use np.argpartition; update()/remove() cost a
+    bisect per month. Ties go to the lower city id.
+    """
+
+    def __init__(self, cube: ClimateCube, n: int = 10, slack: Optional[int] = None):
+        self.cube = cube
+        self.n = max(1, int(n))
+        self.slack = self.n if slack is None else max(0, int(slack))
+        self._ranked: list[list[tuple[float, int]]] = [[] for _ in range(MONTHS)]
+        self._complete = [True] * MONTHS  # buffer holds every city with a score
+        self.rebuild()
+
+    @property
+    def capacity(self) -> int:
+        return self.n + self.slack
+
+    def set_size(self, n: int) -> None:
+        self.n = max(1, int(n))
+        self.slack = max(self.slack, self.n)
+        self.rebuild()
+
+    def rebuild(self, months: Optional[Iterable[int]] = None) -> None:
+        """Rescan the cube for `months` (1-12, default all), e.g. after ClimateCube.rescore()."""
+        nic = self.cube.values[:, :, METRIC_INDEX["niceness"]]
+        for m in (range(1, MONTHS + 1) if months is None else months):
+            col = nic[:, m - 1]
+            ids = np.flatnonzero(~np.isnan(col))
+            scores = col[ids]
+            if len(ids) > self.capacity:
+                # Keep everything tied with the capacity-th best, then order exactly.
+                kth = np.argpartition(-scores, self.capacity - 1)[self.capacity - 1]
+                keep = scores >= scores[kth]
+                ids, scores = ids[keep], scores[keep]
+                self._complete[m - 1] = False
+            else:
+                self._complete[m - 1] = True
+            order = np.lexsort((ids, -scores))[: self.capacity]
+            self._ranked[m - 1] = [(-float(scores[i]), int(ids[i])) for i in order]
+
+    def _place(self, m: int, city_id: int, score: Optional[float]) -> bool:
+        ranked = self._ranked[m - 1]
+        changed = False
+        for pos, (_, rid) in enumerate(ranked):
+            if rid == city_id:
+                del ranked[pos]
+                changed = pos < self.n
+                break
+        if score is not None:
+            key = (-score, city_id)
+            if self._complete[m - 1] or (ranked and key < ranked[-1]):
+                pos = bisect.bisect_left(ranked, key)
+                ranked.insert(pos, key)
+                changed = changed or pos < self.n
+                if len(ranked) > self.capacity:
+                    ranked.pop()
+                    self._complete[m - 1] = False
+        if len(ranked) < self.n and not self._complete[m - 1]:
+            self.rebuild([m])
+            changed = True
+        return changed
+
+    def update(self, name: str) -> list[int]:
+        """Re-rank one city after its monthly values changed; returns the months whose top N moved."""
+        city_id = self.cube.ids.get(name)
+        if city_id is None:
+            return []
+        scores = self.cube.values[city_id, :, METRIC_INDEX["niceness"]].tolist()
+        return [
+            m for m, score in enumerate(scores, start=1)
+            if self._place(m, city_id, None if score != score else score)
+        ]
+
+    def remove(self, name: str) -> list[int]:
+        """Remove a city from the cube and from every month; returns the months whose top N moved."""
+        city_id = self.cube.ids.get(name)
+        if city_id is None:
+            return []
+        self.cube.remove(name)
+        return [m for m in range(1, MONTHS + 1) if self._place(m, city_id, None)]
+
+    def top(self, month: int) -> list[tuple[str, float]]:
+        names = self.cube.names
+        return [(names[city_id], -neg) for neg, city_id in self._ranked[month - 1][: self.n]]
+
+    def top_by_month(self) -> dict[int, list[tuple[str, float]]]:
+        return {m: self.top(m) for m in range(1, MONTHS + 1)}
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Priority order for sync work, shared by weather_sync (the GUI and daemon sync) and the
+catalog backfill runner.
+
+Each pending city gets a score from how stale its forecast is, how much of the estimated
+window is missing, whether the user looks at it (pinned, recently viewed or in the
+itinerary top-N, recorded in sync_meta), minus a penalty for recent errors. Work is
+dispatched highest score first; a FetchScheduler then admits cities until the run's
+deadline or request budget runs out, and reports which priority bands were served.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, Optional
+
+from vc_provider import env_float
+
+
+WEIGHT_STALENESS = env_float("SYNC_PRIORITY_W_STALENESS", 1.0)
+WEIGHT_GAP = env_float("SYNC_PRIORITY_W_GAP", 1.0)
+WEIGHT_INTEREST = env_float("SYNC_PRIORITY_W_INTEREST", 2.0)
+WEIGHT_ERRORS = env_float("SYNC_PRIORITY_W_ERRORS", 0.5)
+# A forecast this old (or missing) counts as fully stale.
+STALE_FULL_HOURS = env_float("SYNC_PRIORITY_STALE_HOURS", 72.0)
+# sync_city_log rows this recent feed the error-rate penalty.
+ERROR_LOOKBACK_DAYS = env_float("SYNC_PRIORITY_ERROR_DAYS", 7.0)
+
+# Interest levels by source; a city keeps the highest that applies.
+INTEREST_PINNED = 1.0
+INTEREST_RECENT = 0.8
+INTEREST_ITINERARY = 0.6
+RECENT_KEEP = 20
+META_KEYS = {"pinned": "interest_pinned", "recent": "interest_recent", "itinerary": "interest_itinerary"}
+
+# Score floors of the reported priority bands.
+BANDS = (("p1", 2.0), ("p2", 1.0), ("p3", 0.25), ("p4", float("-inf")))
+
+
+def band(score: float) -> str:
+    for name, floor in BANDS:
+        if score >= floor:
+            return name
+    return BANDS[-1][0]
+
+
+@dataclass
+class CityPriority:
+    city: str
+    score: float
+    staleness: float = 0.0
+    gap: float = 0.0
+    interest: float = 0.0
+    error_rate: float = 0.0
+
+    @property
+    def band(self) -> str:
+        return band(self.score)
+
+
+def staleness_from_age(fetched_at: Optional[datetime], now: Optional[datetime] = None) -> float:
+    """0 for a forecast fetched just now, 1 at STALE_FULL_HOURS or when there is none."""
+    if fetched_at is None:
+        return 1.0
+    now = now or datetime.now(timezone.utc)
+    hours = (now - fetched_at).total_seconds() / 3600.0
+    return min(1.0, max(0.0, hours / STALE_FULL_HOURS))
+
+
+def score(staleness: float = 0.0, gap: float = 0.0, interest: float = 0.0, error_rate: float = 0.0) -> float:
+    return (
+        WEIGHT_STALENESS * staleness
+        + WEIGHT_GAP * gap
+        + WEIGHT_INTEREST * interest
+        - WEIGHT_ERRORS * error_rate
+    )
+
+
+def prioritize(
+    cities: Iterable[str],
+    staleness: Optional[dict[str, float]] = None,
+    gap: Optional[dict[str, float]] = None,
+    interest: Optional[dict[str, float]] = None,
+    error_rate: Optional[dict[str, float]] = None,
+) -> list[CityPriority]:
+    """CityPriority per city, highest score first; ties keep the input order."""
+    staleness, gap = staleness or {}, gap or {}
+    interest, error_rate = interest or {}, error_rate or {}
+    out = []
+    for city in cities:
+        s, g = staleness.get(city, 0.0), gap.get(city, 0.0)
+        i, e = interest.get(city, 0.0), error_rate.get(city, 0.0)
+        out.append(CityPriority(city, score(s, g, i, e), s, g, i, e))
+    out.sort(key=lambda p: -p.score)
+    return out
+
+
+# ---------------------------------------------------------------- inputs from the DB
+
+
+def save_interest(conn: sqlite3.Connection, **lists: Optional[Iterable[str]]) -> None:
+    """Store pinned=/recent=/itinerary= city lists in sync_meta (None leaves a list as is)."""
+    rows = []
+    for kind, cities in lists.items():
+        if cities is None:
+            continue
+        cities = [c for c in dict.fromkeys(cities) if c]
+        if kind == "recent":
+            cities = cities[-RECENT_KEEP:]
+        rows.append((META_KEYS[kind], json.dumps(cities, ensure_ascii=False)))
+    if rows:
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO sync_meta (key, value) VALUES (?, ?)", rows)
+
+
+def load_interest(conn: sqlite3.Connection) -> dict[str, float]:
+    """city -> interest level from the lists save_interest() recorded; {} before any were saved."""
+    keys = {v: k for k, v in META_KEYS.items()}
+    try:
+        rows = conn.execute(
+            f"SELECT key, value FROM sync_meta WHERE key IN ({','.join('?' * len(keys))})", list(keys)
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    level = {"pinned": INTEREST_PINNED, "recent": INTEREST_RECENT, "itinerary": INTEREST_ITINERARY}
+    out: dict[str, float] = {}
+    for key, value in rows:
+        try:
+            cities = json.loads(value or "[]")
+        except ValueError:
+            continue
+        kind = keys[key]
+        for i, city in enumerate(cities):
+            lvl = level[kind]
+            if kind == "recent":
+                # Most recent last; older views fade towards the itinerary level.
+                lvl = INTEREST_ITINERARY + (INTEREST_RECENT - INTEREST_ITINERARY) * (i + 1) / len(cities)
+            out[city] = max(out.get(city, 0.0), lvl)
+    return out
+
+
+def error_rates(conn: sqlite3.Connection, *stages: str, days: float = ERROR_LOOKBACK_DAYS) -> dict[str, float]:
+    """city -> share of its fetch outcomes for `stages` in sync_city_log over the last `days` that were errors."""
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+    try:
+        rows = conn.execute(
+            f"""
+            SELECT city, SUM(status = 'error'), COUNT(*) FROM sync_city_log
+            WHERE stage IN ({','.join('?' * len(stages))}) AND ts >= ? AND status IN ('error', 'updated', 'no_data')
+            GROUP BY city
+            """,
+            (*stages, since),
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    return {city: errors / total for city, errors, total in rows if total}
+
+
+# ---------------------------------------------------------------- dispatch
+
+
+class FetchScheduler:
+    """
+    Admission control for one phase of a run, fed cities in priority order. A city is
+    admitted while the deadline (monotonic seconds) has not passed and its request cost
+    fits the remaining budget; everything else is skipped and left for the next run.
+
+    Given the city's GridShare keys, the cost is the requests they actually add: a key an
+    admitted city already paid for is served from the share for free, and with batch_size
+    > 1 new keys of one window are packed that many to a multi-location request.
+    Thread-safe.
+    """
+
+    def __init__(
+        self,
+        priorities: list[CityPriority],
+        deadline: Optional[float] = None,
+        budget: Optional[int] = None,
+        batch_size: int = 1,
+    ):
+        self.priorities = priorities
+        self.by_city = {p.city: p for p in priorities}
+        self.deadline = deadline
+        self.budget = budget
+        self.batch_size = max(1, batch_size)
+        self.spent = 0
+        self._paid: set = set()
+        self._paid_per_window: Counter = Counter()
+        self.served: Counter = Counter()
+        self.skipped: Counter = Counter()
+        self.skip_reasons: Counter = Counter()
+        self.min_served_score: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def order(self) -> list[str]:
+        return [p.city for p in self.priorities]
+
+    def _key_cost(self, keys: list) -> int:
+        """Requests the unpaid (cell, window) keys add; caller holds the lock."""
+        new = Counter(window for (cell, window) in keys if (cell, window) not in self._paid)
+
+        def requests(n: int) -> int:
+            return -(-n // self.batch_size)
+
+        return sum(requests(self._paid_per_window[w] + n) - requests(self._paid_per_window[w]) for w, n in new.items())
+
+    def admit(self, city: str, cost: int = 1, share_keys: Optional[Iterable[tuple]] = None) -> bool:
+        """Admit the city, charging `cost` requests, or what its GridShare keys add when given."""
+        p = self.by_city.get(city)
+        b = p.band if p is not None else BANDS[-1][0]
+        keys = list(dict.fromkeys(share_keys)) if share_keys is not None else None
+        with self._lock:
+            if keys is not None:
+                cost = self._key_cost(keys)
+            reason = ""
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                reason = "deadline"
+            elif self.budget is not None and self.spent + cost > self.budget:
+                reason = "budget"
+            if reason:
+                self.skipped[b] += 1
+                self.skip_reasons[reason] += 1
+                return False
+            self.spent += cost
+            for key in keys or ():
+                if key not in self._paid:
+                    self._paid.add(key)
+                    self._paid_per_window[key[1]] += 1
+            self.served[b] += 1
+            if p is not None and (self.min_served_score is None or p.score < self.min_served_score):
+                self.min_served_score = p.score
+            return True
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "served": {name: self.served[name] for name, _ in BANDS},
+                "skipped": {name: self.skipped[name] for name, _ in BANDS},
+                "skip_reasons": dict(self.skip_reasons),
+                "requests": self.spent,
+                "budget": self.budget,
+                "min_served_score": None if self.min_served_score is None else round(self.min_served_score, 3),
+            }
+
+    def summary(self) -> str:
+        st = self.stats()
+        served = ",".join(f"{k}:{v}" for k, v in st["served"].items())
+        skipped = ",".join(f"{k}:{v}" for k, v in st["skipped"].items())
+        return f"served={served} skipped={skipped}" + (
+            f" ({', '.join(f'{k}={v}' for k, v in st['skip_reasons'].items())})" if st["skip_reasons"] else ""
+        )
+
+
+def deadline_from(seconds: float) -> Optional[float]:
+    """Monotonic deadline `seconds` from now; None for 0 (no deadline)."""
+    return time.monotonic() + seconds if seconds and seconds > 0 else None
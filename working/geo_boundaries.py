@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Offline (lat, lon) -> continent / country lookups over a country boundary shapefile
+such as Natural Earth's ne_110m_admin_0_countries.shp (+ .dbf).
+
+Polygons are loaded once into per-country edge arrays, with a coarse lat/lon grid
+mapping each cell to the countries whose bounding box touches it. A batch lookup
+groups points by cell and runs a vectorized even-odd point-in-polygon test against
+only those countries. Points that land just offshore of the simplified coastline
+snap to the nearest country within SNAP_DEG. Results are cached per coordinate in
+the geo_boundary_cache table, so each city is resolved once. Without the shapefile,
+country_codes() maps a city key's country code to its continent instead.
+"""
+import os
+import struct
+import threading
+from datetime import datetime, timezone
+from typing import Iterable
+
+import numpy as np
+
+from weather_store import SQLITE_MAX_PARAMS
+
+GRID_DEG = 5.0
+SNAP_DEG = 1.0
+CACHE_DECIMALS = 4
+NOT_FOUND = {"continent_code": "N/A", "country_a2": "N/A", "country_a3": "N/A"}
+
+# Natural Earth CONTINENT values -> the two-letter codes the Continent tab shows.
+CONTINENT_CODES = {
+    "Africa": "AF",
+    "Antarctica": "AN",
+    "Asia": "AS",
+    "Europe": "EU",
+    "North America": "NA",
+    "Oceania": "OC",
+    "South America": "SA",
+}
+# ISO 3166-1 alpha-2 -> GeoNames continent code, for cities the polygons cannot place.
+COUNTRY_CONTINENTS = {
+    "AD": "EU", "AE": "AS", "AF": "AS", "AG": "NA", "AI": "NA", "AL": "EU", "AM": "AS", "AO": "AF",
+    "AQ": "AN", "AR": "SA", "AS": "OC", "AT": "EU", "AU": "OC", "AW": "NA", "AX": "EU", "AZ": "AS",
+    "BA": "EU", "BB": "NA", "BD": "AS", "BE": "EU", "BF": "AF", "BG": "EU", "BH": "AS", "BI": "AF",
+    "BJ": "AF", "BL": "NA", "BM": "NA", "BN": "AS", "BO": "SA", "BQ": "NA", "BR": "SA", "BS": "NA",
+    "BT": "AS", "BV": "AN", "BW": "AF", "BY": "EU", "BZ": "NA", "CA": "NA", "CC": "AS", "CD": "AF",
+    "CF": "AF", "CG": "AF", "CH": "EU", "CI": "AF", "CK": "OC", "CL": "SA", "CM": "AF", "CN": "AS",
+    "CO": "SA", "CR": "NA", "CU": "NA", "CV": "AF", "CW": "NA", "CX": "OC", "CY": "EU", "CZ": "EU",
+    "DE": "EU", "DJ": "AF", "DK": "EU", "DM": "NA", "DO": "NA", "DZ": "AF", "EC": "SA", "EE": "EU",
+    "EG": "AF", "EH": "AF", "ER": "AF", "ES": "EU", "ET": "AF", "FI": "EU", "FJ": "OC", "FK": "SA",
+    "FM": "OC", "FO": "EU", "FR": "EU", "GA": "AF", "GB": "EU", "GD": "NA", "GE": "AS", "GF": "SA",
+    "GG": "EU", "GH": "AF", "GI": "EU", "GL": "NA", "GM": "AF", "GN": "AF", "GP": "NA", "GQ": "AF",
+    "GR": "EU", "GS": "AN", "GT": "NA", "GU": "OC", "GW": "AF", "GY": "SA", "HK": "AS", "HM": "AN",
+    "HN": "NA", "HR": "EU", "HT": "NA", "HU": "EU", "ID": "AS", "IE": "EU", "IL": "AS", "IM": "EU",
+    "IN": "AS", "IO": "AS", "IQ": "AS", "IR": "AS", "IS": "EU", "IT": "EU", "JE": "EU", "JM": "NA",
+    "JO": "AS", "JP": "AS", "KE": "AF", "KG": "AS", "KH": "AS", "KI": "OC", "KM": "AF", "KN": "NA",
+    "KP": "AS", "KR": "AS", "KW": "AS", "KY": "NA", "KZ": "AS", "LA": "AS", "LB": "AS", "LC": "NA",
+    "LI": "EU", "LK": "AS", "LR": "AF", "LS": "AF", "LT": "EU", "LU": "EU", "LV": "EU", "LY": "AF",
+    "MA": "AF", "MC": "EU", "MD": "EU", "ME": "EU", "MF": "NA", "MG": "AF", "MH": "OC", "MK": "EU",
+    "ML": "AF", "MM": "AS", "MN": "AS", "MO": "AS", "MP": "OC", "MQ": "NA", "MR": "AF", "MS": "NA",
+    "MT": "EU", "MU": "AF", "MV": "AS", "MW": "AF", "MX": "NA", "MY": "AS", "MZ": "AF", "NA": "AF",
+    "NC": "OC", "NE": "AF", "NF": "OC", "NG": "AF", "NI": "NA", "NL": "EU", "NO": "EU", "NP": "AS",
+    "NR": "OC", "NU": "OC", "NZ": "OC", "OM": "AS", "PA": "NA", "PE": "SA", "PF": "OC", "PG": "OC",
+    "PH": "AS", "PK": "AS", "PL": "EU", "PM": "NA", "PN": "OC", "PR": "NA", "PS": "AS", "PT": "EU",
+    "PW": "OC", "PY": "SA", "QA": "AS", "RE": "AF", "RO": "EU", "RS": "EU", "RU": "EU", "RW": "AF",
+    "SA": "AS", "SB": "OC", "SC": "AF", "SD": "AF", "SE": "EU", "SG": "AS", "SH": "AF", "SI": "EU",
+    "SJ": "EU", "SK": "EU", "SL": "AF", "SM": "EU", "SN": "AF", "SO": "AF", "SR": "SA", "SS": "AF",
+    "ST": "AF", "SV": "NA", "SX": "NA", "SY": "AS", "SZ": "AF", "TC": "NA", "TD": "AF", "TF": "AN",
+    "TG": "AF", "TH": "AS", "TJ": "AS", "TK": "OC", "TL": "OC", "TM": "AS", "TN": "AF", "TO": "OC",
+    "TR": "AS", "TT": "NA", "TV": "OC", "TW": "AS", "TZ": "AF", "UA": "EU", "UG": "AF", "UM": "OC",
+    "US": "NA", "UY": "SA", "UZ": "AS", "VA": "EU", "VC": "NA", "VE": "SA", "VG": "NA", "VI": "NA",
+    "VN": "AS", "VU": "OC", "WF": "OC", "WS": "OC", "XK": "EU", "YE": "AS", "YT": "AF", "ZA": "AF",
+    "ZM": "AF", "ZW": "AF",
+}
+POLYGON_SHAPE_TYPES = (5, 15, 25)
+
+
+def read_shp_polygons(path: str) -> list[list[np.ndarray]]:
+    """Rings ((n, 2) float64 lon/lat arrays) of each record in a polygon .shp; [] for null shapes."""
+    with open(path, "rb") as f:
+        data = f.read()
+    shapes = []
+    pos = 100
+    while pos + 8 <= len(data):
+        _num, words = struct.unpack(">ii", data[pos:pos + 8])
+        content = data[pos + 8:pos + 8 + words * 2]
+        pos += 8 + words * 2
+        (shape_type,) = struct.unpack("<i", content[:4])
+        if shape_type not in POLYGON_SHAPE_TYPES:
+            shapes.append([])
+            continue
+        num_parts, num_points = struct.unpack("<ii", content[36:44])
+        parts = list(struct.unpack(f"<{num_parts}i", content[44:44 + 4 * num_parts])) + [num_points]
+        start = 44 + 4 * num_parts
+        points = np.frombuffer(content[start:start + 16 * num_points], dtype="<f8").reshape(num_points, 2)
+        shapes.append([points[parts[i]:parts[i + 1]] for i in range(num_parts) if parts[i + 1] - parts[i] >= 3])
+    return shapes
+
+
+def read_dbf(path: str) -> list[dict[str, str]]:
+    """Every record of a dBase III .dbf as {field: stripped text}."""
+    with open(path, "rb") as f:
+        data = f.read()
+    num_records, header_len, record_len = struct.unpack("<IHH", data[4:12])
+    fields = []
+    pos = 32
+    while data[pos] != 0x0D:
+        name = data[pos:pos + 11].split(b"\x00", 1)[0].decode("ascii")
+        fields.append((name, data[pos + 16]))
+        pos += 32
+    records = []
+    for r in range(num_records):
+        start = header_len + r * record_len
+        row = data[start:start + record_len]
+        off = 1
+        rec = {}
+        for name, length in fields:
+            rec[name] = row[off:off + length].decode("utf-8", errors="replace").strip()
+            off += length
+        records.append(rec)
+    return records
+
+
+def _country_codes(rec: dict[str, str]) -> dict[str, str]:
+    def first(*names):
+        for n in names:
+            v = rec.get(n, "")
+            if v and v != "-99":
+                return v
+        return "N/A"
+
+    return {
+        "continent_code": CONTINENT_CODES.get(rec.get("CONTINENT", ""), "N/A"),
+        "country_a2": first("ISO_A2_EH", "ISO_A2", "WB_A2"),
+        "country_a3": first("ISO_A3_EH", "ISO_A3", "ADM0_A3"),
+    }
+
+
+def country_codes(a2: str) -> dict[str, str]:
+    """Continent/country codes from an ISO alpha-2 code alone (no A3); NOT_FOUND when unknown."""
+    if a2 not in COUNTRY_CONTINENTS:
+        return dict(NOT_FOUND)
+    return {"continent_code": COUNTRY_CONTINENTS[a2], "country_a2": a2, "country_a3": "N/A"}
+
+
+def _cell(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    rows = np.clip(((lat + 90.0) // GRID_DEG).astype(np.int64), 0, int(180 / GRID_DEG) - 1)
+    cols = np.clip(((lon + 180.0) // GRID_DEG).astype(np.int64), 0, int(360 / GRID_DEG) - 1)
+    return rows * int(360 / GRID_DEG) + cols
+
+
+class BoundaryIndex:
+    """Country polygons from `shp_path` (and its .dbf), loaded on first lookup."""
+
+    def __init__(self, shp_path: str):
+        self.shp_path = shp_path
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.countries: list[dict[str, str]] = []
+        self.edges: list[np.ndarray] = []
+        self.bboxes = np.empty((0, 4))
+        self.grid: dict[int, list[int]] = {}
+
+    def available(self) -> bool:
+        self._ensure_loaded()
+        return bool(self.countries)
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            dbf_path = f"{os.path.splitext(self.shp_path)[0]}.dbf"
+            if os.path.exists(self.shp_path) and os.path.exists(dbf_path):
+                self._load(read_shp_polygons(self.shp_path), read_dbf(dbf_path))
+            self._loaded = True
+
+    def _load(self, shapes: list[list[np.ndarray]], records: list[dict[str, str]]) -> None:
+        bboxes = []
+        for rings, rec in zip(shapes, records):
+            if not rings:
+                continue
+            # (x1, y1, x2, y2) per ring edge, closing each ring; even-odd over all rings handles holes and islands.
+            edges = np.concatenate([np.hstack([ring, np.roll(ring, -1, axis=0)]) for ring in rings])
+            pts = np.concatenate(rings)
+            self.countries.append(_country_codes(rec))
+            self.edges.append(edges)
+            bboxes.append((pts[:, 0].min(), pts[:, 1].min(), pts[:, 0].max(), pts[:, 1].max()))
+        self.bboxes = np.array(bboxes, dtype=np.float64).reshape(-1, 4)
+        n_rows, n_cols = int(180 / GRID_DEG), int(360 / GRID_DEG)
+        for cid, (x0, y0, x1, y1) in enumerate(self.bboxes):
+            r0 = max(0, int((y0 - SNAP_DEG + 90.0) // GRID_DEG))
+            r1 = min(n_rows - 1, int((y1 + SNAP_DEG + 90.0) // GRID_DEG))
+            c0 = max(0, int((x0 - SNAP_DEG + 180.0) // GRID_DEG))
+            c1 = min(n_cols - 1, int((x1 + SNAP_DEG + 180.0) // GRID_DEG))
+            for r in range(r0, r1 + 1):
+                for c in range(c0, c1 + 1):
+                    self.grid.setdefault(r * n_cols + c, []).append(cid)
+
+    @staticmethod
+    def _inside(edges: np.ndarray, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        x1, y1, x2, y2 = (edges[:, k][None, :] for k in range(4))
+        y, x = lat[:, None], lon[:, None]
+        straddles = (y1 > y) != (y2 > y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_cross = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+        return np.count_nonzero(straddles & (x < x_cross), axis=1) % 2 == 1
+
+    @staticmethod
+    def _distance(edges: np.ndarray, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """Distance in degrees (longitude scaled by cos(lat)) from each point to its nearest edge."""
+        scale = np.cos(np.radians(lat))[:, None]
+        x1, y1, x2, y2 = (edges[:, k][None, :] for k in range(4))
+        px, py = lon[:, None] * scale, lat[:, None]
+        ax, bx = x1 * scale, x2 * scale
+        dx, dy = bx - ax, y2 - y1
+        seg2 = dx * dx + dy * dy
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.clip(np.where(seg2 > 0, ((px - ax) * dx + (py - y1) * dy) / seg2, 0.0), 0.0, 1.0)
+        return np.sqrt((ax + t * dx - px) ** 2 + (y1 + t * dy - py) ** 2).min(axis=1)
+
+    def country_ids(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """Index into self.countries for every point, -1 where no country is within SNAP_DEG."""
+        self._ensure_loaded()
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        out = np.full(len(lat), -1, dtype=np.int64)
+        if not self.countries or not len(lat):
+            return out
+        best = np.full(len(lat), np.inf)
+        cells = _cell(lat, lon)
+        for cell in np.unique(cells):
+            idx = np.flatnonzero(cells == cell)
+            for cid in self.grid.get(int(cell), ()):
+                x0, y0, x1, y1 = self.bboxes[cid]
+                near = idx[(lat[idx] >= y0 - SNAP_DEG) & (lat[idx] <= y1 + SNAP_DEG)
+                           & (lon[idx] >= x0 - SNAP_DEG) & (lon[idx] <= x1 + SNAP_DEG)]
+                near = near[best[near] > 0]
+                if not len(near):
+                    continue
+                inside = self._inside(self.edges[cid], lat[near], lon[near])
+                out[near[inside]] = cid
+                best[near[inside]] = 0.0
+                rest = near[~inside]
+                if len(rest):
+                    dist = self._distance(self.edges[cid], lat[rest], lon[rest])
+                    closer = (dist <= SNAP_DEG) & (dist < best[rest])
+                    out[rest[closer]] = cid
+                    best[rest[closer]] = dist[closer]
+        return out
+
+    def lookup_many(self, points: list[tuple[float, float]]) -> list[dict[str, str]]:
+        if not points:
+            return []
+        arr = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        return [dict(self.countries[c]) if c >= 0 else dict(NOT_FOUND) for c in self.country_ids(arr[:, 0], arr[:, 1])]
+
+
+def ensure_cache(conn) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS geo_boundary_cache (
+            lat REAL,
+            lon REAL,
+            continent_code TEXT,
+            country_a2 TEXT,
+            country_a3 TEXT,
+            updated_at TEXT,
+            PRIMARY KEY (lat, lon)
+        )
+        """
+    )
+
+
+def _cache_key(lat: float, lon: float) -> tuple[float, float]:
+    return round(float(lat), CACHE_DECIMALS), round(float(lon), CACHE_DECIMALS)
+
+
+def cached_lookup_many(conn, index: BoundaryIndex, points: Iterable[tuple[float, float]]) -> list[dict[str, str]]:
+    """
+    Continent/country codes for every (lat, lon): geo_boundary_cache hits first, the polygon
+    index for the rest in one batch, then one write of the new results. Without boundary data
+    misses come back as N/A and are not cached.
+    """
+    keys = [_cache_key(lat, lon) for lat, lon in points]
+    found: dict[tuple[float, float], dict[str, str]] = {}
+    unique = list(dict.fromkeys(keys))
+    for i in range(0, len(unique), SQLITE_MAX_PARAMS // 2):
+        chunk = unique[i:i + SQLITE_MAX_PARAMS // 2]
+        where = " OR ".join(["(lat=? AND lon=?)"] * len(chunk))
+        params = [v for key in chunk for v in key]
+        for lat, lon, cont, a2, a3 in conn.execute(
+            f"SELECT lat, lon, continent_code, country_a2, country_a3 FROM geo_boundary_cache WHERE {where}", params
+        ):
+            found[(lat, lon)] = {"continent_code": cont, "country_a2": a2, "country_a3": a3}
+    missing = [key for key in unique if key not in found]
+    if missing and index.available():
+        now = datetime.now(timezone.utc).isoformat()
+        results = index.lookup_many(missing)
+        found.update(zip(missing, results))
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO geo_boundary_cache "
+                "(lat, lon, continent_code, country_a2, country_a3, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(*key, r["continent_code"], r["country_a2"], r["country_a3"], now) for key, r in zip(missing, results)],
+            )
+    return [dict(found.get(key, NOT_FOUND)) for key in keys]
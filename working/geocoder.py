@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Offline geocoding for "City, Country" names (the ziplist.txt / ZIP_CITIES keys).
+
+Names resolve in order from city_coords, the GeoNames postal-code index, and the
+GeoNames place index; the Open-Meteo geocoding API is only a fallback when the caller
+allows network. Every resolution is written back to city_coords, so a name is looked
+up at most once across restarts.
+"""
+import sqlite3
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import requests
+
+from geonames_index import GeoNamesIndex, postal_key
+from weather_store import SQLITE_MAX_PARAMS
+
+OPEN_METEO_GEOCODING_URL = "https://geocoding-api.open-meteo.com/v1/search"
+
+# Country names as ziplist.txt and CITY_COUNTRY spell them -> ISO 3166-1 alpha-2 (GeoNames' country_code).
+COUNTRY_A2 = {
+    "Albania": "AL", "Algeria": "DZ", "Antigua and Barbuda": "AG", "Argentina": "AR", "Armenia": "AM",
+    "Aruba": "AW", "Australia": "AU", "Austria": "AT", "Azerbaijan": "AZ", "Bahamas": "BS",
+    "Bahrain": "BH", "Bangladesh": "BD", "Barbados": "BB", "Belgium": "BE", "Belize": "BZ",
+    "Bermuda": "BM", "Bhutan": "BT", "Bolivia": "BO", "Bosnia and Herzegovina": "BA", "Botswana": "BW",
+    "Brazil": "BR", "British Virgin Islands": "VG", "Bulgaria": "BG", "Burkina Faso": "BF",
+    "Cambodia": "KH", "Cameroon": "CM", "Canada": "CA", "Cayman Islands": "KY", "Chile": "CL",
+    "China": "CN", "China (SAR)": "HK", "Colombia": "CO", "Comoros": "KM", "Cook Islands": "CK",
+    "Costa Rica": "CR", "Croatia": "HR", "Cuba": "CU", "Curaçao": "CW", "Czech Republic": "CZ",
+    "Côte d'Ivoire": "CI", "Denmark": "DK", "Djibouti": "DJ", "Dominica": "DM",
+    "Dominican Republic": "DO", "Ecuador": "EC", "Egypt": "EG", "El Salvador": "SV", "Eritrea": "ER",
+    "Estonia": "EE", "Ethiopia": "ET", "Fed. States of Micronesia": "FM", "Fiji": "FJ",
+    "Finland": "FI", "France": "FR", "French Guiana": "GF", "French Polynesia": "PF", "Georgia": "GE",
+    "Germany": "DE", "Ghana": "GH", "Greece": "GR", "Grenada": "GD", "Guatemala": "GT",
+    "Guinea": "GN", "Guinea-Bissau": "GW", "Guyana": "GY", "Haiti": "HT", "Honduras": "HN",
+    "Hungary": "HU", "Iceland": "IS", "India": "IN", "Indonesia": "ID", "Iran": "IR", "Iraq": "IQ",
+    "Ireland": "IE", "Israel": "IL", "Italy": "IT", "Jamaica": "JM", "Japan": "JP", "Jordan": "JO",
+    "Kazakhstan": "KZ", "Kenya": "KE", "Kiribati": "KI", "Kosovo": "XK", "Kuwait": "KW",
+    "Kyrgyzstan": "KG", "Laos": "LA", "Latvia": "LV", "Lebanon": "LB", "Liberia": "LR", "Libya": "LY",
+    "Lithuania": "LT", "Madagascar": "MG", "Malaysia": "MY", "Maldives": "MV", "Mali": "ML",
+    "Malta": "MT", "Marshall Islands": "MH", "Mexico": "MX", "Micronesia": "FM", "Moldova": "MD",
+    "Mongolia": "MN", "Montenegro": "ME", "Morocco": "MA", "Mozambique": "MZ", "Myanmar": "MM",
+    "Namibia": "NA", "Nauru": "NR", "Nepal": "NP", "Netherlands": "NL", "New Caledonia": "NC",
+    "New Zealand": "NZ", "Nicaragua": "NI", "Niger": "NE", "Nigeria": "NG", "North Macedonia": "MK",
+    "Norway": "NO", "Oman": "OM", "Pakistan": "PK", "Palau": "PW", "Palestinian Territories": "PS",
+    "Panama": "PA", "Papua New Guinea": "PG", "Paraguay": "PY", "Peru": "PE", "Philippines": "PH",
+    "Poland": "PL", "Portugal": "PT", "Puerto Rico (US)": "PR", "Qatar": "QA", "Romania": "RO",
+    "Russia": "RU", "Rwanda": "RW", "Samoa": "WS", "Saudi Arabia": "SA", "Senegal": "SN",
+    "Serbia": "RS", "Sierra Leone": "SL", "Singapore": "SG", "Slovakia": "SK", "Slovenia": "SI",
+    "Solomon Islands": "SB", "South Africa": "ZA", "South Korea": "KR", "Spain": "ES",
+    "Sri Lanka": "LK", "St. Barthelemy": "BL", "St. Kitts and Nevis": "KN", "St. Lucia": "LC",
+    "St. Maarten": "SX", "St. Martin (French)": "MF", "St. Vincent & Grenadines": "VC",
+    "Sudan": "SD", "Suriname": "SR", "Sweden": "SE", "Switzerland": "CH", "Syria": "SY",
+    "Taiwan": "TW", "Tajikistan": "TJ", "Tanzania": "TZ", "Thailand": "TH", "The Gambia": "GM",
+    "Tibet (China)": "CN", "Tonga": "TO", "Trinidad and Tobago": "TT", "Tunisia": "TN",
+    "Turkey": "TR", "Turkmenistan": "TM", "Turks & Caicos": "TC", "Tuvalu": "TV",
+    "U.S. Virgin Islands": "VI", "UAE": "AE", "Uganda": "UG", "United Kingdom": "GB",
+    "United States": "US", "Uruguay": "UY", "Uzbekistan": "UZ", "Vanuatu": "VU", "Venezuela": "VE",
+    "Vietnam": "VN", "Zambia": "ZM", "Zimbabwe": "ZW",
+    "USA": "US", "UK": "GB",
+}
+
+
+@dataclass(frozen=True)
+class ZipEntry:
+    city: str
+    country: str
+    postal_code: str = ""
+
+    @property
+    def key(self) -> str:
+        return f"{self.city}, {self.country}"
+
+
+def load_ziplist(path: str) -> dict[str, ZipEntry]:
+    """ziplist.txt (City,Country,Continent,Zip Code with a header row) keyed "City, Country"."""
+    entries: dict[str, ZipEntry] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        next(f, None)
+        for line in f:
+            try:
+                city, country, _continent, zipcode = line.strip().split(",")
+            except ValueError:
+                continue
+            entry = ZipEntry(city.strip(), country.strip(), zipcode.strip())
+            entries[entry.key] = entry
+    return entries
+
+
+def split_city_key(name: str) -> tuple[str, str]:
+    city, _, country = name.partition(",")
+    return city.strip(), country.strip()
+
+
+def country_a2(country: str) -> str:
+    """ISO alpha-2 code for a country name (or an alpha-2 code passed through); "" when unknown."""
+    if country in COUNTRY_A2:
+        return COUNTRY_A2[country]
+    return country if len(country) == 2 and country.isupper() else ""
+
+
+def geocode_online(city: str, a2: str = "", timeout: float = 10.0) -> Optional[tuple[float, float]]:
+    """First Open-Meteo geocoding hit for city (restricted to country a2 when given), or None."""
+    params = {"name": city, "count": 1}
+    if a2:
+        params["countryCode"] = a2
+    r = requests.get(OPEN_METEO_GEOCODING_URL, params=params, timeout=timeout)
+    r.raise_for_status()
+    results = r.json().get("results") or []
+    if not results:
+        return None
+    return float(results[0]["latitude"]), float(results[0]["longitude"])
+
+
+def stored_coords(conn: sqlite3.Connection, names: Iterable[str]) -> dict[str, tuple[float, float]]:
+    """city_coords rows for names, read in chunks that stay under SQLite's parameter limit."""
+    names = list(dict.fromkeys(names))
+    found: dict[str, tuple[float, float]] = {}
+    for i in range(0, len(names), SQLITE_MAX_PARAMS):
+        chunk = names[i:i + SQLITE_MAX_PARAMS]
+        marks = ", ".join("?" * len(chunk))
+        for city, lat, lon in conn.execute(f"SELECT city, lat, lon FROM city_coords WHERE city IN ({marks})", chunk):
+            if lat is not None and lon is not None:
+                found[city] = (float(lat), float(lon))
+    return found
+
+
+class Geocoder:
+    """Resolves "City, Country" names against the local indexes; see the module docstring for the order."""
+
+    def __init__(self, places: GeoNamesIndex, postal: GeoNamesIndex, zip_entries: Optional[dict[str, ZipEntry]] = None):
+        self.places = places
+        self.postal = postal
+        self.zip_entries = zip_entries or {}
+
+    def resolve_offline(self, name: str) -> Optional[tuple[float, float]]:
+        """Coordinates from the GeoNames indexes alone (no DB, no network)."""
+        city, country = split_city_key(name)
+        a2 = country_a2(country)
+        entry = self.zip_entries.get(name)
+        if a2 and entry and entry.postal_code:
+            code = entry.postal_code
+            # GeoNames only carries the outward part of some postcodes (e.g. GB "SW1A").
+            for candidate in (code, code.split()[0]):
+                coords = self.postal.get(postal_key(a2, candidate))
+                if coords is not None:
+                    return coords
+        if a2:
+            coords = self.places.get(f"{city}, {a2}")
+            if coords is not None:
+                return coords
+        return self.places.get(name)
+
+    def resolve_many(
+        self, conn: sqlite3.Connection, names: Iterable[str], allow_network: bool = False
+    ) -> dict[str, Optional[tuple[float, float]]]:
+        """
+        Resolve every name in one pass: one chunked city_coords read, index lookups for the
+        rest, the network for what is still missing (if allowed), and one write of everything
+        newly resolved. Unresolved names map to None.
+        """
+        names = list(dict.fromkeys(names))
+        out: dict[str, Optional[tuple[float, float]]] = dict(stored_coords(conn, names))
+        resolved = []
+        for name in names:
+            if name in out:
+                continue
+            coords = self.resolve_offline(name)
+            if coords is None and allow_network:
+                city, country = split_city_key(name)
+                try:
+                    coords = geocode_online(city, country_a2(country))
+                except requests.exceptions.RequestException:
+                    coords = None
+            out[name] = coords
+            if coords is not None:
+                resolved.append((name, coords[0], coords[1]))
+        if resolved:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO city_coords (city, lat, lon) VALUES (?, ?, ?)", resolved)
+        return out
+
+    def resolve(self, conn: sqlite3.Connection, name: str, allow_network: bool = True) -> Optional[tuple[float, float]]:
+        return self.resolve_many(conn, [name], allow_network=allow_network)[name]
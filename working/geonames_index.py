@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Compiled lookup index over the GeoNames postal dump (allcountries.txt).
+
+The TSV is parsed once into three .npy files next to it: the sorted keys ("Place, CC",
+"CC postal" for the postal index, or search_key() for the search index) as one UTF-8
+blob, their offsets, and a float32 (lat, lon) array. Later runs memory-map those files
+and binary-search the keys, so nothing is read until the first lookup. The index is
+rebuilt when the source file's size and mtime change and its SHA-1 no longer matches
+the one recorded at build time.
+"""
+import csv
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+from typing import Iterator, Optional
+
+import numpy as np
+
+INDEX_VERSION = 1
+# allcountries.txt carries 4 decimal places; float32 holds them exactly after rounding.
+COORD_DECIMALS = 4
+KEY_KINDS = ("place", "postal", "search")
+# Separates the folded sort text from the display key in search-index keys; sorts below " ".
+SEARCH_SEP = "\x1f"
+
+
+def norm_text(s: str) -> str:
+    """Lowercase, accent-free, punctuation collapsed to single spaces."""
+    s = unicodedata.normalize("NFKD", str(s or ""))
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    s = s.lower().strip()
+    s = re.sub(r"[^a-z0-9]+", " ", s)
+    return " ".join(s.split())
+
+
+def postal_key(country_code: str, postal_code: str) -> str:
+    return f"{country_code.strip().upper()} {' '.join(postal_code.upper().split())}"
+
+
+def search_key(display: str) -> str:
+    """norm_text(display), then SEARCH_SEP and display itself, so keys sort by folded text."""
+    return f"{norm_text(display)}{SEARCH_SEP}{display}"
+
+
+def parse_allcountries(path: str, by: str = "place") -> Iterator[tuple[str, float, float]]:
+    """(key, lat, lon) for every usable row, in file order; keys are "Place, CC", postal_key() or search_key()."""
+    with open(path, "r", encoding="utf-8") as f:
+        for row in csv.reader(f, delimiter="\t"):
+            if len(row) < 11:
+                continue
+            country_code = row[0].strip()
+            place_name = row[2].strip()
+            if not place_name:
+                continue
+            lat_str = row[9].strip()
+            lon_str = row[10].strip()
+            if not lat_str or not lon_str:
+                continue
+            try:
+                lat = float(lat_str)
+                lon = float(lon_str)
+            except ValueError:
+                continue
+            if by == "postal":
+                if not row[1].strip():
+                    continue
+                yield postal_key(country_code, row[1]), lat, lon
+            elif by == "search":
+                yield search_key(f"{place_name}, {country_code}"), lat, lon
+            else:
+                yield f"{place_name}, {country_code}", lat, lon
+
+
+def _file_sha1(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _save_npy(path: str, array: np.ndarray) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+
+class GeoNamesIndex:
+    """
+    Read-only key -> (lat, lon) mapping backed by the compiled index. Duplicate keys keep
+    their first row, matching the INSERT OR IGNORE load into city_coords.
+    """
+
+    def __init__(self, source: str, prefix: Optional[str] = None, by: str = "place"):
+        if by not in KEY_KINDS:
+            raise ValueError(f"unknown key kind {by!r}")
+        self.source = source
+        self.by = by
+        base = os.path.splitext(source)[0]
+        self.prefix = prefix or (f"{base}.idx" if by == "place" else f"{base}.{by}.idx")
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._blob = None
+        self._offsets = None
+        self._coords = None
+
+    def _path(self, part: str) -> str:
+        return f"{self.prefix}.{part}"
+
+    # ------------------------------------------------------------------ build
+
+    def _source_stat(self) -> dict:
+        st = os.stat(self.source)
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    def _read_meta(self) -> Optional[dict]:
+        try:
+            with open(self._path("meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != INDEX_VERSION or meta.get("by", "place") != self.by:
+            return None
+        if not all(os.path.exists(self._path(p)) for p in ("keys.npy", "offsets.npy", "coords.npy")):
+            return None
+        return meta
+
+    def _write_meta(self, meta: dict) -> None:
+        tmp = self._path("meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._path("meta.json"))
+
+    def is_current(self) -> bool:
+        """True when the compiled files match the source (refreshing the recorded mtime if only that moved)."""
+        meta = self._read_meta()
+        if meta is None:
+            return False
+        stat = self._source_stat()
+        if meta.get("size") == stat["size"] and meta.get("mtime_ns") == stat["mtime_ns"]:
+            return True
+        if meta.get("size") == stat["size"] and meta.get("sha1") == _file_sha1(self.source):
+            self._write_meta({**meta, **stat})
+            return True
+        return False
+
+    def build(self) -> int:
+        """Parse the source TSV and write the compiled files. Returns the number of keys."""
+        stat = self._source_stat()
+        keys, lats, lons = [], [], []
+        for key, lat, lon in parse_allcountries(self.source, self.by):
+            keys.append(key)
+            lats.append(lat)
+            lons.append(lon)
+        # Python's str order is code point order, which is also UTF-8 byte order.
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        encoded, kept = [], []
+        prev = None
+        for i in order:
+            if keys[i] == prev:
+                continue
+            prev = keys[i]
+            encoded.append(keys[i].encode("utf-8"))
+            kept.append(i)
+
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(k) for k in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        coords = np.empty((len(kept), 2), dtype=np.float32)
+        coords[:, 0] = np.asarray(lats, dtype=np.float64)[kept]
+        coords[:, 1] = np.asarray(lons, dtype=np.float64)[kept]
+
+        _save_npy(self._path("keys.npy"), blob)
+        _save_npy(self._path("offsets.npy"), offsets)
+        _save_npy(self._path("coords.npy"), coords)
+        self._write_meta(
+            {"version": INDEX_VERSION, "by": self.by, **stat, "sha1": _file_sha1(self.source), "count": len(encoded)}
+        )
+        return len(encoded)
+
+    # ------------------------------------------------------------------ reads
+
+    def _ensure_loaded(self) -> bool:
+        if self._loaded:
+            return self._offsets is not None
+        with self._lock:
+            if not self._loaded:
+                if os.path.exists(self.source):
+                    if not self.is_current():
+                        self.build()
+                    # Slicing a memoryview is far cheaper than slicing the memmap itself.
+                    self._blob = memoryview(np.load(self._path("keys.npy"), mmap_mode="r"))
+                    self._offsets = memoryview(np.load(self._path("offsets.npy"), mmap_mode="r"))
+                    self._coords = np.load(self._path("coords.npy"), mmap_mode="r")
+                self._loaded = True
+        return self._offsets is not None
+
+    def _key_bytes(self, i: int) -> bytes:
+        return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]])
+
+    def _lower_bound(self, target: bytes) -> int:
+        lo, hi = 0, len(self._offsets) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_bytes(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _find(self, key: str) -> int:
+        if not self._ensure_loaded():
+            return -1
+        target = key.encode("utf-8")
+        i = self._lower_bound(target)
+        if i < len(self._offsets) - 1 and self._key_bytes(i) == target:
+            return i
+        return -1
+
+    def starting_with(self, prefix: str, limit: int) -> list[str]:
+        """Up to `limit` keys starting with prefix, in key order."""
+        if not self._ensure_loaded():
+            return []
+        target = prefix.encode("utf-8")
+        out = []
+        n = len(self._offsets) - 1
+        i = self._lower_bound(target)
+        while i < n and len(out) < limit:
+            key = self._key_bytes(i)
+            if not key.startswith(target):
+                break
+            out.append(key.decode("utf-8"))
+            i += 1
+        return out
+
+    def _coord(self, i: int) -> tuple[float, float]:
+        lat, lon = self._coords[i]
+        return round(float(lat), COORD_DECIMALS), round(float(lon), COORD_DECIMALS)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1 if self._ensure_loaded() else 0
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._find(key) >= 0
+
+    def __getitem__(self, key: str) -> tuple[float, float]:
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return self._coord(i)
+
+    def get(self, key: str, default=None):
+        i = self._find(key)
+        return self._coord(i) if i >= 0 else default
+
+    def rows(self) -> Iterator[tuple[str, float, float]]:
+        """(key, lat, lon) in key order, e.g. for one executemany into city_coords."""
+        if not self._ensure_loaded():
+            return
+        blob = self._blob.tobytes()
+        offsets = self._offsets.tolist()
+        coords = np.round(np.asarray(self._coords, dtype=np.float64), COORD_DECIMALS).tolist()
+        for i, (lat, lon) in enumerate(coords):
+            yield blob[offsets[i]:offsets[i + 1]].decode("utf-8"), lat, lon
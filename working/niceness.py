@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Vectorized niceness scoring over dense city x month arrays.
+
+Mirrors sunseeker's scalar compute_city_niceness() and the window's
+compute_adjusted_niceness() operation for operation, so results are bit-identical
+(including NaN handling: a NaN temperature makes the default score NaN and the
+adjusted temperature score 0; NaN sunshine or day length scores 0).
+"""
+from typing import Any
+
+import numpy as np
+
+
+def _clamp01(x: np.ndarray) -> np.ndarray:
+    """max(0.0, min(x, 1.0)) with Python's comparison semantics: NaN maps to 0.0."""
+    capped = np.where(1.0 < x, 1.0, x)
+    return np.where(capped > 0.0, capped, 0.0)
+
+
+def as_matrix(values: Any) -> np.ndarray:
+    return np.asarray(values, dtype=np.float64)
+
+
+def daytime_avg_temp(tmax_f: np.ndarray, tmin_f: np.ndarray) -> np.ndarray:
+    daytime_low_f = tmax_f - (tmax_f - tmin_f) / 4.0
+    return (tmax_f + daytime_low_f) / 2.0
+
+
+def sun_day_scores(sunny_days: np.ndarray, day_length_hrs: np.ndarray) -> np.ndarray:
+    sunny_score = _clamp01(sunny_days / 30.0)
+    day_length_score = _clamp01(day_length_hrs / 24.0)
+    return (sunny_score + day_length_score) / 2.0
+
+
+def default_temp_scores(temp_f: np.ndarray) -> np.ndarray:
+    """Piecewise 50F-105F curve of compute_niceness(); NaN falls through to the last branch like the scalar."""
+    t = temp_f
+    return np.select(
+        [
+            (t < 50) | (t > 105),
+            (50 <= t) & (t < 70),
+            (70 <= t) & (t < 75),
+            (75 <= t) & (t <= 85),
+            (85 < t) & (t <= 90),
+        ],
+        [
+            0.0,
+            (t - 50) / 20.0 * 0.5,
+            0.5 + ((t - 70) / 5.0) * 0.5,
+            1.0,
+            1.0 - ((t - 85) / 5.0) * 0.5,
+        ],
+        default=0.5 - ((t - 90) / 15.0) * 0.5,
+    )
+
+
+def default_scores(tmax_f: Any, tmin_f: Any, sunny_days: Any, day_length_hrs: Any) -> np.ndarray:
+    """compute_city_niceness() for every element of same-shaped arrays (e.g. cities x 12 months)."""
+    # Infinite inputs produce NaN quietly, as Python float arithmetic does.
+    with np.errstate(invalid="ignore"):
+        temp_score = default_temp_scores(daytime_avg_temp(as_matrix(tmax_f), as_matrix(tmin_f)))
+        sun_day_score = sun_day_scores(as_matrix(sunny_days), as_matrix(day_length_hrs))
+        return 0.5 * temp_score + 0.5 * sun_day_score
+
+
+def adjusted_scores(
+    tmax_f: Any,
+    tmin_f: Any,
+    sunny_days: Any,
+    day_length_hrs: Any,
+    min_temp: float,
+    max_temp: float,
+    temp_weight: float,
+) -> np.ndarray:
+    """
+    compute_adjusted_niceness() for every element, with the user's comfort band and temperature weight.
+    Where the scalar divides by zero (a NaN temperature with max_temp == 105) this scores the temperature 0.
+    """
+    if min_temp > max_temp:
+        min_temp, max_temp = max_temp, min_temp
+    # Branches whose denominator is zero are never selected; silence their warnings.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = daytime_avg_temp(as_matrix(tmax_f), as_matrix(tmin_f))
+        temp_score = np.select(
+            [
+                (t < 50) | (t > 105),
+                (50 <= t) & (t < min_temp),
+                (min_temp <= t) & (t <= max_temp),
+            ],
+            [
+                0.0,
+                (t - 50) / float(min_temp - 50),
+                1.0,
+            ],
+            default=1.0 - (t - max_temp) / float(105 - max_temp),
+        )
+        temp_score = _clamp01(temp_score)
+        sun_day_score = sun_day_scores(as_matrix(sunny_days), as_matrix(day_length_hrs))
+        niceness = (temp_weight * temp_score) + ((1.0 - temp_weight) * sun_day_score)
+        return _clamp01(niceness)
@@ -8,6 +8,8 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+import weather_store
+
 DB_DEFAULT = "/Users/jos/Desktop/Archive/weather_data_v2.db"
 CATALOG_DEFAULT = "/Users/jos/Desktop/Archive/all_city_data.json"
 REPORT_DEFAULT = "/Users/jos/Desktop/Archive/reconcile_catalog_report.json"
@@ -72,10 +74,10 @@ def main() -> int:
     with db_connect(args.db) as conn:
         est_cols = table_columns(conn, "daily_data_estimated")
         fc_cols = table_columns(conn, "daily_data_forecast")
-        best_cols = table_columns(conn, "daily_data")
         upsert_est = build_upsert_sql("daily_data_estimated", est_cols)
         upsert_fc = build_upsert_sql("daily_data_forecast", fc_cols)
-        upsert_best = build_upsert_sql("daily_data", best_cols)
+        if args.apply:
+            weather_store.ensure_monthly_agg(conn)
 
         est_counts = {r["city"]: int(r["cnt"]) for r in conn.execute("SELECT city, COUNT(*) cnt FROM daily_data_estimated GROUP BY city").fetchall()}
         fc_counts = {r["city"]: int(r["cnt"]) for r in conn.execute("SELECT city, COUNT(*) cnt FROM daily_data_forecast GROUP BY city").fetchall()}
@@ -107,7 +109,6 @@ def main() -> int:
         unmapped = 0
         copied_est = 0
         copied_fc = 0
-        copied_best = 0
         report_rows: list[dict[str, Any]] = []
 
         for row in catalog:
@@ -158,15 +159,14 @@ def main() -> int:
             src_city = best["city"]
             mapped += 1
             if args.apply:
+                # Bulk copy: skip per-row aggregate upkeep; the city is rebuilt on its next read.
+                weather_store.mark_monthly_agg_dirty(conn, [city])
                 cur = conn.execute(upsert_est, (city, src_city))
                 est_rows = int(cur.rowcount or 0)
                 cur = conn.execute(upsert_fc, (city, src_city))
                 fc_rows = int(cur.rowcount or 0)
-                cur = conn.execute(upsert_best, (city, src_city))
-                best_rows = int(cur.rowcount or 0)
                 copied_est += max(0, est_rows)
                 copied_fc += max(0, fc_rows)
-                copied_best += max(0, best_rows)
                 conn.execute("INSERT OR REPLACE INTO city_coords(city, lat, lon) VALUES(?,?,?)", (city, lat, lon))
 
             report_rows.append(
@@ -203,7 +203,6 @@ def main() -> int:
         "unmapped": unmapped,
         "copied_rows_estimated": copied_est,
         "copied_rows_forecast": copied_fc,
-        "copied_rows_best": copied_best,
         "complete_after": complete_after,
         "missing_after": total - complete_after,
         "rows": report_rows,
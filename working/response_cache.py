@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Content-addressed on-disk cache of raw Visual Crossing responses.
+
+Each payload is stored once as zlib-compressed canonical JSON under
+blobs/<sha256[:2]>/<sha256>.json.z, so identical responses share a file. index.db maps
+a request (provider, kind, lat, lon, start, end, include) to its blob, with fetch and
+access times for per-kind TTLs and LRU eviction by total blob size, and records the
+city keys each response was fetched for.
+
+A fresh entry stands in for the network call; an expired one is kept (until evicted) so
+`python response_cache.py reingest` can rebuild the weather tables from every cached
+payload after a schema or mapping change, with no network at all.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+
+from vc_provider import env_float
+
+BASE_DIR = str(Path(__file__).resolve().parent)
+DEFAULT_PROVIDER = "visualcrossing"
+
+
+RESPONSE_CACHE_DIR = os.environ.get("VC_RESPONSE_CACHE_DIR", f"{BASE_DIR}/vc_response_cache")
+RESPONSE_CACHE_ENABLED = os.environ.get("VC_RESPONSE_CACHE", "1") != "0"
+RESPONSE_CACHE_MAX_BYTES = int(env_float("VC_RESPONSE_CACHE_MAX_MB", 512.0) * 1024 * 1024)
+# Seconds a cached response may replace a fetch, per kind.
+DEFAULT_TTLS = {
+    "estimated_window": env_float("VC_CACHE_TTL_ESTIMATED_SEC", 24 * 3600.0),
+    "forecast_bundle": env_float("VC_CACHE_TTL_FORECAST_SEC", 3600.0),
+    "current_conditions": env_float("VC_CACHE_TTL_CURRENT_SEC", 600.0),
+}
+KIND_TABLES = {"estimated_window": "daily_data_estimated", "forecast_bundle": "daily_data_forecast"}
+COORD_DECIMALS = 4
+
+
+def request_key(provider: str, kind: str, lat: float, lon: float, start: str, end: str, include: str) -> str:
+    return f"{provider}|{kind}|{float(lat):.{COORD_DECIMALS}f}|{float(lon):.{COORD_DECIMALS}f}|{start}|{end}|{include}"
+
+
+class ResponseCache:
+    """Thread- and process-safe: every call opens its own connection to index.db."""
+
+    def __init__(
+        self,
+        root: str = RESPONSE_CACHE_DIR,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+        ttls: Optional[dict[str, float]] = None,
+        enabled: bool = RESPONSE_CACHE_ENABLED,
+    ):
+        self.root = root
+        self.max_bytes = max(0, int(max_bytes))
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.enabled = enabled
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._ready:
+            os.makedirs(f"{self.root}/blobs", exist_ok=True)
+        conn = sqlite3.connect(f"{self.root}/index.db", timeout=60, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout=60000")
+        if not self._ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    request_key TEXT PRIMARY KEY,
+                    provider TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    lat REAL NOT NULL,
+                    lon REAL NOT NULL,
+                    start_date TEXT,
+                    end_date TEXT,
+                    include TEXT,
+                    digest TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_digest ON responses(digest)")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS response_cities (
+                    request_key TEXT NOT NULL,
+                    city TEXT NOT NULL,
+                    PRIMARY KEY (request_key, city)
+                )
+                """
+            )
+            self._ready = True
+        return conn
+
+    def _blob_path(self, digest: str) -> str:
+        return f"{self.root}/blobs/{digest[:2]}/{digest}.json.z"
+
+    def load(self, digest: str) -> Optional[Any]:
+        try:
+            with open(self._blob_path(digest), "rb") as f:
+                return json.loads(zlib.decompress(f.read()))
+        except (OSError, zlib.error, ValueError):
+            return None
+
+    def get(
+        self,
+        kind: str,
+        lat: float,
+        lon: float,
+        start: str,
+        end: str,
+        include: str,
+        provider: str = DEFAULT_PROVIDER,
+        city: str = "",
+    ) -> Optional[Any]:
+        """The cached payload when it is younger than the kind's TTL, else None."""
+        if not self.enabled:
+            return None
+        key = request_key(provider, kind, lat, lon, start, end, include)
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT digest, fetched_at FROM responses WHERE request_key=?", (key,)).fetchone()
+            if row is None or time.time() - row[1] > self.ttls.get(kind, 0.0):
+                return None
+            payload = self.load(row[0])
+            if payload is None:
+                conn.execute("DELETE FROM responses WHERE request_key=?", (key,))
+                return None
+            conn.execute("UPDATE responses SET accessed_at=? WHERE request_key=?", (time.time(), key))
+            if city:
+                conn.execute("INSERT OR IGNORE INTO response_cities(request_key, city) VALUES (?, ?)", (key, city))
+            return payload
+        finally:
+            conn.close()
+
+    def put(
+        self,
+        kind: str,
+        lat: float,
+        lon: float,
+        start: str,
+        end: str,
+        include: str,
+        payload: Any,
+        provider: str = DEFAULT_PROVIDER,
+        city: str = "",
+    ) -> Optional[str]:
+        """Store payload for this request; returns its content digest."""
+        if not self.enabled:
+            return None
+        data = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        conn = self._connect()
+        try:
+            path = self._blob_path(digest)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(zlib.compress(data, 6))
+                os.replace(tmp, path)
+            size = os.path.getsize(path)
+            key = request_key(provider, kind, lat, lon, start, end, include)
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            old = conn.execute("SELECT digest FROM responses WHERE request_key=?", (key,)).fetchone()
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO responses(
+                    request_key, provider, kind, lat, lon, start_date, end_date, include, digest, size, fetched_at, accessed_at
+                ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
+                """,
+                (key, provider, kind, round(float(lat), COORD_DECIMALS), round(float(lon), COORD_DECIMALS),
+                 start, end, include, digest, size, now, now),
+            )
+            if city:
+                conn.execute("INSERT OR IGNORE INTO response_cities(request_key, city) VALUES (?, ?)", (key, city))
+            conn.execute("COMMIT")
+            if old is not None and old[0] != digest:
+                self._drop_blob_if_unused(conn, old[0])
+            if self.max_bytes and self._total_bytes(conn) > self.max_bytes:
+                self._evict(conn, self.max_bytes)
+            return digest
+        finally:
+            conn.close()
+
+    def _total_bytes(self, conn: sqlite3.Connection) -> int:
+        row = conn.execute("SELECT SUM(size) FROM (SELECT MAX(size) AS size FROM responses GROUP BY digest)").fetchone()
+        return int(row[0] or 0)
+
+    def _drop_blob_if_unused(self, conn: sqlite3.Connection, digest: str) -> bool:
+        if conn.execute("SELECT 1 FROM responses WHERE digest=? LIMIT 1", (digest,)).fetchone():
+            return False
+        try:
+            os.unlink(self._blob_path(digest))
+        except FileNotFoundError:
+            pass
+        return True
+
+    def _evict(self, conn: sqlite3.Connection, target_bytes: int) -> int:
+        """Drop least recently used entries until distinct blobs total at most target_bytes."""
+        total = self._total_bytes(conn)
+        evicted = 0
+        for key, digest, size in conn.execute(
+            "SELECT request_key, digest, size FROM responses ORDER BY accessed_at"
+        ).fetchall():
+            if total <= target_bytes:
+                break
+            conn.execute("DELETE FROM responses WHERE request_key=?", (key,))
+            conn.execute("DELETE FROM response_cities WHERE request_key=?", (key,))
+            if self._drop_blob_if_unused(conn, digest):
+                total -= size
+            evicted += 1
+        return evicted
+
+    def evict(self, target_bytes: Optional[int] = None) -> int:
+        conn = self._connect()
+        try:
+            return self._evict(conn, self.max_bytes if target_bytes is None else target_bytes)
+        finally:
+            conn.close()
+
+    def entries(self, kinds: Optional[Iterable[str]] = None) -> Iterator[dict[str, Any]]:
+        """Index rows (plus their linked city keys), oldest fetch first so newer payloads win on replay."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT request_key, provider, kind, lat, lon, start_date, end_date, include, digest, fetched_at "
+                "FROM responses ORDER BY fetched_at"
+            ).fetchall()
+            cities: dict[str, list[str]] = {}
+            for key, city in conn.execute("SELECT request_key, city FROM response_cities"):
+                cities.setdefault(key, []).append(city)
+        finally:
+            conn.close()
+        kinds = set(kinds) if kinds else None
+        for key, provider, kind, lat, lon, start, end, include, digest, fetched_at in rows:
+            if kinds is not None and kind not in kinds:
+                continue
+            yield {
+                "request_key": key, "provider": provider, "kind": kind, "lat": lat, "lon": lon,
+                "start_date": start, "end_date": end, "include": include, "digest": digest,
+                "fetched_at": fetched_at, "cities": cities.get(key, []),
+            }
+
+    def stats(self) -> dict[str, Any]:
+        conn = self._connect()
+        try:
+            by_kind = {
+                kind: {"entries": n, "fresh": 0}
+                for kind, n in conn.execute("SELECT kind, COUNT(*) FROM responses GROUP BY kind")
+            }
+            now = time.time()
+            for kind, fetched_at in conn.execute("SELECT kind, fetched_at FROM responses"):
+                if now - fetched_at <= self.ttls.get(kind, 0.0):
+                    by_kind[kind]["fresh"] += 1
+            blobs = conn.execute("SELECT COUNT(DISTINCT digest) FROM responses").fetchone()[0]
+            return {
+                "root": self.root,
+                "enabled": self.enabled,
+                "blobs": blobs,
+                "bytes": self._total_bytes(conn),
+                "max_bytes": self.max_bytes,
+                "kinds": by_kind,
+            }
+        finally:
+            conn.close()
+
+
+def reingest(cache: ResponseCache, db_path: str, kinds: Optional[Iterable[str]] = None, grid_deg: Optional[float] = None) -> dict[str, int]:
+    """
+    Rebuild daily_data_estimated / daily_data_forecast rows from cached payloads through
+    weather_sync's current parsing. A payload goes to the city keys recorded with it and
+    to the tracked cities (sync targets and cities that already have weather rows) at its
+    exact point or in its grid cell (shared requests are fetched at the cell centre).
+    """
+    # Imported here: weather_sync imports this module, and reingest is the only path that needs pandas.
+    import vc_provider
+    import weather_store
+    import weather_sync
+
+    grid_deg = vc_provider.DEFAULT_GRID_DEG if grid_deg is None else grid_deg
+    weather_sync.DATABASE = db_path
+    weather_sync.init_db()
+    conn = weather_sync.get_db_conn(db_path)
+    try:
+        # city_coords holds all of GeoNames: only tracked cities may receive a replayed payload.
+        targets = dict(weather_sync.build_target_city_map(weather_sync.load_forecast_cache()))
+        for city, lat, lon in conn.execute(
+            """
+            SELECT c.city, c.lat, c.lon
+            FROM (SELECT city FROM daily_data_estimated UNION SELECT city FROM daily_data_forecast) t
+            JOIN city_coords c ON c.city = t.city
+            WHERE c.lat IS NOT NULL AND c.lon IS NOT NULL
+            """
+        ):
+            targets.setdefault(city, (lat, lon))
+        by_point: dict[tuple[float, float], set[str]] = {}
+        for city, (lat, lon) in targets.items():
+            for point in {
+                (round(lat, COORD_DECIMALS), round(lon, COORD_DECIMALS)),
+                tuple(round(v, COORD_DECIMALS) for v in vc_provider.grid_cell(lat, lon, grid_deg)),
+            }:
+                by_point.setdefault(point, set()).add(city)
+
+        counts = {"payloads": 0, "missing": 0, "rows": 0}
+        touched: set[str] = set()
+        for entry in cache.entries(kinds):
+            if entry["kind"] not in KIND_TABLES:
+                continue
+            payload = cache.load(entry["digest"])
+            if payload is None:
+                counts["missing"] += 1
+                continue
+            cities = set(entry["cities"]) | by_point.get((entry["lat"], entry["lon"]), set())
+            if entry["kind"] == "forecast_bundle":
+                fore_json, _cur = weather_sync.forecast_bundle_from_payload(payload, entry["lat"], entry["lon"])
+                df = weather_sync.process_forecast_daily_data(fore_json["daily"])
+                source = "forecast"
+            else:
+                df = weather_sync.process_visualcrossing_days(payload.get("days", []) or [])
+                source = "estimated"
+            counts["payloads"] += 1
+            if df.empty:
+                continue
+            # Replay skips per-row aggregate maintenance; touched cities are rebuilt once below.
+            weather_store.mark_monthly_agg_dirty(conn, sorted(cities - touched))
+            touched |= cities
+            for city in cities:
+                weather_sync.store_data(conn, city, df, source=source)
+                counts["rows"] += len(df)
+        weather_store.refresh_monthly_agg_all(conn, weather_sync.START_DATE, weather_sync.END_DATE, cities=sorted(touched))
+        conn.commit()
+        counts["cities"] = len(touched)
+        return counts
+    finally:
+        conn.close()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Inspect, trim or replay the raw Visual Crossing response cache.")
+    ap.add_argument("--root", default=RESPONSE_CACHE_DIR)
+    sub = ap.add_subparsers(dest="cmd")
+    sub.add_parser("stats", help="Print cache size and entry counts as JSON")
+    ev = sub.add_parser("evict", help="Drop least recently used entries down to a size")
+    ev.add_argument("--max-mb", type=float, default=RESPONSE_CACHE_MAX_BYTES / (1024 * 1024))
+    ri = sub.add_parser("reingest", help="Rebuild the weather tables from cached payloads (no network)")
+    ri.add_argument("--db", default=f"{BASE_DIR}/weather_data_v2.db")
+    ri.add_argument("--kind", choices=sorted(KIND_TABLES), action="append", help="Only this kind (repeatable)")
+    ri.add_argument("--grid-deg", type=float, default=None, help="Grid used to match shared payloads to cities")
+    args = ap.parse_args()
+
+    cache = ResponseCache(args.root)
+    if args.cmd == "evict":
+        evicted = cache.evict(int(args.max_mb * 1024 * 1024))
+        print(json.dumps({"evicted": evicted, **cache.stats()}, indent=2))
+        return 0
+    if args.cmd == "reingest":
+        t0 = time.time()
+        counts = reingest(cache, args.db, args.kind, args.grid_deg)
+        print(json.dumps({**counts, "elapsed_sec": round(time.time() - t0, 2)}, indent=2))
+        return 0
+    print(json.dumps(cache.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
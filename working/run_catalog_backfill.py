@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
 import json
 import os
 import sqlite3
@@ -12,32 +13,28 @@ from typing import Any
 
 import requests
 
+import fetch_scheduler
+import response_cache
+import vc_provider
+import weather_store
+import weather_sync
+from weather_sync import load_catalog
+
 BASE_DIR = str(Path(__file__).resolve().parent)
 DEFAULT_DB = f"{BASE_DIR}/weather_data_v2.db"
-DEFAULT_CATALOG = f"{BASE_DIR}/all_city_data.json"
+DEFAULT_CATALOG = weather_sync.CATALOG_FILE
 DEFAULT_API_LOG = f"{BASE_DIR}/sync_api_calls.ndjson"
 DEFAULT_SYNC_LOG = f"{BASE_DIR}/sync_runs.log"
 DEFAULT_KEY_FILE = f"{BASE_DIR}/.visualcrossing_key"
 DEFAULT_STATUS_FILE = f"{BASE_DIR}/backfill_status.json"
 
 VC_URL = (
-    "https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/"
+    vc_provider.VC_TIMELINE_URL + "/"
     "{lat},{lon}/{start}/{end}?unitGroup=metric&include=days{include_current}"
     "&key={key}&contentType=json"
 )
-
-# Explicit disambiguation map for ambiguous city names that collide globally.
-# Key: (catalog city, catalog country) -> DB/API city key
-CITY_COUNTRY_DISAMBIGUATION: dict[tuple[str, str], str] = {
-    ("Hong Kong", "China (Hong Kong SAR)"): "Hong Kong, China",
-    ("Macau", "China (Macau SAR)"): "Macau, China",
-    ("George Town", "Cayman Islands"): "George Town, Cayman Islands",
-    ("Granada", "Nicaragua"): "Granada, Nicaragua",
-    ("Hamilton", "Bermuda"): "Hamilton, Bermuda",
-    ("San Juan", "United States"): "San Juan, United States",
-    ("Alexandria", "United States"): "Alexandria, United States",
-    ("Georgetown, TX", "United States"): "Georgetown, TX",
-}
+# Shared with sunseeker and the dashboard: a fresh cached payload for the same request skips the call.
+RESPONSE_CACHE = response_cache.ResponseCache()
 
 
 def utcnow_iso() -> str:
@@ -132,6 +129,9 @@ def ensure_support_tables(conn: sqlite3.Connection) -> None:
         )
         """
     )
+    weather_store.ensure_daily_view(conn)
+    weather_store.ensure_coverage(conn)
+    weather_store.ensure_monthly_agg(conn)
     conn.commit()
 
 
@@ -148,16 +148,8 @@ def append_api_log(api_log_path: str, row: dict[str, Any]) -> None:
 
 
 def build_counts_map(conn: sqlite3.Connection, table: str, start_date: str, end_date: str) -> dict[str, int]:
-    rows = conn.execute(
-        f"""
-        SELECT city, COUNT(*) AS cnt
-        FROM {table}
-        WHERE date >= ? AND date <= ?
-        GROUP BY city
-        """,
-        (start_date, end_date),
-    ).fetchall()
-    return {r["city"]: int(r["cnt"]) for r in rows}
+    bitmaps = weather_store.coverage_bitmap_map(conn, table, start_date, end_date)
+    return {city: weather_store.coverage_count(bits) for city, bits in bitmaps.items()}
 
 
 def upsert_weather_row(conn: sqlite3.Connection, table: str, city: str, d: dict[str, Any], source: str) -> None:
@@ -218,97 +210,174 @@ def upsert_weather_row(conn: sqlite3.Connection, table: str, city: str, d: dict[
 
 
 class RateGate:
-    def __init__(self, min_interval_sec: float):
-        self.min_interval_sec = max(0.0, float(min_interval_sec))
-        self.last_call = 0.0
-
-    def wait(self) -> None:
-        if self.min_interval_sec <= 0:
-            return
-        now = time.time()
-        delay = self.min_interval_sec - (now - self.last_call)
+    """
+    Async front for the cross-process VC token bucket (vc_provider.TokenBucket).
+    Every in-flight request reserves a token first, so this runner shares one request
+    budget with sunseeker and the dashboard instead of pacing only itself. A per-run
+    rate/burst only tightens this process's pace; it is never saved to the shared state.
+    """
+
+    def __init__(self, rate_per_sec: float | None = None, burst: float | None = None):
+        self.bucket = vc_provider.TokenBucket(rate_per_sec=rate_per_sec, burst=burst)
+
+    async def wait(self) -> None:
+        delay = await asyncio.to_thread(self.bucket.reserve)
         if delay > 0:
-            time.sleep(delay)
-        self.last_call = time.time()
+            await asyncio.sleep(delay)
 
+    def stats(self) -> dict[str, Any]:
+        return self.bucket.stats()
 
-def fetch_vc(
-    key: str,
-    lat: float,
-    lon: float,
-    start_date: str,
-    end_date: str,
-    include_current: bool,
+
+class AdaptiveSlots:
+    """
+    asyncio view of a vc_provider.AimdController: bounds in-flight requests by the
+    controller's current worker limit and applies its local request spacing.
+    """
+
+    def __init__(self, controller: vc_provider.AimdController):
+        self.controller = controller
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self) -> "AdaptiveSlots":
+        async with self._cond:
+            await self._cond.wait_for(self.controller.try_acquire_slot)
+        delay = self.controller.pace_delay()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self
+
+    async def __aexit__(self, *_exc) -> None:
+        self.controller.release_slot()
+        async with self._cond:
+            self._cond.notify_all()
+
+
+def make_http_session(pool_size: int) -> requests.Session:
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+async def vc_get_json(
+    session: requests.Session,
+    url: str,
     gate: RateGate,
     attempts: int,
-) -> tuple[dict[str, Any], str, int]:
-    include = ",current" if include_current else ""
-    url = VC_URL.format(
-        lat=lat,
-        lon=lon,
-        start=start_date,
-        end=end_date,
-        include_current=include,
-        key=key,
-    )
+    in_flight: AdaptiveSlots,
+    breaker: vc_provider.CircuitBreaker | None = None,
+    params: dict[str, Any] | None = None,
+) -> tuple[Any, str, int]:
+    """(payload, called url, status) of a VC GET under the breaker, the controller and the shared bucket, with retries."""
     last_err: Exception | None = None
     for i in range(1, max(1, attempts) + 1):
-        gate.wait()
         try:
-            r = requests.get(url, timeout=60)
+            if breaker is not None:
+                await breaker.check_async()
+            async with in_flight:
+                await gate.wait()
+                t0 = time.monotonic()
+                try:
+                    r = await asyncio.to_thread(session.get, url, params=params, timeout=60)
+                except requests.RequestException:
+                    in_flight.controller.record(None, time.monotonic() - t0)
+                    if breaker is not None:
+                        await asyncio.to_thread(breaker.record, None)
+                    raise
+                in_flight.controller.record(r.status_code, time.monotonic() - t0)
+            if breaker is not None:
+                await asyncio.to_thread(breaker.record, r.status_code, vc_provider.retry_after_sec(r.headers))
             if r.status_code == 429:
                 retry_after = r.headers.get("Retry-After")
                 sleep_sec = float(retry_after) if retry_after and retry_after.isdigit() else min(60.0, 2.0 * i)
-                time.sleep(sleep_sec)
+                await asyncio.sleep(sleep_sec)
                 r.raise_for_status()
             if 500 <= r.status_code <= 599:
                 r.raise_for_status()
             r.raise_for_status()
-            return r.json(), url, r.status_code
+            return r.json(), r.url or url, r.status_code
+        except vc_provider.ProviderUnavailable:
+            # Retrying cannot help until the shared circuit's probe succeeds.
+            raise
         except Exception as e:
             last_err = e
             if i >= attempts:
                 break
-            time.sleep(min(30.0, 1.5 * i))
+            await asyncio.sleep(min(30.0, 1.5 * i))
     assert last_err is not None
     raise last_err
 
 
-def db_city_key(city: str, country: str) -> str:
-    city_s = str(city or "").strip()
-    country_s = str(country or "").strip()
-    if not city_s:
-        return ""
-    mapped = CITY_COUNTRY_DISAMBIGUATION.get((city_s, country_s))
-    if mapped:
-        return mapped
-    return city_s
+async def fetch_vc(
+    session: requests.Session,
+    key: str,
+    lat: float,
+    lon: float,
+    start_date: str,
+    end_date: str,
+    include_current: bool,
+    gate: RateGate,
+    attempts: int,
+    in_flight: AdaptiveSlots,
+    breaker: vc_provider.CircuitBreaker | None = None,
+) -> tuple[dict[str, Any], str, int]:
+    include = ",current" if include_current else ""
+    url = VC_URL.format(
+        lat=lat,
+        lon=lon,
+        start=start_date,
+        end=end_date,
+        include_current=include,
+        key=key,
+    )
+    kind = "forecast_bundle" if include_current else "estimated_window"
+    cached = await asyncio.to_thread(RESPONSE_CACHE.get, kind, lat, lon, start_date, end_date, f"days{include}")
+    if cached is not None:
+        return cached, url, 200
+    payload, _called, status_code = await vc_get_json(session, url, gate, attempts, in_flight, breaker)
+    await asyncio.to_thread(RESPONSE_CACHE.put, kind, lat, lon, start_date, end_date, f"days{include}", payload)
+    return payload, url, status_code
 
 
-def load_catalog(path: str) -> list[dict[str, Any]]:
-    data = json.loads(Path(path).read_text(encoding="utf-8"))
-    out = []
-    seen = set()
-    for row in data:
-        city = str(row.get("city", "")).strip()
-        country = str(row.get("country", "")).strip()
-        if not city or not country:
-            continue
-        key = (city, country)
-        if key in seen:
-            continue
-        seen.add(key)
-        out.append(
-            {
-                "city": city,
-                "country": country,
-                "db_city": db_city_key(city, country),
-                "continent": str(row.get("continent", "Unknown")).strip() or "Unknown",
-                "lat": float(row.get("lat", 0.0)),
-                "lng": float(row.get("lng", 0.0)),
-            }
-        )
-    return out
+async def fetch_vc_multi(
+    session: requests.Session,
+    key: str,
+    points: list[tuple[float, float]],
+    start_date: str,
+    end_date: str,
+    include_current: bool,
+    gate: RateGate,
+    attempts: int,
+    in_flight: AdaptiveSlots,
+    breaker: vc_provider.CircuitBreaker | None = None,
+) -> list[Any]:
+    """
+    One timelinemulti request for `points`: (payload, url, status) or vc_provider.BatchLocationError
+    per point, in order. Points with a cached response are not sent.
+    """
+    include = "days,current" if include_current else "days"
+    kind = "forecast_bundle" if include_current else "estimated_window"
+    results: list[Any] = []
+    for lat, lon in points:
+        cached = await asyncio.to_thread(RESPONSE_CACHE.get, kind, lat, lon, start_date, end_date, include)
+        results.append(None if cached is None else (cached, vc_provider.VC_MULTI_URL, 200))
+    pending = [i for i, r in enumerate(results) if r is None]
+    if not pending:
+        return results
+    sent = [points[i] for i in pending]
+    params = vc_provider.multi_location_params(sent, start_date, end_date, include, key)
+    payload, url, status_code = await vc_get_json(
+        session, vc_provider.VC_MULTI_URL, gate, attempts, in_flight, breaker, params=params
+    )
+    for i, loc in zip(pending, vc_provider.split_multi_location(payload, sent)):
+        if not isinstance(loc, vc_provider.BatchLocationError):
+            lat, lon = points[i]
+            await asyncio.to_thread(RESPONSE_CACHE.put, kind, lat, lon, start_date, end_date, include, loc)
+            loc = (loc, url, status_code)
+        results[i] = loc
+    return results
 
 
 def parse_csv_values(value: str) -> set[str]:
@@ -346,6 +415,504 @@ def release_lock(fd: int, lock_path: str) -> None:
             os.unlink(lock_path)
 
 
+class BackfillRun:
+    """Shared state for one backfill run; mutated only from the event loop thread."""
+
+    def __init__(
+        self,
+        args: argparse.Namespace,
+        conn: sqlite3.Connection,
+        run_id: str,
+        key: str,
+        total: int,
+        est_window: tuple[str, str],
+        fc_window: tuple[str, str],
+        est_counts: dict[str, int],
+        fc_counts: dict[str, int],
+        est_plan: dict[str, list[tuple[str, str]]],
+        started_ts: float,
+    ):
+        self.args = args
+        self.conn = conn
+        self.run_id = run_id
+        self.key = key
+        self.total = total
+        self.est_start, self.est_end = est_window
+        self.fc_start, self.fc_end = fc_window
+        self.est_counts = est_counts
+        self.fc_counts = fc_counts
+        self.est_plan = est_plan
+        self.started_ts = started_ts
+        concurrency = max(1, args.concurrency)
+        if args.adaptive:
+            start_workers, min_workers, max_interval = args.initial_concurrency or max(1, concurrency // 2), 1, 30.0
+        else:
+            start_workers, min_workers, max_interval = concurrency, concurrency, 0.0
+        self.controller = vc_provider.AimdController(
+            workers=start_workers,
+            max_workers=concurrency,
+            min_workers=min_workers,
+            max_interval_sec=max_interval,
+            latency_target_sec=args.latency_target_sec,
+            log_fn=lambda row: append_api_log(args.api_log, {**row, "run_id": run_id, "ts": utcnow_iso()}),
+            source="backfill",
+        )
+        self.share = vc_provider.GridShare(args.grid_deg)
+        self.breaker = vc_provider.CircuitBreaker()
+        self.scheduler = fetch_scheduler.FetchScheduler([])
+        self.batch = vc_provider.BatchStats(args.batch_size)
+        # (cell, window) keys already pulled in a batch; later aliases get them from the grid share.
+        self.batched_keys: set[tuple] = set()
+        self.deferred = 0
+        self.done = 0
+        self.ok = 0
+        self.err = 0
+        self.fetched = 0
+        self.est_updated_cities = 0
+        self.fc_updated_cities = 0
+
+    def city_pulls(self, c: dict[str, Any]) -> tuple[list[tuple[str, str]], bool]:
+        """(estimated ranges to fetch, whether to fetch the forecast) for one catalog city."""
+        args = self.args
+        city = c["db_city"]
+        est_ranges = self.est_plan.get(city, []) if args.mode in {"both", "estimated"} else []
+        f_ok = self.fc_counts.get(city, 0) >= 14
+        pull_fc = args.mode in {"both", "forecast"} and (not args.resume or not f_ok)
+        return est_ranges, pull_fc
+
+    def prioritize(self, catalog: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """
+        catalog with the cities that have work, highest priority first, ahead of the rest.
+        Forecast staleness is the share of the forecast window missing, the gap the share of
+        the estimated window missing.
+        """
+        est_days = max(1, weather_store.window_days(self.est_start, self.est_end))
+        fc_days = max(1, weather_store.window_days(self.fc_start, self.fc_end))
+        staleness, gap = {}, {}
+        for c in catalog:
+            city = c["db_city"]
+            est_ranges, pull_fc = self.city_pulls(c)
+            if est_ranges:
+                gap[city] = min(1.0, sum(weather_store.window_days(s, e) for s, e in est_ranges) / est_days)
+            if pull_fc:
+                staleness[city] = 1.0 - min(1.0, self.fc_counts.get(city, 0) / fc_days)
+        pending = [c["db_city"] for c in catalog if any(self.city_pulls(c))]
+        self.scheduler = fetch_scheduler.FetchScheduler(
+            fetch_scheduler.prioritize(
+                pending,
+                staleness=staleness,
+                gap=gap,
+                interest=fetch_scheduler.load_interest(self.conn),
+                error_rate=fetch_scheduler.error_rates(self.conn, "estimated" if self.args.mode == "estimated" else "forecast"),
+            ),
+            deadline=fetch_scheduler.deadline_from(self.args.deadline_sec),
+            budget=self.args.request_budget or None,
+            batch_size=self.batch.size,
+        )
+        rank = {city: i for i, city in enumerate(self.scheduler.order())}
+        return sorted(catalog, key=lambda c: rank.get(c["db_city"], len(rank)))
+
+    def admit(self, c: dict[str, Any]) -> bool:
+        """
+        Whether the city's requests fit the run's deadline and budget; cities with no work always
+        pass. Windows an admitted alias already pulls through the grid share cost nothing.
+        """
+        windows = self.shared_windows(c)
+        keys = [self.share.key(c["lat"], c["lng"], window) for window in windows]
+        return not windows or self.scheduler.admit(c["db_city"], share_keys=keys)
+
+    def shared_windows(self, c: dict[str, Any]) -> list[tuple[str, str, bool]]:
+        """The (start, end, include_current) windows the city will request through the grid share."""
+        est_ranges, pull_fc = self.city_pulls(c)
+        windows = [(start, end, False) for start, end in est_ranges]
+        if pull_fc:
+            windows.append((self.fc_start, self.fc_end, True))
+        return windows
+
+    def expect_shared(self, catalog: list[dict[str, Any]]) -> None:
+        """Register every planned request so aliases in one grid cell reuse the first city's payload."""
+        for c in catalog:
+            for window in self.shared_windows(c):
+                self.share.expect(c["lat"], c["lng"], window)
+
+    def defer(self, c: dict[str, Any], reason: str) -> None:
+        """Leave the city for the next run: log it and drop its grid-share registrations."""
+        self.deferred += 1
+        for window in self.shared_windows(c):
+            self.share.release_expected(c["lat"], c["lng"], window)
+        est_ranges, pull_fc = self.city_pulls(c)
+        for stage, pulled in (("estimated", est_ranges), ("forecast", pull_fc)):
+            if pulled:
+                insert_city_log(self.conn, self.run_id, c["db_city"], stage, "deferred", reason)
+
+    async def prefetch(
+        self,
+        cities: list[dict[str, Any]],
+        session: requests.Session,
+        gate: RateGate,
+        in_flight: AdaptiveSlots,
+    ) -> dict[tuple, Any]:
+        """
+        The pending windows of `cities` pulled as multi-location requests, --batch-size grid cells
+        each: {(cell, window): (payload, url, status, batch log fields) or exception}. Locations
+        that failed are logged here, one API log row each; the rest are logged when stored.
+        """
+        groups: dict[tuple, dict[tuple[float, float], None]] = {}
+        city_of: dict[tuple[float, float], dict[str, Any]] = {}
+        for c in cities:
+            cell = vc_provider.grid_cell(c["lat"], c["lng"], self.share.grid_deg)
+            city_of.setdefault(cell, c)
+            for window in self.shared_windows(c):
+                if (cell, window) not in self.batched_keys:
+                    self.batched_keys.add((cell, window))
+                    groups.setdefault(window, {})[cell] = None
+        out: dict[tuple, Any] = {}
+
+        async def pull(window: tuple, chunk: list[tuple[float, float]]) -> None:
+            start, end, include_current = window
+            try:
+                results = await fetch_vc_multi(
+                    session, self.key, chunk, start, end, include_current,
+                    gate=gate, attempts=self.args.attempts, in_flight=in_flight, breaker=self.breaker,
+                )
+            except Exception as e:
+                results = [e] * len(chunk)
+            self.batch.record(len(chunk), failed=sum(isinstance(r, Exception) for r in results))
+            batch_id = uuid.uuid4().hex[:8]
+            for n, (cell, r) in enumerate(zip(chunk, results)):
+                batch = {"batch_id": batch_id, "batch_size": len(chunk), "batch_index": n}
+                if not isinstance(r, Exception):
+                    out[(cell, window)] = (*r, batch)
+                    continue
+                out[(cell, window)] = r
+                c = city_of[cell]
+                append_api_log(self.args.api_log, {
+                    "city": c["db_city"],
+                    "catalog_city": c["city"],
+                    "catalog_country": c["country"],
+                    "kind": "forecast_bundle" if include_current else "estimated_window",
+                    "provider": "visualcrossing",
+                    "status_code": getattr(getattr(r, "response", None), "status_code", None),
+                    "ok": False,
+                    "lat": cell[0],
+                    "lon": cell[1],
+                    "records": 0,
+                    "start_date": start,
+                    "end_date": end,
+                    "error": str(r),
+                    **batch,
+                    "ts": utcnow_iso(),
+                })
+
+        await asyncio.gather(*(
+            pull(window, chunk)
+            for window, cells in groups.items()
+            for chunk in vc_provider.chunked(list(cells), self.batch.size)
+        ))
+        return out
+
+    def throughput(self) -> dict[str, float]:
+        elapsed = time.time() - self.started_ts
+        minutes = elapsed / 60.0
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        rem = self.total - self.done
+        return {
+            "elapsed": elapsed,
+            "eta": rem / rate if rate > 0 else 0,
+            "cities_per_min": self.done / minutes if minutes > 0 else 0.0,
+            "fetched_cities_per_min": self.fetched / minutes if minutes > 0 else 0.0,
+        }
+
+    def report(self, c: dict[str, Any], city_action: list[str], error: str | None = None) -> None:
+        city = c["db_city"]
+        t = self.throughput()
+        line = f"[{self.done}/{self.total}] {city} ({', '.join(city_action)}) "
+        if error is not None:
+            line += f"ERROR: {error} "
+        line += (
+            f"ok={self.ok} err={self.err} elapsed={format_duration(t['elapsed'])} eta={format_duration(t['eta'])} "
+            f"rate={t['cities_per_min']:.1f}/min"
+        )
+        if self.args.live:
+            print(line, flush=True)
+        payload = {
+            "run_id": self.run_id,
+            "state": "running",
+            "mode": self.args.mode,
+            "done": self.done,
+            "total_cities": self.total,
+            "ok": self.ok,
+            "err": self.err,
+            "elapsed_sec": round(t["elapsed"], 1),
+            "eta_sec": round(t["eta"], 1),
+            "cities_per_min": round(t["cities_per_min"], 2),
+            "fetched_cities_per_min": round(t["fetched_cities_per_min"], 2),
+            "concurrency": self.args.concurrency,
+            "controller": self.controller.snapshot(),
+            "current_city": f"{c['city']}, {c['country']}",
+            "db_city": city,
+            "current_action": city_action,
+            "last_message": line,
+            "updated_at": utcnow_iso(),
+        }
+        if error is not None:
+            payload["last_error"] = error
+        write_status_file(self.args.status_file, payload)
+
+
+def build_api_log_row(
+    run: BackfillRun,
+    c: dict[str, Any],
+    kind: str,
+    status_code: int,
+    url: str,
+    days: list[dict[str, Any]],
+    start_date: str,
+    end_date: str,
+    cur: dict[str, Any] | None = None,
+    batch: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    row = {
+        "city": c["db_city"],
+        "catalog_city": c["city"],
+        "catalog_country": c["country"],
+        "kind": kind,
+        "provider": "visualcrossing",
+        "status_code": status_code,
+        "ok": True,
+        "url": url.replace(run.key, "***"),
+        "lat": c["lat"],
+        "lon": c["lng"],
+        "records": len(days),
+        "start_date": start_date,
+        "end_date": end_date,
+    }
+    if cur is not None:
+        row["current_temp_c"] = cur.get("temp")
+    if batch:
+        row.update(batch)
+    row.update(
+        {
+            "sample_tmax_c": (days[0].get("tempmax") if days else None),
+            "sample_tmin_c": (days[0].get("tempmin") if days else None),
+            "sample_precip_mm": (days[0].get("precip") if days else None),
+            "sample_precip_prob_pct": (days[0].get("precipprob") if days else None),
+            "sample_solarradiation_wm2": (days[0].get("solarradiation") if days else None),
+            "ts": utcnow_iso(),
+        }
+    )
+    return row
+
+
+async def process_city(
+    run: BackfillRun,
+    c: dict[str, Any],
+    session: requests.Session,
+    gate: RateGate,
+    in_flight: AdaptiveSlots,
+    prefetched: dict[tuple, Any] | None = None,
+) -> None:
+    args = run.args
+    conn = run.conn
+    city = c["db_city"]
+    lat = c["lat"]
+    lon = c["lng"]
+    city_action = []
+
+    want_est = args.mode in {"both", "estimated"}
+    want_fc = args.mode in {"both", "forecast"}
+    est_ranges, pull_fc = run.city_pulls(c)
+    pull_est = bool(est_ranges)
+    if want_est:
+        city_action.append("est:fetch" if pull_est else "est:skip")
+    if want_fc:
+        city_action.append("fc:fetch" if pull_fc else "fc:skip")
+
+    if not pull_est and not pull_fc:
+        if want_est:
+            insert_city_log(conn, run.run_id, city, "estimated", "complete", "already complete")
+        if want_fc:
+            insert_city_log(conn, run.run_id, city, "forecast", "complete", "already complete")
+        conn.commit()
+        run.done += 1
+        run.ok += 1
+        run.report(c, city_action)
+        if run.done % 50 == 0 or run.done == run.total:
+            append_sync_log(args.sync_log, f"Progress {run.done}/{run.total} ok={run.ok} err={run.err} (skip)")
+        return
+
+    def shared_fetch(start: str, end: str, include_current: bool):
+        """(payload, url, status, batch log fields); a batched cell is served from the prefetch."""
+        window = (start, end, include_current)
+
+        async def fetch(cell_lat: float, cell_lon: float):
+            hit = vc_provider.take_prefetched(prefetched, ((cell_lat, cell_lon), window), run.batch)
+            if hit is not None:
+                return hit
+            payload, url, status_code = await fetch_vc(
+                session, run.key, cell_lat, cell_lon, start, end,
+                include_current=include_current, gate=gate, attempts=args.attempts, in_flight=in_flight,
+                breaker=run.breaker,
+            )
+            return payload, url, status_code, {}
+
+        # One request per grid cell and window; other city keys in the cell reuse its payload.
+        return run.share.get_async(lat, lon, window, fetch)
+
+    # Estimated and forecast windows are independent requests; issue them together.
+    pending: dict[str, Any] = {}
+    if pull_est:
+        pending["estimated"] = asyncio.gather(*(shared_fetch(start, end, False) for start, end in est_ranges))
+    if pull_fc:
+        pending["forecast"] = shared_fetch(run.fc_start, run.fc_end, True)
+    results = dict(zip(pending.keys(), await asyncio.gather(*pending.values(), return_exceptions=True)))
+
+    errors: list[str] = []
+    try:
+        conn.execute("INSERT OR IGNORE INTO city_coords(city, lat, lon) VALUES(?,?,?)", (city, lat, lon))
+
+        est_res = results.get("estimated")
+        if isinstance(est_res, BaseException):
+            errors.append(str(est_res))
+            insert_city_log(conn, run.run_id, city, "estimated", "error", str(est_res))
+        elif est_res is not None:
+            rows = 0
+            for (start, end), (payload, url, status_code, batch) in zip(est_ranges, est_res):
+                days = payload.get("days", []) or []
+                for d in days:
+                    upsert_weather_row(conn, "daily_data_estimated", city, d, "estimated")
+                rows += len(days)
+                append_api_log(
+                    args.api_log,
+                    build_api_log_row(
+                        run, c, "estimated_window", status_code, url, days, start, end,
+                        batch=batch,
+                    ),
+                )
+            ranges_txt = ",".join(f"{start}..{end}" for start, end in est_ranges)
+            insert_city_log(conn, run.run_id, city, "estimated", "updated", f"rows={rows} ranges={ranges_txt}")
+            run.est_counts[city] = weather_store.coverage_count(
+                weather_store.coverage_bitmap(conn, "daily_data_estimated", city, run.est_start, run.est_end)
+            )
+            run.est_updated_cities += 1
+        elif want_est:
+            insert_city_log(conn, run.run_id, city, "estimated", "complete", "already complete")
+
+        fc_res = results.get("forecast")
+        if isinstance(fc_res, BaseException):
+            errors.append(str(fc_res))
+            insert_city_log(conn, run.run_id, city, "forecast", "error", str(fc_res))
+        elif fc_res is not None:
+            payload, url, status_code, batch = fc_res
+            days = payload.get("days", []) or []
+            cur = payload.get("currentConditions", {}) or {}
+            for d in days:
+                upsert_weather_row(conn, "daily_data_forecast", city, d, "forecast")
+            insert_city_log(conn, run.run_id, city, "forecast", "updated", f"rows={len(days)}")
+            append_api_log(
+                args.api_log,
+                build_api_log_row(
+                    run, c, "forecast_bundle", status_code, url, days, run.fc_start, run.fc_end, cur=cur,
+                    batch=batch,
+                ),
+            )
+            run.fc_counts[city] = len(days)
+            run.fc_updated_cities += 1
+        elif want_fc:
+            insert_city_log(conn, run.run_id, city, "forecast", "complete", "already complete")
+
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        msg = str(e)
+        errors = [msg]
+        if want_est:
+            insert_city_log(conn, run.run_id, city, "estimated", "error", msg)
+        if want_fc:
+            insert_city_log(conn, run.run_id, city, "forecast", "error", msg)
+        conn.commit()
+
+    run.done += 1
+    if errors:
+        run.err += 1
+        run.report(c, city_action, error="; ".join(errors))
+    else:
+        run.ok += 1
+        # Cities pulled and stored; failed fetches are only counted in err.
+        run.fetched += 1
+        run.report(c, city_action)
+    if run.done % 25 == 0 or run.done == run.total:
+        t = run.throughput()
+        append_sync_log(
+            args.sync_log,
+            f"Progress {run.done}/{run.total} ok={run.ok} err={run.err} rate={t['cities_per_min']:.1f} cities/min",
+        )
+
+
+async def run_fetch_engine(run: BackfillRun, catalog: list[dict[str, Any]]) -> None:
+    """
+    Drive the catalog through a fixed pool of city workers.
+    In-flight HTTP requests are bounded by the run's AIMD controller (at most --concurrency)
+    and paced by the shared VC token bucket.
+    """
+    concurrency = max(1, run.args.concurrency)
+    run.expect_shared(catalog)
+    queue: asyncio.Queue = asyncio.Queue()
+    # Highest priority first; cities sharing a grid cell follow its first member so their
+    # shared payloads are released quickly.
+    ordered = run.prioritize(catalog)
+    for c in vc_provider.order_by_cell(ordered, lambda c: (c["lat"], c["lng"]), run.share.grid_deg):
+        queue.put_nowait(c)
+    gate = RateGate(run.args.rate_per_sec, run.args.burst)
+    in_flight = AdaptiveSlots(run.controller)
+    session = make_http_session(concurrency)
+
+    async def worker() -> None:
+        while True:
+            # A probe in flight decides within one request; wait for it rather than giving up the run.
+            while await asyncio.to_thread(run.breaker.probing):
+                await asyncio.sleep(0.25)
+            if not queue.empty() and await asyncio.to_thread(run.breaker.is_open):
+                # Leave the rest for a resumed run instead of failing each city against a known outage.
+                left = queue.qsize()
+                while not queue.empty():
+                    run.defer(queue.get_nowait(), "provider circuit open")
+                run.conn.commit()
+                append_sync_log(
+                    run.args.sync_log,
+                    f"VC {run.breaker.summary()}; deferring {left} cities (rerun to resume)",
+                )
+                return
+            # With --batch-size N a worker takes up to N admitted cities and pulls their windows
+            # as multi-location requests before storing each city.
+            group: list[dict[str, Any]] = []
+            while len(group) < run.batch.size:
+                try:
+                    c = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if run.admit(c):
+                    group.append(c)
+                    continue
+                # Past the deadline or over budget: left for the next run, like an outage deferral.
+                run.defer(c, "deadline or request budget reached")
+                run.conn.commit()
+            if not group:
+                if queue.empty():
+                    return
+                continue
+            if len(group) == 1:
+                await process_city(run, group[0], session, gate, in_flight)
+                continue
+            prefetched = await run.prefetch(group, session, gate, in_flight)
+            await asyncio.gather(*(process_city(run, c, session, gate, in_flight, prefetched) for c in group))
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        session.close()
+
+
 def main() -> int:
     ap = argparse.ArgumentParser(description="Resumable Visual Crossing backfill runner for catalog cities.")
     ap.add_argument("--db", default=DEFAULT_DB)
@@ -358,14 +925,90 @@ def main() -> int:
     ap.add_argument("--country", default="", help="Filter to one or more countries (comma-separated)")
     ap.add_argument("--resume", action="store_true", default=True)
     ap.add_argument("--no-resume", action="store_false", dest="resume")
+    ap.add_argument(
+        "--full-window",
+        action="store_false",
+        dest="incremental",
+        help="Re-fetch the whole estimated window for incomplete cities instead of only the missing dates",
+    )
+    ap.add_argument(
+        "--merge-gap-days",
+        type=int,
+        default=0,
+        help="Request gaps separated by at most this many stored days as one range",
+    )
+    ap.add_argument("--prune", action="store_true", help="Delete estimated rows that have rolled out of the window")
     ap.add_argument("--max-cities", type=int, default=0, help="Limit number of catalog cities for test runs")
-    ap.add_argument("--min-interval-sec", type=float, default=0.15, help="Minimum delay between VC requests")
+    ap.add_argument(
+        "--rate-per-sec",
+        type=float,
+        default=None,
+        help=(
+            "Cap this run's VC request rate, in memory for this process only; the shared rate in the "
+            "provider state DB still applies (change it with: python vc_provider.py configure)"
+        ),
+    )
+    ap.add_argument(
+        "--burst",
+        type=float,
+        default=None,
+        help="Cap this run's token bucket burst, in memory only (shared burst: python vc_provider.py configure)",
+    )
+    ap.add_argument(
+        "--min-interval-sec",
+        type=float,
+        default=0.0,
+        help=(
+            "Deprecated: same as --rate-per-sec 1/N (this run only). The shared default is already "
+            "the old 0.15 s pacing; an existing state DB keeps its stored rate (python vc_provider.py configure)"
+        ),
+    )
+    ap.add_argument("--concurrency", type=int, default=4, help="Maximum in-flight VC requests")
+    ap.add_argument(
+        "--initial-concurrency",
+        type=int,
+        default=0,
+        help="In-flight requests to start from before the AIMD controller probes upward (default: half of --concurrency)",
+    )
+    ap.add_argument("--no-adaptive", action="store_false", dest="adaptive", help="Keep concurrency fixed at --concurrency")
+    ap.add_argument(
+        "--latency-target-sec",
+        type=float,
+        default=8.0,
+        help="Response latency above which the controller stops probing and trims concurrency",
+    )
     ap.add_argument("--attempts", type=int, default=4)
+    ap.add_argument(
+        "--deadline-sec",
+        type=float,
+        default=0.0,
+        help="Stop starting new cities after this many seconds; the rest are deferred (0: no deadline)",
+    )
+    ap.add_argument(
+        "--request-budget",
+        type=int,
+        default=0,
+        help="Most VC requests to spend this run, highest-priority cities first (0: unlimited)",
+    )
+    ap.add_argument(
+        "--grid-deg",
+        type=float,
+        default=vc_provider.DEFAULT_GRID_DEG,
+        help="Cities within one cell of this lat/lon grid share a request per window (0: identical coordinates only)",
+    )
+    ap.add_argument(
+        "--batch-size",
+        type=int,
+        default=vc_provider.VC_BATCH_SIZE,
+        help="Locations per multi-location VC request; cities sharing a window are pulled together (1: one request per city)",
+    )
     ap.add_argument("--status-file", default=DEFAULT_STATUS_FILE, help="Live JSON status output path")
     ap.add_argument("--live", action="store_true", default=True, help="Print per-city live updates in terminal")
     ap.add_argument("--quiet-live", action="store_false", dest="live", help="Disable per-city live output")
     ap.add_argument("--dry-run", action="store_true")
     args = ap.parse_args()
+    if args.rate_per_sec is None and args.min_interval_sec > 0:
+        args.rate_per_sec = 1.0 / args.min_interval_sec
 
     key = read_vc_key(args.key_file)
     if not key:
@@ -398,7 +1041,6 @@ def main() -> int:
         return 3
 
     run_id = str(uuid.uuid4())
-    gate = RateGate(args.min_interval_sec)
     started = utcnow_iso()
     started_ts = time.time()
 
@@ -412,7 +1054,7 @@ def main() -> int:
             "running",
             len(catalog),
             (
-                f"script=run_catalog_backfill.py mode={args.mode} resume={args.resume} "
+                f"script=run_catalog_backfill.py mode={args.mode} resume={args.resume} concurrency={args.concurrency} "
                 f"continent={args.continent or '*'} country={args.country or '*'} "
                 f"window_est={est_start}..{est_end} window_fc={fc_start}..{fc_end}"
             ),
@@ -427,17 +1069,27 @@ def main() -> int:
         args.sync_log,
         f"Filters: continent={args.continent or '*'} country={args.country or '*'}",
     )
-    append_sync_log(args.sync_log, f"Mode={args.mode} Resume={args.resume} Cities={len(catalog)}")
+    append_sync_log(
+        args.sync_log,
+        f"Mode={args.mode} Resume={args.resume} Cities={len(catalog)} "
+        f"Concurrency={args.concurrency} Adaptive={args.adaptive}",
+    )
     append_sync_log(args.sync_log, f"Live status file: {args.status_file}")
 
     try:
-        est_counts = build_counts_map(conn, "daily_data_estimated", est_start, est_end)
+        if args.prune:
+            removed = weather_store.prune_before(conn, "daily_data_estimated", est_start)
+            conn.commit()
+            append_sync_log(args.sync_log, f"Pruned {removed} estimated rows before {est_start}")
+
+        est_bitmaps = weather_store.coverage_bitmap_map(conn, "daily_data_estimated", est_start, est_end)
+        est_counts = {city: weather_store.coverage_count(bits) for city, bits in est_bitmaps.items()}
         fc_counts = build_counts_map(conn, "daily_data_forecast", fc_start, fc_end)
 
         est_complete = 0
         fc_complete = 0
-        to_pull_est = 0
         to_pull_fc = 0
+        est_plan: dict[str, list[tuple[str, str]]] = {}
         for c in catalog:
             city = c["db_city"]
             e_ok = est_counts.get(city, 0) >= 365
@@ -446,17 +1098,32 @@ def main() -> int:
                 est_complete += 1
             if f_ok:
                 fc_complete += 1
-            if args.mode in {"both", "estimated"} and (not args.resume or not e_ok):
-                to_pull_est += 1
+            if args.mode in {"both", "estimated"}:
+                if not args.resume:
+                    est_plan[city] = [(est_start, est_end)]
+                elif args.incremental:
+                    ranges = weather_store.gap_ranges(
+                        est_bitmaps.get(city, 0), est_start, est_end, merge_gap_days=args.merge_gap_days
+                    )
+                    if ranges:
+                        est_plan[city] = ranges
+                elif not e_ok:
+                    est_plan[city] = [(est_start, est_end)]
             if args.mode in {"both", "forecast"} and (not args.resume or not f_ok):
                 to_pull_fc += 1
+        to_pull_est = len(est_plan)
+        est_plan_days = sum(
+            (date.fromisoformat(end) - date.fromisoformat(start)).days + 1
+            for ranges in est_plan.values()
+            for start, end in ranges
+        )
 
         append_sync_log(
             args.sync_log,
             "Before sync: "
             f"estimated complete={est_complete}, missing={len(catalog)-est_complete}; "
             f"forecast complete={fc_complete}, missing={len(catalog)-fc_complete}; "
-            f"to_pull_est={to_pull_est}, to_pull_fc={to_pull_fc}",
+            f"to_pull_est={to_pull_est} ({est_plan_days} days, incremental={args.incremental}), to_pull_fc={to_pull_fc}",
         )
         write_status_file(
             args.status_file,
@@ -476,6 +1143,7 @@ def main() -> int:
                 "est_complete_before": est_complete,
                 "fc_complete_before": fc_complete,
                 "to_pull_est": to_pull_est,
+                "to_pull_est_days": est_plan_days,
                 "to_pull_fc": to_pull_fc,
                 "current_city": None,
                 "last_message": "starting",
@@ -513,223 +1181,35 @@ def main() -> int:
             conn.commit()
             return 0
 
-        done = 0
-        ok = 0
-        err = 0
-        est_updated_cities = 0
-        fc_updated_cities = 0
-
-        for c in catalog:
-            city = c["db_city"]
-            label = f"{c['city']}, {c['country']}"
-            lat = c["lat"]
-            lon = c["lng"]
-            done += 1
-            city_action = []
-
-            e_ok = est_counts.get(city, 0) >= 365
-            f_ok = fc_counts.get(city, 0) >= 14
-            pull_est = args.mode in {"both", "estimated"} and (not args.resume or not e_ok)
-            pull_fc = args.mode in {"both", "forecast"} and (not args.resume or not f_ok)
-            if args.mode in {"both", "estimated"}:
-                city_action.append("est:fetch" if pull_est else "est:skip")
-            if args.mode in {"both", "forecast"}:
-                city_action.append("fc:fetch" if pull_fc else "fc:skip")
-
-            if not pull_est and not pull_fc:
-                if args.mode in {"both", "estimated"}:
-                    insert_city_log(conn, run_id, city, "estimated", "complete", "already complete")
-                if args.mode in {"both", "forecast"}:
-                    insert_city_log(conn, run_id, city, "forecast", "complete", "already complete")
-                conn.commit()
-                ok += 1
-                elapsed = time.time() - started_ts
-                rate = done / elapsed if elapsed > 0 else 0.0
-                rem = len(catalog) - done
-                eta = rem / rate if rate > 0 else 0
-                msg = (
-                    f"[{done}/{len(catalog)}] {city} ({', '.join(city_action)}) "
-                    f"ok={ok} err={err} elapsed={format_duration(elapsed)} eta={format_duration(eta)}"
-                )
-                if args.live:
-                    print(msg, flush=True)
-                write_status_file(
-                    args.status_file,
-                    {
-                        "run_id": run_id,
-                        "state": "running",
-                        "mode": args.mode,
-                        "done": done,
-                        "total_cities": len(catalog),
-                        "ok": ok,
-                        "err": err,
-                        "elapsed_sec": round(elapsed, 1),
-                        "eta_sec": round(eta, 1),
-                        "current_city": label,
-                        "db_city": city,
-                        "current_action": city_action,
-                        "last_message": msg,
-                        "updated_at": utcnow_iso(),
-                    },
-                )
-                if done % 50 == 0 or done == len(catalog):
-                    append_sync_log(args.sync_log, f"Progress {done}/{len(catalog)} ok={ok} err={err} (skip)")
-                continue
-
-            try:
-                conn.execute("INSERT OR IGNORE INTO city_coords(city, lat, lon) VALUES(?,?,?)", (city, lat, lon))
-
-                if pull_est:
-                    payload, url, status_code = fetch_vc(
-                        key, lat, lon, est_start, est_end, include_current=False, gate=gate, attempts=args.attempts
-                    )
-                    days = payload.get("days", []) or []
-                    for d in days:
-                        upsert_weather_row(conn, "daily_data_estimated", city, d, "estimated")
-                        upsert_weather_row(conn, "daily_data", city, d, "estimated")
-                    insert_city_log(conn, run_id, city, "estimated", "updated", f"rows={len(days)}")
-                    append_api_log(
-                        args.api_log,
-                        {
-                            "city": city,
-                            "catalog_city": c["city"],
-                            "catalog_country": c["country"],
-                            "kind": "estimated_window",
-                            "provider": "visualcrossing",
-                            "status_code": status_code,
-                            "ok": True,
-                            "url": url.replace(key, "***"),
-                            "lat": lat,
-                            "lon": lon,
-                            "records": len(days),
-                            "start_date": est_start,
-                            "end_date": est_end,
-                            "sample_tmax_c": (days[0].get("tempmax") if days else None),
-                            "sample_tmin_c": (days[0].get("tempmin") if days else None),
-                            "sample_precip_mm": (days[0].get("precip") if days else None),
-                            "sample_precip_prob_pct": (days[0].get("precipprob") if days else None),
-                            "sample_solarradiation_wm2": (days[0].get("solarradiation") if days else None),
-                            "ts": utcnow_iso(),
-                        },
-                    )
-                    est_counts[city] = len(days)
-                    est_updated_cities += 1
-                elif args.mode in {"both", "estimated"}:
-                    insert_city_log(conn, run_id, city, "estimated", "complete", "already complete")
-
-                if pull_fc:
-                    payload, url, status_code = fetch_vc(
-                        key, lat, lon, fc_start, fc_end, include_current=True, gate=gate, attempts=args.attempts
-                    )
-                    days = payload.get("days", []) or []
-                    cur = payload.get("currentConditions", {}) or {}
-                    for d in days:
-                        upsert_weather_row(conn, "daily_data_forecast", city, d, "forecast")
-                        upsert_weather_row(conn, "daily_data", city, d, "forecast")
-                    insert_city_log(conn, run_id, city, "forecast", "updated", f"rows={len(days)}")
-                    append_api_log(
-                        args.api_log,
-                        {
-                            "city": city,
-                            "catalog_city": c["city"],
-                            "catalog_country": c["country"],
-                            "kind": "forecast_bundle",
-                            "provider": "visualcrossing",
-                            "status_code": status_code,
-                            "ok": True,
-                            "url": url.replace(key, "***"),
-                            "lat": lat,
-                            "lon": lon,
-                            "records": len(days),
-                            "start_date": fc_start,
-                            "end_date": fc_end,
-                            "current_temp_c": cur.get("temp"),
-                            "sample_tmax_c": (days[0].get("tempmax") if days else None),
-                            "sample_tmin_c": (days[0].get("tempmin") if days else None),
-                            "sample_precip_mm": (days[0].get("precip") if days else None),
-                            "sample_precip_prob_pct": (days[0].get("precipprob") if days else None),
-                            "sample_solarradiation_wm2": (days[0].get("solarradiation") if days else None),
-                            "ts": utcnow_iso(),
-                        },
-                    )
-                    fc_counts[city] = len(days)
-                    fc_updated_cities += 1
-                elif args.mode in {"both", "forecast"}:
-                    insert_city_log(conn, run_id, city, "forecast", "complete", "already complete")
-
-                conn.commit()
-                ok += 1
-                elapsed = time.time() - started_ts
-                rate = done / elapsed if elapsed > 0 else 0.0
-                rem = len(catalog) - done
-                eta = rem / rate if rate > 0 else 0
-                msg = (
-                    f"[{done}/{len(catalog)}] {city} ({', '.join(city_action)}) "
-                    f"ok={ok} err={err} elapsed={format_duration(elapsed)} eta={format_duration(eta)}"
-                )
-                if args.live:
-                    print(msg, flush=True)
-                write_status_file(
-                    args.status_file,
-                    {
-                        "run_id": run_id,
-                        "state": "running",
-                        "mode": args.mode,
-                        "done": done,
-                        "total_cities": len(catalog),
-                        "ok": ok,
-                        "err": err,
-                        "elapsed_sec": round(elapsed, 1),
-                        "eta_sec": round(eta, 1),
-                        "current_city": label,
-                        "db_city": city,
-                        "current_action": city_action,
-                        "last_message": msg,
-                        "updated_at": utcnow_iso(),
-                    },
-                )
-            except Exception as e:
-                conn.rollback()
-                msg = str(e)
-                if args.mode in {"both", "estimated"}:
-                    insert_city_log(conn, run_id, city, "estimated", "error", msg)
-                if args.mode in {"both", "forecast"}:
-                    insert_city_log(conn, run_id, city, "forecast", "error", msg)
-                conn.commit()
-                err += 1
-                elapsed = time.time() - started_ts
-                rate = done / elapsed if elapsed > 0 else 0.0
-                rem = len(catalog) - done
-                eta = rem / rate if rate > 0 else 0
-                line = (
-                    f"[{done}/{len(catalog)}] {city} ({', '.join(city_action)}) ERROR: {msg} "
-                    f"ok={ok} err={err} elapsed={format_duration(elapsed)} eta={format_duration(eta)}"
-                )
-                if args.live:
-                    print(line, flush=True)
-                write_status_file(
-                    args.status_file,
-                    {
-                        "run_id": run_id,
-                        "state": "running",
-                        "mode": args.mode,
-                        "done": done,
-                        "total_cities": len(catalog),
-                        "ok": ok,
-                        "err": err,
-                        "elapsed_sec": round(elapsed, 1),
-                        "eta_sec": round(eta, 1),
-                        "current_city": label,
-                        "db_city": city,
-                        "current_action": city_action,
-                        "last_message": line,
-                        "last_error": msg,
-                        "updated_at": utcnow_iso(),
-                    },
-                )
+        # Full-window imports skip per-row aggregate maintenance and are rebuilt once after the run.
+        bulk_cities = [city for city, ranges in est_plan.items() if ranges == [(est_start, est_end)]]
+        weather_store.mark_monthly_agg_dirty(conn, bulk_cities)
+        conn.commit()
 
-            if done % 25 == 0 or done == len(catalog):
-                append_sync_log(args.sync_log, f"Progress {done}/{len(catalog)} ok={ok} err={err}")
+        run = BackfillRun(
+            args=args,
+            conn=conn,
+            run_id=run_id,
+            key=key,
+            total=len(catalog),
+            est_window=(est_start, est_end),
+            fc_window=(fc_start, fc_end),
+            est_counts=est_counts,
+            fc_counts=fc_counts,
+            est_plan=est_plan,
+            started_ts=started_ts,
+        )
+        asyncio.run(run_fetch_engine(run, catalog))
+        err = run.err
+        ok = run.ok
+        est_updated_cities = run.est_updated_cities
+        fc_updated_cities = run.fc_updated_cities
+        throughput = run.throughput()
+        limiter = vc_provider.TokenBucket().stats()
+        vc_state = run.controller.snapshot()
+        share_stats = run.share.stats()
+        agg_counts = weather_store.refresh_monthly_agg_all(conn, est_start, est_end, cities=bulk_cities)
+        conn.commit()
 
         est_complete_after = 0
         fc_complete_after = 0
@@ -744,25 +1224,47 @@ def main() -> int:
             args.sync_log,
             "After sync: "
             f"estimated complete={est_complete_after}, missing={len(catalog)-est_complete_after}; "
-            f"forecast complete={fc_complete_after}, missing={len(catalog)-fc_complete_after}",
+            f"forecast complete={fc_complete_after}, missing={len(catalog)-fc_complete_after}; "
+            f"elapsed={format_duration(throughput['elapsed'])} rate={throughput['cities_per_min']:.1f} cities/min; "
+            f"limiter rate={limiter['rate_per_sec']:.2f}/s tokens={limiter['tokens']:.2f} "
+            f"avg_wait={limiter['avg_wait_sec']:.2f}s max_wait={limiter['max_wait_sec']:.2f}s; "
+            f"controller workers={vc_state['workers']}/{vc_state['max_workers']} "
+            f"interval={vc_state['interval_sec']:.2f}s adjustments={vc_state['adjustments']} "
+            f"throttled={vc_state['throttled']}; "
+            f"{run.share.summary()}; "
+            f"{run.breaker.summary()}; deferred={run.deferred}; "
+            f"priority {run.scheduler.summary()}; "
+            f"{run.batch.summary()}; "
+            f"monthly aggregates rebuilt={agg_counts['rebuilt']}",
         )
         write_status_file(
             args.status_file,
             {
                 "run_id": run_id,
-                "state": "done" if err == 0 else "partial",
+                "state": "done" if err == 0 and run.deferred == 0 else "partial",
                 "finished_at": utcnow_iso(),
                 "mode": args.mode,
-                "done": len(catalog),
+                "done": run.done,
                 "total_cities": len(catalog),
                 "ok": ok,
                 "err": err,
+                "deferred": run.deferred,
                 "historical_complete": est_complete_after,
                 "historical_missing": len(catalog) - est_complete_after,
                 "forecast_complete": fc_complete_after,
                 "forecast_missing": len(catalog) - fc_complete_after,
                 "historical_updated": est_updated_cities,
                 "forecast_updated": fc_updated_cities,
+                "elapsed_sec": round(throughput["elapsed"], 1),
+                "cities_per_min": round(throughput["cities_per_min"], 2),
+                "fetched_cities_per_min": round(throughput["fetched_cities_per_min"], 2),
+                "concurrency": args.concurrency,
+                "rate_limit": limiter,
+                "controller": vc_state,
+                "grid_share": share_stats,
+                "provider_health": run.breaker.status(),
+                "priority": run.scheduler.stats(),
+                "batching": run.batch.stats(),
                 "updated_at": utcnow_iso(),
             },
         )
@@ -778,12 +1280,13 @@ def main() -> int:
                 forecast_stale=?,
                 historical_updated=?,
                 forecast_updated=?,
-                errors=?
+                errors=?,
+                notes=COALESCE(notes, '') || ?
             WHERE run_id=?
             """,
             (
                 utcnow_iso(),
-                "ok" if err == 0 else "partial",
+                "ok" if err == 0 and run.deferred == 0 else "partial",
                 est_complete_after,
                 len(catalog) - est_complete_after,
                 fc_complete_after,
@@ -791,11 +1294,12 @@ def main() -> int:
                 est_updated_cities,
                 fc_updated_cities,
                 err,
+                f" deferred={run.deferred} priority=[{run.scheduler.summary()}] batch=[{run.batch.summary()}]",
                 run_id,
             ),
         )
         conn.commit()
-        return 0 if err == 0 else 1
+        return 0 if err == 0 and run.deferred == 0 else 1
     finally:
         conn.close()
         if lock_fd >= 0:
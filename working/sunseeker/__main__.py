@@ -0,0 +1,27 @@
+"""
+python -m sunseeker            # the window
+python -m sunseeker sync ...   # headless sync daemon; never imports PyQt6 (see weather_sync.py)
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main() -> int:
+    if sys.argv[1:2] == ["sync"]:
+        t0 = time.perf_counter()
+        import weather_sync
+
+        weather_sync.append_sync_log(f"Daemon: imported the sync pipeline in {(time.perf_counter() - t0) * 1000:.0f} ms")
+        return weather_sync.main(sys.argv[2:])
+
+    from sunseeker import sunseeker as app
+
+    app.main()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,52 +1,54 @@
 import sys
 import os
-import sqlite3
 import requests
+import numpy as np
 import pandas as pd
-import pickle
 import time
-import uuid
-from typing import Dict, Any
-from datetime import datetime, timezone, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import csv
+from datetime import datetime, timezone
 import traceback
 import threading
-import json
-import fcntl
+from abc import ABCMeta, abstractmethod
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fetch_scheduler
+import geo_boundaries
+import geocoder
+import niceness
+import vc_provider
+from city_search import TIER_CATALOG, TIER_COMMAND, TIER_ZIP, CitySearchIndex
+from climate_cube import METRIC_INDEX, ItineraryIndex
+import weather_store
+import weather_sync
+from weather_sync import (
+    CITY_COORDS, DATABASE, MONTHLY_COLUMNS, RUN_LOCK_FILE, SUNNY_CODES, SyncProgress, VC_BREAKER, VC_CONTROLLER,
+    VC_RATE_LIMITER, WEATHER_PROVIDER, _fetch_visualcrossing_forecast_bundle, acquire_run_lock,
+    CURRENT_TTL_SEC, append_sync_log, build_target_city_map, c_to_f, cache_entry_time, compute_daytime_avg_temp,
+    compute_niceness, current_row_from_forecast, estimated_ranges_to_fetch, fetch_estimated_ranges,
+    fetch_forecast_bundle, forecast_cache_entry, forecast_until, forecast_window_key,
+    get_city_coords, get_db_conn, have_data_for_city, init_db, is_forecast_fresh, load_all_cities_ui_cache,
+    load_data_from_db, load_forecast_cache, month_name, monthly_aggregates, monthly_aggregates_from_db,
+    monthly_cube_from_sums, process_forecast_daily_data, run_daily_sync, save_all_cities_ui_cache,
+    save_forecast_cache, store_data
+)
 
 from PyQt6.QtWidgets import (
-    QApplication, QWidget, QTabWidget, QVBoxLayout, QTableWidget, QTableWidgetItem,
+    QApplication, QWidget, QTabWidget, QVBoxLayout, QTableWidget, QTableWidgetItem, QTableView,
     QHeaderView, QAbstractItemView, QLabel, QDialog, QProgressBar, QPushButton, QLineEdit, QHBoxLayout,
     QMessageBox, QCompleter, QScrollArea, QGroupBox, QAbstractScrollArea, QFormLayout, QSpinBox, QDoubleSpinBox
 )
-from PyQt6.QtCore import Qt, pyqtSlot, QCoreApplication
+from PyQt6.QtCore import (
+    Qt, pyqtSlot, pyqtSignal, QCoreApplication, QAbstractTableModel, QAbstractListModel, QModelIndex,
+    QObject, QThread, QTimer
+)
 from PyQt6.QtGui import QPalette, QColor, QBrush, QCursor, QFont
 
-DATABASE = "weather_data_v2.db"
-CACHE_FILE = "forecast_cache.pkl"
-CACHE_MAX_AGE = timedelta(hours=1)
-ALL_CITIES_UI_CACHE_FILE = "all_cities_ui_cache.pkl"
-ALL_CITIES_UI_CACHE_MAX_AGE = timedelta(hours=24)
-ALLCOUNTRIES_FILE = "allcountries.txt"
-SYNC_LOG_FILE = "sync_runs.log"
-API_CALL_LOG_FILE = "sync_api_calls.ndjson"
-RUN_LOCK_FILE = "weather_data_v2.sync.lock"
-VISUAL_CROSSING_KEY = os.environ.get("VISUAL_CROSSING_API_KEY", "").strip()
-WEATHER_PROVIDER = "visualcrossing"
-VC_STATE_LOCK = threading.Lock()
-VC_DISABLED_UNTIL = None
-VC_NEXT_ALLOWED_AT = None
-VC_MIN_INTERVAL_SEC = float(os.environ.get("VC_MIN_INTERVAL_SEC", "0.75"))
-VC_MAX_WORKERS = int(os.environ.get("VC_MAX_WORKERS", "1"))
-ESTIMATED_WINDOW_DAYS = int(os.environ.get("ESTIMATED_WINDOW_DAYS", "365"))
-WEATHER_COLUMNS = [
-    "city", "date", "tmax_c", "tmin_c", "tavg_c", "feelslike_max_c", "feelslike_min_c", "feelslike_c", "dewpoint_c",
-    "humidity_pct", "cloudcover_pct", "visibility_km", "precip_mm", "precip_prob_pct", "precip_cover_pct", "precip_type",
-    "snow_mm", "snowdepth_mm", "windspeed_kph", "windgust_kph", "winddir_deg", "pressure_mb", "solarradiation_wm2",
-    "solarenergy_mj_m2", "uvindex", "moonphase", "conditions_text", "icon", "description_text", "source_provider",
-    "stations_text", "severerisk", "weathercode", "sunrise", "sunset", "data_source", "updated_at",
-]
+ITINERARY_SIZE = int(os.environ.get("ITINERARY_SIZE", "10"))
+# Run the sync behind the modal LoadingDialog before the window opens (the pre-cache startup).
+FOREGROUND_SYNC = os.environ.get("SUNSEEKER_FOREGROUND_SYNC", "0") == "1"
+# Streamed sync results larger than this are applied with a full table reload instead of row upserts.
+SYNC_BULK_REFRESH_ROWS = 200
+# On quit, wait at most this long for the background sync to wind down before exiting anyway.
+SYNC_STOP_TIMEOUT_MS = int(os.environ.get("SUNSEEKER_SYNC_STOP_TIMEOUT_MS", "5000"))
 
 CITY_COUNTRY = {
     "Honolulu": "Honolulu, USA",
@@ -82,1073 +84,83 @@ CITY_COUNTRY = {
     "Palm Springs": "Palm Springs, USA"
 }
 
-CITY_COORDS = {
-    "Honolulu":        (21.3069, -157.8583),
-    "Todos Santos":    (23.4469, -110.2231),
-    "Tenerife":        (28.2916, -16.6291),
-    "Los Angeles":     (34.0522, -118.2437),
-    "Medellin":        (6.2442, -75.5812),
-    "Mexico City":     (19.4326, -99.1332),
-    "Rio de Janeiro":  (-22.9068, -43.1729),
-    "Fortaleza":       (-3.7319, -38.5267),
-    "Abu Dhabi":       (24.4539, 54.3773),
-    "Las Vegas":       (36.1699, -115.1398),
-    "Tucson":          (32.2226, -110.9747),
-    "Buenos Aires":    (-34.6037, -58.3816),
-    "Sydney":          (-33.8688, 151.2093),
-    "Sao Paolo":       (-23.5505, -46.6333),
-    "Berlin":          (52.5200, 13.4050),
-    "Copenhagen":      (55.6761, 12.5683),
-    "Santa Fe":        (35.6870, -105.9378),
-    "Amsterdam":       (52.3676, 4.9041),
-    "New York":        (40.7128, -74.0060),
-    "London":          (51.5074, -0.1278),
-    "Tokyo":           (35.6762, 139.6503),
-    "Barcelona":       (41.3851, 2.1734),
-    "Athens":          (37.9838, 23.7275),
-    "Valencia":        (39.4699, -0.3763),
-    "Shanghai":        (31.2304, 121.4737),
-    "Austin":          (30.2672, -97.7431),
-    "Milos":           (36.7260, 24.4443),
-    "Santiago":        (-33.4489, -70.6693),
-    "Lisbon":          (38.7223, -9.1393),
-    "El Paso":         (31.7619, -106.4850),
-    "Palm Springs":    (33.8303, -116.5453)
-}
 
-ALL_CITIES = {}
-if os.path.exists("allcountries.txt"):
-    import csv
-    with open("allcountries.txt", "r", encoding="utf-8") as f:
-        reader = csv.reader(f, delimiter='\t')
-        for row in reader:
-            if len(row) < 11:
-                continue
-            country_code = row[0].strip()
-            place_name = row[2].strip()
-            if not place_name:
-                continue
-            lat_str = row[9].strip() if len(row) > 9 else ""
-            lon_str = row[10].strip() if len(row) > 10 else ""
-            if not lat_str or not lon_str:
-                continue
-            try:
-                lat = float(lat_str)
-                lon = float(lon_str)
-            except ValueError:
-                continue
-            key = f"{place_name}, {country_code}"
-            if key not in CITY_COORDS:
-                ALL_CITIES[key] = (lat, lon)
+ALL_CITIES = weather_sync.GEONAMES
 
-def get_estimated_window_dates():
-    """
-    Rolling one-year expected-data window starting today (UTC), inclusive.
-    Default is 365 days including today.
-    """
-    start_dt = datetime.now(timezone.utc).date()
-    span = max(1, ESTIMATED_WINDOW_DAYS)
-    end_dt = start_dt + timedelta(days=span - 1)
-    return start_dt.isoformat(), end_dt.isoformat()
-
-START_DATE, END_DATE = get_estimated_window_dates()
-SUNNY_CODES = [0,1,2]
-
-ZIP_CITIES = {}
-if os.path.exists("ziplist.txt"):
-    with open("ziplist.txt", "r", encoding="utf-8") as f:
-        next(f)  # Skip header if present
-        for line in f:
-            try:
-                city, country, continent, zipcode = line.strip().split(',')
-                key = f"{city}, {country}"
-                ZIP_CITIES[key] = None
-            except ValueError:
-                continue
+ZIP_ENTRIES = geocoder.load_ziplist("ziplist.txt") if os.path.exists("ziplist.txt") else {}
+# "City, Country" -> (lat, lon) once resolved, else None.
+ZIP_CITIES = dict.fromkeys(ZIP_ENTRIES)
+GEOCODER = geocoder.Geocoder(weather_sync.GEONAMES, weather_sync.GEONAMES_POSTAL, ZIP_ENTRIES)
 
-def c_to_f(c):
-    return (c * 9/5) + 32
 
-def append_sync_log(message: str):
-    ts = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
-    line = f"[{ts}] {message}"
-    print(line)
-    try:
-        with open(SYNC_LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(line + "\n")
-    except Exception:
-        pass
-
-def _scrub_api_key(text: str) -> str:
-    if not text:
-        return text
-    if VISUAL_CROSSING_KEY:
-        return text.replace(VISUAL_CROSSING_KEY, "***")
-    return text
-
-def append_api_call_log(payload: dict):
-    entry = dict(payload or {})
-    entry["ts"] = datetime.now(timezone.utc).isoformat()
-    for k in ("url", "error"):
-        if k in entry and isinstance(entry[k], str):
-            entry[k] = _scrub_api_key(entry[k])
+def resolve_zip_cities(allow_network=False):
+    """Resolve every ZIP_CITIES entry still without coordinates in one batch (persisted to city_coords)."""
+    pending = [c for c, coords in ZIP_CITIES.items() if coords is None]
+    if not pending:
+        return 0
+    conn = get_db_conn(DATABASE)
     try:
-        with open(API_CALL_LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
-    except Exception:
-        pass
-
-def _column_exists(conn, table_name: str, column_name: str) -> bool:
-    c = conn.cursor()
-    c.execute(f"PRAGMA table_info({table_name})")
-    return any(row[1] == column_name for row in c.fetchall())
-
-def _ensure_column(conn, table_name: str, column_name: str, col_type: str):
-    if not _column_exists(conn, table_name, column_name):
-        c = conn.cursor()
-        c.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {col_type}")
-
-def _source_priority(source: str) -> int:
-    # Forecast supersedes estimated.
-    return 2 if source == "forecast" else 1
-
-def _create_weather_table(conn, table_name: str):
-    c = conn.cursor()
-    c.execute(
-        f"""
-        CREATE TABLE IF NOT EXISTS {table_name} (
-            city TEXT,
-            date TEXT,
-            tmax_c REAL,
-            tmin_c REAL,
-            weathercode INT,
-            sunrise TEXT,
-            sunset TEXT,
-            PRIMARY KEY (city, date)
-        )
-        """
-    )
-    _ensure_column(conn, table_name, "data_source", "TEXT DEFAULT 'estimated'")
-    _ensure_column(conn, table_name, "updated_at", "TEXT")
-    _ensure_column(conn, table_name, "tavg_c", "REAL")
-    _ensure_column(conn, table_name, "feelslike_max_c", "REAL")
-    _ensure_column(conn, table_name, "feelslike_min_c", "REAL")
-    _ensure_column(conn, table_name, "feelslike_c", "REAL")
-    _ensure_column(conn, table_name, "dewpoint_c", "REAL")
-    _ensure_column(conn, table_name, "humidity_pct", "REAL")
-    _ensure_column(conn, table_name, "cloudcover_pct", "REAL")
-    _ensure_column(conn, table_name, "visibility_km", "REAL")
-    _ensure_column(conn, table_name, "precip_mm", "REAL")
-    _ensure_column(conn, table_name, "precip_prob_pct", "REAL")
-    _ensure_column(conn, table_name, "precip_cover_pct", "REAL")
-    _ensure_column(conn, table_name, "precip_type", "TEXT")
-    _ensure_column(conn, table_name, "snow_mm", "REAL")
-    _ensure_column(conn, table_name, "snowdepth_mm", "REAL")
-    _ensure_column(conn, table_name, "windspeed_kph", "REAL")
-    _ensure_column(conn, table_name, "windgust_kph", "REAL")
-    _ensure_column(conn, table_name, "winddir_deg", "REAL")
-    _ensure_column(conn, table_name, "pressure_mb", "REAL")
-    _ensure_column(conn, table_name, "solarradiation_wm2", "REAL")
-    _ensure_column(conn, table_name, "solarenergy_mj_m2", "REAL")
-    _ensure_column(conn, table_name, "uvindex", "REAL")
-    _ensure_column(conn, table_name, "moonphase", "REAL")
-    _ensure_column(conn, table_name, "conditions_text", "TEXT")
-    _ensure_column(conn, table_name, "icon", "TEXT")
-    _ensure_column(conn, table_name, "description_text", "TEXT")
-    _ensure_column(conn, table_name, "source_provider", "TEXT")
-    _ensure_column(conn, table_name, "stations_text", "TEXT")
-    _ensure_column(conn, table_name, "severerisk", "REAL")
-
-def _upsert_weather_row(conn, table_name: str, values: dict):
-    cols = ", ".join(WEATHER_COLUMNS)
-    placeholders = ", ".join(["?"] * len(WEATHER_COLUMNS))
-    conn.execute(
-        f"INSERT OR REPLACE INTO {table_name} ({cols}) VALUES ({placeholders})",
-        tuple(values.get(k) for k in WEATHER_COLUMNS),
-    )
+        resolved = GEOCODER.resolve_many(conn, pending, allow_network=allow_network)
+    finally:
+        conn.close()
+    ZIP_CITIES.update((c, coords) for c, coords in resolved.items() if coords is not None)
+    return sum(coords is not None for coords in resolved.values())
 
-def _vc_gate():
+def load_startup_snapshot(conn, city_names, forecast_cache):
     """
-    Global Visual Crossing pacing gate.
-    Ensures we don't exceed plan concurrency/rate and burst into 429s.
+    What the window can show before any sync work: the last UI cache whatever its age, else
+    the stored monthly aggregates plus rows from the cached forecasts. None on an empty DB.
     """
-    global VC_NEXT_ALLOWED_AT
-    with VC_STATE_LOCK:
-        now = datetime.now(timezone.utc)
-        if VC_NEXT_ALLOWED_AT and now < VC_NEXT_ALLOWED_AT:
-            wait = (VC_NEXT_ALLOWED_AT - now).total_seconds()
-            if wait > 0:
-                time.sleep(wait)
-        VC_NEXT_ALLOWED_AT = datetime.now(timezone.utc) + timedelta(seconds=max(0.0, VC_MIN_INTERVAL_SEC))
-
-def get_db_conn(path: str = DATABASE) -> sqlite3.Connection:
-    conn = sqlite3.connect(path, timeout=60)
-    conn.execute("PRAGMA busy_timeout=60000")
-    conn.execute("PRAGMA journal_mode=WAL")
-    conn.execute("PRAGMA synchronous=NORMAL")
-    return conn
-
-def acquire_run_lock(lock_path: str):
-    fh = open(lock_path, "w", encoding="utf-8")
-    try:
-        fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
-        fh.write(f"{os.getpid()}\n")
-        fh.flush()
-        return fh
-    except Exception:
-        try:
-            fh.close()
-        except Exception:
-            pass
+    payload = load_all_cities_ui_cache(max_age=None)
+    if payload is not None:
+        payload["source"] = "ui cache"
+        return payload
+    climate = monthly_cube_from_sums(weather_store.monthly_agg_map(conn), city_names)
+    if not len(climate):
         return None
+    current_data_list = [
+        current_row_from_forecast(city, climate, forecast_cache[city].get('fore_json', {}), forecast_cache[city].get('cur_json', {}))
+        for city in city_names
+        if city in forecast_cache
+    ]
+    return {"saved_at": None, "current_data_list": current_data_list, "climate": climate, "source": "db aggregates"}
+
+def print_zip_cities_report(climate, current_data_list, failed):
+    # Initialize a dictionary to track fetch status of each city
+    city_fetch_status = {}
 
-def init_db():
-    """Initialize all database tables"""
-    conn = get_db_conn(DATABASE)
-    c = conn.cursor()
-    # Weather tables:
-    # - daily_data_estimated: full 1-year expected baseline
-    # - daily_data_forecast: short-horizon forecast snapshots by city/date
-    # - daily_data: materialized "best available" (forecast overrides estimated) for legacy read paths
-    _create_weather_table(conn, "daily_data")
-    _create_weather_table(conn, "daily_data_estimated")
-    _create_weather_table(conn, "daily_data_forecast")
-
-    # One-time migration from legacy daily_data into split tables.
-    est_count = c.execute("SELECT COUNT(*) FROM daily_data_estimated").fetchone()[0]
-    fc_count = c.execute("SELECT COUNT(*) FROM daily_data_forecast").fetchone()[0]
-    legacy_count = c.execute("SELECT COUNT(*) FROM daily_data").fetchone()[0]
-    if legacy_count > 0 and est_count == 0 and fc_count == 0:
-        cols = ", ".join(WEATHER_COLUMNS)
-        c.execute(
-            f"INSERT OR IGNORE INTO daily_data_estimated ({cols}) "
-            f"SELECT {cols} FROM daily_data WHERE COALESCE(data_source, 'estimated') <> 'forecast'"
-        )
-        c.execute(
-            f"INSERT OR IGNORE INTO daily_data_forecast ({cols}) "
-            f"SELECT {cols} FROM daily_data WHERE data_source='forecast'"
-        )
-    
-    # City coordinates table
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS city_coords (
-            city TEXT PRIMARY KEY,
-            lat REAL,
-            lon REAL
-        )
-    """)
-
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS sync_meta (
-            key TEXT PRIMARY KEY,
-            value TEXT
-        )
-    """)
-
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS sync_runs (
-            run_id TEXT PRIMARY KEY,
-            started_at TEXT,
-            finished_at TEXT,
-            status TEXT,
-            total_cities INTEGER,
-            historical_complete INTEGER,
-            historical_missing INTEGER,
-            forecast_fresh INTEGER,
-            forecast_stale INTEGER,
-            historical_updated INTEGER,
-            forecast_updated INTEGER,
-            errors INTEGER,
-            notes TEXT
-        )
-    """)
-
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS sync_city_log (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            run_id TEXT,
-            city TEXT,
-            stage TEXT,
-            status TEXT,
-            message TEXT,
-            ts TEXT
-        )
-    """)
-
-    
-    conn.commit()
-    
-    # Populate city_coords from allcountries.txt if needed
-    if os.path.exists(ALLCOUNTRIES_FILE):
-        c.execute("SELECT COUNT(*) FROM city_coords")
-        if c.fetchone()[0] == 0:  # Only populate if empty
-            with open(ALLCOUNTRIES_FILE, "r", encoding="utf-8") as f:
-                reader = csv.reader(f, delimiter='\t')
-                for row in reader:
-                    if len(row) < 11:
-                        continue
-                    country_code = row[0].strip()
-                    place_name = row[2].strip()
-                    if not place_name:
-                        continue
-                    lat_str = row[9].strip()
-                    lon_str = row[10].strip()
-                    if not lat_str or not lon_str:
-                        continue
-                    try:
-                        lat = float(lat_str)
-                        lon = float(lon_str)
-                    except ValueError:
-                        continue
-
-                    city_key = f"{place_name}, {country_code}"
-                    c.execute("""
-                        INSERT OR IGNORE INTO city_coords (city, lat, lon)
-                        VALUES (?, ?, ?)
-                    """, (city_key, lat, lon))
-            conn.commit()
-    
-    conn.close()
-
-def get_sync_meta(conn, key: str, default: str = "") -> str:
-    c = conn.cursor()
-    c.execute("SELECT value FROM sync_meta WHERE key=?", (key,))
-    row = c.fetchone()
-    return row[0] if row else default
-
-def set_sync_meta(conn, key: str, value: str):
-    c = conn.cursor()
-    c.execute(
-        "INSERT INTO sync_meta (key, value) VALUES (?, ?) "
-        "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
-        (key, value),
-    )
-    conn.commit()
-
-def insert_sync_city_log(conn, run_id: str, city: str, stage: str, status: str, message: str):
-    c = conn.cursor()
-    c.execute(
-        "INSERT INTO sync_city_log (run_id, city, stage, status, message, ts) VALUES (?, ?, ?, ?, ?, ?)",
-        (run_id, city, stage, status, message, datetime.now(timezone.utc).isoformat()),
-    )
+    # ADDED: Check how many ZIP_CITIES ended up in climate/current_data_list:
+    zip_cities_set = set(ZIP_CITIES.keys())
+    loaded_cities = set(climate.cities())  # cities that have monthly data
+    displayed_cities = set(city["city"] for city in current_data_list)  # cities in current data
 
-def get_city_coords(city_name):
-    """Get coordinates for a city from the database"""
-    conn = get_db_conn(DATABASE)
-    c = conn.cursor()
-    c.execute("SELECT lat, lon FROM city_coords WHERE city = ?", (city_name,))
-    row = c.fetchone()
-    conn.close()
-    if row:
-        return row[0], row[1]
-    return None
-
-def have_data_for_city(conn, city):
-    c = conn.cursor()
-    c.execute("SELECT COUNT(*) FROM daily_data_estimated WHERE city=? AND date>=? AND date<=?", (city, START_DATE, END_DATE))
-    count = c.fetchone()[0]
-    total_days = (datetime.strptime(END_DATE, "%Y-%m-%d") - datetime.strptime(START_DATE, "%Y-%m-%d")).days + 1
-    return count == total_days
-
-
-def fetch_historical(lat: float, lon: float, start_date: str, end_date: str) -> Dict[str, Any]:
-    url = "https://archive-api.open-meteo.com/v1/era5"
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "start_date": start_date,
-        "end_date": end_date,
-        "daily": "temperature_2m_max,temperature_2m_min,weathercode,sunrise,sunset",
-        "timezone": "UTC"
-    }
-    
-    max_retries = 5
-    base_delay = 1  # Start with 1 second delay
-    
-    for attempt in range(max_retries):
-        try:
-            r = requests.get(url, params=params)
-            r.raise_for_status()
-            return r.json()
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 429:  # Too Many Requests
-                if attempt < max_retries - 1:  # Don't sleep on the last attempt
-                    delay = base_delay * (2 ** attempt)  # Exponential backoff
-                    time.sleep(delay)
-                    continue
-            raise  # Re-raise the exception if it's not a 429 or we're out of retries
-
-def _visualcrossing_weathercode(icon: str, conditions: str, precip_prob: float) -> int:
-    icon_l = (icon or "").lower()
-    cond_l = (conditions or "").lower()
-    if "clear" in icon_l or "sunny" in cond_l:
-        return 0
-    if "partly" in icon_l:
-        return 1
-    if "cloud" in icon_l:
-        return 3
-    if any(x in icon_l or x in cond_l for x in ["rain", "drizzle", "shower"]):
-        return 61
-    if any(x in icon_l or x in cond_l for x in ["snow", "sleet", "ice"]):
-        return 71
-    if any(x in icon_l or x in cond_l for x in ["thunder", "storm"]):
-        return 95
-    if "fog" in icon_l or "fog" in cond_l:
-        return 45
-    if precip_prob is not None and precip_prob >= 50:
-        return 61
-    return 3
-
-def fetch_visualcrossing_estimated_window(lat: float, lon: float, start_date: str, end_date: str, city: str = "") -> Dict[str, Any]:
-    global VC_DISABLED_UNTIL
-    if not VISUAL_CROSSING_KEY:
-        raise RuntimeError("VISUAL_CROSSING_API_KEY is not set")
-    now = datetime.now(timezone.utc)
-    with VC_STATE_LOCK:
-        if VC_DISABLED_UNTIL is not None and now < VC_DISABLED_UNTIL:
-            raise RuntimeError(f"Visual Crossing temporarily disabled until {VC_DISABLED_UNTIL.isoformat()}")
-    location = f"{lat},{lon}"
-    url = f"https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/{location}/{start_date}/{end_date}"
-    params = {
-        "unitGroup": "metric",
-        "include": "days",
-        "key": VISUAL_CROSSING_KEY,
-        "contentType": "json",
-    }
-    _vc_gate()
-    r = requests.get(url, params=params, timeout=60)
-    called_url = r.url if hasattr(r, "url") else url
-    if r.status_code == 429:
-        with VC_STATE_LOCK:
-            VC_DISABLED_UNTIL = datetime.now(timezone.utc) + timedelta(hours=6)
-        append_api_call_log({
-            "city": city,
-            "kind": "estimated_window",
-            "provider": WEATHER_PROVIDER,
-            "status_code": 429,
-            "ok": False,
-            "url": called_url,
-            "start_date": start_date,
-            "end_date": end_date,
-            "lat": lat,
-            "lon": lon,
-            "records": 0,
-            "error": "rate_limited",
-        })
-        raise requests.HTTPError(
-            f"429 rate limited; disabling VC for this run until {VC_DISABLED_UNTIL.isoformat()}",
-            response=r,
-        )
-    r.raise_for_status()
-    data = r.json()
-    days = data.get("days", []) if isinstance(data, dict) else []
-    sample_tmax = None
-    sample_tmin = None
-    sample_date = None
-    if days:
-        sample = days[0]
-        sample_tmax = sample.get("tempmax")
-        sample_tmin = sample.get("tempmin")
-        sample_date = sample.get("datetime")
-        sample_precip = sample.get("precip")
-        sample_precipprob = sample.get("precipprob")
-        sample_solar = sample.get("solarradiation")
-    else:
-        sample_precip = None
-        sample_precipprob = None
-        sample_solar = None
-    append_api_call_log({
-        "city": city,
-        "kind": "estimated_window",
-        "provider": WEATHER_PROVIDER,
-        "status_code": r.status_code,
-        "ok": True,
-        "url": called_url,
-        "start_date": start_date,
-        "end_date": end_date,
-        "lat": lat,
-        "lon": lon,
-        "records": len(days),
-        "sample_tmax_c": sample_tmax,
-        "sample_tmin_c": sample_tmin,
-        "sample_date": sample_date,
-        "sample_precip_mm": sample_precip,
-        "sample_precip_prob_pct": sample_precipprob,
-        "sample_solarradiation_wm2": sample_solar,
-    })
-    return data
-
-def process_visualcrossing_days(days: list[dict]) -> pd.DataFrame:
-    rows = []
-    for d in days:
-        dt = pd.to_datetime(d.get("datetime"))
-        sunrise_epoch = d.get("sunriseEpoch")
-        sunset_epoch = d.get("sunsetEpoch")
-        sunrise = pd.to_datetime(sunrise_epoch, unit="s", utc=True) if sunrise_epoch is not None else pd.NaT
-        sunset = pd.to_datetime(sunset_epoch, unit="s", utc=True) if sunset_epoch is not None else pd.NaT
-        tmax_c = d.get("tempmax")
-        tmin_c = d.get("tempmin")
-        icon = d.get("icon", "")
-        conditions = d.get("conditions", "")
-        precip_prob = d.get("precipprob")
-        code = _visualcrossing_weathercode(icon, conditions, precip_prob)
-        rows.append(
-            {
-                "time": dt,
-                "tmax_c": tmax_c,
-                "tmin_c": tmin_c,
-                "tavg_c": d.get("temp"),
-                "feelslike_max_c": d.get("feelslikemax"),
-                "feelslike_min_c": d.get("feelslikemin"),
-                "feelslike_c": d.get("feelslike"),
-                "dewpoint_c": d.get("dew"),
-                "humidity_pct": d.get("humidity"),
-                "cloudcover_pct": d.get("cloudcover"),
-                "visibility_km": d.get("visibility"),
-                "precip_mm": d.get("precip"),
-                "precip_prob_pct": d.get("precipprob"),
-                "precip_cover_pct": d.get("precipcover"),
-                "precip_type": ",".join(d.get("preciptype", [])) if isinstance(d.get("preciptype"), list) else (d.get("preciptype") or ""),
-                "snow_mm": d.get("snow"),
-                "snowdepth_mm": d.get("snowdepth"),
-                "windspeed_kph": d.get("windspeed"),
-                "windgust_kph": d.get("windgust"),
-                "winddir_deg": d.get("winddir"),
-                "pressure_mb": d.get("pressure"),
-                "solarradiation_wm2": d.get("solarradiation"),
-                "solarenergy_mj_m2": d.get("solarenergy"),
-                "uvindex": d.get("uvindex"),
-                "moonphase": d.get("moonphase"),
-                "conditions_text": d.get("conditions", ""),
-                "icon": d.get("icon", ""),
-                "description_text": d.get("description", ""),
-                "source_provider": d.get("source", ""),
-                "stations_text": ",".join(d.get("stations", [])) if isinstance(d.get("stations"), list) else (d.get("stations") or ""),
-                "severerisk": d.get("severerisk"),
-                "weathercode": code,
-                "sunrise": sunrise,
-                "sunset": sunset,
-            }
-        )
-    df = pd.DataFrame(rows)
-    if not df.empty:
-        df["time"] = pd.to_datetime(df["time"], utc=True)
-    return df
-
-def fetch_estimated_history(lat: float, lon: float, start_date: str, end_date: str, city: str = "") -> pd.DataFrame:
-    # Visual Crossing only.
-    if VISUAL_CROSSING_KEY:
-        try:
-            vc = fetch_visualcrossing_estimated_window(lat, lon, start_date, end_date, city=city)
-            days = vc.get("days", [])
-            if days:
-                return process_visualcrossing_days(days)
-        except Exception as e:
-            msg = str(e)
-            if "temporarily disabled until" in msg:
-                # Avoid flooding logs once VC is known unavailable.
-                pass
-            else:
-                append_sync_log(f"[estimated] Visual Crossing failed for {lat},{lon}: {e}.")
-                if "429 rate limited" in msg:
-                    append_sync_log("[estimated] Visual Crossing quota/rate limit hit. Remaining cities will skip estimated history this run.")
-    return pd.DataFrame()
-
-def store_data(conn, city, df, source: str = "estimated"):
-    c = conn.cursor()
-    split_table = "daily_data_forecast" if source == "forecast" else "daily_data_estimated"
-    for _, row in df.iterrows():
-        day = row["time"].strftime("%Y-%m-%d")
-        values = {
-            "city": city,
-            "date": day,
-            "tmax_c": row.get("tmax_c"),
-            "tmin_c": row.get("tmin_c"),
-            "tavg_c": row.get("tavg_c"),
-            "feelslike_max_c": row.get("feelslike_max_c"),
-            "feelslike_min_c": row.get("feelslike_min_c"),
-            "feelslike_c": row.get("feelslike_c"),
-            "dewpoint_c": row.get("dewpoint_c"),
-            "humidity_pct": row.get("humidity_pct"),
-            "cloudcover_pct": row.get("cloudcover_pct"),
-            "visibility_km": row.get("visibility_km"),
-            "precip_mm": row.get("precip_mm"),
-            "precip_prob_pct": row.get("precip_prob_pct"),
-            "precip_cover_pct": row.get("precip_cover_pct"),
-            "precip_type": row.get("precip_type"),
-            "snow_mm": row.get("snow_mm"),
-            "snowdepth_mm": row.get("snowdepth_mm"),
-            "windspeed_kph": row.get("windspeed_kph"),
-            "windgust_kph": row.get("windgust_kph"),
-            "winddir_deg": row.get("winddir_deg"),
-            "pressure_mb": row.get("pressure_mb"),
-            "solarradiation_wm2": row.get("solarradiation_wm2"),
-            "solarenergy_mj_m2": row.get("solarenergy_mj_m2"),
-            "uvindex": row.get("uvindex"),
-            "moonphase": row.get("moonphase"),
-            "conditions_text": row.get("conditions_text"),
-            "icon": row.get("icon"),
-            "description_text": row.get("description_text"),
-            "source_provider": row.get("source_provider"),
-            "stations_text": row.get("stations_text"),
-            "severerisk": row.get("severerisk"),
-            "weathercode": row.get("weathercode"),
-            "sunrise": row.get("sunrise").isoformat() if not pd.isna(row.get("sunrise")) else None,
-            "sunset": row.get("sunset").isoformat() if not pd.isna(row.get("sunset")) else None,
-            "data_source": source,
-            "updated_at": datetime.now(timezone.utc).isoformat(),
-        }
-        # Store immutable source rows.
-        _upsert_weather_row(conn, split_table, values)
-
-        # Update materialized best table for legacy paths.
-        c.execute("SELECT data_source FROM daily_data WHERE city=? AND date=?", (city, day))
-        old = c.fetchone()
-        old_source = old[0] if old and old[0] else "estimated"
-        if not old or _source_priority(source) >= _source_priority(old_source):
-            _upsert_weather_row(conn, "daily_data", values)
-    conn.commit()
-
-def process_daily_data(daily_data: Dict[str, Any]) -> pd.DataFrame:
-    df = pd.DataFrame({
-        "time": daily_data["time"],
-        "tmax_c": daily_data["temperature_2m_max"],
-        "tmin_c": daily_data["temperature_2m_min"],
-        "weathercode": daily_data["weathercode"],
-        "sunrise": daily_data["sunrise"],
-        "sunset": daily_data["sunset"]
-    })
-    df["time"] = pd.to_datetime(df["time"])
-    df["sunrise"] = pd.to_datetime(df["sunrise"])
-    df["sunset"] = pd.to_datetime(df["sunset"])
-    return df
-
-def process_forecast_daily_data(fore_daily: Dict[str, Any]) -> pd.DataFrame:
-    def col(key, default=None):
-        return fore_daily.get(key, default if default is not None else [None] * len(fore_daily.get("time", [])))
-
-    df = pd.DataFrame({
-        "time": fore_daily["time"],
-        "tmax_c": fore_daily["temperature_2m_max"],
-        "tmin_c": fore_daily["temperature_2m_min"],
-        "tavg_c": col("temperature_2m_mean"),
-        "feelslike_max_c": col("feelslike_max_c"),
-        "feelslike_min_c": col("feelslike_min_c"),
-        "feelslike_c": col("feelslike_c"),
-        "dewpoint_c": col("dewpoint_c"),
-        "humidity_pct": col("humidity_pct"),
-        "cloudcover_pct": col("cloudcover_pct"),
-        "visibility_km": col("visibility_km"),
-        "precip_mm": col("precip_mm"),
-        "precip_prob_pct": col("precip_prob_pct"),
-        "precip_cover_pct": col("precip_cover_pct"),
-        "precip_type": col("precip_type", [""] * len(fore_daily.get("time", []))),
-        "snow_mm": col("snow_mm"),
-        "snowdepth_mm": col("snowdepth_mm"),
-        "windspeed_kph": col("windspeed_kph"),
-        "windgust_kph": col("windgust_kph"),
-        "winddir_deg": col("winddir_deg"),
-        "pressure_mb": col("pressure_mb"),
-        "solarradiation_wm2": col("solarradiation_wm2"),
-        "solarenergy_mj_m2": col("solarenergy_mj_m2"),
-        "uvindex": col("uvindex"),
-        "moonphase": col("moonphase"),
-        "conditions_text": col("conditions_text", [""] * len(fore_daily.get("time", []))),
-        "icon": col("icon", [""] * len(fore_daily.get("time", []))),
-        "description_text": col("description_text", [""] * len(fore_daily.get("time", []))),
-        "source_provider": col("source_provider", [""] * len(fore_daily.get("time", []))),
-        "stations_text": col("stations_text", [""] * len(fore_daily.get("time", []))),
-        "severerisk": col("severerisk"),
-        "weathercode": fore_daily["weathercode"],
-        "sunrise": fore_daily["sunrise"],
-        "sunset": fore_daily["sunset"]
-    })
-    df["time"] = pd.to_datetime(df["time"])
-    df["sunrise"] = pd.to_datetime(df["sunrise"])
-    df["sunset"] = pd.to_datetime(df["sunset"])
-    return df
-
-def load_data_from_db(conn, city):
-    c = conn.cursor()
-    c.execute("SELECT date,tmax_c,tmin_c,weathercode,sunrise,sunset FROM daily_data WHERE city=? AND date>=? AND date<=? ORDER BY date",
-              (city, START_DATE, END_DATE))
-    rows = c.fetchall()
-    df = pd.DataFrame(rows, columns=["date", "tmax_c", "tmin_c", "weathercode", "sunrise", "sunset"])
-    df["time"] = pd.to_datetime(df["date"])
-    df["sunrise"] = pd.to_datetime(df["sunrise"])
-    df["sunset"] = pd.to_datetime(df["sunset"])
-    return df
-
-def monthly_aggregates_from_db(conn, city):
-    """
-    Fast monthly aggregate path that avoids loading full daily rows into pandas.
-    Returns the same shape as monthly_aggregates().
-    """
-    c = conn.cursor()
-    sunny_codes = tuple(SUNNY_CODES)
-    placeholders = ",".join(["?"] * len(sunny_codes))
-    query = f"""
-        SELECT
-            CAST(SUBSTR(date, 6, 2) AS INTEGER) AS month,
-            AVG(tmax_c) AS tmax_mean_c,
-            AVG(tmin_c) AS tmin_mean_c,
-            AVG(CASE WHEN weathercode IN ({placeholders}) THEN 1.0 ELSE 0.0 END) * 30.0 AS sunny_day_30,
-            AVG((julianday(sunset) - julianday(sunrise)) * 24.0) AS day_length_hrs
-        FROM daily_data
-        WHERE city=? AND date>=? AND date<=?
-        GROUP BY CAST(SUBSTR(date, 6, 2) AS INTEGER)
-        ORDER BY month
-    """
-    c.execute(query, (*sunny_codes, city, START_DATE, END_DATE))
-    rows = c.fetchall()
-    if not rows:
-        return None
+    zip_cities_displayed = zip_cities_set.intersection(displayed_cities)
+    zip_cities_not_displayed = zip_cities_set - displayed_cities
 
-    by_month = {}
-    for month, tmax_mean_c, tmin_mean_c, sunny_day_30, day_length_hrs in rows:
-        tmax_mean = c_to_f(tmax_mean_c) if tmax_mean_c is not None else float("nan")
-        tmin_mean = c_to_f(tmin_mean_c) if tmin_mean_c is not None else float("nan")
-        avg_day_f = (tmax_mean + tmin_mean) / 2 if not pd.isna(tmax_mean) and not pd.isna(tmin_mean) else float("nan")
-        sunny_day = max(0.0, min(float(sunny_day_30), 30.0)) if sunny_day_30 is not None else float("nan")
-        by_month[int(month)] = (avg_day_f, sunny_day, day_length_hrs, tmax_mean, tmin_mean)
-
-    monthly_data = []
-    for m in range(1, 13):
-        if m in by_month:
-            avg_day_f, sunny_day, day_length_hrs, tmax_mean, tmin_mean = by_month[m]
-            monthly_data.append((m, avg_day_f, sunny_day, day_length_hrs, tmax_mean, tmin_mean))
+    # Update fetch status based on loaded_cities
+    for city in zip_cities_set:
+        if city in loaded_cities:
+            city_fetch_status[city] = "Successfully fetched data"
+        elif city in failed:
+            city_fetch_status[city] = "Fetch failed"
         else:
-            monthly_data.append((m, float("nan"), float("nan"), float("nan"), float("nan"), float("nan")))
-
-    return pd.DataFrame(
-        monthly_data,
-        columns=["month", "avg_day_f", "sunny_day", "day_length_hrs", "tmax_mean", "tmin_mean"]
-    )
-
-def monthly_aggregates(df: pd.DataFrame) -> pd.DataFrame:
-    df["month"] = df["time"].dt.month
-    df["tmax_f"] = c_to_f(df["tmax_c"])
-    df["tmin_f"] = c_to_f(df["tmin_c"])
-    df["avg_day_f"] = (df["tmax_f"] + df["tmin_f"]) / 2
-    df["sunny_day"] = df["weathercode"].apply(lambda w: 1 if w in SUNNY_CODES else 0)
-    df["day_length_hrs"] = (df["sunset"] - df["sunrise"]).dt.total_seconds() / 3600.0
-
-    monthly_data = []
-    for m in range(1, 13):
-        mdf = df[df["month"] == m]
-        if mdf.empty:
-            monthly_data.append((m, float('nan'), float('nan'), float('nan'), float('nan'), float('nan'), float('nan'), float('nan'), float('nan')))
-            continue
-
-        avg_day_f_m = mdf["avg_day_f"].mean()
-        tmax_mean = mdf["tmax_f"].mean()
-        tmin_mean = mdf["tmin_f"].mean()
-
-        # Normalize to an expected sunny-days-per-30-days value for this month.
-        # Historical data spans multiple years, so raw sums can exceed 30.
-        sunny_days_avg = mdf["sunny_day"].mean() * 30.0
-        sunny_days_avg = max(0.0, min(float(sunny_days_avg), 30.0))
-
-        day_length_avg = mdf["day_length_hrs"].mean()
-        monthly_data.append((m, avg_day_f_m, sunny_days_avg, day_length_avg, tmax_mean, tmin_mean))
-
-    monthly_df = pd.DataFrame(
-        monthly_data,
-        columns=["month", "avg_day_f", "sunny_day", "day_length_hrs", "tmax_mean", "tmin_mean"]
-    )
-    return monthly_df
-
-def month_name(m):
-    return ["Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"][m-1]
-
-def _fetch_visualcrossing_forecast_bundle(lat: float, lon: float, days: int = 16, city: str = ""):
-    if not VISUAL_CROSSING_KEY:
-        raise RuntimeError("VISUAL_CROSSING_API_KEY is not set")
-    start_dt = datetime.now(timezone.utc).date()
-    end_dt = start_dt + timedelta(days=max(1, days) - 1)
-    location = f"{lat},{lon}"
-    url = f"https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/{location}/{start_dt.isoformat()}/{end_dt.isoformat()}"
-    params = {
-        "unitGroup": "metric",
-        "include": "days,current",
-        "key": VISUAL_CROSSING_KEY,
-        "contentType": "json",
-    }
-    _vc_gate()
-    r = requests.get(url, params=params, timeout=60)
-    called_url = r.url if hasattr(r, "url") else url
-    if r.status_code >= 400:
-        append_api_call_log({
-            "city": city,
-            "kind": "forecast_bundle",
-            "provider": WEATHER_PROVIDER,
-            "status_code": r.status_code,
-            "ok": False,
-            "url": called_url,
-            "lat": lat,
-            "lon": lon,
-            "records": 0,
-            "error": f"http_{r.status_code}",
-        })
-    r.raise_for_status()
-    vc = r.json()
-
-    rows = vc.get("days", [])[:days]
-    daily = {
-        "time": [],
-        "weathercode": [],
-        "sunrise": [],
-        "sunset": [],
-        "temperature_2m_max": [],
-        "temperature_2m_min": [],
-        "temperature_2m_mean": [],
-        "feelslike_max_c": [],
-        "feelslike_min_c": [],
-        "feelslike_c": [],
-        "dewpoint_c": [],
-        "humidity_pct": [],
-        "cloudcover_pct": [],
-        "visibility_km": [],
-        "precip_mm": [],
-        "precip_prob_pct": [],
-        "precip_cover_pct": [],
-        "precip_type": [],
-        "snow_mm": [],
-        "snowdepth_mm": [],
-        "windspeed_kph": [],
-        "windgust_kph": [],
-        "winddir_deg": [],
-        "pressure_mb": [],
-        "solarradiation_wm2": [],
-        "solarenergy_mj_m2": [],
-        "uvindex": [],
-        "moonphase": [],
-        "conditions_text": [],
-        "icon": [],
-        "description_text": [],
-        "source_provider": [],
-        "stations_text": [],
-        "severerisk": [],
-    }
-    for d in rows:
-        daily["time"].append(str(d.get("datetime")))
-        sunrise_epoch = d.get("sunriseEpoch")
-        sunset_epoch = d.get("sunsetEpoch")
-        sunrise_iso = pd.to_datetime(sunrise_epoch, unit="s", utc=True).isoformat() if sunrise_epoch is not None else None
-        sunset_iso = pd.to_datetime(sunset_epoch, unit="s", utc=True).isoformat() if sunset_epoch is not None else None
-        daily["sunrise"].append(sunrise_iso)
-        daily["sunset"].append(sunset_iso)
-        daily["temperature_2m_max"].append(d.get("tempmax"))
-        daily["temperature_2m_min"].append(d.get("tempmin"))
-        daily["temperature_2m_mean"].append(d.get("temp"))
-        daily["feelslike_max_c"].append(d.get("feelslikemax"))
-        daily["feelslike_min_c"].append(d.get("feelslikemin"))
-        daily["feelslike_c"].append(d.get("feelslike"))
-        daily["dewpoint_c"].append(d.get("dew"))
-        daily["humidity_pct"].append(d.get("humidity"))
-        daily["cloudcover_pct"].append(d.get("cloudcover"))
-        daily["visibility_km"].append(d.get("visibility"))
-        daily["precip_mm"].append(d.get("precip"))
-        daily["precip_prob_pct"].append(d.get("precipprob"))
-        daily["precip_cover_pct"].append(d.get("precipcover"))
-        daily["precip_type"].append(",".join(d.get("preciptype", [])) if isinstance(d.get("preciptype"), list) else (d.get("preciptype") or ""))
-        daily["snow_mm"].append(d.get("snow"))
-        daily["snowdepth_mm"].append(d.get("snowdepth"))
-        daily["windspeed_kph"].append(d.get("windspeed"))
-        daily["windgust_kph"].append(d.get("windgust"))
-        daily["winddir_deg"].append(d.get("winddir"))
-        daily["pressure_mb"].append(d.get("pressure"))
-        daily["solarradiation_wm2"].append(d.get("solarradiation"))
-        daily["solarenergy_mj_m2"].append(d.get("solarenergy"))
-        daily["uvindex"].append(d.get("uvindex"))
-        daily["moonphase"].append(d.get("moonphase"))
-        daily["conditions_text"].append(d.get("conditions", ""))
-        daily["icon"].append(d.get("icon", ""))
-        daily["description_text"].append(d.get("description", ""))
-        daily["source_provider"].append(d.get("source", ""))
-        daily["stations_text"].append(",".join(d.get("stations", [])) if isinstance(d.get("stations"), list) else (d.get("stations") or ""))
-        daily["severerisk"].append(d.get("severerisk"))
-        daily["weathercode"].append(_visualcrossing_weathercode(d.get("icon", ""), d.get("conditions", ""), d.get("precipprob")))
-
-    fore_json = {
-        "latitude": lat,
-        "longitude": lon,
-        "daily": daily,
-    }
-    cur = vc.get("currentConditions", {}) or {}
-    cur_temp_c = cur.get("temp")
-    if cur_temp_c is None and rows:
-        cur_temp_c = rows[0].get("temp")
-    cur_json = {
-        "current_weather": {
-            "temperature": cur_temp_c
-        }
-    }
-    append_api_call_log({
-        "city": city,
-        "kind": "forecast_bundle",
-        "provider": WEATHER_PROVIDER,
-        "status_code": r.status_code,
-        "ok": True,
-        "url": called_url,
-        "lat": lat,
-        "lon": lon,
-        "records": len(daily["time"]),
-        "current_temp_c": cur_temp_c,
-        "sample_tmax_c": daily["temperature_2m_max"][0] if daily["temperature_2m_max"] else None,
-        "sample_tmin_c": daily["temperature_2m_min"][0] if daily["temperature_2m_min"] else None,
-        "sample_precip_mm": daily["precip_mm"][0] if daily["precip_mm"] else None,
-        "sample_precip_prob_pct": daily["precip_prob_pct"][0] if daily["precip_prob_pct"] else None,
-        "sample_solarradiation_wm2": daily["solarradiation_wm2"][0] if daily["solarradiation_wm2"] else None,
-    })
-    return fore_json, cur_json
-
-def fetch_current_forecast_data(lat, lon):
-    fore_json, _ = _fetch_visualcrossing_forecast_bundle(lat, lon, days=16)
-    return fore_json
-
-def fetch_current(lat, lon):
-    _, cur_json = _fetch_visualcrossing_forecast_bundle(lat, lon, days=16)
-    return cur_json
-
-def compute_daytime_avg_temp(tmax_f, tmin_f):
-    # Approximate a daytime low temperature closer to the high.
-    daytime_low_f = tmax_f - (tmax_f - tmin_f) / 4.0
-    daytime_avg_f = (tmax_f + daytime_low_f) / 2.0
-    return daytime_avg_f
-
-def compute_niceness(temp_f, sunny_days, day_length_hrs):
-    """
-    Default niceness computation with temperature range 50F - 105F,
-    including partial scoring.
-    """
-    if temp_f < 50 or temp_f > 105:
-        temp_score = 0.0
-    elif 50 <= temp_f < 70:
-        temp_score = (temp_f - 50) / 20.0 * 0.5
-    elif 70 <= temp_f < 75:
-        temp_score = 0.5 + ((temp_f - 70) / 5.0) * 0.5
-    elif 75 <= temp_f <= 85:
-        temp_score = 1.0
-    elif 85 < temp_f <= 90:
-        temp_score = 1.0 - ((temp_f - 85) / 5.0) * 0.5
-    else:  # 90 < temp_f <= 105
-        temp_score = 0.5 - ((temp_f - 90) / 15.0) * 0.5
-
-    sunny_score = max(0.0, min(sunny_days / 30.0, 1.0))
-    day_length_score = max(0.0, min(day_length_hrs / 24.0, 1.0))
-    sun_day_score = (sunny_score + day_length_score) / 2.0
-
-    niceness = 0.5 * temp_score + 0.5 * sun_day_score
-    return niceness
-
-def compute_city_niceness(tmax_f, tmin_f, sunny_days, day_length_hrs):
-    # Uses an approximate daytime average in the niceness calculation.
-    daytime_avg_f = compute_daytime_avg_temp(tmax_f, tmin_f)
-    return compute_niceness(daytime_avg_f, sunny_days, day_length_hrs)
-
-def load_forecast_cache():
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, 'rb') as f:
-            data = pickle.load(f)
-            return data
-    return {}
-
-def save_forecast_cache(cache):
-    with open(CACHE_FILE, 'wb') as f:
-        pickle.dump(cache, f)
-
-def load_all_cities_ui_cache(max_age: timedelta = ALL_CITIES_UI_CACHE_MAX_AGE):
-    if not os.path.exists(ALL_CITIES_UI_CACHE_FILE):
-        return None
-    try:
-        with open(ALL_CITIES_UI_CACHE_FILE, "rb") as f:
-            payload = pickle.load(f)
-        saved_at = payload.get("saved_at")
-        if isinstance(saved_at, str):
-            saved_at = datetime.fromisoformat(saved_at)
-        if not isinstance(saved_at, datetime):
-            return None
-        if saved_at.tzinfo is None:
-            saved_at = saved_at.replace(tzinfo=timezone.utc)
-        if datetime.now(timezone.utc) - saved_at > max_age:
-            return None
-        if not isinstance(payload.get("current_data_list"), list):
-            return None
-        if not isinstance(payload.get("monthly_dict"), dict):
-            return None
-        return payload
-    except Exception:
-        return None
-
-def save_all_cities_ui_cache(current_data_list, monthly_dict):
-    payload = {
-        "saved_at": datetime.now(timezone.utc).isoformat(),
-        "current_data_list": current_data_list,
-        "monthly_dict": monthly_dict,
-    }
-    with open(ALL_CITIES_UI_CACHE_FILE, "wb") as f:
-        pickle.dump(payload, f)
+            city_fetch_status[city] = "Never called"
 
-def is_forecast_fresh(city: str, cache: dict, hours: int = 24) -> bool:
-    """
-    Returns True if 'city' forecast data in 'cache' was fetched within 'hours' hours.
-    """
-    now = datetime.now(timezone.utc)
-    if city not in cache or 'time' not in cache[city]:
-        return False
-    provider = cache[city].get("provider")
-    if provider != WEATHER_PROVIDER:
-        return False
-    last_fetch = cache[city]['time']
-    return (now - last_fetch) < timedelta(hours=hours)
-
-def build_target_city_map(forecast_cache: dict) -> dict[str, tuple[float, float]]:
-    """
-    Build the full sync target set.
-    Priority:
-    1) Existing forecast cache coordinates (typically the largest set; e.g. ~2431 cities)
-    2) Hardcoded CITY_COORDS fallback entries
-    """
-    targets: dict[str, tuple[float, float]] = {}
+    print("\n=== ZIP CITIES REPORT ===")
+    print(f"Total ZIP cities: {len(zip_cities_set)}")
+    print(f"Displayed (loaded) ZIP cities: {len(zip_cities_displayed)}")
+    if zip_cities_displayed:
+        print("These ZIP cities are displayed:")
+        for c in zip_cities_displayed:
+            print(f"  - {c}")
 
-    for city, payload in forecast_cache.items():
-        if not isinstance(city, str) or not isinstance(payload, dict):
-            continue
-        fore = payload.get("fore_json", {})
-        try:
-            lat = float(fore.get("latitude"))
-            lon = float(fore.get("longitude"))
-            targets[city] = (lat, lon)
-        except Exception:
-            continue
-
-    for city, latlon in CITY_COORDS.items():
-        if city not in targets and isinstance(latlon, tuple) and len(latlon) == 2:
-            targets[city] = latlon
-
-    return targets
-
-def sync_status_snapshot(conn, city_names: list[str], forecast_cache: dict):
-    hist_complete = 0
-    hist_missing = 0
-    forecast_fresh = 0
-    forecast_stale = 0
-    for city in city_names:
-        if have_data_for_city(conn, city):
-            hist_complete += 1
-        else:
-            hist_missing += 1
-        if is_forecast_fresh(city, forecast_cache, hours=24):
-            forecast_fresh += 1
-        else:
-            forecast_stale += 1
-    return {
-        "hist_complete": hist_complete,
-        "hist_missing": hist_missing,
-        "forecast_fresh": forecast_fresh,
-        "forecast_stale": forecast_stale,
-    }
+    print(f"\nNot displayed ZIP cities: {len(zip_cities_not_displayed)}")
+    if zip_cities_not_displayed:
+        print("These ZIP cities are not displayed (no data or could not fetch):")
+        for c in zip_cities_not_displayed:
+            # Provide detailed reasons based on fetch status
+            reason = city_fetch_status.get(c, "unknown reason")
+            print(f"  - {c} (Reason: {reason})")
 
 class LoadingDialog(QDialog):
     def __init__(self, max_cities):
@@ -1190,20 +202,65 @@ class LoadingDialog(QDialog):
     def update_current(self, value):
         self.pb_current.setValue(value)
 
-class NumericTableWidgetItem(QTableWidgetItem):
-    def __init__(self, value):
-        if pd.isna(value):
-            self.numeric_val = float('nan')
-            display_value = "N/A"
-        else:
-            self.numeric_val = float(value)
-            display_value = f"{self.numeric_val:.4f}"
-        super().__init__(display_value)
+class LoadingDialogProgress(SyncProgress):
+    """Drives the blocking LoadingDialog (first run on an empty DB, or FOREGROUND_SYNC)."""
+
+    def __init__(self, dialog):
+        self.updates = {
+            "estimated": dialog.update_fetch,
+            "monthly": dialog.update_process,
+            "forecast": dialog.update_current,
+        }
+
+    def advance(self, name, done):
+        self.updates[name](done)
+
+class SyncWorker(QObject, SyncProgress):
+    """
+    Runs run_daily_sync() on a QThread with its own sqlite connection and forecast cache copy.
+    Progress and per-city results cross back to the window as queued signals.
+    """
+    phase_started = pyqtSignal(str, int)
+    progressed = pyqtSignal(str, int)
+    city_synced = pyqtSignal(str, object)
+    climate_synced = pyqtSignal(object)
+    row_synced = pyqtSignal(object)
+    sync_finished = pyqtSignal(object)
+    sync_failed = pyqtSignal(str)
+
+    def __init__(self, forecast_cache, city_list):
+        super().__init__()
+        self.forecast_cache = dict(forecast_cache)
+        self.city_list = city_list
+        self.stop = threading.Event()
+
+    def phase(self, name, total):
+        self.phase_started.emit(name, total)
+
+    def advance(self, name, done):
+        self.progressed.emit(name, done)
+
+    def city_climate(self, city, monthly_rows):
+        self.city_synced.emit(city, monthly_rows)
+
+    def climate_ready(self, climate):
+        self.climate_synced.emit(climate)
+
+    def current_row(self, row):
+        self.row_synced.emit(row)
 
-    def __lt__(self, other):
-        if isinstance(other, NumericTableWidgetItem):
-            return self.numeric_val < other.numeric_val
-        return super().__lt__(other)
+    @pyqtSlot()
+    def run(self):
+        conn = get_db_conn(DATABASE)
+        try:
+            result = run_daily_sync(conn, self.forecast_cache, self.city_list, progress=self, stop=self.stop)
+        except Exception:
+            append_sync_log(f"Background sync failed: {traceback.format_exc()}")
+            self.sync_failed.emit(traceback.format_exc(limit=1))
+        else:
+            self.sync_finished.emit(result)
+        finally:
+            conn.close()
 
 def is_nice_strict(avg_temp, sunny_days, day_length):
     return (avg_temp > 70) and (sunny_days > 12) and (day_length > 10)
@@ -1211,61 +268,359 @@ def is_nice_strict(avg_temp, sunny_days, day_length):
 def is_nice_light(avg_temp, sunny_days, day_length):
     return (avg_temp > 60) and (sunny_days > 10) and (day_length > 10)
 
-def highlight_cell(item, avg_temp, sunny_days, day_length):
-    item.setBackground(QBrush(QColor(255,255,255)))
-    item.setForeground(QBrush(Qt.GlobalColor.black))
-
+def highlight_colors(avg_temp, sunny_days, day_length):
+    """(background, foreground) QColors for a cell with these monthly conditions."""
+    white, black = QColor(255,255,255), QColor(0,0,0)
     if pd.isna(avg_temp) or pd.isna(sunny_days) or pd.isna(day_length):
-        return
+        return white, black
 
     if avg_temp > 90:
-        item.setBackground(QBrush(QColor(255,0,0)))  # red
-        item.setForeground(QBrush(QColor(255,255,255)))
+        return QColor(255,0,0), white  # red
     elif avg_temp < 50:
-        item.setBackground(QBrush(QColor(0,0,255)))  # blue
-        item.setForeground(QBrush(QColor(255,255,255)))
+        return QColor(0,0,255), white  # blue
     elif is_nice_strict(avg_temp, sunny_days, day_length):
         # Keep foreground black so text is readable on bright yellow
-        item.setBackground(QBrush(QColor(255,255,0)))  # bright yellow
-        item.setForeground(QBrush(QColor(0,0,0)))
+        return QColor(255,255,0), black  # bright yellow
     elif is_nice_light(avg_temp, sunny_days, day_length):
         # Keep foreground black so text is readable on light yellow
-        item.setBackground(QBrush(QColor(255,255,224)))  # light yellow
-        item.setForeground(QBrush(QColor(0,0,0)))
+        return QColor(255,255,224), black  # light yellow
+    return white, black
 
-def get_geo_boundaries(lat, lon):
-    """
-    Calls geojson-places-api on localhost:3000 with the correct path-based route:
-    /lookup/:lat/:lon
+def highlight_cell(item, avg_temp, sunny_days, day_length):
+    background, foreground = highlight_colors(avg_temp, sunny_days, day_length)
+    item.setBackground(QBrush(background))
+    item.setForeground(QBrush(foreground))
+
+def abbreviated_monthly_text(tmax, tmin, sunny):
+    tmax_str = "N/A" if pd.isna(tmax) else f"{tmax:.0f}"
+    tmin_str = "N/A" if pd.isna(tmin) else f"{tmin:.0f}"
+    sunny_str = "N/A" if pd.isna(sunny) else f"{int(sunny)}/30"
+    return f"High: {tmax_str}F Low: {tmin_str}F Sun: {sunny_str}"
+
+# Models behind the Current Weather and Monthly Calendar views. Display text and colours are
+# produced per visible cell. Each row carries precomputed sort keys (NaN as -inf, so missing
+# values sink in descending order), exposed as SORT_ROLE; UserRole carries the city key on
+# every column.
+SORT_ROLE = Qt.ItemDataRole.UserRole + 1
+
+def _sort_key(value):
+    return float('-inf') if pd.isna(value) else float(value)
 
-    Returns a dict with continent_code, country_a2, and country_a3 if found,
-    or None if the server returns 404 or no data.
+class _AbstractModelMeta(type(QAbstractTableModel), ABCMeta):
+    """Lets a Qt model class declare abstract methods."""
+
+
+class SortedRowsModel(QAbstractTableModel, metaclass=_AbstractModelMeta):
     """
-    base_url = "http://localhost:3000"
-    # Use path parameters instead of query params
-    lookup_url = f"{base_url}/lookup/{lat}/{lon}"
-    try:
-        r = requests.get(lookup_url)
-        if r.status_code != 200:
+    Table model that keeps its rows in display order. Rows are (city, sort_keys, payload)
+    entries; sort() is one list sort over the precomputed keys, and a single-row change is
+    re-placed with a binary search and at most one beginMoveRows instead of a re-sort.
+    Subclasses build the entries in make_entry().
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.entries = []
+        self.row_of = {}
+        self.sort_column = -1
+        self.sort_order = Qt.SortOrder.DescendingOrder
+        self.city_font = QFont()
+        self.city_font.setUnderline(True)
+
+    @abstractmethod
+    def make_entry(self, item):
+        """(city, sort_keys, payload) for one source item; sort_keys has one value per column."""
+
+    def _sorted(self, entries):
+        if self.sort_column < 0:
+            return entries
+        col = self.sort_column
+        return sorted(entries, key=lambda e: e[1][col], reverse=self.sort_order == Qt.SortOrder.DescendingOrder)
+
+    def _reindex(self, start=0, stop=None):
+        stop = len(self.entries) if stop is None else stop
+        for i in range(start, stop):
+            self.row_of[self.entries[i][0]] = i
+
+    def set_items(self, items):
+        self.beginResetModel()
+        self.entries = self._sorted([self.make_entry(item) for item in items])
+        self.row_of = {}
+        self._reindex()
+        self.endResetModel()
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        if column < 0 or column >= self.columnCount():
+            return
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        cities = [self.entries[idx.row()][0] for idx in persistent]
+        self.sort_column, self.sort_order = column, order
+        self.entries = self._sorted(self.entries)
+        self._reindex()
+        self.changePersistentIndexList(
+            persistent, [self.index(self.row_of[city], idx.column()) for city, idx in zip(cities, persistent)]
+        )
+        self.layoutChanged.emit()
+
+    def _position_for(self, keys, skip=None):
+        """Display row where an entry with `keys` belongs, ignoring row `skip` (binary search)."""
+        n = len(self.entries) - (skip is not None)
+        if self.sort_column < 0:
+            return n if skip is None else skip
+        col = self.sort_column
+        key = keys[col]
+        descending = self.sort_order == Qt.SortOrder.DescendingOrder
+        lo, hi = 0, n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            other = self.entries[mid if skip is None or mid < skip else mid + 1][1][col]
+            if (other >= key) if descending else (other <= key):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def upsert(self, item):
+        """Insert or update one row: one rowsInserted, or a dataChanged plus at most one row move."""
+        entry = self.make_entry(item)
+        i = self.row_of.get(entry[0])
+        if i is None:
+            p = self._position_for(entry[1])
+            self.beginInsertRows(QModelIndex(), p, p)
+            self.entries.insert(p, entry)
+            self._reindex(p)
+            self.endInsertRows()
+            return
+        p = self._position_for(entry[1], skip=i)
+        if p != i:
+            self.beginMoveRows(QModelIndex(), i, i, QModelIndex(), p + 1 if p > i else p)
+            del self.entries[i]
+            self.entries.insert(p, entry)
+            self._reindex(min(i, p), max(i, p) + 1)
+            self.endMoveRows()
+        else:
+            self.entries[i] = entry
+        self.dataChanged.emit(self.index(p, 0), self.index(p, self.columnCount() - 1))
+
+    def remove_city(self, city):
+        i = self.row_of.pop(city, None)
+        if i is None:
+            return
+        self.beginRemoveRows(QModelIndex(), i, i)
+        del self.entries[i]
+        self._reindex(i)
+        self.endRemoveRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entries)
+
+class CurrentWeatherModel(SortedRowsModel):
+    HEADERS = ["Niceness","City","Temp (H/DL/L)","Sunny Next 16 Days","Sunny Next 30 Days","Day Length"]
+
+    def __init__(self, rows, climate, parent=None):
+        super().__init__(parent)
+        self.climate = climate
+        self.set_items(rows)
+
+    def make_entry(self, row):
+        tmax_f = row.get("tmax_f", float('nan'))
+        tmin_f = row.get("tmin_f", float('nan'))
+        if pd.isna(tmax_f) or pd.isna(tmin_f):
+            triple_str = "N/A"
+            triple_val = float('nan')
+        else:
+            daytime_low = (tmax_f + tmin_f)/2
+            triple_str = f"{tmax_f:.0f}F/{daytime_low:.0f}F/{tmin_f:.0f}F"
+            triple_val = (tmax_f + daytime_low + tmin_f)/3.0
+
+        nice_val = row["niceness"]
+        forecast_sunny_count = row.get("forecast_sunny_count", 0)
+        s_val = row["next_month_sunny_days"]
+        dl_val = row.get("est_next_month_day_length", float('nan'))
+        city_text = CITY_COUNTRY.get(row["city"], row["city"])
+        texts = (
+            f"{nice_val:.2f}" if not pd.isna(nice_val) else "N/A",
+            city_text,
+            triple_str,
+            str(forecast_sunny_count),
+            f"{s_val:.0f}" if not pd.isna(s_val) else "N/A",
+            f"{dl_val:.0f}" if not pd.isna(dl_val) else "N/A",
+        )
+        keys = (_sort_key(nice_val), city_text, _sort_key(triple_val), _sort_key(forecast_sunny_count), _sort_key(s_val), _sort_key(dl_val))
+
+        now = datetime.now(timezone.utc)
+        row_m = self.climate.month(row["city"], (now.month % 12) + 1)
+        if row_m is not None:
+            colors = highlight_colors(row_m["avg_day_f"], row_m["sunny_day"], row_m["day_length_hrs"])
+        else:
+            colors = highlight_colors(float('nan'), float('nan'), float('nan'))
+        return row["city"], keys, (texts, colors)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
             return None
-        data = r.json()
-        if data is None:
+        city, keys, (texts, colors) = self.entries[index.row()]
+        col = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return texts[col]
+        if role == SORT_ROLE:
+            return keys[col]
+        if role == Qt.ItemDataRole.UserRole:
+            return city
+        if role == Qt.ItemDataRole.BackgroundRole:
+            return QBrush(colors[0])
+        if role == Qt.ItemDataRole.ForegroundRole:
+            return QBrush(colors[1])
+        if role == Qt.ItemDataRole.FontRole and col == 1:
+            return self.city_font
+        return None
+
+class MonthlyCalendarModel(SortedRowsModel):
+    """One row per city in the ClimateCube; month cells sort by that month's niceness."""
+
+    def __init__(self, climate, parent=None):
+        super().__init__(parent)
+        self.climate = climate
+        self.reload()
+
+    def reload(self):
+        cities = self.climate.cities()
+        nic = self.climate.metric("niceness")
+        keys = np.where(np.isnan(nic), -np.inf, nic).tolist()
+        self.beginResetModel()
+        self.entries = self._sorted([
+            (city, (CITY_COUNTRY.get(city, city), *month_keys), None)
+            for city, month_keys in zip(cities, keys)
+        ])
+        self.row_of = {}
+        self._reindex()
+        self.endResetModel()
+
+    def make_entry(self, city):
+        nic = self.climate.city_months(city)[:, METRIC_INDEX["niceness"]]
+        return city, (CITY_COUNTRY.get(city, city), *np.where(np.isnan(nic), -np.inf, nic).tolist()), None
+
+    def upsert_city(self, city):
+        """Refresh or append a city after the cube changed (removes it if the cube no longer has it)."""
+        if city in self.climate:
+            self.upsert(city)
+        else:
+            self.remove_city(city)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 13
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return "City" if section == 0 else month_name(section)
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
             return None
-        return {
-            "continent_code": data.get("continent_code"),
-            "country_a2": data.get("country_a2"), 
-            "country_a3": data.get("country_a3")
-        }
-    except Exception:
+        city, keys, _ = self.entries[index.row()]
+        col = index.column()
+        if role == Qt.ItemDataRole.UserRole:
+            return city
+        if role == SORT_ROLE:
+            return keys[col]
+        if col == 0:
+            if role == Qt.ItemDataRole.DisplayRole:
+                return keys[0]
+            if role == Qt.ItemDataRole.ForegroundRole:
+                return QBrush(Qt.GlobalColor.blue)
+            if role == Qt.ItemDataRole.FontRole:
+                return self.city_font
+            return None
+        if role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.BackgroundRole, Qt.ItemDataRole.ForegroundRole):
+            return None
+        # Columns follow climate_cube.METRICS.
+        avg_f, sunny, hrs, tmax, tmin, _ = self.climate.city_months(city)[col - 1].tolist()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return abbreviated_monthly_text(tmax, tmin, sunny)
+        background, foreground = highlight_colors(avg_f, sunny, hrs)
+        return QBrush(background if role == Qt.ItemDataRole.BackgroundRole else foreground)
+
+ADD_CITY_COMMANDS = ["all cities", "refresh stale cities"]
+CITY_SEARCH_LIMIT = 25
+
+
+def build_city_search_index(available=()):
+    """Commands, catalog and ZIP cities in memory; GeoNames through its compiled search index."""
+    index = CitySearchIndex(weather_sync.GEONAMES_SEARCH)
+    index.add(ADD_CITY_COMMANDS, TIER_COMMAND)
+    if os.path.exists(weather_sync.CATALOG_FILE):
+        try:
+            catalog = weather_sync.load_catalog(weather_sync.CATALOG_FILE)
+            index.add((c["db_city"] for c in catalog if c["db_city"]), TIER_CATALOG)
+        except Exception as e:
+            append_sync_log(f"City search: catalog not loaded ({e})")
+    index.add(ZIP_CITIES.keys(), TIER_ZIP)
+    index.set_available(available)
+    index.prepare()
+    return index
+
+
+class CitySearchModel(QAbstractListModel):
+    """Completer rows for the current Add City text, recomputed per keystroke by the search index."""
+
+    def __init__(self, index, parent=None):
+        super().__init__(parent)
+        self.search_index = index
+        self.matches = []
+
+    def set_query(self, text):
+        self.beginResetModel()
+        self.matches = self.search_index.search(text, CITY_SEARCH_LIMIT)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.matches)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return self.matches[index.row()]
         return None
 
+def make_sorted_view(model, row_height):
+    """
+    QTableView directly over a SortedRowsModel, styled like the old tables; header sorts go
+    to the model's sort(), one pass over the precomputed keys.
+    """
+    view = QTableView()
+    view.setModel(model)
+    view.setAlternatingRowColors(True)
+    view.verticalHeader().setDefaultSectionSize(row_height)
+    view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+    view.setCursor(QCursor(Qt.CursorShape.PointingHandCursor))
+    view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+    view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+    view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+    view.horizontalHeader().setSectionsMovable(True)
+    view.horizontalHeader().setSortIndicatorShown(True)
+    return view
+
 class WeatherApp(QWidget):
-    def __init__(self, current_data_list, monthly_dict, all_city_data, forecast_cache):
+    def __init__(self, current_data_list, climate, all_city_data, forecast_cache):
         super().__init__()
         self.setWindowTitle("Weather Overview")
 
         self.current_data_list = current_data_list
-        self.monthly_dict = monthly_dict
+        self.climate = climate
+        self.itinerary = ItineraryIndex(climate, ITINERARY_SIZE)
+        self._stale_itinerary_months = set()
+        self._removed_cities = set()
         self.all_city_data = all_city_data
         self.forecast_cache = forecast_cache
         self.current_detail_city = None
@@ -1285,7 +640,8 @@ class WeatherApp(QWidget):
         # Current Tab
         self.current_tab = QWidget()
         current_layout = QVBoxLayout()
-        self.current_table = self.create_current_table(self.current_data_list, self.monthly_dict)
+        self.current_model = CurrentWeatherModel(self.current_data_list, self.climate, self)
+        self.current_table = make_sorted_view(self.current_model, 30)
         current_layout.addWidget(self.current_table)
         self.current_tab.setLayout(current_layout)
 
@@ -1296,22 +652,23 @@ class WeatherApp(QWidget):
 
         self.current_table.horizontalHeader().sectionClicked.connect(self.on_current_header_clicked)
         self.current_table.horizontalHeader().sectionDoubleClicked.connect(self.on_current_header_double_clicked)
-        self.current_table.cellDoubleClicked.connect(self.on_current_table_double_click)
+        self.current_table.doubleClicked.connect(self.on_current_table_double_click)
         # Default sort by niceness descending
-        self.current_table.sortItems(0, Qt.SortOrder.DescendingOrder)
+        self.current_table.sortByColumn(0, Qt.SortOrder.DescendingOrder)
         self.last_sorted_column_current = 0
         self.last_sort_order_current = Qt.SortOrder.DescendingOrder
 
         # Monthly Tab
         self.monthly_tab = QWidget()
         monthly_layout = QVBoxLayout()
-        self.monthly_table = self.create_monthly_table(self.monthly_dict)
+        self.monthly_model = MonthlyCalendarModel(self.climate, self)
+        self.monthly_table = make_sorted_view(self.monthly_model, 50)
         monthly_layout.addWidget(self.monthly_table)
         self.monthly_tab.setLayout(monthly_layout)
 
         self.monthly_table.horizontalHeader().sectionClicked.connect(self.on_monthly_header_clicked)
         self.monthly_table.horizontalHeader().sectionDoubleClicked.connect(self.on_monthly_header_double_clicked)
-        self.monthly_table.cellDoubleClicked.connect(self.on_monthly_table_double_click)
+        self.monthly_table.doubleClicked.connect(self.on_monthly_table_double_click)
 
         # Detail Tab
         self.detail_tab = QWidget()
@@ -1347,14 +704,20 @@ class WeatherApp(QWidget):
         # Add a label to display "Updated as of" and forecast info
         self.itinerary_info_label = QLabel("")
         itinerary_info_layout = QHBoxLayout()
+        self.itinerary_size_spin = QSpinBox()
+        self.itinerary_size_spin.setRange(1, 50)
+        self.itinerary_size_spin.setValue(self.itinerary.n)
+        self.itinerary_size_spin.valueChanged.connect(self.on_itinerary_size_changed)
+        itinerary_info_layout.addWidget(QLabel("Cities per month:"))
+        itinerary_info_layout.addWidget(self.itinerary_size_spin)
         itinerary_info_layout.addStretch()
         itinerary_info_layout.addWidget(self.itinerary_info_label)
         itinerary_layout.addLayout(itinerary_info_layout)
         
         # Create the itinerary table
         self.itinerary_table = QTableWidget()
-        self.itinerary_table.setColumnCount(11)
-        itinerary_headers = ["Month"] + [f"Rank {i}" for i in range(1, 11)]
+        self.itinerary_table.setColumnCount(self.itinerary.n + 1)
+        itinerary_headers = ["Month"] + [f"Rank {i}" for i in range(1, self.itinerary.n + 1)]
         self.itinerary_table.setHorizontalHeaderLabels(itinerary_headers)
         self.itinerary_table.setRowCount(12)
         self.itinerary_table.setAlternatingRowColors(True)
@@ -1377,10 +740,16 @@ class WeatherApp(QWidget):
 
         add_city_layout = QHBoxLayout()
         self.city_input = QLineEdit()
-        all_keys = ["all cities", "refresh stale cities"] + list(ZIP_CITIES.keys())
-        completer = QCompleter(all_keys)
-        completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.city_search = build_city_search_index(self.climate)
+        # Open (or compile, the first time) the GeoNames search index before the first keystroke needs it.
+        threading.Thread(target=len, args=(weather_sync.GEONAMES_SEARCH,), daemon=True).start()
+        self.city_search_model = CitySearchModel(self.city_search, self)
+        # The model already holds only matches for the typed text, so the completer must not filter again.
+        completer = QCompleter(self.city_search_model, self)
+        completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        completer.setMaxVisibleItems(12)
         self.city_input.setCompleter(completer)
+        self.city_input.textEdited.connect(self.on_city_input_edited)
         self.add_city_button = QPushButton("Add City")
         self.add_city_button.clicked.connect(self.add_city)
 
@@ -1388,14 +757,37 @@ class WeatherApp(QWidget):
         add_city_layout.addWidget(self.city_input)
         add_city_layout.addWidget(self.add_city_button)
 
+        # Non-modal progress for the background sync (hidden when none is running)
+        self.sync_label = QLabel("")
+        self.sync_bar = QProgressBar()
+        self.sync_bar.setMaximumWidth(240)
+        self.sync_bar.hide()
+        add_city_layout.addWidget(self.sync_label)
+        add_city_layout.addWidget(self.sync_bar)
+        self.sync_thread = None
+        self.sync_worker = None
+        self._pending_climate = {}
+        self._pending_rows = {}
+        self._sync_flush_timer = QTimer(self)
+        self._sync_flush_timer.setSingleShot(True)
+        self._sync_flush_timer.setInterval(250)
+        self._sync_flush_timer.timeout.connect(self.flush_sync_results)
+        # Re-run the sync while the window is open so current conditions follow their own TTL;
+        # forecasts and the estimated baseline are only refetched when their tiers are due.
+        self._sync_city_list = None
+        self._current_refresh_timer = QTimer(self)
+        self._current_refresh_timer.setInterval(int(max(60.0, CURRENT_TTL_SEC) * 1000))
+        self._current_refresh_timer.timeout.connect(self.on_current_refresh_due)
+
         layout.addWidget(self.tab_widget)
         layout.addLayout(add_city_layout)
         self.setLayout(layout)
         self.resize(1600, 900)
 
         # Connect signals for table clicks
-        self.current_table.cellClicked.connect(self.on_current_table_click)
-        self.monthly_table.cellClicked.connect(self.on_monthly_table_click)
+        self.current_table.clicked.connect(self.on_current_table_click)
+        self.monthly_table.clicked.connect(self.on_monthly_table_click)
+        self.itinerary_table.cellClicked.connect(self.on_itinerary_table_click)
 
         # Make sure the app opens on the Current Weather tab
         self.tab_widget.setCurrentIndex(0)
@@ -1417,6 +809,7 @@ class WeatherApp(QWidget):
 
         # -- Initialize a dict to store continent/country lookups
         self.city_geo_info = {}
+        self.boundaries_missing = False
 
         # Load continent data now that we have current_data_list
         self.load_continent_data()
@@ -1424,11 +817,18 @@ class WeatherApp(QWidget):
         # Create the new Continent tab after data is loaded
         self.create_continent_tab()
 
+    def on_city_input_edited(self, text):
+        self.city_search_model.set_query(text)
+        if self.city_search_model.rowCount():
+            self.city_input.completer().complete()
+        else:
+            self.city_input.completer().popup().hide()
+
     def set_itinerary_label(self, text):
         self.itinerary_info_label.setText(text)
 
     def _city_already_loaded(self, city_name: str) -> bool:
-        if city_name in self.monthly_dict or city_name in self.all_city_data:
+        if city_name in self.climate or city_name in self.all_city_data:
             return True
         return any(r.get("city") == city_name for r in self.current_data_list)
 
@@ -1436,10 +836,10 @@ class WeatherApp(QWidget):
         if not self.current_detail_city:
             return
         city = self.current_detail_city
+        self._removed_cities.add(city)
         if city in self.all_city_data:
             del self.all_city_data[city]
-        if city in self.monthly_dict:
-            del self.monthly_dict[city]
+        self._stale_itinerary_months.update(self.itinerary.remove(city))
         self.current_data_list = [c for c in self.current_data_list if c["city"] != city]
         if city in self.forecast_cache:
             del self.forecast_cache[city]
@@ -1451,9 +851,8 @@ class WeatherApp(QWidget):
         # Remove from recent_cities
         self.recent_cities = [c for c in self.recent_cities if c != city]
 
-        self.refresh_current_table()
-        self.refresh_monthly_table()
-        self.refresh_itinerary_tab()
+        self.refresh_city_rows(city)
+        self.refresh_itinerary_months()
 
         # Update detail tab
         if self.recent_cities:
@@ -1470,25 +869,22 @@ class WeatherApp(QWidget):
 
         self.current_detail_city = None
 
-    def refresh_itinerary_tab(self):
-        monthly_data = {}
-        for city, mdf in self.monthly_dict.items():
-            monthly_data[city] = mdf.set_index("month")
-
-        top_cities_by_month = {}
-        for month in range(1,13):
-            city_scores = []
-            for city, mdf in monthly_data.items():
-                if month in mdf.index:
-                    nic = mdf.at[month, "niceness"]
-                    if not pd.isna(nic):
-                        city_scores.append((city, nic))
-            city_scores.sort(key=lambda x: x[1], reverse=True)
-            top_cities_by_month[month] = city_scores[:10]
+    def _set_city_climate(self, city_name, mdf):
+        """Store one city's monthly frame in the cube, score it and re-rank it in the itinerary index."""
+        self.climate.set_frame(city_name, mdf)
+        self.climate.rescore(names=[city_name])
+        self._stale_itinerary_months.update(self.itinerary.update(city_name))
 
+    def on_itinerary_size_changed(self, value):
+        self.itinerary.set_size(value)
+        self.refresh_itinerary_tab()
+
+    def refresh_itinerary_tab(self):
+        n = self.itinerary.n
+        self._stale_itinerary_months.clear()
         self.itinerary_table.clear()
-        self.itinerary_table.setColumnCount(11)
-        itinerary_headers = ["Month"] + [f"Rank {i}" for i in range(1, 11)]
+        self.itinerary_table.setColumnCount(n + 1)
+        itinerary_headers = ["Month"] + [f"Rank {i}" for i in range(1, n + 1)]
         self.itinerary_table.setHorizontalHeaderLabels(itinerary_headers)
         self.itinerary_table.setRowCount(12)
         self.itinerary_table.setAlternatingRowColors(True)
@@ -1501,30 +897,9 @@ class WeatherApp(QWidget):
         self.itinerary_table.horizontalHeader().setSectionsMovable(True)
         self.itinerary_table.setSizeAdjustPolicy(QAbstractScrollArea.SizeAdjustPolicy.AdjustToContents)
 
-        if any(top_cities_by_month.values()):
-            for i, mon in enumerate(range(1, 13)):
-                month_item = QTableWidgetItem(month_name(mon))
-                self.itinerary_table.setItem(i, 0, month_item)
-                for col_clear in range(1,11):
-                    self.itinerary_table.setItem(i, col_clear, None)
-
-                for j, (city, nic_val) in enumerate(top_cities_by_month[mon], start=1):
-                    row_m = monthly_data[city].loc[mon] if (city in monthly_data and mon in monthly_data[city].index) else None
-                    if row_m is not None:
-                        avg_f = row_m["avg_day_f"]
-                        sunny = row_m["sunny_day"]
-                        hrs = row_m["day_length_hrs"]
-                    else:
-                        avg_f, sunny, hrs = float('nan'), float('nan'), float('nan')
-                    city_str = f"{CITY_COUNTRY.get(city, city)} ({nic_val:.2f})"
-                    city_item = QTableWidgetItem(city_str)
-                    city_item.setData(Qt.ItemDataRole.UserRole, city)
-                    city_item.setForeground(QBrush(Qt.GlobalColor.blue))
-                    font = city_item.font()
-                    font.setUnderline(True)
-                    city_item.setFont(font)
-                    highlight_cell(city_item, avg_f, sunny, hrs)
-                    self.itinerary_table.setItem(i, j, city_item)
+        if any(self.itinerary.top(mon) for mon in range(1, 13)):
+            for mon in range(1, 13):
+                self._render_itinerary_month(mon)
         else:
             self.itinerary_table.setRowCount(1)
             self.itinerary_table.setColumnCount(1)
@@ -1532,157 +907,45 @@ class WeatherApp(QWidget):
             no_data_item = QTableWidgetItem("No itinerary data available.")
             self.itinerary_table.setItem(0, 0, no_data_item)
 
-        self.itinerary_table.cellClicked.connect(self.on_itinerary_table_click)
-
-    def abbreviated_monthly_text(self, tmax, tmin, sunny):
-        tmax_str = "N/A" if pd.isna(tmax) else f"{tmax:.0f}"
-        tmin_str = "N/A" if pd.isna(tmin) else f"{tmin:.0f}"
-        sunny_str = "N/A" if pd.isna(sunny) else f"{int(sunny)}/30"
-        return f"High: {tmax_str}F Low: {tmin_str}F Sun: {sunny_str}"
-
-    def create_current_table(self, data, monthly_dict):
-        # New headers order: Niceness, City, Temp, Sunny Next 16 Days, Sunny Next 30 Days, Day Length
-        headers = ["Niceness","City","Temp (H/DL/L)","Sunny Next 16 Days","Sunny Next 30 Days","Day Length"]
-        table = QTableWidget()
-        table.setColumnCount(len(headers))
-        table.setHorizontalHeaderLabels(headers)
-        table.setRowCount(len(data))
-        table.setAlternatingRowColors(True)
-        table.verticalHeader().setDefaultSectionSize(30)
-        table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
-        table.setCursor(QCursor(Qt.CursorShape.PointingHandCursor))
-        table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
-        table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
-        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        table.horizontalHeader().setSectionsMovable(True)
-        now = datetime.now(timezone.utc)
-        next_month = (now.month % 12) + 1
-
-        for i, row in enumerate(data):
-            tmax_f = row.get("tmax_f", float('nan'))
-            tmin_f = row.get("tmin_f", float('nan'))
-            daytime_low = (tmax_f + tmin_f)/2 if not pd.isna(tmax_f) and not pd.isna(tmin_f) else float('nan')
-            if pd.isna(tmax_f) or pd.isna(tmin_f):
-                triple_str = "N/A"
-                triple_val = float('nan')
-            else:
-                triple_str = f"{tmax_f:.0f}F/{daytime_low:.0f}F/{tmin_f:.0f}F"
-                triple_val = (tmax_f + daytime_low + tmin_f)/3.0
-
-            nice_val = row["niceness"]
-            nice_str = f"{nice_val:.2f}" if not pd.isna(nice_val) else "N/A"
-            nice_item = NumericTableWidgetItem(nice_val)
-            nice_item.setText(nice_str)
-
-            city_text = CITY_COUNTRY.get(row["city"], row["city"])
-            city_item = QTableWidgetItem(city_text)
-            city_item.setData(Qt.ItemDataRole.UserRole, row["city"])
-            city_item.setForeground(QBrush(Qt.GlobalColor.blue))
-            font = city_item.font()
-            font.setUnderline(True)
-            city_item.setFont(font)
-
-            forecast_sunny_count = row.get("forecast_sunny_count", 0)
-            forecast_item = NumericTableWidgetItem(forecast_sunny_count)
-            forecast_item.setText(str(forecast_sunny_count))
-
-            s_val = row["next_month_sunny_days"]
-            s_display = f"{s_val:.0f}" if not pd.isna(s_val) else "N/A"
-            next_30_item = NumericTableWidgetItem(s_val)
-            next_30_item.setText(s_display)
-
-            dl_val = row.get("est_next_month_day_length", float('nan'))
-            dl_display = f"{dl_val:.0f}" if not pd.isna(dl_val) else "N/A"
-            dl_item = NumericTableWidgetItem(dl_val)
-            dl_item.setText(dl_display)
-
-            triple_item = NumericTableWidgetItem(triple_val)
-            triple_item.setText(triple_str)
-
-            table.setItem(i, 0, nice_item)
-            table.setItem(i, 1, city_item)
-            table.setItem(i, 2, triple_item)
-            table.setItem(i, 3, forecast_item)
-            table.setItem(i, 4, next_30_item)
-            table.setItem(i, 5, dl_item)
-
-            mdf = monthly_dict.get(row["city"], pd.DataFrame())
-            row_m = mdf[mdf["month"] == next_month]
-            if not row_m.empty:
-                avg_f = row_m["avg_day_f"].iloc[0]
-                sunny_v = row_m["sunny_day"].iloc[0]
-                hrs = row_m["day_length_hrs"].iloc[0]
+    def refresh_itinerary_months(self):
+        """Redraw only the month rows whose top N changed since the last render."""
+        months = sorted(self._stale_itinerary_months)
+        self._stale_itinerary_months.clear()
+        if self.itinerary_table.columnCount() != self.itinerary.n + 1 or self.itinerary_table.rowCount() != 12:
+            self.refresh_itinerary_tab()
+            return
+        for mon in months:
+            self._render_itinerary_month(mon)
+
+    def _render_itinerary_month(self, mon):
+        i = mon - 1
+        month_item = QTableWidgetItem(month_name(mon))
+        self.itinerary_table.setItem(i, 0, month_item)
+        for col_clear in range(1, self.itinerary.n + 1):
+            self.itinerary_table.setItem(i, col_clear, None)
+
+        for j, (city, nic_val) in enumerate(self.itinerary.top(mon), start=1):
+            row_m = self.climate.month(city, mon)
+            if row_m is not None:
+                avg_f = row_m["avg_day_f"]
+                sunny = row_m["sunny_day"]
+                hrs = row_m["day_length_hrs"]
             else:
-                avg_f, sunny_v, hrs = float('nan'), float('nan'), float('nan')
-
-            for c in range(table.columnCount()):
-                it = table.item(i, c)
-                if it:
-                    highlight_cell(it, avg_f, sunny_v, hrs)
-
-        table.setSortingEnabled(True)
-        return table
-
-    def create_monthly_table(self, data):
-        headers = ["City"] + [month_name(m) for m in range(1,13)]
-        table = QTableWidget()
-        table.setColumnCount(len(headers))
-        table.setHorizontalHeaderLabels(headers)
-        table.setRowCount(len(data))
-        table.setAlternatingRowColors(True)
-        table.verticalHeader().setDefaultSectionSize(50)
-        table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
-        table.setCursor(QCursor(Qt.CursorShape.PointingHandCursor))
-        table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
-        table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
-        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        table.horizontalHeader().setSectionsMovable(True)
-
-        city_list = list(data.keys())
-        for i, city in enumerate(city_list):
-            monthly_df = data[city]
-            city_item = QTableWidgetItem(CITY_COUNTRY.get(city, city))
+                avg_f, sunny, hrs = float('nan'), float('nan'), float('nan')
+            city_str = f"{CITY_COUNTRY.get(city, city)} ({nic_val:.2f})"
+            city_item = QTableWidgetItem(city_str)
             city_item.setData(Qt.ItemDataRole.UserRole, city)
             city_item.setForeground(QBrush(Qt.GlobalColor.blue))
             font = city_item.font()
             font.setUnderline(True)
             city_item.setFont(font)
-            table.setItem(i, 0, city_item)
-
-            for col, m in enumerate(range(1,13), start=1):
-                row_m = monthly_df[monthly_df["month"] == m]
-                if row_m.empty:
-                    item = NumericTableWidgetItem(float('nan'))
-                    item.setText("N/A")
-                    table.setItem(i, col, item)
-                else:
-                    tmax = row_m["tmax_mean"].iloc[0]
-                    tmin = row_m["tmin_mean"].iloc[0]
-                    sunny = row_m["sunny_day"].iloc[0]
-                    avg_f = row_m["avg_day_f"].iloc[0]
-                    hrs = row_m["day_length_hrs"].iloc[0]
-                    
-                    # Retrieve niceness score for this month
-                    niceness = row_m["niceness"].iloc[0]
-    
-                    txt = self.abbreviated_monthly_text(tmax, tmin, sunny)
-                    # Now we use niceness as the value to sort by instead of avg_f:
-                    sort_val = niceness  
-                    item = NumericTableWidgetItem(sort_val)
-                    item.setText(txt)
-                    highlight_cell(item, avg_f, sunny, hrs)
-                    fitem = item.font()
-                    fitem.setBold(False)
-                    item.setFont(fitem)
-                    table.setItem(i, col, item)
-    
-        table.setSortingEnabled(True)
-        return table
+            highlight_cell(city_item, avg_f, sunny, hrs)
+            self.itinerary_table.setItem(i, j, city_item)
 
     @pyqtSlot(int)
     def on_current_header_clicked(self, col):
         # For simplicity, just toggle descending by default on single click
-        self.current_table.sortItems(col, Qt.SortOrder.DescendingOrder)
+        self.current_table.sortByColumn(col, Qt.SortOrder.DescendingOrder)
         self.last_sorted_column_current = col
         self.last_sort_order_current = Qt.SortOrder.DescendingOrder
 
@@ -1690,75 +953,67 @@ class WeatherApp(QWidget):
     def on_current_header_double_clicked(self, col):
         # double click toggles order
         if self.last_sorted_column_current == col and self.last_sort_order_current == Qt.SortOrder.DescendingOrder:
-            self.current_table.sortItems(col, Qt.SortOrder.AscendingOrder)
+            self.current_table.sortByColumn(col, Qt.SortOrder.AscendingOrder)
             self.last_sort_order_current = Qt.SortOrder.AscendingOrder
         else:
             if self.last_sorted_column_current == col and self.last_sort_order_current == Qt.SortOrder.AscendingOrder:
-                self.current_table.sortItems(col, Qt.SortOrder.DescendingOrder)
+                self.current_table.sortByColumn(col, Qt.SortOrder.DescendingOrder)
                 self.last_sort_order_current = Qt.SortOrder.DescendingOrder
             else:
-                self.current_table.sortItems(col, Qt.SortOrder.AscendingOrder)
+                self.current_table.sortByColumn(col, Qt.SortOrder.AscendingOrder)
                 self.last_sorted_column_current = col
                 self.last_sort_order_current = Qt.SortOrder.AscendingOrder
 
     @pyqtSlot(int)
     def on_monthly_header_clicked(self, col):
-        self.monthly_table.sortItems(col, Qt.SortOrder.DescendingOrder)
+        self.monthly_table.sortByColumn(col, Qt.SortOrder.DescendingOrder)
         self.last_sorted_column_monthly = col
         self.last_sort_order_monthly = Qt.SortOrder.DescendingOrder
 
     @pyqtSlot(int)
     def on_monthly_header_double_clicked(self, col):
         if self.last_sorted_column_monthly == col and self.last_sort_order_monthly == Qt.SortOrder.DescendingOrder:
-            self.monthly_table.sortItems(col, Qt.SortOrder.AscendingOrder)
+            self.monthly_table.sortByColumn(col, Qt.SortOrder.AscendingOrder)
             self.last_sort_order_monthly = Qt.SortOrder.AscendingOrder
         else:
             if self.last_sorted_column_monthly == col and self.last_sort_order_monthly == Qt.SortOrder.AscendingOrder:
-                self.monthly_table.sortItems(col, Qt.SortOrder.DescendingOrder)
+                self.monthly_table.sortByColumn(col, Qt.SortOrder.DescendingOrder)
                 self.last_sort_order_monthly = Qt.SortOrder.DescendingOrder
             else:
-                self.monthly_table.sortItems(col, Qt.SortOrder.AscendingOrder)
+                self.monthly_table.sortByColumn(col, Qt.SortOrder.AscendingOrder)
                 self.last_sorted_column_monthly = col
                 self.last_sort_order_monthly = Qt.SortOrder.AscendingOrder
 
-    @pyqtSlot(int,int)
-    def on_monthly_table_double_click(self, row, column):
-        city_item = self.monthly_table.item(row, 0)
-        if city_item:
-            city_key = city_item.data(Qt.ItemDataRole.UserRole)
-            if city_key in self.monthly_dict:
-                self.show_city_detail(city_key)
+    @pyqtSlot(QModelIndex)
+    def on_monthly_table_double_click(self, index):
+        city_key = index.data(Qt.ItemDataRole.UserRole)
+        if city_key in self.climate:
+            self.show_city_detail(city_key)
 
-    @pyqtSlot(int,int)
-    def on_current_table_double_click(self, row, column):
-        city_item = self.current_table.item(row, 1)
-        if city_item:
-            city_key = city_item.data(Qt.ItemDataRole.UserRole)
-            if city_key in self.monthly_dict:
-                self.show_city_detail(city_key)
+    @pyqtSlot(QModelIndex)
+    def on_current_table_double_click(self, index):
+        city_key = index.data(Qt.ItemDataRole.UserRole)
+        if city_key in self.climate:
+            self.show_city_detail(city_key)
 
-    @pyqtSlot(int,int)
-    def on_current_table_click(self, row, column):
+    @pyqtSlot(QModelIndex)
+    def on_current_table_click(self, index):
         # city column = 1 now
-        if column == 1:
-            city_item = self.current_table.item(row, column)
-            if city_item is not None:
-                city_key = city_item.data(Qt.ItemDataRole.UserRole)
-                if city_key in self.monthly_dict:
-                    self.show_city_detail(city_key)
-                else:
-                    self.update_detail_tab("<b>No monthly data found for this city.</b>", enable_remove=False)
+        if index.column() == 1:
+            city_key = index.data(Qt.ItemDataRole.UserRole)
+            if city_key in self.climate:
+                self.show_city_detail(city_key)
+            else:
+                self.update_detail_tab("<b>No monthly data found for this city.</b>", enable_remove=False)
 
-    @pyqtSlot(int,int)
-    def on_monthly_table_click(self, row, column):
-        if column == 0:
-            city_item = self.monthly_table.item(row, column)
-            if city_item is not None:
-                city_key = city_item.data(Qt.ItemDataRole.UserRole)
-                if city_key in self.monthly_dict:
-                    self.show_city_detail(city_key)
-                else:
-                    self.update_detail_tab("<b>No monthly data found for this city.</b>", enable_remove=False)
+    @pyqtSlot(QModelIndex)
+    def on_monthly_table_click(self, index):
+        if index.column() == 0:
+            city_key = index.data(Qt.ItemDataRole.UserRole)
+            if city_key in self.climate:
+                self.show_city_detail(city_key)
+            else:
+                self.update_detail_tab("<b>No monthly data found for this city.</b>", enable_remove=False)
 
     @pyqtSlot(int,int)
     def on_itinerary_table_click(self, row, column):
@@ -1766,7 +1021,7 @@ class WeatherApp(QWidget):
             item = self.itinerary_table.item(row, column)
             if item is not None:
                 city_key = item.data(Qt.ItemDataRole.UserRole)
-                if city_key and city_key in self.monthly_dict:
+                if city_key and city_key in self.climate:
                     self.show_city_detail(city_key)
                 else:
                     self.update_detail_tab("<b>No monthly data found for this city.</b>", enable_remove=False)
@@ -1779,6 +1034,20 @@ class WeatherApp(QWidget):
         self.detail_label.setText(text)
         self.remove_city_button.setEnabled(enable_remove)
 
+    def save_interest(self):
+        """Hand pinned and recently viewed cities to the sync scheduler when they change."""
+        lists = ([self.pinned_city] if self.pinned_city else [], self.recent_cities[-fetch_scheduler.RECENT_KEEP:])
+        if lists == getattr(self, "_saved_interest", None):
+            return
+        conn = get_db_conn(DATABASE)
+        try:
+            fetch_scheduler.save_interest(conn, pinned=lists[0], recent=lists[1])
+            self._saved_interest = (list(lists[0]), list(lists[1]))
+        except Exception as e:
+            append_sync_log(f"Could not save city interest: {e}")
+        finally:
+            conn.close()
+
     def show_city_detail(self, city):
         self.current_detail_city = city
         self.remove_city_button.setEnabled(True)
@@ -1787,6 +1056,7 @@ class WeatherApp(QWidget):
         if city in self.recent_cities:
             self.recent_cities.remove(city)
         self.recent_cities.append(city)
+        self.save_interest()
 
         for i in reversed(range(self.detail_layout.count())):
             widget = self.detail_layout.itemAt(i).widget()
@@ -1820,8 +1090,7 @@ class WeatherApp(QWidget):
 
         now = datetime.now(timezone.utc)
         next_month = (now.month % 12) + 1
-        mdf = self.monthly_dict.get(city, pd.DataFrame())
-        row_m = mdf[mdf["month"]==next_month]
+        row_m = self.climate.month(city, next_month)
 
         summary_box = QGroupBox()
         font = summary_box.font()
@@ -1845,7 +1114,7 @@ class WeatherApp(QWidget):
             if sunny_str != "N/A":
                 sunny_str = f"{sunny_str}/30"
 
-            dl_val = row_m["day_length_hrs"].iloc[0] if not row_m.empty else cur_data.get("est_next_month_day_length", 12.0)
+            dl_val = row_m["day_length_hrs"] if row_m is not None else cur_data.get("est_next_month_day_length", 12.0)
             dl_str = fmt_or_na(dl_val)
             nic_val = cur_data["niceness"]
             nic_str = "N/A" if pd.isna(nic_val) else f"{nic_val:.2f}"
@@ -1905,78 +1174,68 @@ class WeatherApp(QWidget):
         monthly_box.setFont(font)
         monthly_box_layout = QVBoxLayout()
 
-        if city in self.monthly_dict:
-            mdf = self.monthly_dict[city]
-            if mdf.empty:
-                no_data_label = QLabel("No monthly data available.")
-                monthly_box_layout.addWidget(no_data_label)
+        if city in self.climate:
+            current_month = datetime.now(timezone.utc).month
+            row_m = self.climate.month(city, current_month)
+            avg_f = row_m["avg_day_f"]
+            sunny = row_m["sunny_day"]
+            hrs = row_m["day_length_hrs"]
+            tmax = row_m["tmax_mean"]
+            tmin = row_m["tmin_mean"]
+
+            # Create a container widget for the month data with only outer border
+            month_container = QWidget()
+            month_layout = QVBoxLayout()
+            month_container.setLayout(month_layout)
+
+            month_label = QLabel(month_name(current_month))
+            month_font = QFont()
+            month_font.setPointSize(30)
+            month_font.setBold(True)
+            month_label.setFont(month_font)
+            month_layout.addWidget(month_label)
+
+            data_font = QFont()
+            data_font.setPointSize(30)
+
+            temp_label = QLabel(f"High/Low: {tmax:.0f}F / {tmin:.0f}F")
+            temp_label.setFont(data_font)
+            month_layout.addWidget(temp_label)
+
+            sunny_label = QLabel(f"Average Sunny Days: {sunny:.0f}/30")
+            sunny_label.setFont(data_font)
+            month_layout.addWidget(sunny_label)
+
+            length_label = QLabel(f"Day Length: {hrs:.1f} hours")
+            length_label.setFont(data_font)
+            month_layout.addWidget(length_label)
+
+            # Set background color based on temperature and conditions
+            # Modified to only have outer border
+            base_style = """
+                QWidget {
+                    border: 2px solid black;
+                    padding: 10px;
+                    %s
+                }
+                QLabel {
+                    border: none;
+                    %s
+                }
+            """
+
+            if is_nice_strict(avg_f, sunny, hrs):
+                month_container.setStyleSheet(base_style % ("background-color: #FFFF00;", ""))
+            elif is_nice_light(avg_f, sunny, hrs):
+                month_container.setStyleSheet(base_style % ("background-color: #FFFFE0;", ""))
+            elif avg_f > 90:
+                month_container.setStyleSheet(base_style % ("background-color: #FF0000;", "color: white;"))
+            elif avg_f < 50:
+                month_container.setStyleSheet(base_style % ("background-color: #0000FF;", "color: white;"))
             else:
-                current_month = datetime.now(timezone.utc).month
-                row_m = mdf[mdf["month"] == current_month]
-                
-                if not row_m.empty:
-                    avg_f = row_m["avg_day_f"].iloc[0]
-                    sunny = row_m["sunny_day"].iloc[0]
-                    hrs = row_m["day_length_hrs"].iloc[0]
-                    tmax = row_m["tmax_mean"].iloc[0]
-                    tmin = row_m["tmin_mean"].iloc[0]
-
-                    # Create a container widget for the month data with only outer border
-                    month_container = QWidget()
-                    month_layout = QVBoxLayout()
-                    month_container.setLayout(month_layout)
-
-                    month_label = QLabel(month_name(current_month))
-                    month_font = QFont()
-                    month_font.setPointSize(30)
-                    month_font.setBold(True)
-                    month_label.setFont(month_font)
-                    month_layout.addWidget(month_label)
-
-                    data_font = QFont()
-                    data_font.setPointSize(30)
-
-                    temp_label = QLabel(f"High/Low: {tmax:.0f}F / {tmin:.0f}F")
-                    temp_label.setFont(data_font)
-                    month_layout.addWidget(temp_label)
-
-                    sunny_label = QLabel(f"Average Sunny Days: {sunny:.0f}/30")
-                    sunny_label.setFont(data_font)
-                    month_layout.addWidget(sunny_label)
-
-                    length_label = QLabel(f"Day Length: {hrs:.1f} hours")
-                    length_label.setFont(data_font)
-                    month_layout.addWidget(length_label)
-
-                    # Set background color based on temperature and conditions
-                    # Modified to only have outer border
-                    base_style = """
-                        QWidget {
-                            border: 2px solid black;
-                            padding: 10px;
-                            %s
-                        }
-                        QLabel {
-                            border: none;
-                            %s
-                        }
-                    """
-
-                    if is_nice_strict(avg_f, sunny, hrs):
-                        month_container.setStyleSheet(base_style % ("background-color: #FFFF00;", ""))
-                    elif is_nice_light(avg_f, sunny, hrs):
-                        month_container.setStyleSheet(base_style % ("background-color: #FFFFE0;", ""))
-                    elif avg_f > 90:
-                        month_container.setStyleSheet(base_style % ("background-color: #FF0000;", "color: white;"))
-                    elif avg_f < 50:
-                        month_container.setStyleSheet(base_style % ("background-color: #0000FF;", "color: white;"))
-                    else:
-                        month_container.setStyleSheet(base_style % ("background-color: white;", ""))
+                month_container.setStyleSheet(base_style % ("background-color: white;", ""))
 
-                    monthly_box_layout.addWidget(month_container)
-                else:
-                    no_data_label = QLabel("No data available for current month.")
-                    monthly_box_layout.addWidget(no_data_label)
+            monthly_box_layout.addWidget(month_container)
         else:
             no_data_label = QLabel("No monthly data found for this city.")
             monthly_box_layout.addWidget(no_data_label)
@@ -2028,6 +1287,8 @@ class WeatherApp(QWidget):
             added = 0
             already_present = 0
             failed = 0
+            resolved = resolve_zip_cities(allow_network=False)
+            print(f"Geocoded {resolved} ZIP cities locally")
             for idx, c in enumerate(reversed(list(ZIP_CITIES.keys())), start=1):
                 before_count = len(self.current_data_list)
                 try:
@@ -2052,9 +1313,9 @@ class WeatherApp(QWidget):
             # Refresh once at the end to avoid excessive UI churn and crashes.
             self.refresh_current_table()
             self.refresh_monthly_table()
-            self.refresh_itinerary_tab()
+            self.refresh_itinerary_months()
             save_forecast_cache(self.forecast_cache)
-            save_all_cities_ui_cache(self.current_data_list, self.monthly_dict)
+            save_all_cities_ui_cache(self.current_data_list, self.climate)
 
             summary = (
                 f"All-cities run finished.\n\n"
@@ -2079,22 +1340,15 @@ class WeatherApp(QWidget):
         elif coords := get_city_coords(city_name):
             pass
         
-        # 3. Check ZIP_CITIES and geocode if needed
+        # 3. Check ZIP_CITIES and geocode if needed (local indexes first, network as fallback)
         elif city_name in ZIP_CITIES:
             if ZIP_CITIES[city_name] is None:
+                conn = get_db_conn(DATABASE)
                 try:
-                    url = f"https://geocoding-api.open-meteo.com/v1/search?name={city_name}&count=1"
-                    r = requests.get(url)
-                    r.raise_for_status()
-                    data = r.json()
-                    if data.get("results"):
-                        result = data["results"][0]
-                        coords = (result["latitude"], result["longitude"])
-                        ZIP_CITIES[city_name] = coords
-                except Exception:
-                    pass
-            else:
-                coords = ZIP_CITIES[city_name]
+                    ZIP_CITIES[city_name] = GEOCODER.resolve(conn, city_name)
+                finally:
+                    conn.close()
+            coords = ZIP_CITIES[city_name]
         
         if not coords:
             QMessageBox.warning(self, "Error", f"Could not find coordinates for {city_name}")
@@ -2107,40 +1361,24 @@ class WeatherApp(QWidget):
 
         conn = get_db_conn(DATABASE)
         try:
-            if not have_data_for_city(conn, city_name):
-                df = fetch_estimated_history(lat, lon, START_DATE, END_DATE, city=city_name)
-                if not df.empty:
-                    store_data(conn, city_name, df)
-                    self.all_city_data[city_name] = df
-                else:
-                    QMessageBox.warning(self, "Error", f"No Visual Crossing historical data for {city_name}")
-                    return
-            else:
-                df = load_data_from_db(conn, city_name)
-                self.all_city_data[city_name] = df
+            ranges = estimated_ranges_to_fetch(conn, city_name)
+            if ranges:
+                df_new = fetch_estimated_ranges(lat, lon, ranges, city=city_name)
+                if not df_new.empty:
+                    store_data(conn, city_name, df_new)
+            df = load_data_from_db(conn, city_name)
+            if df.empty:
+                QMessageBox.warning(self, "Error", f"No Visual Crossing historical data for {city_name}")
+                return
+            self.all_city_data[city_name] = df
         finally:
             conn.close()
 
-        mdf = monthly_aggregates(self.all_city_data[city_name])
-        mdf["niceness"] = mdf.apply(
-            lambda r: compute_city_niceness(
-                r["tmax_mean"], 
-                r["tmin_mean"], 
-                r["sunny_day"], 
-                r["day_length_hrs"]
-            ), 
-            axis=1
-        )  # ← Make sure this closing parenthesis is here
-
-        self.monthly_dict[city_name] = mdf
+        self._set_city_climate(city_name, monthly_aggregates(self.all_city_data[city_name]))
 
         today = datetime.now(timezone.utc)
         next_month = (today.month % 12) + 1
-        target_month_row = mdf[mdf["month"]==next_month]
-        if target_month_row.empty:
-            historical_sunny_avg = 15.0
-        else:
-            historical_sunny_avg = target_month_row["sunny_day"].iloc[0]
+        historical_sunny_avg = self.climate.value(city_name, next_month, "sunny_day", 15.0)
 
         if city_name in self.forecast_cache:
             fore_json = self.forecast_cache[city_name]['fore_json']
@@ -2148,12 +1386,7 @@ class WeatherApp(QWidget):
         else:
             try:
                 fore_json, cur_json = _fetch_visualcrossing_forecast_bundle(lat, lon, days=16, city=city_name)
-                self.forecast_cache[city_name] = {
-                    'fore_json': fore_json,
-                    'cur_json': cur_json,
-                    'time': datetime.now(timezone.utc),
-                    'provider': WEATHER_PROVIDER,
-                }
+                self.forecast_cache[city_name] = forecast_cache_entry(fore_json, cur_json)
             except:
                 fore_json = {}
                 cur_json = {}
@@ -2206,11 +1439,7 @@ class WeatherApp(QWidget):
             next_month_sunny_days = historical_sunny_avg
         next_month_sunny_days = max(0.0, min(float(next_month_sunny_days), 30.0))
 
-        row_m = mdf[mdf["month"] == next_month]
-        if not row_m.empty:
-            est_next_month_day_length = row_m["day_length_hrs"].iloc[0]
-        else:
-            est_next_month_day_length = 12.0
+        est_next_month_day_length = self.climate.value(city_name, next_month, "day_length_hrs", 12.0)
 
         ref_temp = (tmax_f+tmin_f)/2 if not pd.isna(tmax_f) and not pd.isna(tmin_f) else current_temp_f
         niceness = compute_niceness(ref_temp, next_month_sunny_days, est_next_month_day_length)
@@ -2229,9 +1458,8 @@ class WeatherApp(QWidget):
         self.current_data_list.append(new_city_current)
         save_forecast_cache(self.forecast_cache)
 
-        self.refresh_current_table()
-        self.refresh_monthly_table()
-        self.refresh_itinerary_tab()
+        self.refresh_city_rows(city_name)
+        self.refresh_itinerary_months()
 
         QMessageBox.information(self, "Success", f"City {city_name} added successfully!")
         self.show_city_detail(city_name)
@@ -2241,32 +1469,21 @@ class WeatherApp(QWidget):
             return
 
         # Check if it's a full city,country string from ALL_CITIES
-        if city_name in ALL_CITIES:
+        if city_name not in CITY_COORDS and city_name in ALL_CITIES:
             lat, lon = ALL_CITIES[city_name]
         else:
             # Check if it's in ZIP_CITIES
             if city_name in ZIP_CITIES:
                 # If we don't have coordinates yet, we need to fetch them
                 if ZIP_CITIES[city_name] is None:
-                    if not allow_network:
-                        return
-                    # Use a geocoding service to get coordinates
+                    conn = get_db_conn(DATABASE)
                     try:
-                        url = f"https://geocoding-api.open-meteo.com/v1/search?name={city_name}&count=1"
-                        r = requests.get(url)
-                        r.raise_for_status()
-                        data = r.json()
-                        if data.get("results"):
-                            result = data["results"][0]
-                            lat = result["latitude"]
-                            lon = result["longitude"]
-                            ZIP_CITIES[city_name] = (lat, lon)
-                        else:
-                            return
-                    except Exception as e:
+                        ZIP_CITIES[city_name] = GEOCODER.resolve(conn, city_name, allow_network=allow_network)
+                    finally:
+                        conn.close()
+                    if ZIP_CITIES[city_name] is None:
                         return
-                else:
-                    lat, lon = ZIP_CITIES[city_name]
+                lat, lon = ZIP_CITIES[city_name]
             else:
                 # Check if it's a simple city name from CITY_COORDS
                 city_key = next((k for k in CITY_COORDS.keys() if k.lower() == city_name.lower()), None)
@@ -2280,19 +1497,21 @@ class WeatherApp(QWidget):
         mdf = None
         conn = get_db_conn(DATABASE)
         try:
-            if not have_data_for_city(conn, city_name):
+            ranges = estimated_ranges_to_fetch(conn, city_name)
+            if ranges:
                 if not allow_network:
                     return
                 try:
-                    df = fetch_estimated_history(lat, lon, START_DATE, END_DATE, city=city_name)
-                    if not df.empty:
-                        store_data(conn, city_name, df)
-                        self.all_city_data[city_name] = df
-                    else:
-                        return
+                    df_new = fetch_estimated_ranges(lat, lon, ranges, city=city_name)
+                    if not df_new.empty:
+                        store_data(conn, city_name, df_new)
                 except requests.exceptions.RequestException:
                     # Silently fail on request errors
                     return
+                df = load_data_from_db(conn, city_name)
+                if df.empty:
+                    return
+                self.all_city_data[city_name] = df
             else:
                 if allow_network:
                     df = load_data_from_db(conn, city_name)
@@ -2306,25 +1525,11 @@ class WeatherApp(QWidget):
 
         if mdf is None:
             mdf = monthly_aggregates(self.all_city_data[city_name])
-        mdf["niceness"] = mdf.apply(
-            lambda r: compute_city_niceness(
-                r["tmax_mean"], 
-                r["tmin_mean"], 
-                r["sunny_day"], 
-                r["day_length_hrs"]
-            ), 
-            axis=1
-        )  # ← Make sure this closing parenthesis is here
-
-        self.monthly_dict[city_name] = mdf
+        self._set_city_climate(city_name, mdf)
 
         today = datetime.now(timezone.utc)
         next_month = (today.month % 12) + 1
-        target_month_row = mdf[mdf["month"]==next_month]
-        if target_month_row.empty:
-            historical_sunny_avg = 15.0
-        else:
-            historical_sunny_avg = target_month_row["sunny_day"].iloc[0]
+        historical_sunny_avg = self.climate.value(city_name, next_month, "sunny_day", 15.0)
 
         if city_name in self.forecast_cache:
             fore_json = self.forecast_cache[city_name]['fore_json']
@@ -2336,12 +1541,7 @@ class WeatherApp(QWidget):
             else:
                 try:
                     fore_json, cur_json = _fetch_visualcrossing_forecast_bundle(lat, lon, days=16, city=city_name)
-                    self.forecast_cache[city_name] = {
-                        'fore_json': fore_json,
-                        'cur_json': cur_json,
-                        'time': datetime.now(timezone.utc),
-                        'provider': WEATHER_PROVIDER,
-                    }
+                    self.forecast_cache[city_name] = forecast_cache_entry(fore_json, cur_json)
                 except:
                     fore_json = {}
                     cur_json = {}
@@ -2402,11 +1602,7 @@ class WeatherApp(QWidget):
             next_month_sunny_days = historical_sunny_avg
         next_month_sunny_days = max(0.0, min(float(next_month_sunny_days), 30.0))
 
-        row_m = self.monthly_dict[city_name][
-            self.monthly_dict[city_name]["month"] == next_month
-        ]
-        if not row_m.empty:
-            est_next_month_day_length = row_m["day_length_hrs"].iloc[0]
+        est_next_month_day_length = self.climate.value(city_name, next_month, "day_length_hrs", est_next_month_day_length)
 
         ref_temp = (tmax_f + tmin_f) / 2 if not pd.isna(tmax_f) and not pd.isna(tmin_f) else current_temp_f
         niceness = compute_niceness(ref_temp, next_month_sunny_days, est_next_month_day_length)
@@ -2431,9 +1627,8 @@ class WeatherApp(QWidget):
 
         # Refresh UI tables only when explicitly requested.
         if refresh_ui:
-            self.refresh_current_table()
-            self.refresh_monthly_table()
-            self.refresh_itinerary_tab()
+            self.refresh_city_rows(city_name)
+            self.refresh_itinerary_months()
 
     def _resolve_city_coords_local(self, city_name):
         # Prefer known in-memory mappings first.
@@ -2448,89 +1643,17 @@ class WeatherApp(QWidget):
             return coords
         return None
 
-    def _compute_current_row(self, city_name, mdf, fore_json, cur_json):
-        today = datetime.now(timezone.utc)
-        next_month = (today.month % 12) + 1
-        target_month_row = mdf[mdf["month"] == next_month]
-        if target_month_row.empty:
-            historical_sunny_avg = 15.0
-        else:
-            historical_sunny_avg = target_month_row["sunny_day"].iloc[0]
-
-        current_temp_f = float('nan')
-        tmax_f = float('nan')
-        tmin_f = float('nan')
-        forecast_sunny_count = 0
-        forecast_days = 0
-
-        if "current_weather" in cur_json:
-            current_temp_c = cur_json["current_weather"]["temperature"]
-            current_temp_f = c_to_f(current_temp_c)
-
-        if "daily" in fore_json and "temperature_2m_max" in fore_json["daily"]:
-            daily_dates = pd.to_datetime(fore_json["daily"]["time"])
-            daily_tmax = fore_json["daily"]["temperature_2m_max"]
-            daily_tmin = fore_json["daily"]["temperature_2m_min"]
-            daily_codes = fore_json["daily"]["weathercode"]
-
-            forecast_sunny_count = sum(1 for c in daily_codes if c in SUNNY_CODES)
-            forecast_days = len(daily_codes)
-
-            today_str = today.strftime("%Y-%m-%d")
-            idx_today = None
-            for i2, d in enumerate(daily_dates):
-                if d.strftime("%Y-%m-%d") == today_str:
-                    idx_today = i2
-                    break
-            if idx_today is not None:
-                tmax_f = c_to_f(daily_tmax[idx_today])
-                tmin_f = c_to_f(daily_tmin[idx_today])
-            elif len(daily_tmax) > 0:
-                tmax_f = c_to_f(daily_tmax[0])
-                tmin_f = c_to_f(daily_tmin[0])
-
-            sunny_fraction_hist = historical_sunny_avg / 30.0
-            if forecast_days < 30:
-                remainder = 30 - forecast_days
-                remainder_sunny = remainder * sunny_fraction_hist
-                next_month_sunny_days = forecast_sunny_count + remainder_sunny
-            else:
-                next_month_sunny_days = forecast_sunny_count
-        else:
-            next_month_sunny_days = historical_sunny_avg
-        next_month_sunny_days = max(0.0, min(float(next_month_sunny_days), 30.0))
-
-        row_m = mdf[mdf["month"] == next_month]
-        if not row_m.empty:
-            est_next_month_day_length = row_m["day_length_hrs"].iloc[0]
-        else:
-            est_next_month_day_length = 12.0
-
-        ref_temp = (tmax_f + tmin_f) / 2 if not pd.isna(tmax_f) and not pd.isna(tmin_f) else current_temp_f
-        niceness = compute_niceness(ref_temp, next_month_sunny_days, est_next_month_day_length)
-
-        return {
-            "city": city_name,
-            "current_temp_f": current_temp_f,
-            "next_month_sunny_days": next_month_sunny_days,
-            "est_next_month_day_length": est_next_month_day_length,
-            "niceness": niceness,
-            "tmax_f": tmax_f,
-            "tmin_f": tmin_f,
-            "forecast_sunny_count": forecast_sunny_count,
-            "forecast_days": forecast_days
-        }
+    def _compute_current_row(self, city_name, fore_json, cur_json):
+        return current_row_from_forecast(city_name, self.climate, fore_json, cur_json)
 
-    def _refresh_single_stale_city(self, city_name):
-        coords = self._resolve_city_coords_local(city_name)
+    def _refresh_single_stale_city(self, city_name, coords=None, share=None):
+        coords = coords or self._resolve_city_coords_local(city_name)
         if not coords:
             return False
         lat, lon = coords
 
         # Ensure monthly data is available without heavy in-memory daily loads.
-        if city_name in self.monthly_dict:
-            mdf = self.monthly_dict[city_name]
-        else:
+        if city_name not in self.climate:
             conn = get_db_conn(DATABASE)
             try:
                 if not have_data_for_city(conn, city_name):
@@ -2540,32 +1663,18 @@ class WeatherApp(QWidget):
                 conn.close()
             if mdf is None:
                 return False
-            mdf["niceness"] = mdf.apply(
-                lambda r: compute_city_niceness(
-                    r["tmax_mean"],
-                    r["tmin_mean"],
-                    r["sunny_day"],
-                    r["day_length_hrs"]
-                ),
-                axis=1
-            )
-            self.monthly_dict[city_name] = mdf
+            self._set_city_climate(city_name, mdf)
 
         try:
-            fore_json, cur_json = _fetch_visualcrossing_forecast_bundle(lat, lon, days=16, city=city_name)
+            fore_json, cur_json = fetch_forecast_bundle(lat, lon, days=16, city=city_name, share=share)
         except requests.exceptions.RequestException:
             return False
         except Exception:
             return False
 
-        self.forecast_cache[city_name] = {
-            "fore_json": fore_json,
-            "cur_json": cur_json,
-            "time": datetime.now(timezone.utc),
-            "provider": WEATHER_PROVIDER,
-        }
+        self.forecast_cache[city_name] = forecast_cache_entry(fore_json, cur_json)
 
-        row = self._compute_current_row(city_name, mdf, fore_json, cur_json)
+        row = self._compute_current_row(city_name, fore_json, cur_json)
         replaced = False
         for i, existing in enumerate(self.current_data_list):
             if existing.get("city") == city_name:
@@ -2581,13 +1690,24 @@ class WeatherApp(QWidget):
         if not stale:
             QMessageBox.information(self, "Stale Refresh", "All ZIP cities are already fresh (within 24h).")
             return
+        if VC_BREAKER.is_open():
+            QMessageBox.warning(self, "Stale Refresh", f"Visual Crossing is unavailable: {VC_BREAKER.summary()}.")
+            return
+
+        # ZIP cities that are aliases of one location (same grid cell) share one forecast request.
+        share = vc_provider.GridShare()
+        coords = {c: self._resolve_city_coords_local(c) for c in stale}
+        located = vc_provider.order_by_cell([c for c in stale if coords[c]], coords.get, share.grid_deg)
+        stale = located + [c for c in stale if not coords[c]]
+        for city in located:
+            share.expect(*coords[city], forecast_window_key(16))
 
         total = len(stale)
         updated = 0
         failed = 0
         for idx, city in enumerate(stale, start=1):
             print(f"[stale {idx}/{total}] Refreshing {city}...")
-            ok = self._refresh_single_stale_city(city)
+            ok = self._refresh_single_stale_city(city, coords=coords[city], share=share)
             if ok:
                 updated += 1
             else:
@@ -2595,48 +1715,191 @@ class WeatherApp(QWidget):
             if idx % 10 == 0:
                 QApplication.processEvents()
 
+        append_sync_log(f"Stale refresh: {share.summary()}")
         save_forecast_cache(self.forecast_cache)
-        save_all_cities_ui_cache(self.current_data_list, self.monthly_dict)
+        save_all_cities_ui_cache(self.current_data_list, self.climate)
         self.refresh_current_table()
         self.refresh_monthly_table()
-        self.refresh_itinerary_tab()
+        self.refresh_itinerary_months()
 
         QMessageBox.information(
             self,
             "Stale Refresh Summary",
-            f"Candidates: {total}\nUpdated: {updated}\nFailed/Skipped: {failed}"
+            f"Candidates: {total}\nUpdated: {updated}\nFailed/Skipped: {failed}\n"
+            f"API calls saved by grid sharing: {share.stats()['saved']}"
         )
 
     def refresh_current_table(self):
-        new_table = self.create_current_table(self.current_data_list, self.monthly_dict)
-        self.current_table.horizontalHeader().sectionClicked.disconnect()
-        self.current_table.horizontalHeader().sectionDoubleClicked.disconnect()
-        self.current_table.cellDoubleClicked.disconnect()
-        self.tab_widget.widget(0).layout().replaceWidget(self.current_table, new_table)
-        self.current_table.deleteLater()
-        self.current_table = new_table
-        self.current_table.horizontalHeader().sectionClicked.connect(self.on_current_header_clicked)
-        self.current_table.horizontalHeader().sectionDoubleClicked.connect(self.on_current_header_double_clicked)
-        self.current_table.cellClicked.connect(self.on_current_table_click)
-        self.current_table.cellDoubleClicked.connect(self.on_current_table_double_click)
+        self.current_model.set_items(self.current_data_list)
         # Default sort by niceness descending
-        self.current_table.sortItems(0, Qt.SortOrder.DescendingOrder)
+        self.current_table.sortByColumn(0, Qt.SortOrder.DescendingOrder)
         self.last_sorted_column_current = 0
         self.last_sort_order_current = Qt.SortOrder.DescendingOrder
 
     def refresh_monthly_table(self):
-        new_table = self.create_monthly_table(self.monthly_dict)
-        self.monthly_table.horizontalHeader().sectionClicked.disconnect()
-        self.monthly_table.horizontalHeader().sectionDoubleClicked.disconnect()
-        self.monthly_table.cellDoubleClicked.disconnect()
-        self.monthly_table.cellClicked.disconnect()
-        self.tab_widget.widget(1).layout().replaceWidget(self.monthly_table, new_table)
-        self.monthly_table.deleteLater()
-        self.monthly_table = new_table
-        self.monthly_table.horizontalHeader().sectionClicked.connect(self.on_monthly_header_clicked)
-        self.monthly_table.horizontalHeader().sectionDoubleClicked.connect(self.on_monthly_header_double_clicked)
-        self.monthly_table.cellClicked.connect(self.on_monthly_table_click)
-        self.monthly_table.cellDoubleClicked.connect(self.on_monthly_table_double_click)
+        self.monthly_model.reload()
+
+    def refresh_city_rows(self, city_name):
+        """Push one city's current row and monthly block to the views (a dataChanged or insert each)."""
+        for row in self.current_data_list:
+            if row.get("city") == city_name:
+                self.current_model.upsert(row)
+                break
+        else:
+            self.current_model.remove_city(city_name)
+        self.monthly_model.upsert_city(city_name)
+        if city_name in self.climate:
+            self.city_search.mark_available([city_name])
+
+    # -- Background sync: results stream in from SyncWorker and are applied in coalesced batches
+
+    def schedule_background_sync(self, city_list):
+        """Re-sync city_list every CURRENT_TTL_SEC from now on."""
+        if self._sync_city_list is None:
+            QApplication.instance().aboutToQuit.connect(self.stop_background_sync)
+            self._current_refresh_timer.start()
+        self._sync_city_list = city_list
+
+    def start_background_sync(self, city_list):
+        self.schedule_background_sync(city_list)
+        self.sync_worker = SyncWorker(self.forecast_cache, city_list)
+        self.sync_thread = QThread(self)
+        self.sync_worker.moveToThread(self.sync_thread)
+        self.sync_thread.started.connect(self.sync_worker.run)
+        self.sync_worker.phase_started.connect(self.on_sync_phase)
+        self.sync_worker.progressed.connect(self.on_sync_progress)
+        self.sync_worker.city_synced.connect(self.on_sync_city_climate)
+        self.sync_worker.climate_synced.connect(self.on_sync_climate)
+        self.sync_worker.row_synced.connect(self.on_sync_row)
+        self.sync_worker.sync_finished.connect(self.on_sync_finished)
+        self.sync_worker.sync_failed.connect(self.on_sync_failed)
+        self.sync_worker.sync_finished.connect(self.sync_thread.quit)
+        self.sync_worker.sync_failed.connect(self.sync_thread.quit)
+        self.sync_label.setText("Syncing...")
+        self.sync_bar.setRange(0, 0)
+        self.sync_bar.show()
+        self.sync_thread.start()
+
+    def on_current_refresh_due(self):
+        if self.sync_thread is not None and self.sync_thread.isRunning():
+            return
+        self.start_background_sync(self._sync_city_list)
+
+    def stop_background_sync(self):
+        """Ask the worker to stop and give in-flight requests up to SYNC_STOP_TIMEOUT_MS to finish."""
+        if self.sync_thread is None or not self.sync_thread.isRunning():
+            return
+        self.sync_worker.stop.set()
+        self.sync_thread.quit()
+        if not self.sync_thread.wait(SYNC_STOP_TIMEOUT_MS):
+            append_sync_log(
+                f"Background sync still running {SYNC_STOP_TIMEOUT_MS} ms after stop; exiting without waiting for it."
+            )
+
+    def on_sync_phase(self, name, total):
+        labels = {
+            "estimated": "Fetching estimated history",
+            "monthly": "Processing monthly data",
+            "forecast": "Fetching current & forecast data",
+        }
+        self.sync_label.setText(labels.get(name, name))
+        self.sync_bar.setRange(0, total)
+        self.sync_bar.setValue(0)
+
+    def on_sync_progress(self, name, done):
+        self.sync_bar.setValue(done)
+
+    def on_sync_city_climate(self, city, monthly_rows):
+        if city in self._removed_cities:
+            return
+        self._pending_climate[city] = monthly_rows
+        if not self._sync_flush_timer.isActive():
+            self._sync_flush_timer.start()
+
+    def on_sync_row(self, row):
+        if row.get("city") in self._removed_cities:
+            return
+        self._pending_rows[row["city"]] = row
+        if not self._sync_flush_timer.isActive():
+            self._sync_flush_timer.start()
+
+    def on_sync_climate(self, climate):
+        """Adopt the run's refreshed normals for every city at once (windows rolled, aggregates rebuilt)."""
+        self._pending_climate.clear()
+        for city in climate:
+            if city not in self._removed_cities:
+                self.climate.set_city(city, climate.city_months(city)[:, :-1])
+        self.climate.rescore(self._niceness_prefs())
+        self.itinerary.rebuild()
+        self.refresh_monthly_table()
+        self.refresh_itinerary_tab()
+
+    def flush_sync_results(self):
+        climate, rows = self._pending_climate, self._pending_rows
+        self._pending_climate, self._pending_rows = {}, {}
+        if not climate and not rows:
+            return
+        prefs = self._niceness_prefs()
+        for city, monthly_rows in climate.items():
+            self.climate.set_city(city, [row[1:] for row in monthly_rows], MONTHLY_COLUMNS[1:])
+        self.climate.rescore(prefs, names=list(climate))
+        self._rescore_current_rows(list(rows.values()), prefs)
+        index = {row.get("city"): i for i, row in enumerate(self.current_data_list)}
+        for city, row in rows.items():
+            if city in index:
+                self.current_data_list[index[city]] = row
+            else:
+                self.current_data_list.append(row)
+
+        if len(climate) + len(rows) > SYNC_BULK_REFRESH_ROWS:
+            if climate:
+                self.itinerary.rebuild()
+                self.refresh_monthly_table()
+                self.refresh_itinerary_tab()
+            if rows:
+                self.current_model.set_items(self.current_data_list)
+        else:
+            for city in climate:
+                self._stale_itinerary_months.update(self.itinerary.update(city))
+            for city in climate.keys() | rows.keys():
+                self.refresh_city_rows(city)
+            self.refresh_itinerary_months()
+        if self.current_detail_city in climate or self.current_detail_city in rows:
+            self.show_city_detail(self.current_detail_city)
+
+    def on_sync_finished(self, result):
+        self._sync_flush_timer.stop()
+        self.flush_sync_results()
+        synced_cache = result["forecast_cache"]
+        for city, entry in synced_cache.items():
+            mine = cache_entry_time(self.forecast_cache, city, current=True)
+            theirs = cache_entry_time(synced_cache, city, current=True)
+            if city in self._removed_cities or (mine is not None and theirs is not None and mine > theirs):
+                continue
+            self.forecast_cache[city] = entry
+        save_forecast_cache(self.forecast_cache)
+        self.sync_bar.hide()
+        if result["status"] == "cancelled":
+            self.sync_label.setText("Sync cancelled")
+            return
+        save_all_cities_ui_cache(self.current_data_list, self.climate)
+        self.sync_label.setText(
+            f"Synced: {result['historical_updated']} history, {result['forecast_updated']} forecasts, "
+            f"{result.get('current_updated', 0)} current, "
+            f"{result['errors']} errors"
+        )
+        now = datetime.now(timezone.utc)
+        self.set_itinerary_label(
+            f"Updated as of: {now.strftime('%Y-%m-%d %H:%M UTC')}   Forecast until: {forecast_until(self.forecast_cache)}"
+        )
+        print_zip_cities_report(self.climate, self.current_data_list, result["failed"])
+
+    def on_sync_failed(self, message):
+        self._sync_flush_timer.stop()
+        self.flush_sync_results()
+        self.sync_bar.hide()
+        self.sync_label.setText("Sync failed (see sync_runs.log)")
+        print(f"Background sync failed: {message}")
 
     def update_ziplist_entry(self, city_name, fetched_value):
         # city_name is e.g. "Austin, USA"
@@ -2699,28 +1962,36 @@ class WeatherApp(QWidget):
         self.use_preferences = True
         self.update_all_niceness_and_refresh()
 
+    def _niceness_prefs(self):
+        """(min_temp, max_temp, temp_weight) when user preferences are applied, else None."""
+        if not self.use_preferences:
+            return None
+        if self.pref_min_temp > self.pref_max_temp:
+            self.pref_min_temp, self.pref_max_temp = self.pref_max_temp, self.pref_min_temp
+        return (self.pref_min_temp, self.pref_max_temp, self.pref_temp_weight)
+
+    def _rescore_current_rows(self, rows, prefs):
+        """Recompute niceness for current rows in one vectorized pass."""
+        if not rows:
+            return
+        args = (
+            [row["tmax_f"] for row in rows],
+            [row["tmin_f"] for row in rows],
+            [row["next_month_sunny_days"] for row in rows],
+            [row["est_next_month_day_length"] for row in rows],
+        )
+        scores = niceness.default_scores(*args) if prefs is None else niceness.adjusted_scores(*args, *prefs)
+        for row, score in zip(rows, scores.tolist()):
+            row["niceness"] = score
+
     # {{ New method: re-compute niceness for all cities }}
     def update_all_niceness_and_refresh(self):
-        # Recompute niceness for each current_data_list entry
-        for row in self.current_data_list:
-            tmax_f = row["tmax_f"]
-            tmin_f = row["tmin_f"]
-            sunny_days = row["next_month_sunny_days"]
-            day_length = row["est_next_month_day_length"]
+        prefs = self._niceness_prefs()
+        self._rescore_current_rows(self.current_data_list, prefs)
 
-            if not self.use_preferences:
-                row["niceness"] = compute_city_niceness(tmax_f, tmin_f, sunny_days, day_length)
-            else:
-                row["niceness"] = self.compute_adjusted_niceness(tmax_f, tmin_f, sunny_days, day_length)
-
-        # Recompute niceness in each monthly dataframe
-        for city, mdf in self.monthly_dict.items():
-            def calc_niceness(r):
-                if not self.use_preferences:
-                    return compute_city_niceness(r["tmax_mean"], r["tmin_mean"], r["sunny_day"], r["day_length_hrs"])
-                else:
-                    return self.compute_adjusted_niceness(r["tmax_mean"], r["tmin_mean"], r["sunny_day"], r["day_length_hrs"])
-            mdf["niceness"] = mdf.apply(calc_niceness, axis=1)
+        # Recompute the cube's niceness channel for every city-month at once
+        self.climate.rescore(prefs)
+        self.itinerary.rebuild()
 
         # Refresh displayed tables
         self.refresh_current_table()
@@ -2755,31 +2026,33 @@ class WeatherApp(QWidget):
 
     def load_continent_data(self):
         """
-        For each city in current_data_list, get the lat/lon from CITY_COORDS and call get_geo_boundaries.
-        Store the result in self.city_geo_info[city].
+        Continent/country codes for every city in current_data_list, in one batch: coordinates
+        from the forecast cache, CITY_COORDS, ZIP_CITIES and city_coords, then the cached
+        boundary index. Cities it cannot place (or all of them, with a warning, when the boundary
+        shapefile is missing) fall back to the country named in the city key. Stored in
+        self.city_geo_info[city].
         """
-        for row in self.current_data_list:
-            city = row["city"]
-            # Only do lookup if city is in CITY_COORDS
-            if city in CITY_COORDS:
-                lat, lon = CITY_COORDS[city]
-                info = get_geo_boundaries(lat, lon)
-                if info is None:
-                    # If the server returns 404 or no data
-                    self.city_geo_info[city] = {
-                        "continent_code": "N/A",
-                        "country_a2": "N/A",
-                        "country_a3": "N/A"
-                    }
-                else:
-                    self.city_geo_info[city] = info
-            else:
-                # If we don't have coordinates, just set N/A
-                self.city_geo_info[city] = {
-                    "continent_code": "N/A",
-                    "country_a2": "N/A",
-                    "country_a3": "N/A"
-                }
+        cities = [row["city"] for row in self.current_data_list]
+        self.boundaries_missing = not weather_sync.BOUNDARIES.available()
+        if self.boundaries_missing:
+            append_sync_log(
+                f"WARNING: Continent tab: boundary shapefile {os.path.abspath(weather_sync.BOUNDARIES_FILE)} (+ .dbf) "
+                "not found; set SUNSEEKER_BOUNDARIES to ne_110m_admin_0_countries.shp. Using the country in each city name instead."
+            )
+        coords = build_target_city_map(self.forecast_cache)
+        coords.update((c, ZIP_CITIES[c]) for c in cities if c not in coords and ZIP_CITIES.get(c))
+        conn = get_db_conn(DATABASE)
+        try:
+            coords.update(geocoder.stored_coords(conn, [c for c in cities if c not in coords]))
+            located = [c for c in cities if c in coords]
+            infos = geo_boundaries.cached_lookup_many(conn, weather_sync.BOUNDARIES, [coords[c] for c in located])
+        finally:
+            conn.close()
+        self.city_geo_info = {c: dict(geo_boundaries.NOT_FOUND) for c in cities}
+        self.city_geo_info.update(zip(located, infos))
+        for city, info in self.city_geo_info.items():
+            if info["continent_code"] == "N/A":
+                self.city_geo_info[city] = geo_boundaries.country_codes(geocoder.country_a2(geocoder.split_city_key(city)[1]))
 
     def create_continent_tab(self):
         """
@@ -2787,6 +2060,14 @@ class WeatherApp(QWidget):
         """
         self.continent_tab = QWidget()
         continent_layout = QVBoxLayout()
+        if self.boundaries_missing:
+            warning = QLabel(
+                f"Boundary shapefile {weather_sync.BOUNDARIES_FILE} not found (set SUNSEEKER_BOUNDARIES): "
+                "codes come from the country in each city name and may be N/A."
+            )
+            warning.setWordWrap(True)
+            warning.setStyleSheet("color: #b45309;")
+            continent_layout.addWidget(warning)
 
         headers = ["City", "Continent Code", "Country Code (A2)", "Country Code (A3)"]
         table = QTableWidget()
@@ -2864,6 +2145,7 @@ def _configure_qt_runtime():
 
 
 def main():
+    started = time.perf_counter()
     _configure_qt_runtime()
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
@@ -2919,8 +2201,7 @@ def main():
         }
     """)
 
-    global START_DATE, END_DATE
-    START_DATE, END_DATE = get_estimated_window_dates()
+    start_date, end_date = weather_sync.roll_estimated_window()
     lock_fh = acquire_run_lock(RUN_LOCK_FILE)
     if lock_fh is None:
         append_sync_log("Another sync process is already running. Exiting this run to avoid DB lock conflicts.")
@@ -2936,344 +2217,49 @@ def main():
     city_names = [c for c, _ in city_list]
 
     append_sync_log(f"Using DB: {DATABASE}")
-    append_sync_log(f"Provider: {WEATHER_PROVIDER} (workers={max(1, VC_MAX_WORKERS)}, min_interval={VC_MIN_INTERVAL_SEC:.2f}s)")
-    append_sync_log(f"Estimated window: {START_DATE} .. {END_DATE}")
-    append_sync_log(f"Target cities: {len(city_list)}")
-
-    loading = LoadingDialog(len(city_list))
-    loading.show()
-
-    conn = get_db_conn(DATABASE)
-    before = sync_status_snapshot(conn, city_names, forecast_cache)
+    limiter = VC_RATE_LIMITER.stats()
     append_sync_log(
-        "Before sync: "
-        f"estimated complete={before['hist_complete']}, missing={before['hist_missing']}; "
-        f"forecast fresh={before['forecast_fresh']}, stale={before['forecast_stale']}"
-    )
-
-    today_key = datetime.now(timezone.utc).date().isoformat()
-    last_daily_sync = get_sync_meta(conn, "last_daily_sync_date", "")
-    should_sync = (last_daily_sync != today_key)
-    if should_sync:
-        append_sync_log("Daily sync: enabled (not yet run today).")
-    else:
-        append_sync_log("Daily sync: skipped (already ran today).")
-
-    run_id = str(uuid.uuid4())
-    c_meta = conn.cursor()
-    c_meta.execute(
-        "UPDATE sync_runs SET status='abandoned', finished_at=?, notes=COALESCE(notes,'') || ' ; superseded_by=' || ? "
-        "WHERE status='running'",
-        (datetime.now(timezone.utc).isoformat(), run_id),
+        f"Provider: {WEATHER_PROVIDER} (workers={VC_CONTROLLER.limit}..{VC_CONTROLLER.max_workers}, "
+        f"rate={limiter['rate_per_sec']:.2f}/s, burst={limiter['burst']:g}, tokens={limiter['tokens']:.2f}; "
+        f"{VC_BREAKER.summary()})"
     )
-    c_meta.execute(
-        "INSERT OR REPLACE INTO sync_runs (run_id, started_at, status, total_cities) VALUES (?, ?, ?, ?)",
-        (run_id, datetime.now(timezone.utc).isoformat(), "running", len(city_list)),
-    )
-    conn.commit()
-
-    historical_updated = 0
-    forecast_updated = 0
-    errors = 0
-
-    print("Fetching estimated baseline data...")
-    cities_needing_estimated = set()
-    if should_sync:
-        for city_name in city_names:
-            if not have_data_for_city(conn, city_name):
-                cities_needing_estimated.add(city_name)
-
-    def fetch_city_data(city, latlon):
-        try:
-            if city not in cities_needing_estimated:
-                return city, False, pd.DataFrame(), None
-            lat, lon = latlon
-            df_est = fetch_estimated_history(lat, lon, START_DATE, END_DATE, city=city)
-            return city, True, df_est, None
-        except Exception as e:
-            return city, True, pd.DataFrame(), str(e)
-
-    all_city_data = {}
-    done_count = 0
-    with ThreadPoolExecutor(max_workers=max(1, VC_MAX_WORKERS)) as executor:
-        futures = {executor.submit(fetch_city_data, c, l): c for c, l in city_list}
-        for fut in as_completed(futures):
-            city_name, needed_fetch, df_est, err_msg = fut.result()
-            hist_rows = 0
-            if err_msg:
-                errors += 1
-                insert_sync_city_log(conn, run_id, city_name, "estimated", "error", err_msg)
-            elif needed_fetch and not df_est.empty:
-                try:
-                    store_data(conn, city_name, df_est, source="estimated")
-                    hist_rows = len(df_est)
-                except Exception as e:
-                    errors += 1
-                    insert_sync_city_log(conn, run_id, city_name, "estimated", "error", f"store_failed: {e}")
-            elif needed_fetch:
-                insert_sync_city_log(conn, run_id, city_name, "estimated", "no_data", "provider returned no rows")
-            else:
-                insert_sync_city_log(conn, run_id, city_name, "estimated", "complete", "already complete")
+    append_sync_log(f"Estimated window: {start_date} .. {end_date}")
+    append_sync_log(f"Target cities: {len(city_list)}")
 
-            df = load_data_from_db(conn, city_name)
-            if not df.empty:
-                all_city_data[city_name] = df
-
-            if hist_rows > 0:
-                historical_updated += 1
-                insert_sync_city_log(conn, run_id, city_name, "estimated", "updated", f"rows={hist_rows}")
-            done_count += 1
-            loading.update_fetch(done_count)
-            if done_count % 50 == 0:
-                append_sync_log(f"Estimated progress: {done_count}/{len(city_list)}")
-
-    print("Processing monthly data...")
-    done_count = 0
-    monthly_dict = {}
-    with ThreadPoolExecutor(max_workers=max(1, VC_MAX_WORKERS)) as executor:
-        def monthly_task(c):
-            mdf = monthly_aggregates(all_city_data[c])
-            mdf["niceness"] = mdf.apply(
-                lambda r: compute_city_niceness(r["tmax_mean"], r["tmin_mean"], r["sunny_day"], r["day_length_hrs"]),
-                axis=1
-            )
-            return c, mdf
-
-        futures = {executor.submit(monthly_task, c): c for c in all_city_data}
-        for fut in as_completed(futures):
-            city_name, mdf = fut.result()
-            monthly_dict[city_name] = mdf
-            done_count += 1
-            loading.update_process(done_count)
-
-    print("Fetching current & forecast data...")
-    def fetch_current_data(city, latlon):
-        lat, lon = latlon
-        local_df = all_city_data.get(city, pd.DataFrame())
+    conn = get_db_conn(DATABASE)
+    snapshot = None if FOREGROUND_SYNC else load_startup_snapshot(conn, city_names, forecast_cache)
+    if snapshot is None:
+        # Nothing to show yet (or asked to wait): sync behind the modal dialog, then open the window.
+        loading = LoadingDialog(len(city_list))
+        loading.show()
+        result = run_daily_sync(conn, forecast_cache, city_list, progress=LoadingDialogProgress(loading))
+        conn.close()
+        loading.close()
+
+        window = WeatherApp(result["current_data_list"], result["climate"], {}, forecast_cache)
         now = datetime.now(timezone.utc)
+        window.set_itinerary_label(
+            f"Updated as of: {now.strftime('%Y-%m-%d %H:%M UTC')}   Forecast until: {forecast_until(forecast_cache)}"
+        )
+        print_zip_cities_report(result["climate"], result["current_data_list"], result["failed"])
+        window.schedule_background_sync(city_list)
+        window.show()
+        sys.exit(app.exec())
 
-        fore_json = {}
-        cur_json = {}
-        forecast_was_updated = False
-        forecast_err = None
-        try:
-            can_use_cached = (city in forecast_cache and is_forecast_fresh(city, forecast_cache, hours=24))
-            if can_use_cached or not should_sync:
-                if city in forecast_cache:
-                    fore_json = forecast_cache[city].get('fore_json', {})
-                    cur_json = forecast_cache[city].get('cur_json', {})
-            else:
-                fore_json, cur_json = _fetch_visualcrossing_forecast_bundle(lat, lon, days=16, city=city)
-                forecast_cache[city] = {
-                    'fore_json': fore_json,
-                    'cur_json': cur_json,
-                    'time': now,
-                    'provider': WEATHER_PROVIDER,
-                }
-                forecast_was_updated = True
-        except Exception as e:
-            forecast_err = str(e)
-            fore_json = forecast_cache.get(city, {}).get('fore_json', {})
-            cur_json = forecast_cache.get(city, {}).get('cur_json', {})
-
-        forecast_df = pd.DataFrame()
-        if "daily" in fore_json and "temperature_2m_max" in fore_json["daily"]:
-            forecast_df = process_forecast_daily_data(fore_json["daily"])
-
-        current_temp_f = float('nan')
-        est_next_month_day_length = 12.0
-        tmax_f = float('nan')
-        tmin_f = float('nan')
-
-        today = datetime.now(timezone.utc)
-        next_month = (today.month % 12) + 1
-        mdf = monthly_dict.get(city)
-        if mdf is None:
-            mdf = pd.DataFrame(columns=["month", "sunny_day", "day_length_hrs"])
-
-        target_month_row = mdf[mdf["month"] == next_month] if not mdf.empty else pd.DataFrame()
-        historical_sunny_avg = 15.0 if target_month_row.empty else target_month_row["sunny_day"].iloc[0]
-
-        if "current_weather" in cur_json:
-            current_temp_c = cur_json["current_weather"]["temperature"]
-            current_temp_f = c_to_f(current_temp_c)
-
-        forecast_sunny_count = 0
-        forecast_days = 0
-        if "daily" in fore_json and "temperature_2m_max" in fore_json["daily"]:
-            daily_dates = pd.to_datetime(fore_json["daily"]["time"])
-            daily_tmax = fore_json["daily"]["temperature_2m_max"]
-            daily_tmin = fore_json["daily"]["temperature_2m_min"]
-            daily_codes = fore_json["daily"]["weathercode"]
-
-            forecast_sunny_count = sum(1 for c in daily_codes if c in SUNNY_CODES)
-            forecast_days = len(daily_codes)
-
-            today_str = today.strftime("%Y-%m-%d")
-            idx_today = None
-            for i2, d in enumerate(daily_dates):
-                if d.strftime("%Y-%m-%d") == today_str:
-                    idx_today = i2
-                    break
-            if idx_today is not None:
-                tmax_f = c_to_f(daily_tmax[idx_today])
-                tmin_f = c_to_f(daily_tmin[idx_today])
-            elif len(daily_tmax) > 0:
-                tmax_f = c_to_f(daily_tmax[0])
-                tmin_f = c_to_f(daily_tmin[0])
-
-            sunny_fraction_hist = historical_sunny_avg / 30.0
-            if forecast_days < 30:
-                remainder = 30 - forecast_days
-                remainder_sunny = remainder * sunny_fraction_hist
-                next_month_sunny_days = forecast_sunny_count + remainder_sunny
-            else:
-                next_month_sunny_days = forecast_sunny_count
-        else:
-            next_month_sunny_days = historical_sunny_avg
-        next_month_sunny_days = max(0.0, min(float(next_month_sunny_days), 30.0))
-
-        row_m = mdf[mdf["month"] == next_month] if not mdf.empty else pd.DataFrame()
-        if not row_m.empty:
-            est_next_month_day_length = row_m["day_length_hrs"].iloc[0]
-
-        ref_temp = (tmax_f + tmin_f) / 2 if not pd.isna(tmax_f) and not pd.isna(tmin_f) else current_temp_f
-        niceness = compute_niceness(ref_temp, next_month_sunny_days, est_next_month_day_length)
-
-        return {
-            "city": city,
-            "current_temp_f": current_temp_f,
-            "next_month_sunny_days": next_month_sunny_days,
-            "est_next_month_day_length": est_next_month_day_length,
-            "niceness": niceness,
-            "tmax_f": tmax_f,
-            "tmin_f": tmin_f,
-            "forecast_sunny_count": forecast_sunny_count,
-            "forecast_days": forecast_days
-        }, forecast_was_updated, forecast_df, forecast_err
-
-    current_data_list = []
-    done_count = 0
-    with ThreadPoolExecutor(max_workers=8) as executor:
-        futures = {executor.submit(fetch_current_data, c, l): c for c, l in city_list}
-        for fut in as_completed(futures):
-            row, was_updated, forecast_df, forecast_err = fut.result()
-            city_name = row.get("city", "")
-            if not forecast_df.empty:
-                try:
-                    store_data(conn, city_name, forecast_df, source="forecast")
-                    existing_df = all_city_data.get(city_name, pd.DataFrame())
-                    if not existing_df.empty:
-                        all_city_data[city_name] = pd.concat([existing_df, forecast_df], ignore_index=True)
-                    else:
-                        all_city_data[city_name] = forecast_df
-                except Exception as e:
-                    errors += 1
-                    insert_sync_city_log(conn, run_id, city_name, "forecast", "error", f"store_failed: {e}")
-            elif forecast_err:
-                errors += 1
-                insert_sync_city_log(conn, run_id, city_name, "forecast", "error", forecast_err)
-
-            current_data_list.append(row)
-            if was_updated:
-                forecast_updated += 1
-                insert_sync_city_log(conn, run_id, city_name, "forecast", "updated", "refreshed")
-            done_count += 1
-            loading.update_current(done_count)
-            if done_count % 50 == 0:
-                append_sync_log(f"Forecast progress: {done_count}/{len(city_list)}")
-
-    save_forecast_cache(forecast_cache)
-    save_all_cities_ui_cache(current_data_list, monthly_dict)
-
-    after = sync_status_snapshot(conn, city_names, forecast_cache)
-    append_sync_log(
-        "After sync: "
-        f"estimated complete={after['hist_complete']}, missing={after['hist_missing']}; "
-        f"forecast fresh={after['forecast_fresh']}, stale={after['forecast_stale']}"
-    )
-
-    c_meta.execute(
-        """
-        UPDATE sync_runs
-        SET finished_at=?, status=?, historical_complete=?, historical_missing=?, forecast_fresh=?, forecast_stale=?,
-            historical_updated=?, forecast_updated=?, errors=?, notes=?
-        WHERE run_id=?
-        """,
-        (
-            datetime.now(timezone.utc).isoformat(),
-            "ok" if errors == 0 else "partial",
-            after["hist_complete"],
-            after["hist_missing"],
-            after["forecast_fresh"],
-            after["forecast_stale"],
-            historical_updated,
-            forecast_updated,
-            errors,
-            f"window={START_DATE}..{END_DATE}",
-            run_id,
-        ),
-    )
-    conn.commit()
-    # Mark daily sync complete only when estimated coverage is complete.
-    # This preserves resume semantics when a run is partial due to rate limits.
-    if should_sync and after["hist_missing"] == 0:
-        set_sync_meta(conn, "last_daily_sync_date", today_key)
-        append_sync_log("Daily sync marker set for today (estimated backfill complete).")
-    elif should_sync:
-        append_sync_log("Daily sync marker NOT set (estimated backfill still incomplete; resume allowed).")
     conn.close()
-    loading.close()
-
-    window = WeatherApp(current_data_list, monthly_dict, all_city_data, forecast_cache)
-    now = datetime.now(timezone.utc)
-    forecast_until = "N/A"
-    for c in forecast_cache:
-        fore_json = forecast_cache[c]['fore_json']
-        if "daily" in fore_json and "time" in fore_json["daily"]:
-            times = pd.to_datetime(fore_json["daily"]["time"])
-            forecast_until = times.max().strftime("%Y-%m-%d")
-            break
-
-    window.set_itinerary_label(f"Updated as of: {now.strftime('%Y-%m-%d %H:%M UTC')}   Forecast until: {forecast_until}")
-    
-    # Initialize a dictionary to track fetch status of each city
-    city_fetch_status = {}
-    
-    # ADDED: Check how many ZIP_CITIES ended up in monthly_dict/current_data_list:
-    zip_cities_set = set(ZIP_CITIES.keys())
-    loaded_cities = set(city for city in monthly_dict.keys())  # cities that have monthly data
-    displayed_cities = set(city["city"] for city in current_data_list)  # cities in current data
-    
-    zip_cities_displayed = zip_cities_set.intersection(displayed_cities)
-    zip_cities_not_displayed = zip_cities_set - displayed_cities
-    
-    # Update fetch status based on loaded_cities
-    for city in zip_cities_set:
-        if city in loaded_cities:
-            city_fetch_status[city] = "Successfully fetched data"
-        elif city in all_city_data:
-            city_fetch_status[city] = "Fetch failed"
-        else:
-            city_fetch_status[city] = "Never called"
-    
-    print("\n=== ZIP CITIES REPORT ===")
-    print(f"Total ZIP cities: {len(zip_cities_set)}")
-    print(f"Displayed (loaded) ZIP cities: {len(zip_cities_displayed)}")
-    if zip_cities_displayed:
-        print("These ZIP cities are displayed:")
-        for c in zip_cities_displayed:
-            print(f"  - {c}")
-    
-    print(f"\nNot displayed ZIP cities: {len(zip_cities_not_displayed)}")
-    if zip_cities_not_displayed:
-        print("These ZIP cities are not displayed (no data or could not fetch):")
-        for c in zip_cities_not_displayed:
-            # Provide detailed reasons based on fetch status
-            reason = city_fetch_status.get(c, "unknown reason")
-            print(f"  - {c} (Reason: {reason})")
-    
+    window = WeatherApp(snapshot["current_data_list"], snapshot["climate"], {}, forecast_cache)
+    saved_at = snapshot["saved_at"]
+    shown_as_of = datetime.fromisoformat(saved_at).strftime('%Y-%m-%d %H:%M UTC') if saved_at else "stored aggregates"
+    window.set_itinerary_label(
+        f"Showing: {shown_as_of} (syncing...)   Forecast until: {forecast_until(forecast_cache)}"
+    )
     window.show()
+    app.processEvents()
+    append_sync_log(
+        f"First paint from {snapshot['source']} in {(time.perf_counter() - started) * 1000:.0f} ms "
+        f"({len(snapshot['current_data_list'])} rows, {len(snapshot['climate'])} cities)"
+    )
+    window.start_background_sync(city_list)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
@@ -7,6 +7,8 @@ from datetime import datetime, timezone
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from urllib.parse import parse_qs, urlparse
 
+import vc_provider
+
 API_LOG_PATH = "/Users/jos/Desktop/Archive/sync_api_calls.ndjson"
 
 HTML = """<!doctype html>
@@ -149,6 +151,11 @@ HTML = """<!doctype html>
       <div class="card"><div class="label">Forecast Updated (Run)</div><div class="value" id="forecast_updated">-</div></div>
       <div class="card"><div class="label">Errors (Run)</div><div class="value bad" id="errors">-</div></div>
       <div class="card"><div class="label">Rows in daily_data</div><div class="value" id="rows">-</div></div>
+      <div class="card"><div class="label">Monthly Aggregates Ready / Dirty</div><div class="value" id="monthly_agg">-</div></div>
+      <div class="card">
+        <div class="label">Visual Crossing Circuit</div><div class="value" id="provider">-</div>
+        <div class="sub" id="provider_detail">-</div>
+      </div>
     </div>
 
     <div class="section">
@@ -280,6 +287,8 @@ HTML = """<!doctype html>
         document.getElementById("forecast_updated").textContent = fmt(run.forecast_updated);
         document.getElementById("errors").textContent = fmt(run.errors);
         document.getElementById("rows").textContent = fmt(stats.daily_rows);
+        document.getElementById("monthly_agg").textContent =
+          `${fmt(stats.monthly_agg_ready)} / ${fmt(stats.monthly_agg_dirty)}`;
 
         document.getElementById("run_id").textContent = run.run_id || "-";
         document.getElementById("status").innerHTML = statusPill(run.status || "-");
@@ -292,6 +301,15 @@ HTML = """<!doctype html>
         const pct = total > 0 ? Math.max(0, Math.min(100, (done / total) * 100)) : 0;
         document.getElementById("bar").style.width = pct.toFixed(1) + "%";
 
+        const hRes = await fetch("/api/provider-health");
+        const h = await hRes.json();
+        const provider = document.getElementById("provider");
+        provider.textContent = h.state || "-";
+        provider.className = "value " + (h.state === "closed" ? "good" : (h.state === "open" ? "bad" : "warn"));
+        let detail = `error rate ${Math.round((h.error_rate || 0) * 100)}% over ${fmt(h.window_requests)} requests • opens=${fmt(h.total_opens)}`;
+        if (h.state && h.state !== "closed") detail += ` • ${h.reason || ""} • next probe ${h.next_probe_at || "-"}`;
+        document.getElementById("provider_detail").textContent = detail;
+
         const eRes = await fetch("/api/events?limit=120");
         const ev = await eRes.json();
         const rows = (ev.events || []).map(r => {
@@ -352,7 +370,7 @@ HTML = """<!doctype html>
 
 def table_exists(conn: sqlite3.Connection, name: str) -> bool:
     row = conn.execute(
-        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+        "SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name=?",
         (name,),
     ).fetchone()
     return bool(row)
@@ -361,6 +379,8 @@ def table_exists(conn: sqlite3.Connection, name: str) -> bool:
 class Handler(BaseHTTPRequestHandler):
     db_path = ""
     api_log_path = API_LOG_PATH
+    # Outage state shared with every Visual Crossing caller (vc_provider's provider state DB).
+    breaker = vc_provider.CircuitBreaker()
 
     def _connect(self):
         conn = sqlite3.connect(self.db_path, timeout=5)
@@ -418,6 +438,8 @@ class Handler(BaseHTTPRequestHandler):
             except Exception:
                 pass
             return self._send_json(self._city_values(limit))
+        if path == "/api/provider-health":
+            return self._send_json(self.breaker.status())
         return self._send_json({"error": "not found"}, status=404)
 
     def _summary(self):
@@ -453,6 +475,14 @@ class Handler(BaseHTTPRequestHandler):
                         "SELECT COUNT(*) FROM daily_data WHERE data_source='forecast'"
                     ).fetchone()[0]
 
+            monthly_agg_ready = 0
+            monthly_agg_dirty = 0
+            if table_exists(conn, "city_monthly_agg_state"):
+                row = conn.execute(
+                    "SELECT COALESCE(SUM(dirty=0), 0), COALESCE(SUM(dirty<>0), 0) FROM city_monthly_agg_state"
+                ).fetchone()
+                monthly_agg_ready, monthly_agg_dirty = row[0], row[1]
+
             target = run.get("total_cities", 0) if run else 0
             hist_complete = run.get("historical_complete", 0) if run else 0
             hist_missing = run.get("historical_missing", 0) if run else 0
@@ -483,6 +513,8 @@ class Handler(BaseHTTPRequestHandler):
                     "daily_rows": daily_rows,
                     "daily_cities": daily_cities,
                     "forecast_rows": forecast_rows,
+                    "monthly_agg_ready": monthly_agg_ready,
+                    "monthly_agg_dirty": monthly_agg_dirty,
                 },
             }
 
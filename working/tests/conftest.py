@@ -0,0 +1,39 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = str(Path(__file__).resolve().parent.parent)
+sys.path.insert(0, BASE_DIR)
+
+# Module-level defaults are read at import; keep them off the working tree and the network.
+_STATE_DIR = tempfile.mkdtemp(prefix="sunseeker_tests_")
+os.environ.setdefault("VC_PROVIDER_STATE_DB", f"{_STATE_DIR}/provider_state.db")
+os.environ.setdefault("VC_RESPONSE_CACHE_DIR", f"{_STATE_DIR}/vc_response_cache")
+os.environ.setdefault("VC_BASE_URL", "http://127.0.0.1:9")
+
+
+class FakeClock:
+    """Stand-in for a module's `time`, advanced by hand."""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += max(0.0, seconds)
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
@@ -0,0 +1,81 @@
+from city_search import TIER_AVAILABLE, TIER_CATALOG, TIER_COMMAND, TIER_GEONAMES, TIER_ZIP, CitySearchIndex
+from geonames_index import GeoNamesIndex
+
+
+def make_index(geonames=None):
+    index = CitySearchIndex(geonames)
+    index.add(["São Paulo, BR", "Saint Paul, US", "Santa Fe, US", "Paris, FR"], TIER_CATALOG)
+    index.add(["Portland, US"], TIER_ZIP)
+    return index
+
+
+def test_accent_insensitive_prefix_match():
+    index = make_index()
+    assert index.search("sao") == ["São Paulo, BR"]
+    assert index.search("SÃO PAU") == ["São Paulo, BR"]
+    assert index.search("") == []
+
+
+def test_name_prefix_outranks_word_prefix_and_substring():
+    index = make_index()
+    index.add(["Le Paris, FR", "Montparis, FR"], TIER_COMMAND)
+    # Match quality beats tier: the catalog "Paris" still leads the command entries.
+    assert index.search("paris") == ["Paris, FR", "Le Paris, FR", "Montparis, FR"]
+
+
+def test_tier_then_population_then_length_break_ties():
+    index = CitySearchIndex()
+    index.add(["Springfield, US", "Springfield, AU"], TIER_CATALOG)
+    index.add(["Springvale, AU"], TIER_ZIP)
+    index.add(["Springs, ZA"], TIER_CATALOG, population={"Springs, ZA": 200_000})
+    assert index.search("spring") == ["Springs, ZA", "Springfield, AU", "Springfield, US", "Springvale, AU"]
+
+    index.set_available(["Springvale, AU"])
+    assert index.search("spring")[0] == "Springvale, AU"
+
+
+def test_adding_a_name_keeps_its_highest_tier():
+    index = CitySearchIndex()
+    index.add(["Oslo, NO"], TIER_COMMAND)
+    index.add(["Oslo, NO"], TIER_GEONAMES)
+    assert len(index) == 1
+    assert index.tier[index.ids["Oslo, NO"]] == TIER_COMMAND
+
+
+def test_mark_available_promotes_names():
+    index = CitySearchIndex()
+    index.add(["Lima, PE", "Lima, US"], TIER_CATALOG)
+    assert index.search("lima") == ["Lima, PE", "Lima, US"]
+    index.mark_available(["Lima, US"])
+    assert index.available == {"Lima, US"}
+    assert index.tier[index.ids["Lima, US"]] == TIER_CATALOG
+    assert index._rank_tier(index.ids["Lima, US"]) == TIER_AVAILABLE
+    assert index.search("lima") == ["Lima, US", "Lima, PE"]
+
+
+def test_fuzzy_matches_come_last():
+    index = make_index()
+    index.add(["Portlaw, IE"], TIER_CATALOG)
+    assert index.search("portla") == ["Portlaw, IE", "Portland, US"]
+    index.add(["Portlnd Heights, US"], TIER_ZIP)
+    # The one real prefix match leads; typo matches follow by trigram overlap, and Paris shares too few.
+    assert index.search("portlnd") == ["Portlnd Heights, US", "Portland, US", "Portlaw, IE"]
+
+
+def test_short_query_memo_is_cleared_by_add():
+    index = make_index()
+    assert index.search("pa") == ["Paris, FR", "São Paulo, BR", "Saint Paul, US"]
+    index.add(["Pau, FR"], TIER_CATALOG)
+    assert index.search("pa") == ["Pau, FR", "Paris, FR", "São Paulo, BR", "Saint Paul, US"]
+
+
+def test_geonames_prefix_matches_follow_in_memory_ones(tmp_path):
+    path = tmp_path / "allCountries.txt"
+    with open(path, "w", encoding="utf-8") as f:
+        for cc, place, lat, lon in [("FR", "Paris", 48.86, 2.3447), ("US", "Paris", 33.66, -95.55), ("DK", "Parisvej", 55.6, 12.5)]:
+            f.write(f"{cc}\t\t{place}\tAdmin\t01\t\t\t\t\t{lat}\t{lon}\t4\n")
+    index = make_index(GeoNamesIndex(str(path), by="search"))
+    index.add(["Montparis, FR"], TIER_CATALOG)
+    # In-memory matches (prefix, then substring) lead; GeoNames adds only the names not already listed.
+    assert index.search("paris") == ["Paris, FR", "Montparis, FR", "Paris, US", "Parisvej, DK"]
+    assert index.search("paris", limit=2) == ["Paris, FR", "Montparis, FR"]
@@ -0,0 +1,77 @@
+import random
+
+import numpy as np
+
+from climate_cube import MONTHS, ClimateCube, ItineraryIndex
+
+
+def set_scores(cube, name, scores):
+    cube.set_city(name, np.asarray(scores, dtype=np.float64).reshape(MONTHS, 1), metrics=("niceness",))
+
+
+def expected_top(cube, n):
+    """Best n per month by a full sort: score descending, ties to the lower city id, NaN skipped."""
+    out = {}
+    for m in range(1, MONTHS + 1):
+        scored = [(-cube.value(name, m, "niceness"), cube.ids[name], name) for name in cube]
+        scored = sorted(s for s in scored if s[0] == s[0])[:n]
+        out[m] = [(name, -neg) for neg, _id, name in scored]
+    return out
+
+
+def random_scores(rng):
+    # Coarse values so ties are common; some months unscored.
+    return [rng.choice([0.1, 0.25, 0.5, 0.75, 0.9, float("nan")]) for _ in range(MONTHS)]
+
+
+def test_build_matches_a_full_sort_with_ties_and_nan():
+    cube = ClimateCube()
+    set_scores(cube, "a", [0.5] * MONTHS)
+    set_scores(cube, "b", [0.9] * 6 + [float("nan")] * 6)
+    set_scores(cube, "c", [0.5] * MONTHS)
+    set_scores(cube, "d", [0.7] * MONTHS)
+    index = ItineraryIndex(cube, n=2, slack=1)
+    assert [name for name, _score in index.top(1)] == ["b", "d"]
+    # "a" and "c" tie; the lower city id wins.
+    assert [name for name, _score in index.top(12)] == ["d", "a"]
+    assert index.top_by_month() == expected_top(cube, 2)
+
+
+def test_incremental_updates_match_a_full_sort():
+    rng = random.Random(11)
+    cube = ClimateCube()
+    for i in range(40):
+        set_scores(cube, f"City {i}", random_scores(rng))
+    index = ItineraryIndex(cube, n=5, slack=2)
+    next_city = 40
+    for _ in range(300):
+        before = index.top_by_month()
+        roll = rng.random()
+        if roll < 0.2 and len(cube) > 1:
+            moved = index.remove(rng.choice(cube.cities()))
+        else:
+            if roll < 0.4:
+                name = f"City {next_city}"
+                next_city += 1
+            else:
+                name = rng.choice(cube.cities())
+            set_scores(cube, name, random_scores(rng))
+            moved = index.update(name)
+        after = index.top_by_month()
+        assert after == expected_top(cube, 5)
+        assert {m for m in range(1, MONTHS + 1) if before[m] != after[m]} <= set(moved)
+
+
+def test_set_size_and_unknown_cities():
+    rng = random.Random(3)
+    cube = ClimateCube()
+    for i in range(30):
+        set_scores(cube, f"City {i}", random_scores(rng))
+    index = ItineraryIndex(cube, n=3)
+    index.set_size(12)
+    assert index.top_by_month() == expected_top(cube, 12)
+    assert index.capacity >= 24
+    index.set_size(0)
+    assert index.top_by_month() == expected_top(cube, 1)
+    assert index.update("Nowhere") == []
+    assert index.remove("Nowhere") == []
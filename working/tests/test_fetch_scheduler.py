@@ -0,0 +1,138 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import fetch_scheduler
+from fetch_scheduler import (
+    FetchScheduler,
+    band,
+    deadline_from,
+    error_rates,
+    load_interest,
+    prioritize,
+    save_interest,
+    staleness_from_age,
+)
+
+
+def test_band_floors():
+    assert [band(s) for s in (3.0, 2.0, 1.5, 1.0, 0.3, 0.25, 0.1, -1.0)] == ["p1", "p1", "p2", "p2", "p3", "p3", "p4", "p4"]
+
+
+def test_staleness_from_age():
+    now = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    full = timedelta(hours=fetch_scheduler.STALE_FULL_HOURS)
+    assert staleness_from_age(None, now) == 1.0
+    assert staleness_from_age(now, now) == 0.0
+    assert staleness_from_age(now - full / 2, now) == pytest.approx(0.5)
+    assert staleness_from_age(now - full * 3, now) == 1.0
+    assert staleness_from_age(now + timedelta(hours=1), now) == 0.0
+
+
+def test_prioritize_orders_by_score_and_keeps_ties_stable(monkeypatch):
+    monkeypatch.setattr(fetch_scheduler, "WEIGHT_STALENESS", 1.0)
+    monkeypatch.setattr(fetch_scheduler, "WEIGHT_GAP", 1.0)
+    monkeypatch.setattr(fetch_scheduler, "WEIGHT_INTEREST", 2.0)
+    monkeypatch.setattr(fetch_scheduler, "WEIGHT_ERRORS", 0.5)
+    cities = ["a", "b", "c", "d", "e"]
+    out = prioritize(
+        cities,
+        staleness={"a": 1.0, "b": 1.0, "c": 1.0, "d": 0.2},
+        gap={"c": 0.5},
+        interest={"d": 1.0},
+        error_rate={"b": 1.0},
+    )
+    assert [p.city for p in out] == ["d", "c", "a", "b", "e"]
+    assert [p.score for p in out] == [pytest.approx(2.2), 1.5, 1.0, 0.5, 0.0]
+    assert [p.band for p in out] == ["p1", "p2", "p2", "p3", "p4"]
+
+
+def test_budget_admits_in_priority_order():
+    sched = FetchScheduler(prioritize(["hot", "warm", "cold"], staleness={"warm": 1.0}, interest={"hot": 1.0}), budget=3)
+    assert sched.order() == ["hot", "warm", "cold"]
+    assert sched.admit("hot", cost=2)
+    assert not sched.admit("warm", cost=2)
+    assert sched.admit("cold")
+    assert not sched.admit("unknown")
+    st = sched.stats()
+    assert st["requests"] == 3
+    assert st["served"] == {"p1": 1, "p2": 0, "p3": 0, "p4": 1}
+    assert st["skipped"] == {"p1": 0, "p2": 1, "p3": 0, "p4": 1}
+    assert st["skip_reasons"] == {"budget": 2}
+    assert st["min_served_score"] == 0.0
+    assert sched.summary().endswith("(budget=2)")
+
+
+def test_aliases_served_from_the_grid_share_are_not_charged():
+    window = ("2024-06-01", "2024-06-16")
+    sched = FetchScheduler(prioritize(["a", "a2", "b", "c"]), budget=2)
+    assert sched.admit("a", share_keys=[((1.0, 1.0), window)])
+    assert sched.admit("a2", share_keys=[((1.0, 1.0), window)])
+    assert sched.admit("b", share_keys=[((2.0, 2.0), window), ((2.0, 2.0), window)])
+    assert not sched.admit("c", share_keys=[((3.0, 3.0), window)])
+    assert sched.stats()["requests"] == 2
+    assert sched.stats()["skip_reasons"] == {"budget": 1}
+
+
+def test_batched_keys_are_charged_per_request():
+    fc, est = ("fc",), ("est",)
+    sched = FetchScheduler(prioritize([]), budget=3, batch_size=3)
+    for i in range(3):
+        assert sched.admit(f"fc{i}", share_keys=[((float(i), 0.0), fc)])
+    assert sched.spent == 1
+    assert sched.admit("fc3", share_keys=[((3.0, 0.0), fc)])
+    assert sched.admit("est0", share_keys=[((0.0, 0.0), est)])
+    assert sched.spent == 3
+    # Joins the open batch of fc3's window without another request.
+    assert sched.admit("fc4", share_keys=[((4.0, 0.0), fc)])
+    assert not sched.admit("est1", share_keys=[((9.0, 9.0), ("est2",))])
+    assert sched.spent == 3
+
+
+def test_deadline_skips_everything_after_it(monkeypatch, clock):
+    monkeypatch.setattr(fetch_scheduler, "time", clock)
+    sched = FetchScheduler(prioritize(["a", "b"]), deadline=deadline_from(10))
+    assert sched.admit("a")
+    clock.advance(10)
+    assert not sched.admit("b")
+    assert sched.stats()["skip_reasons"] == {"deadline": 1}
+    assert deadline_from(0) is None
+
+
+def test_interest_round_trip():
+    conn = sqlite3.connect(":memory:")
+    assert load_interest(conn) == {}
+    conn.execute("CREATE TABLE sync_meta (key TEXT PRIMARY KEY, value TEXT)")
+    save_interest(conn, pinned=["Oslo, NO"], recent=["Lima, PE", "Oslo, NO", "Kyiv, UA", ""], itinerary=["Lima, PE"])
+    interest = load_interest(conn)
+    assert interest["Oslo, NO"] == fetch_scheduler.INTEREST_PINNED
+    # Most recent last: Kyiv scores highest of the recent views, the oldest fades towards the itinerary level.
+    assert interest["Kyiv, UA"] == pytest.approx(fetch_scheduler.INTEREST_RECENT)
+    assert interest["Lima, PE"] == pytest.approx(fetch_scheduler.INTEREST_ITINERARY + (
+        fetch_scheduler.INTEREST_RECENT - fetch_scheduler.INTEREST_ITINERARY) / 3)
+
+    save_interest(conn, pinned=None, recent=[f"City {i}" for i in range(fetch_scheduler.RECENT_KEEP + 5)])
+    interest = load_interest(conn)
+    assert "Oslo, NO" in interest
+    assert "City 0" not in interest
+    assert f"City {fetch_scheduler.RECENT_KEEP + 4}" in interest
+
+
+def test_error_rates_cover_the_requested_stages():
+    conn = sqlite3.connect(":memory:")
+    assert error_rates(conn, "forecast") == {}
+    conn.execute("CREATE TABLE sync_city_log (city TEXT, stage TEXT, status TEXT, ts TEXT)")
+    now = datetime.now(timezone.utc)
+    rows = [
+        ("Oslo, NO", "forecast", "updated", now),
+        ("Oslo, NO", "current", "error", now),
+        ("Oslo, NO", "current", "deferred", now),
+        ("Oslo, NO", "estimated", "error", now),
+        ("Lima, PE", "forecast", "error", now - timedelta(days=30)),
+        ("Lima, PE", "forecast", "updated", now),
+    ]
+    conn.executemany("INSERT INTO sync_city_log VALUES (?, ?, ?, ?)", [(c, s, st, ts.isoformat()) for c, s, st, ts in rows])
+    assert error_rates(conn, "forecast") == {"Oslo, NO": 0.0, "Lima, PE": 0.0}
+    assert error_rates(conn, "forecast", "current") == {"Oslo, NO": 0.5, "Lima, PE": 0.0}
+    assert error_rates(conn, "forecast", days=60)["Lima, PE"] == 0.5
@@ -0,0 +1,86 @@
+import os
+import sqlite3
+
+import numpy as np
+import pytest
+
+import geo_boundaries
+from benchmarks import write_synthetic_boundaries
+from geo_boundaries import NOT_FOUND, BoundaryIndex, cached_lookup_many, country_codes, ensure_cache
+
+# The Natural Earth set weather_sync.BOUNDARIES_FILE points at.
+BUNDLED = os.path.join(os.path.dirname(geo_boundaries.__file__), "ne_110m_admin_0_countries.shp")
+
+
+@pytest.fixture
+def shp(tmp_path):
+    # 2 x 3 grid of square countries: rows split at lat 7.5, columns at lon -60 and 60.
+    path = str(tmp_path / "countries.shp")
+    write_synthetic_boundaries(path, 2, 3, vertices=40)
+    return path
+
+
+def test_points_inside_each_country(shp):
+    index = BoundaryIndex(shp)
+    assert index.available()
+    results = index.lookup_many([(-30.0, -120.0), (-30.0, 0.0), (40.0, 120.0)])
+    assert results == [
+        {"continent_code": "AF", "country_a2": "AA", "country_a3": "000"},
+        {"continent_code": "AS", "country_a2": "AB", "country_a3": "001"},
+        {"continent_code": "SA", "country_a2": "AF", "country_a3": "005"},
+    ]
+    assert index.country_ids(np.array([40.0]), np.array([-120.0])).tolist() == [3]
+
+
+def test_offshore_points_snap_within_snap_deg(shp):
+    index = BoundaryIndex(shp)
+    near = 75.0 + geo_boundaries.SNAP_DEG / 2
+    far = 75.0 + geo_boundaries.SNAP_DEG * 2
+    assert index.country_ids(np.array([near, far, -89.0]), np.array([0.0, 0.0, 0.0])).tolist() == [4, -1, -1]
+    assert index.lookup_many([(far, 0.0)]) == [NOT_FOUND]
+    assert index.lookup_many([]) == []
+
+
+def test_bundled_countries_place_real_cities():
+    index = BoundaryIndex(BUNDLED)
+    assert index.available()
+    paris, new_york, sydney, sao_paulo, mid_pacific = index.lookup_many(
+        [(48.8566, 2.3522), (40.7128, -74.006), (-33.8688, 151.2093), (-23.5505, -46.6333), (0.0, -160.0)]
+    )
+    assert paris == {"continent_code": "EU", "country_a2": "FR", "country_a3": "FRA"}
+    assert new_york == {"continent_code": "NA", "country_a2": "US", "country_a3": "USA"}
+    assert sydney["country_a2"] == "AU"
+    assert sao_paulo["continent_code"] == "SA"
+    assert mid_pacific == NOT_FOUND
+
+
+def test_missing_shapefile(tmp_path):
+    index = BoundaryIndex(str(tmp_path / "absent.shp"))
+    assert not index.available()
+    assert index.lookup_many([(10.0, 10.0)]) == [NOT_FOUND]
+
+
+def test_cached_lookups_are_written_once(shp):
+    conn = sqlite3.connect(":memory:")
+    ensure_cache(conn)
+    points = [(-30.0, -120.0), (40.0, 120.0), (-30.0, -120.0)]
+    first = cached_lookup_many(conn, BoundaryIndex(shp), points)
+    assert [r["country_a2"] for r in first] == ["AA", "AF", "AA"]
+    assert conn.execute("SELECT COUNT(*) FROM geo_boundary_cache").fetchone()[0] == 2
+
+    # Cache hits need no boundary data at all.
+    assert cached_lookup_many(conn, BoundaryIndex(shp + ".gone"), points) == first
+
+
+def test_no_caching_without_boundary_data(tmp_path):
+    conn = sqlite3.connect(":memory:")
+    ensure_cache(conn)
+    assert cached_lookup_many(conn, BoundaryIndex(str(tmp_path / "absent.shp")), [(1.0, 2.0)]) == [NOT_FOUND]
+    assert conn.execute("SELECT COUNT(*) FROM geo_boundary_cache").fetchone()[0] == 0
+
+
+def test_country_codes():
+    assert country_codes("FR") == {"continent_code": "EU", "country_a2": "FR", "country_a3": "N/A"}
+    assert country_codes("BR")["continent_code"] == "SA"
+    assert country_codes("ZZ") == NOT_FOUND
+    assert country_codes("ZZ") is not NOT_FOUND
@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+from geonames_index import SEARCH_SEP, GeoNamesIndex, norm_text, postal_key, search_key
+
+ROWS = [
+    ("US", "62701", "Springfield", "39.80172", "-89.64371"),
+    ("US", "01101", "Springfield", "42.10148", "-72.58981"),
+    ("CH", "8001", "Zürich", "47.36667", "8.55"),
+    ("FR", "75001", "Paris", "48.86", "2.3447"),
+    ("US", "", "Paris", "33.66094", "-95.55551"),
+    ("DE", "10115", "Berlin", "", "13.3872"),
+]
+
+
+def write_tsv(path, rows=ROWS, extra=""):
+    with open(path, "w", encoding="utf-8") as f:
+        for cc, postal, place, lat, lon in rows:
+            f.write(f"{cc}\t{postal}\t{place}\tAdmin\t01\t\t\t\t\t{lat}\t{lon}\t4\n")
+        f.write("US\t99999\ttoo short\n")
+        f.write(extra)
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "allCountries.txt"
+    write_tsv(path)
+    return str(path)
+
+
+def test_place_lookups(source):
+    index = GeoNamesIndex(source)
+    assert len(index) == 4
+    # Duplicate keys keep their first row; coordinates come back rounded to 4 places.
+    assert index["Springfield, US"] == (39.8017, -89.6437)
+    assert index.get("Zürich, CH") == (47.3667, 8.55)
+    assert "Paris, US" in index
+    assert "Berlin, DE" not in index
+    assert index.get("Nowhere, XX", "missing") == "missing"
+    with pytest.raises(KeyError):
+        index["Nowhere, XX"]
+
+
+def test_rows_and_prefix_scan_are_in_key_order(source):
+    index = GeoNamesIndex(source)
+    keys = [key for key, _lat, _lon in index.rows()]
+    assert keys == sorted(keys)
+    assert index.starting_with("Paris", 10) == ["Paris, FR", "Paris, US"]
+    assert index.starting_with("Paris", 1) == ["Paris, FR"]
+    assert index.starting_with("Q", 10) == []
+
+
+def test_build_is_reused_until_the_source_changes(source):
+    index = GeoNamesIndex(source)
+    assert len(index) == 4
+    assert index.is_current()
+    meta = f"{index.prefix}.meta.json"
+    built_at = os.stat(meta).st_mtime_ns
+    assert len(GeoNamesIndex(source)) == 4
+    assert os.stat(meta).st_mtime_ns == built_at
+
+    write_tsv(source, extra="GB\tSW1A\tLondon\tAdmin\t01\t\t\t\t\t51.5\t-0.1276\t4\n")
+    assert not index.is_current()
+    fresh = GeoNamesIndex(source)
+    assert len(fresh) == 5
+    assert fresh["London, GB"] == (51.5, -0.1276)
+
+
+def test_missing_source_is_empty(tmp_path):
+    index = GeoNamesIndex(str(tmp_path / "absent.txt"))
+    assert len(index) == 0
+    assert index.get("Paris, FR") is None
+    assert index.starting_with("P", 5) == []
+    assert list(index.rows()) == []
+
+
+def test_postal_and_search_kinds(source):
+    postal = GeoNamesIndex(source, by="postal")
+    assert postal.prefix.endswith(".postal.idx")
+    assert postal[postal_key("us", " 62701 ")] == (39.8017, -89.6437)
+    assert "US " not in postal  # the US Paris row has no postal code
+
+    search = GeoNamesIndex(source, by="search")
+    assert search.starting_with(norm_text("ZUR"), 5) == [search_key("Zürich, CH")]
+    assert [k.split(SEARCH_SEP, 1)[1] for k in search.starting_with("paris", 5)] == ["Paris, FR", "Paris, US"]
+
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        GeoNamesIndex("allCountries.txt", by="admin")
@@ -0,0 +1,56 @@
+import math
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import niceness
+import weather_sync
+from benchmarks import _same_scores, synthetic_monthly_inputs
+
+NAN = float("nan")
+# Edge rows on top of the random months: all-NaN, one NaN input each, the curve's breakpoints, infinities.
+EDGES = [
+    (NAN, NAN, NAN, NAN),
+    (NAN, 60.0, 15.0, 12.0),
+    (80.0, NAN, 15.0, 12.0),
+    (80.0, 60.0, NAN, 12.0),
+    (80.0, 60.0, 15.0, NAN),
+    (50.0, 50.0, 0.0, 0.0),
+    (105.0, 105.0, 30.0, 24.0),
+    (70.0, 70.0, -3.0, 30.0),
+    (math.inf, 60.0, 15.0, 12.0),
+    (80.0, 60.0, -math.inf, 12.0),
+]
+
+
+@pytest.fixture(scope="module")
+def inputs():
+    cols = synthetic_monthly_inputs(40)
+    cols = (cols["tmax_mean"], cols["tmin_mean"], cols["sunny_day"], cols["day_length_hrs"])
+    flat = [tuple(v) for v in zip(*(c.ravel().tolist() for c in cols))] + EDGES
+    return tuple(np.array(c).reshape(-1, 10) for c in zip(*flat)), flat
+
+
+def test_default_scores_match_compute_city_niceness(inputs):
+    cols, flat = inputs
+    scalar = np.array([weather_sync.compute_city_niceness(*v) for v in flat]).reshape(cols[0].shape)
+    assert np.isnan(scalar).any()
+    assert _same_scores(niceness.default_scores(*cols), scalar)
+
+
+def test_default_scores_accept_scalars():
+    assert math.isnan(niceness.default_scores(NAN, 60.0, 15.0, 12.0))
+    assert niceness.default_scores(75.0, 75.0, 15.0, 12.0) == weather_sync.compute_city_niceness(75.0, 75.0, 15.0, 12.0)
+
+
+@pytest.mark.parametrize("prefs", [(65, 80, 0.5), (50, 104, 0.7), (80, 60, 0.3), (72, 72, 1.0)])
+def test_adjusted_scores_match_compute_adjusted_niceness(inputs, prefs, monkeypatch):
+    pytest.importorskip("PyQt6")
+    monkeypatch.setenv("QT_QPA_PLATFORM", "offscreen")
+    # The GUI's scalar reference; benchmarks puts sunseeker/ on sys.path.
+    ss = pytest.importorskip("sunseeker")
+    cols, flat = inputs
+    window = SimpleNamespace(pref_min_temp=prefs[0], pref_max_temp=prefs[1], pref_temp_weight=prefs[2])
+    scalar = np.array([ss.WeatherApp.compute_adjusted_niceness(window, *v) for v in flat]).reshape(cols[0].shape)
+    assert _same_scores(niceness.adjusted_scores(*cols, *prefs), scalar)
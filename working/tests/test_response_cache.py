@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+import response_cache
+from response_cache import ResponseCache, request_key
+
+REQ = ("forecast_bundle", 48.8566, 2.3522, "2024-06-01", "2024-06-16", "days")
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch, clock):
+    monkeypatch.setattr(response_cache, "time", clock)
+    return ResponseCache(str(tmp_path / "cache"), max_bytes=0, ttls={"forecast_bundle": 3600.0})
+
+
+def blob_files(cache):
+    return [name for _dirs, _subdirs, files in os.walk(f"{cache.root}/blobs") for name in files]
+
+
+def test_round_trip_and_ttl(cache, clock):
+    payload = {"days": [{"datetime": "2024-06-01", "tempmax": 24.5}], "address": "Paris"}
+    assert cache.get(*REQ) is None
+    digest = cache.put(*REQ, payload, city="Paris, FR")
+    assert len(digest) == 64
+    assert cache.get(*REQ) == payload
+    # Coordinates are keyed to 4 places.
+    assert cache.get("forecast_bundle", 48.85661, 2.35219, *REQ[3:]) == payload
+    assert cache.get("forecast_bundle", 48.8566, 2.3522, "2024-06-02", "2024-06-16", "days") is None
+
+    clock.advance(3601)
+    assert cache.get(*REQ) is None
+    # Expired entries stay listed for reingest.
+    [entry] = cache.entries()
+    assert entry["request_key"] == request_key("visualcrossing", *REQ)
+    assert entry["cities"] == ["Paris, FR"]
+    assert cache.stats()["kinds"] == {"forecast_bundle": {"entries": 1, "fresh": 0}}
+
+
+def test_identical_payloads_share_one_blob(cache):
+    payload = {"b": 1, "a": [1, 2, 3]}
+    first = cache.put(*REQ, payload)
+    second = cache.put("estimated_window", 40.0, -74.0, "2024-01-01", "2024-01-31", "days", {"a": [1, 2, 3], "b": 1})
+    assert first == second
+    assert len(blob_files(cache)) == 1
+    st = cache.stats()
+    assert st["blobs"] == 1
+    assert st["bytes"] == os.path.getsize(cache._blob_path(first))
+
+
+def test_replacing_a_payload_drops_the_unused_blob(cache):
+    old = cache.put(*REQ, {"v": 1})
+    new = cache.put(*REQ, {"v": 2})
+    assert old != new
+    assert not os.path.exists(cache._blob_path(old))
+    assert cache.get(*REQ) == {"v": 2}
+
+
+def test_eviction_is_least_recently_used(cache, clock):
+    lats = (10.0, 20.0, 30.0)
+    for lat in lats:
+        cache.put("forecast_bundle", lat, 0.0, "s", "e", "days", {"lat": lat, "pad": "x" * 200})
+        clock.advance(1)
+    assert cache.get("forecast_bundle", 10.0, 0.0, "s", "e", "days") is not None
+    clock.advance(1)
+    total = cache.stats()["bytes"]
+    assert cache.evict(total - 1) == 1
+    kept = sorted(e["lat"] for e in cache.entries())
+    assert kept == [10.0, 30.0]
+    assert len(blob_files(cache)) == 2
+
+
+def test_max_bytes_is_enforced_on_put(tmp_path, monkeypatch, clock):
+    monkeypatch.setattr(response_cache, "time", clock)
+    probe = ResponseCache(str(tmp_path / "probe"), max_bytes=0)
+    size = os.path.getsize(probe._blob_path(probe.put(*REQ, {"lat": 0, "pad": "x" * 200})))
+    cache = ResponseCache(str(tmp_path / "cache"), max_bytes=2 * size)
+    for lat in (1, 2, 3):
+        cache.put("forecast_bundle", lat, 0.0, "s", "e", "days", {"lat": lat, "pad": "x" * 200})
+        clock.advance(1)
+    assert sorted(e["lat"] for e in cache.entries()) == [2.0, 3.0]
+
+
+def test_entries_filter_by_kind(cache):
+    cache.put(*REQ, {"v": 1})
+    cache.put("current_conditions", 1.0, 2.0, "", "", "current", {"v": 2})
+    assert [e["kind"] for e in cache.entries(["current_conditions"])] == ["current_conditions"]
+    assert len(list(cache.entries())) == 2
+
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache"), enabled=False)
+    assert cache.put(*REQ, {"v": 1}) is None
+    assert cache.get(*REQ) is None
+    assert not os.path.exists(cache.root)
@@ -0,0 +1,314 @@
+import threading
+
+import pytest
+
+import vc_provider
+from vc_provider import (
+    BatchLocationError,
+    BatchStats,
+    Cancelled,
+    CircuitBreaker,
+    GridShare,
+    ProviderUnavailable,
+    TokenBucket,
+    grid_cell,
+    location_key,
+    split_multi_location,
+    take_prefetched,
+)
+
+WINDOW = ("2024-01-01", "2024-01-16", "days")
+
+
+# ---------------------------------------------------------------- TokenBucket
+
+
+def test_run_overrides_stay_in_memory(tmp_path):
+    db = str(tmp_path / "state.db")
+    bucket = TokenBucket("vc", rate_per_sec=0.5, burst=1, db_path=db)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(2.0, abs=0.05)
+    st = bucket.stats()
+    assert (st["run_rate_per_sec"], st["run_burst"]) == (0.5, 1)
+
+    shared = TokenBucket("vc", db_path=db).stats()
+    assert shared["rate_per_sec"] == round(vc_provider.DEFAULT_RATE_PER_SEC, 4)
+    assert "run_rate_per_sec" not in shared
+    assert shared["total_acquired"] == 2
+
+
+def test_configure_persists_the_shared_rate(tmp_path):
+    db = str(tmp_path / "state.db")
+    TokenBucket("vc", db_path=db).configure(rate_per_sec=3.0, burst=4)
+    st = TokenBucket("vc", db_path=db).stats()
+    assert (st["rate_per_sec"], st["burst"]) == (3.0, 4.0)
+
+
+def test_acquire_is_cancelled_by_stop(tmp_path):
+    stop = threading.Event()
+    stop.set()
+    with pytest.raises(Cancelled):
+        TokenBucket("vc", db_path=str(tmp_path / "state.db")).acquire(stop=stop)
+
+
+# ---------------------------------------------------------------- GridShare
+
+
+def test_grid_cell_rounds_to_the_cell_centre():
+    assert grid_cell(40.7128, -74.006, 0.05) == (40.7, -74.0)
+    assert grid_cell(40.71284, -74.00601, 0) == (40.7128, -74.006)
+
+
+def test_nearby_points_share_one_fetch():
+    share = GridShare(0.05)
+    calls = []
+
+    def fetch(lat, lon):
+        calls.append((lat, lon))
+        return {"at": (lat, lon)}
+
+    for lat, lon in [(40.7128, -74.006), (40.709, -74.01)]:
+        share.expect(lat, lon, WINDOW)
+    first = share.get(40.7128, -74.006, WINDOW, fetch)
+    second = share.get(40.709, -74.01, WINDOW, fetch)
+    assert first is second
+    assert calls == [(40.7, -74.0)]
+    assert share.stats() == {"grid_deg": 0.05, "requests": 1, "saved": 1, "saved_pct": 50.0}
+    # Every expected caller has its copy, so the result is no longer held.
+    assert share._results == {}
+
+
+def test_zero_grid_merges_identical_coordinates_only():
+    share = GridShare(0)
+    calls = []
+
+    def fetch(lat, lon):
+        calls.append((lat, lon))
+        return len(calls)
+
+    share.expect(40.7128, -74.006, WINDOW)
+    share.expect(40.7128, -74.006, WINDOW)
+    assert share.get(40.7128, -74.006, WINDOW, fetch) == share.get(40.7128, -74.006, WINDOW, fetch) == 1
+    assert share.get(40.709, -74.01, WINDOW, fetch) == 2
+    assert calls == [(40.7128, -74.006), (40.709, -74.01)]
+
+
+def test_release_expected_drops_results_a_deferred_alias_would_have_claimed():
+    share = GridShare(0.05)
+    share.expect(40.7128, -74.006, WINDOW)
+    share.expect(40.709, -74.01, WINDOW)
+    share.get(40.7128, -74.006, WINDOW, lambda lat, lon: "payload")
+    assert len(share._results) == 1
+    share.release_expected(40.709, -74.01, WINDOW)
+    assert share._results == {}
+    assert not share._expected
+
+
+def test_windows_and_cells_are_fetched_separately():
+    share = GridShare(0.05)
+    calls = []
+
+    def fetch(lat, lon):
+        calls.append((lat, lon))
+        return len(calls)
+
+    assert share.get(40.71, -74.0, WINDOW, fetch) == 1
+    assert share.get(40.71, -74.0, ("2024-02-01", "2024-02-16", "days"), fetch) == 2
+    assert share.get(34.05, -118.24, WINDOW, fetch) == 3
+    # Without expect() the result is dropped after its one caller, so the same key fetches again.
+    assert share.get(40.71, -74.0, WINDOW, fetch) == 4
+    assert share.stats()["saved"] == 0
+
+
+def test_concurrent_callers_wait_for_the_in_flight_request():
+    share = GridShare(0.05)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fetch(lat, lon):
+        calls.append((lat, lon))
+        started.set()
+        release.wait(5)
+        return "payload"
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(share.get(51.5, -0.12, WINDOW, fetch)))
+    owner.start()
+    assert started.wait(5)
+    waiter = threading.Thread(target=lambda: results.append(share.get(51.51, -0.11, WINDOW, fetch)))
+    waiter.start()
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+    assert results == ["payload", "payload"]
+    assert len(calls) == 1
+
+
+def test_fetch_errors_reach_every_sharing_caller():
+    share = GridShare(0.05)
+    share.expect(10.0, 10.0, WINDOW)
+    share.expect(10.0, 10.0, WINDOW)
+
+    def fetch(lat, lon):
+        raise RuntimeError("boom")
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match="boom"):
+            share.get(10.0, 10.0, WINDOW, fetch)
+    assert share.stats()["requests"] == 1
+
+
+# ---------------------------------------------------------------- CircuitBreaker
+
+
+@pytest.fixture
+def breaker(tmp_path, monkeypatch, clock):
+    monkeypatch.setattr(vc_provider, "time", clock)
+    monkeypatch.setattr(vc_provider, "BREAKER_FAILURES", 3)
+    monkeypatch.setattr(vc_provider, "BREAKER_COOLDOWN_SEC", 60.0)
+    return CircuitBreaker("test", db_path=str(tmp_path / "state.db"), enabled=True)
+
+
+def test_consecutive_failures_open_the_circuit(breaker):
+    for status in (503, None, 200, 429, 500):
+        breaker.record(status)
+    assert breaker.allow()
+    breaker.record(502)
+    st = breaker.status()
+    assert st["state"] == "open"
+    assert st["reason"] == "http_502"
+    assert st["total_opens"] == 1
+    assert breaker.is_open()
+    assert not breaker.allow()
+    with pytest.raises(ProviderUnavailable):
+        breaker.check()
+
+
+def test_error_rate_opens_the_circuit(breaker, monkeypatch):
+    monkeypatch.setattr(vc_provider, "BREAKER_FAILURES", 100)
+    monkeypatch.setattr(vc_provider, "BREAKER_MIN_REQUESTS", 4)
+    monkeypatch.setattr(vc_provider, "BREAKER_ERROR_RATE", 0.5)
+    for status in (500, 200, 500, 200):
+        breaker.record(status)
+    assert breaker.status()["state"] == "closed"
+    assert breaker.status()["error_rate"] == 0.5
+    breaker.record(500)
+    assert breaker.status()["state"] == "open"
+
+
+def test_half_open_probe_success_closes(breaker, clock):
+    breaker.trip("manual")
+    assert not breaker.allow()
+    clock.advance(61)
+    assert not breaker.is_open()
+    assert breaker.allow()  # this caller is the probe
+    other = CircuitBreaker("test", db_path=breaker.db_path, enabled=True)
+    assert other.probing()
+    assert not other.allow()
+    breaker.record(200)
+    assert other.status()["state"] == "closed"
+    assert other.allow()
+
+
+def test_half_open_probe_failure_doubles_the_cooldown(breaker, clock):
+    breaker.trip("manual")
+    clock.advance(61)
+    assert breaker.allow()
+    breaker.record(503)
+    st = breaker.status()
+    assert st["state"] == "open"
+    assert st["cooldown_sec"] == 120.0
+    assert st["retry_in_sec"] == 120.0
+    assert st["total_opens"] == 2
+    clock.advance(61)
+    assert not breaker.allow()
+    clock.advance(60)
+    assert breaker.allow()
+
+
+def test_retry_after_extends_the_cooldown(breaker, clock):
+    breaker.trip("rate_limited", retry_after=600)
+    clock.advance(300)
+    assert breaker.is_open()
+    assert breaker.reset()["state"] == "closed"
+    assert breaker.allow()
+
+
+def test_check_waits_for_the_probe_and_honours_stop(breaker, clock):
+    breaker.trip("manual")
+    clock.advance(61)
+    assert breaker.allow()
+    stop = threading.Event()
+    stop.set()
+    with pytest.raises(Cancelled):
+        breaker.check(wait_for_probe=True, poll_sec=0.01, stop=stop)
+    with pytest.raises(ProviderUnavailable):
+        breaker.check()
+
+
+def test_disabled_breaker_never_blocks(tmp_path):
+    breaker = CircuitBreaker("off", db_path=str(tmp_path / "state.db"), enabled=False)
+    for _ in range(10):
+        breaker.record(500)
+    breaker.trip("manual")
+    assert breaker.allow()
+    assert not breaker.is_open()
+    assert breaker.status()["state"] == "closed"
+
+
+# ---------------------------------------------------------------- multi-location batches
+
+
+def loc(lat, lon, address=None, **extra):
+    return {"address": address or location_key(lat, lon), "latitude": lat, "longitude": lon, "days": [{}], **extra}
+
+
+def test_split_matches_by_address_not_position():
+    points = [(10.0, 20.0), (30.0, 40.0), (50.0, 60.0)]
+    payload = {"locations": [loc(50.0, 60.0), loc(10.0, 20.0), loc(30.0, 40.0)]}
+    out = split_multi_location(payload, points)
+    assert [(p["latitude"], p["longitude"]) for p in out] == points
+
+
+def test_split_falls_back_to_coordinates_within_tolerance():
+    points = [(10.0, 20.0), (30.0, 40.0)]
+    payload = [loc(30.0004, 39.9996, address="Somewhere"), loc(10.0, 20.0, address="Elsewhere"), "junk"]
+    out = split_multi_location(payload, points)
+    assert out[0]["address"] == "Elsewhere"
+    assert out[1]["address"] == "Somewhere"
+    assert isinstance(split_multi_location(payload, points, tolerance_deg=1e-5)[1], BatchLocationError)
+
+
+def test_split_reports_missing_failed_and_empty_locations():
+    points = [(1.0, 1.0), (2.0, 2.0), (3.0, 3.0), (4.0, 4.0)]
+    payload = {"locations": [
+        loc(1.0, 1.0),
+        loc(2.0, 2.0, errorCode=999, message="Invalid location"),
+        {"address": location_key(3.0, 3.0), "latitude": 3.0, "longitude": 3.0},
+    ]}
+    out = split_multi_location(payload, points)
+    assert out[0]["latitude"] == 1.0
+    assert all(isinstance(r, BatchLocationError) for r in out[1:])
+    assert str(out[1]) == "Invalid location"
+    assert "returned no data" in str(out[2])
+    assert "missing" in str(out[3])
+
+
+def test_each_entry_serves_one_point():
+    # Two cities at the same coordinates but one entry returned: the second is not handed a copy.
+    points = [(5.0, 5.0), (5.0, 5.0)]
+    out = split_multi_location({"locations": [loc(5.0, 5.0)]}, points)
+    assert out[0]["latitude"] == 5.0
+    assert isinstance(out[1], BatchLocationError)
+
+
+def test_take_prefetched():
+    stats = BatchStats(size=10)
+    prefetched = {"a": {"days": []}, "b": BatchLocationError("bad"), "c": RuntimeError("batch failed")}
+    assert take_prefetched(prefetched, "a", stats) == {"days": []}
+    assert take_prefetched(prefetched, "b", stats) is None
+    assert take_prefetched(prefetched, "missing", stats) is None
+    assert take_prefetched(None, "a", stats) is None
+    with pytest.raises(RuntimeError, match="batch failed"):
+        take_prefetched(prefetched, "c", stats)
+    assert stats.stats()["fallbacks"] == 1
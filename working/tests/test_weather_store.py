@@ -0,0 +1,266 @@
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+import weather_store
+from weather_store import gap_ranges, prune_before, window_days
+
+EST, FC = "daily_data_estimated", "daily_data_forecast"
+COLUMNS = ["city", "date", "tmax_c", "tmin_c", "weathercode", "sunrise", "sunset", "data_source"]
+
+
+def create_weather_table(conn, table):
+    conn.execute(
+        f"CREATE TABLE {table} (city TEXT, date TEXT, tmax_c REAL, tmin_c REAL, weathercode INT, "
+        "sunrise TEXT, sunset TEXT, data_source TEXT DEFAULT 'estimated', PRIMARY KEY (city, date))"
+    )
+
+
+def days(start, n):
+    first = date.fromisoformat(start)
+    return [(first + timedelta(days=i)).isoformat() for i in range(n)]
+
+
+def write(conn, table, city, dates, tmax=20.0, tmin=10.0, code=0, source=None):
+    rows = [
+        (city, d, tmax, tmin, code, f"{d}T06:00", f"{d}T18:00", source or ("forecast" if table == FC else "estimated"))
+        for d in dates
+    ]
+    weather_store.upsert_weather_rows(conn, table, COLUMNS, rows)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    create_weather_table(conn, EST)
+    create_weather_table(conn, FC)
+    return conn
+
+
+def bitmap(conn, city, start, end, table=EST):
+    return weather_store.coverage_bitmap(conn, table, city, start, end)
+
+
+# ---------------------------------------------------------------- rolling window
+
+
+def test_rolled_window_plans_only_the_new_day(conn):
+    weather_store.ensure_coverage(conn)
+    write(conn, EST, "Oslo, NO", days("2024-01-01", 365))
+    assert gap_ranges(bitmap(conn, "Oslo, NO", "2024-01-01", "2024-12-30"), "2024-01-01", "2024-12-30") == []
+    # Next morning the window has moved on a day.
+    assert gap_ranges(bitmap(conn, "Oslo, NO", "2024-01-02", "2024-12-31"), "2024-01-02", "2024-12-31") == [
+        ("2024-12-31", "2024-12-31")
+    ]
+    assert gap_ranges(0, "2024-01-02", "2024-12-31") == [("2024-01-02", "2024-12-31")]
+
+
+def test_prune_drops_days_that_left_the_window(conn):
+    weather_store.ensure_coverage(conn)
+    write(conn, EST, "Oslo, NO", days("2024-01-01", 10))
+    write(conn, EST, "Lima, PE", days("2024-01-01", 3), source="backfill")
+    assert prune_before(conn, EST, "2024-01-03", data_source="estimated") == 2
+    assert prune_before(conn, EST, "2024-01-03") == 2
+    assert prune_before(conn, EST, "2024-01-03") == 0
+    start, end = "2024-01-01", "2024-01-10"
+    assert weather_store.coverage_count(bitmap(conn, "Oslo, NO", start, end)) == window_days(start, end) - 2
+
+
+# ---------------------------------------------------------------- coverage bitmaps
+
+
+def test_triggers_keep_the_coverage_bitmap_in_step(conn):
+    weather_store.ensure_coverage(conn)
+    start, end = "2024-01-01", "2024-03-31"
+    # Days 0-2 and 40 sit in different 32-bit words; pre-epoch rows are not tracked.
+    write(conn, EST, "Oslo, NO", days(start, 3) + ["2024-02-10", "2019-12-31"])
+    assert bitmap(conn, "Oslo, NO", start, end) == 0b111 | 1 << 40
+
+    conn.execute(f"UPDATE {EST} SET date='2024-01-06' WHERE city='Oslo, NO' AND date='2024-01-03'")
+    conn.execute(f"DELETE FROM {EST} WHERE city='Oslo, NO' AND date='2024-01-02'")
+    conn.execute(f"UPDATE {EST} SET city='Lima, PE' WHERE date='2024-02-10'")
+    # Upserts of an existing day leave the bits alone.
+    write(conn, EST, "Oslo, NO", ["2024-01-01"], tmax=30.0)
+    assert bitmap(conn, "Oslo, NO", start, end) == 0b100001
+    assert bitmap(conn, "Lima, PE", start, end) == 1 << 40
+    assert bitmap(conn, "Oslo, NO", start, end, table=FC) == 0
+
+    write(conn, FC, "Oslo, NO", ["2024-01-02"])
+    assert bitmap(conn, "Oslo, NO", start, end, table=FC) == 0b10
+    assert weather_store.coverage_bitmap_map(conn, EST, "2024-01-05", end) == {"Oslo, NO": 0b10, "Lima, PE": 1 << 36}
+
+    before = conn.execute("SELECT tbl, city, word, bits FROM date_coverage WHERE bits <> 0 ORDER BY 1, 2, 3").fetchall()
+    weather_store.rebuild_coverage(conn)
+    assert conn.execute("SELECT tbl, city, word, bits FROM date_coverage ORDER BY 1, 2, 3").fetchall() == before
+
+
+def test_coverage_is_seeded_from_existing_rows(conn):
+    write(conn, EST, "Oslo, NO", days("2024-01-30", 5))
+    weather_store.ensure_coverage(conn)
+    assert bitmap(conn, "Oslo, NO", "2024-01-29", "2024-02-05") == 0b111110
+    # Creating it again does not reseed or duplicate anything.
+    weather_store.ensure_coverage(conn)
+    assert bitmap(conn, "Oslo, NO", "2024-01-29", "2024-02-05") == 0b111110
+
+
+def test_gap_ranges_merge_nearby_gaps():
+    start, end = "2024-01-01", "2024-01-10"
+    # Present: days 2, 5-6 and 9 (2024-01-03, -06, -07, -10).
+    present = 1 << 2 | 1 << 5 | 1 << 6 | 1 << 9
+    assert gap_ranges(present, start, end) == [
+        ("2024-01-01", "2024-01-02"),
+        ("2024-01-04", "2024-01-05"),
+        ("2024-01-08", "2024-01-09"),
+    ]
+    assert gap_ranges(present, start, end, merge_gap_days=1) == [
+        ("2024-01-01", "2024-01-05"),
+        ("2024-01-08", "2024-01-09"),
+    ]
+    assert gap_ranges(present, start, end, merge_gap_days=2) == [("2024-01-01", "2024-01-09")]
+    assert gap_ranges((1 << 10) - 1, start, end, merge_gap_days=5) == []
+    # Bits past the window are ignored.
+    assert gap_ranges(1 << 10 | 0b1111111110, start, end) == [("2024-01-01", "2024-01-01")]
+
+
+# ---------------------------------------------------------------- daily_data view
+
+
+def object_type(conn, name):
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name=?", (name,)).fetchone()
+    return row and row[0]
+
+
+def test_materialized_daily_data_is_migrated_to_the_view(conn):
+    # Baseline schema: the split tables plus a materialized daily_data every writer double-wrote.
+    create_weather_table(conn, "daily_data")
+    write(conn, "daily_data", "Oslo, NO", ["2024-01-01"], tmax=1.0, source="estimated")
+    write(conn, "daily_data", "Oslo, NO", ["2024-01-02"], tmax=2.0, source="forecast")
+    write(conn, "daily_data", "Oslo, NO", ["2024-01-03"], tmax=3.0)
+    conn.execute("UPDATE daily_data SET data_source=NULL WHERE date='2024-01-03'")
+    write(conn, "daily_data", "Oslo, NO", ["2024-01-04"], tmax=4.0, source="estimated")
+    write(conn, EST, "Oslo, NO", ["2024-01-04"], tmax=40.0)
+
+    weather_store.ensure_daily_view(conn)
+    assert object_type(conn, "daily_data") == "view"
+    assert conn.execute(f"SELECT date, tmax_c FROM {EST} ORDER BY date").fetchall() == [
+        ("2024-01-01", 1.0), ("2024-01-03", 3.0), ("2024-01-04", 40.0)
+    ]
+    assert conn.execute(f"SELECT date, tmax_c FROM {FC}").fetchall() == [("2024-01-02", 2.0)]
+
+    # A forecast row supersedes the estimated one for the same day.
+    write(conn, FC, "Oslo, NO", ["2024-01-01"], tmax=11.0)
+    assert conn.execute("SELECT date, tmax_c, data_source FROM daily_data ORDER BY date").fetchall() == [
+        ("2024-01-01", 11.0, "forecast"),
+        ("2024-01-02", 2.0, "forecast"),
+        ("2024-01-03", 3.0, None),
+        ("2024-01-04", 40.0, "estimated"),
+    ]
+
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name='daily_data'").fetchone()[0]
+    weather_store.ensure_daily_view(conn)
+    assert conn.execute("SELECT sql FROM sqlite_master WHERE name='daily_data'").fetchone()[0] == sql
+
+
+def test_view_follows_new_columns_on_both_split_tables(conn):
+    weather_store.ensure_daily_view(conn)
+    conn.execute(f"ALTER TABLE {EST} ADD COLUMN humidity_pct REAL")
+    weather_store.ensure_daily_view(conn)
+    assert "humidity_pct" not in weather_store._table_columns(conn, "daily_data")
+    conn.execute(f"ALTER TABLE {FC} ADD COLUMN humidity_pct REAL")
+    weather_store.ensure_daily_view(conn)
+    assert "humidity_pct" in weather_store._table_columns(conn, "daily_data")
+
+
+def test_no_view_without_the_split_tables():
+    conn = sqlite3.connect(":memory:")
+    weather_store.ensure_daily_view(conn)
+    assert object_type(conn, "daily_data") is None
+
+
+# ---------------------------------------------------------------- monthly aggregates
+
+
+def rebuilt_sums(conn, city, start, end):
+    """The city's sums recomputed from scratch, leaving the stored ones untouched."""
+    conn.execute("SAVEPOINT rebuild")
+    try:
+        weather_store.mark_monthly_agg_dirty(conn, [city])
+        assert weather_store.refresh_monthly_agg(conn, city, start, end) == "rebuilt"
+        return weather_store.monthly_agg_map(conn, city).get(city, {})
+    finally:
+        conn.execute("ROLLBACK TO rebuild")
+        conn.execute("RELEASE rebuild")
+
+
+def assert_sums_match(conn, city, start, end):
+    stored = weather_store.monthly_agg_map(conn, city).get(city, {})
+    expected = rebuilt_sums(conn, city, start, end)
+    assert stored.keys() == expected.keys()
+    for month, sums in expected.items():
+        assert stored[month] == pytest.approx(sums)
+    assert weather_store.monthly_agg_map(conn, city).get(city, {}) == stored
+
+
+@pytest.fixture
+def agg(conn):
+    weather_store.ensure_daily_view(conn)
+    weather_store.ensure_monthly_agg(conn)
+    write(conn, EST, "Oslo, NO", days("2024-01-01", 5))
+    write(conn, EST, "Oslo, NO", days("2024-02-01", 2), code=3)
+    conn.execute(f"UPDATE {EST} SET tmax_c=NULL WHERE date='2024-02-02'")
+    assert weather_store.refresh_monthly_agg(conn, "Oslo, NO", "2024-01-01", "2024-12-31") == "rebuilt"
+    return conn
+
+
+def test_refresh_builds_the_month_sums(agg):
+    sums = weather_store.monthly_agg_map(agg)["Oslo, NO"]
+    assert sums[1] == pytest.approx({
+        "days": 5, "tmax_sum": 100.0, "tmax_days": 5, "tmin_sum": 50.0, "tmin_days": 5,
+        "sunny_days": 5, "daylen_sum": 60.0, "daylen_days": 5,
+    })
+    assert (sums[2]["days"], sums[2]["tmax_sum"], sums[2]["tmax_days"], sums[2]["sunny_days"]) == (2, 20.0, 1, 0)
+    assert weather_store.refresh_monthly_agg(agg, "Oslo, NO", "2024-01-01", "2024-12-31") == "fresh"
+
+
+def test_triggers_apply_row_changes_to_clean_cities(agg):
+    window = ("Oslo, NO", "2024-01-01", "2024-12-31")
+    steps = [
+        f"INSERT INTO {EST} (city, date, tmax_c, tmin_c, weathercode) VALUES ('Oslo, NO', '2024-01-06', 25, 15, 1)",
+        f"UPDATE {EST} SET tmax_c=30, weathercode=61 WHERE city='Oslo, NO' AND date='2024-01-01'",
+        f"DELETE FROM {EST} WHERE city='Oslo, NO' AND date='2024-01-02'",
+        # A forecast row hides the estimated row of its day, and shows it again once deleted.
+        f"INSERT INTO {FC} (city, date, tmax_c, tmin_c, weathercode) VALUES ('Oslo, NO', '2024-01-03', 5, -5, 71)",
+        f"UPDATE {FC} SET tmax_c=6 WHERE city='Oslo, NO' AND date='2024-01-03'",
+        f"UPDATE {EST} SET tmax_c=99 WHERE city='Oslo, NO' AND date='2024-01-03'",
+        f"UPDATE {FC} SET date='2024-01-04' WHERE city='Oslo, NO' AND date='2024-01-03'",
+        f"DELETE FROM {FC} WHERE city='Oslo, NO'",
+        f"UPDATE {EST} SET date='2024-03-04' WHERE city='Oslo, NO' AND date='2024-01-04'",
+        # Outside the window: no change.
+        f"INSERT INTO {EST} (city, date, tmax_c) VALUES ('Oslo, NO', '2025-01-01', 50)",
+    ]
+    for sql in steps:
+        agg.execute(sql)
+        assert_sums_match(agg, *window)
+    sums = weather_store.monthly_agg_map(agg, "Oslo, NO")["Oslo, NO"]
+    assert sums[1]["days"] == 4
+    assert sums[1]["tmax_sum"] == 30.0 + 99.0 + 20.0 + 25.0
+    assert sums[3]["days"] == 1
+
+
+def test_dirty_cities_are_skipped_until_rebuilt(agg):
+    weather_store.mark_monthly_agg_dirty(agg, ["Oslo, NO"])
+    before = weather_store.monthly_agg_map(agg, "Oslo, NO")
+    write(agg, EST, "Oslo, NO", ["2024-01-10"])
+    assert weather_store.monthly_agg_map(agg, "Oslo, NO") == before
+    assert weather_store.refresh_monthly_agg(agg, "Oslo, NO", "2024-01-01", "2024-12-31") == "rebuilt"
+    assert weather_store.monthly_agg_map(agg, "Oslo, NO")["Oslo, NO"][1]["days"] == 6
+
+
+def test_moving_window_is_rolled(agg):
+    write(agg, EST, "Oslo, NO", ["2025-01-01"])
+    assert weather_store.refresh_monthly_agg(agg, "Oslo, NO", "2024-01-03", "2025-01-02") == "rolled"
+    assert_sums_match(agg, "Oslo, NO", "2024-01-03", "2025-01-02")
+    assert weather_store.monthly_agg_map(agg, "Oslo, NO")["Oslo, NO"][1]["days"] == 4
+    counts = weather_store.refresh_monthly_agg_all(agg, "2024-01-03", "2025-01-02")
+    assert counts == {"fresh": 1, "rolled": 0, "rebuilt": 0}
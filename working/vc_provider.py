@@ -0,0 +1,1006 @@
+#!/usr/bin/env python3
+"""
+Shared Visual Crossing provider plumbing used by sunseeker, the catalog backfill
+runner and the city weather dashboard.
+
+State lives in a small SQLite file next to this module (override with
+VC_PROVIDER_STATE_DB) so that every process on the box shares one request budget.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+BASE_DIR = str(Path(__file__).resolve().parent)
+PROVIDER_STATE_DB = os.environ.get("VC_PROVIDER_STATE_DB", f"{BASE_DIR}/provider_state.db")
+DEFAULT_BUCKET = "visualcrossing"
+
+
+def env_float(name: str, default: float) -> float:
+    """Float setting from the environment; `default` when unset or unparsable. Shared by the sync modules."""
+    try:
+        return float(os.environ.get(name, "") or default)
+    except ValueError:
+        return default
+
+
+# Shared rate for a new bucket: the catalog backfill's old 0.15 s pacing, so one backfill keeps
+# its throughput. VC_MIN_INTERVAL_SEC is the older per-process pacing knob; keep honouring it.
+DEFAULT_RATE_PER_SEC = env_float("VC_RATE_PER_SEC", 1.0 / max(0.01, env_float("VC_MIN_INTERVAL_SEC", 0.15)))
+DEFAULT_BURST = env_float("VC_BURST", 2.0)
+# City keys whose coordinates fall in the same cell of this grid (degrees) share one request
+# per window, fetched at the cell centre. Off by default: 0 merges only keys with identical
+# coordinates, so every city is fetched at its own point.
+DEFAULT_GRID_DEG = env_float("VC_GRID_DEG", 0.0)
+# Point every fetch path at another host, e.g. a local vc_simulator.py, with VC_BASE_URL.
+VC_BASE_URL = os.environ.get("VC_BASE_URL", "https://weather.visualcrossing.com").rstrip("/")
+VC_TIMELINE_URL = f"{VC_BASE_URL}/VisualCrossingWebServices/rest/services/timeline"
+# Multi-location retrieval: one request for up to VC_BATCH_SIZE locations sharing a window and
+# include set (1 = one request per location, the default).
+VC_MULTI_URL = f"{VC_BASE_URL}/VisualCrossingWebServices/rest/services/timelinemulti"
+VC_BATCH_SIZE = max(1, int(env_float("VC_BATCH_SIZE", 1)))
+# Circuit breaker: trip after this many failures in a row, or this error rate over the window.
+BREAKER_ENABLED = os.environ.get("VC_BREAKER", "1") != "0"
+BREAKER_FAILURES = int(env_float("VC_BREAKER_FAILURES", 5))
+BREAKER_ERROR_RATE = env_float("VC_BREAKER_ERROR_RATE", 0.5)
+BREAKER_MIN_REQUESTS = int(env_float("VC_BREAKER_MIN_REQUESTS", 20))
+BREAKER_WINDOW_SEC = env_float("VC_BREAKER_WINDOW_SEC", 120.0)
+# First wait before a probe; doubled after each failed probe up to the max (6 hours).
+BREAKER_COOLDOWN_SEC = env_float("VC_BREAKER_COOLDOWN_SEC", 300.0)
+BREAKER_MAX_COOLDOWN_SEC = env_float("VC_BREAKER_MAX_COOLDOWN_SEC", 6 * 3600.0)
+BREAKER_PROBE_TIMEOUT_SEC = env_float("VC_BREAKER_PROBE_TIMEOUT_SEC", 120.0)
+# How often a wait for a controller slot re-checks the caller's stop event.
+STOP_POLL_SEC = 0.25
+
+
+def utcnow_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class Cancelled(RuntimeError):
+    """Raised from a rate-limit, slot or probe wait once the caller's stop event is set."""
+
+
+def wait_or_cancel(seconds: float, stop: threading.Event | None, what: str) -> None:
+    """time.sleep(seconds), cut short with Cancelled when `stop` is set before or during it."""
+    if stop is None:
+        if seconds > 0:
+            time.sleep(seconds)
+        return
+    if stop.wait(max(0.0, seconds)):
+        raise Cancelled(f"stop requested while waiting for {what}")
+
+
+def state_connect(db_path: str = "") -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path or PROVIDER_STATE_DB, timeout=60, isolation_level=None)
+    conn.execute("PRAGMA busy_timeout=60000")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS token_buckets (
+            name TEXT PRIMARY KEY,
+            rate_per_sec REAL NOT NULL,
+            burst REAL NOT NULL,
+            tokens REAL NOT NULL,
+            refilled_at REAL NOT NULL,
+            total_acquired INTEGER NOT NULL DEFAULT 0,
+            total_wait_sec REAL NOT NULL DEFAULT 0,
+            max_wait_sec REAL NOT NULL DEFAULT 0,
+            updated_at TEXT
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS provider_health (
+            name TEXT PRIMARY KEY,
+            state TEXT NOT NULL,
+            opened_at REAL,
+            reason TEXT,
+            cooldown_sec REAL NOT NULL DEFAULT 0,
+            next_probe_at REAL,
+            probe_started_at REAL,
+            consecutive_failures INTEGER NOT NULL DEFAULT 0,
+            window_started_at REAL NOT NULL DEFAULT 0,
+            window_requests INTEGER NOT NULL DEFAULT 0,
+            window_errors INTEGER NOT NULL DEFAULT 0,
+            total_opens INTEGER NOT NULL DEFAULT 0,
+            last_status INTEGER,
+            updated_at TEXT
+        )
+        """
+    )
+    return conn
+
+
+class TokenBucket:
+    """
+    Token bucket persisted in SQLite and shared across processes.
+
+    Callers reserve a token inside a write transaction and are told how long to wait
+    for it. The balance may go negative, which queues concurrent callers (in any
+    process) behind each other instead of letting them poll and burst together.
+
+    The shared rate and burst come from the stored row (or VC_RATE_PER_SEC / VC_BURST for
+    a new bucket) and only change through configure(). rate_per_sec/burst given here are a
+    per-run cap kept in memory: this process also paces itself through a local bucket with
+    those values, on top of the shared one, and never writes them to the state DB.
+    """
+
+    def __init__(self, name: str = DEFAULT_BUCKET, rate_per_sec: float | None = None, burst: float | None = None, db_path: str = ""):
+        self.name = name
+        self.db_path = db_path or PROVIDER_STATE_DB
+        self._rate_override = rate_per_sec
+        self._burst_override = burst
+        self._local: dict[str, float] | None = None
+        self._local_lock = threading.Lock()
+
+    def _load(self, conn: sqlite3.Connection, now: float) -> dict[str, Any]:
+        row = conn.execute(
+            "SELECT rate_per_sec, burst, tokens, refilled_at, total_acquired, total_wait_sec, max_wait_sec "
+            "FROM token_buckets WHERE name=?",
+            (self.name,),
+        ).fetchone()
+        if row is None:
+            return {
+                "rate_per_sec": max(1e-6, float(DEFAULT_RATE_PER_SEC)),
+                "burst": max(1.0, float(DEFAULT_BURST)),
+                "tokens": max(1.0, float(DEFAULT_BURST)),
+                "refilled_at": now,
+                "total_acquired": 0,
+                "total_wait_sec": 0.0,
+                "max_wait_sec": 0.0,
+            }
+        state = {
+            "rate_per_sec": float(row[0]),
+            "burst": float(row[1]),
+            "tokens": float(row[2]),
+            "refilled_at": float(row[3]),
+            "total_acquired": int(row[4]),
+            "total_wait_sec": float(row[5]),
+            "max_wait_sec": float(row[6]),
+        }
+        elapsed = max(0.0, now - state["refilled_at"])
+        state["tokens"] = min(state["burst"], state["tokens"] + elapsed * state["rate_per_sec"])
+        state["refilled_at"] = now
+        return state
+
+    def _reserve_local(self, tokens: float, now: float, shared: dict[str, Any]) -> float:
+        """Per-run cap: same reservation against an in-memory bucket; falls back to the shared value for an unset override."""
+        if self._rate_override is None and self._burst_override is None:
+            return 0.0
+        rate = max(1e-6, float(self._rate_override if self._rate_override is not None else shared["rate_per_sec"]))
+        burst = max(1.0, float(self._burst_override if self._burst_override is not None else shared["burst"]))
+        with self._local_lock:
+            if self._local is None:
+                self._local = {"tokens": burst, "refilled_at": now}
+            local = self._local
+            local["tokens"] = min(burst, local["tokens"] + max(0.0, now - local["refilled_at"]) * rate)
+            local["refilled_at"] = now
+            local["tokens"] -= tokens
+            return max(0.0, -local["tokens"] / rate)
+
+    def _save(self, conn: sqlite3.Connection, state: dict[str, Any]) -> None:
+        conn.execute(
+            """
+            INSERT INTO token_buckets(
+                name, rate_per_sec, burst, tokens, refilled_at, total_acquired, total_wait_sec, max_wait_sec, updated_at
+            ) VALUES (?,?,?,?,?,?,?,?,?)
+            ON CONFLICT(name) DO UPDATE SET
+                rate_per_sec=excluded.rate_per_sec,
+                burst=excluded.burst,
+                tokens=excluded.tokens,
+                refilled_at=excluded.refilled_at,
+                total_acquired=excluded.total_acquired,
+                total_wait_sec=excluded.total_wait_sec,
+                max_wait_sec=excluded.max_wait_sec,
+                updated_at=excluded.updated_at
+            """,
+            (
+                self.name,
+                state["rate_per_sec"],
+                state["burst"],
+                state["tokens"],
+                state["refilled_at"],
+                state["total_acquired"],
+                state["total_wait_sec"],
+                state["max_wait_sec"],
+                utcnow_iso(),
+            ),
+        )
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take `tokens` from the bucket and return the seconds the caller must wait before using them."""
+        conn = state_connect(self.db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            state = self._load(conn, now)
+            state["tokens"] -= tokens
+            wait = max(0.0, -state["tokens"] / state["rate_per_sec"], self._reserve_local(tokens, now, state))
+            state["total_acquired"] += 1
+            state["total_wait_sec"] += wait
+            state["max_wait_sec"] = max(state["max_wait_sec"], wait)
+            self._save(conn, state)
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def acquire(self, tokens: float = 1.0, stop: threading.Event | None = None) -> float:
+        """Blocking variant of reserve(); returns the time spent waiting. Setting `stop` ends the wait with Cancelled."""
+        wait_or_cancel(0.0, stop, "the VC token bucket")
+        wait = self.reserve(tokens)
+        if wait > 0:
+            wait_or_cancel(wait, stop, "the VC token bucket")
+        return wait
+
+    def configure(self, rate_per_sec: float | None = None, burst: float | None = None) -> dict[str, Any]:
+        """Persist a new shared rate and/or burst; every process using this bucket picks it up."""
+        conn = state_connect(self.db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            state = self._load(conn, time.time())
+            if rate_per_sec is not None:
+                state["rate_per_sec"] = max(1e-6, float(rate_per_sec))
+            if burst is not None:
+                state["burst"] = max(1.0, float(burst))
+            state["tokens"] = min(state["tokens"], state["burst"])
+            self._save(conn, state)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return self.stats()
+
+    def stats(self) -> dict[str, Any]:
+        conn = state_connect(self.db_path)
+        try:
+            state = self._load(conn, time.time())
+        finally:
+            conn.close()
+        tokens = state["tokens"]
+        acquired = state["total_acquired"]
+        out = {
+            "name": self.name,
+            "db_path": self.db_path,
+            "rate_per_sec": round(state["rate_per_sec"], 4),
+            "burst": state["burst"],
+            "tokens": round(tokens, 3),
+            "wait_sec": round(max(0.0, (1.0 - tokens) / state["rate_per_sec"]), 3),
+            "queued": max(0, math.ceil(-tokens)),
+            "total_acquired": acquired,
+            "total_wait_sec": round(state["total_wait_sec"], 3),
+            "avg_wait_sec": round(state["total_wait_sec"] / acquired, 3) if acquired else 0.0,
+            "max_wait_sec": round(state["max_wait_sec"], 3),
+        }
+        if self._rate_override is not None:
+            out["run_rate_per_sec"] = self._rate_override
+        if self._burst_override is not None:
+            out["run_burst"] = self._burst_override
+        return out
+
+
+class ProviderUnavailable(RuntimeError):
+    """Raised instead of sending a request while the provider's circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit for one provider, persisted in the provider state DB
+    so the GUI sync, the backfill runner and the dashboard all see the same outage.
+
+    Transport errors, 429s and 5xx responses count as failures. BREAKER_FAILURES in a row,
+    or an error rate of BREAKER_ERROR_RATE over at least BREAKER_MIN_REQUESTS in the current
+    window, opens the circuit for a cooldown (or the server's Retry-After, if longer). Once it
+    has passed, exactly one caller is let through as the probe: success closes the circuit,
+    failure reopens it with the cooldown doubled.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str = DEFAULT_BUCKET, db_path: str = "", enabled: bool = BREAKER_ENABLED):
+        self.name = name
+        self.db_path = db_path or PROVIDER_STATE_DB
+        self.enabled = enabled
+
+    def _load(self, conn: sqlite3.Connection) -> dict[str, Any]:
+        row = conn.execute(
+            "SELECT state, opened_at, reason, cooldown_sec, next_probe_at, probe_started_at, consecutive_failures, "
+            "window_started_at, window_requests, window_errors, total_opens, last_status "
+            "FROM provider_health WHERE name=?",
+            (self.name,),
+        ).fetchone()
+        keys = (
+            "state", "opened_at", "reason", "cooldown_sec", "next_probe_at", "probe_started_at", "consecutive_failures",
+            "window_started_at", "window_requests", "window_errors", "total_opens", "last_status",
+        )
+        if row is None:
+            return dict(zip(keys, (self.CLOSED, None, None, 0.0, None, None, 0, 0.0, 0, 0, 0, None)))
+        return dict(zip(keys, row))
+
+    def _save(self, conn: sqlite3.Connection, state: dict[str, Any]) -> None:
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO provider_health(
+                name, state, opened_at, reason, cooldown_sec, next_probe_at, probe_started_at, consecutive_failures,
+                window_started_at, window_requests, window_errors, total_opens, last_status, updated_at
+            ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+            """,
+            (
+                self.name, state["state"], state["opened_at"], state["reason"], state["cooldown_sec"],
+                state["next_probe_at"], state["probe_started_at"], state["consecutive_failures"],
+                state["window_started_at"], state["window_requests"], state["window_errors"],
+                state["total_opens"], state["last_status"], utcnow_iso(),
+            ),
+        )
+
+    @contextmanager
+    def _transaction(self):
+        conn = state_connect(self.db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            state = self._load(conn)
+            before = dict(state)
+            yield state
+            if state != before:
+                self._save(conn, state)
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _blocked(self, state: dict[str, Any], now: float) -> bool:
+        if state["state"] == self.OPEN:
+            return now < (state["next_probe_at"] or 0.0)
+        if state["state"] == self.HALF_OPEN:
+            return now - (state["probe_started_at"] or 0.0) < BREAKER_PROBE_TIMEOUT_SEC
+        return False
+
+    def is_open(self) -> bool:
+        """True while requests would be refused: open before the probe time, or a probe in flight."""
+        if not self.enabled:
+            return False
+        conn = state_connect(self.db_path)
+        try:
+            state = self._load(conn)
+        finally:
+            conn.close()
+        return self._blocked(state, time.time())
+
+    def allow(self) -> bool:
+        """Whether to send a request now; the first caller after the cooldown becomes the half-open probe."""
+        if not self.enabled:
+            return True
+        conn = state_connect(self.db_path)
+        try:
+            state = self._load(conn)
+        finally:
+            conn.close()
+        if state["state"] == self.CLOSED:
+            return True
+        with self._transaction() as state:
+            now = time.time()
+            if state["state"] == self.CLOSED:
+                return True
+            if self._blocked(state, now):
+                return False
+            state["state"] = self.HALF_OPEN
+            state["probe_started_at"] = now
+            return True
+
+    def probing(self) -> bool:
+        """True while another caller's half-open probe is in flight."""
+        if not self.enabled:
+            return False
+        conn = state_connect(self.db_path)
+        try:
+            state = self._load(conn)
+        finally:
+            conn.close()
+        return state["state"] == self.HALF_OPEN and self._blocked(state, time.time())
+
+    def _unavailable(self) -> ProviderUnavailable:
+        st = self.status()
+        return ProviderUnavailable(
+            f"{self.name} circuit {st['state']} ({st['reason'] or 'errors'}); next probe at {st['next_probe_at'] or 'soon'}"
+        )
+
+    def check(self, wait_for_probe: bool = False, poll_sec: float = 0.25, stop: threading.Event | None = None) -> None:
+        """
+        allow(), raising ProviderUnavailable when the answer is no. With wait_for_probe, a
+        caller that arrives while a probe is in flight waits for its verdict instead (or
+        until `stop` is set, which raises Cancelled).
+        """
+        while not self.allow():
+            if not (wait_for_probe and self.probing()):
+                raise self._unavailable()
+            wait_or_cancel(poll_sec, stop, "the VC probe")
+
+    async def check_async(self, poll_sec: float = 0.25) -> None:
+        """check(wait_for_probe=True) for the event loop; the SQLite reads run on worker threads."""
+        while not await asyncio.to_thread(self.allow):
+            if not await asyncio.to_thread(self.probing):
+                raise await asyncio.to_thread(self._unavailable)
+            await asyncio.sleep(poll_sec)
+
+    def _open(self, state: dict[str, Any], now: float, reason: str, cooldown_sec: float, retry_after: float | None) -> None:
+        if state["state"] != self.OPEN:
+            state["total_opens"] += 1
+            state["opened_at"] = now if state["state"] == self.CLOSED else state["opened_at"]
+        state["state"] = self.OPEN
+        state["reason"] = reason
+        state["cooldown_sec"] = cooldown_sec
+        state["next_probe_at"] = now + max(cooldown_sec, retry_after or 0.0)
+        state["probe_started_at"] = None
+
+    def record(self, status_code: int | None, retry_after: float | None = None) -> None:
+        """Feed one response (status_code=None for a transport error) into the shared state."""
+        if not self.enabled:
+            return
+        failed = status_code is None or status_code == 429 or status_code >= 500
+        with self._transaction() as state:
+            now = time.time()
+            if now - state["window_started_at"] > BREAKER_WINDOW_SEC:
+                state["window_started_at"] = now
+                state["window_requests"] = 0
+                state["window_errors"] = 0
+            state["window_requests"] += 1
+            state["window_errors"] += int(failed)
+            state["consecutive_failures"] = state["consecutive_failures"] + 1 if failed else 0
+            state["last_status"] = status_code
+            reason = "transport_error" if status_code is None else ("rate_limited" if status_code == 429 else f"http_{status_code}")
+            if state["state"] == self.HALF_OPEN:
+                if failed:
+                    cooldown = min(BREAKER_MAX_COOLDOWN_SEC, max(BREAKER_COOLDOWN_SEC, state["cooldown_sec"] * 2.0))
+                    self._open(state, now, reason, cooldown, retry_after)
+                else:
+                    state.update(state=self.CLOSED, reason=None, cooldown_sec=0.0, next_probe_at=None, probe_started_at=None)
+                    state.update(window_started_at=now, window_requests=1, window_errors=0)
+            elif state["state"] == self.CLOSED and failed:
+                rate = state["window_errors"] / state["window_requests"]
+                if state["consecutive_failures"] >= BREAKER_FAILURES or (
+                    state["window_requests"] >= BREAKER_MIN_REQUESTS and rate >= BREAKER_ERROR_RATE
+                ):
+                    self._open(state, now, reason, BREAKER_COOLDOWN_SEC, retry_after)
+
+    def trip(self, reason: str, cooldown_sec: float | None = None, retry_after: float | None = None) -> None:
+        """Open the circuit now, e.g. when the caller's own backoff has run out of room."""
+        if not self.enabled:
+            return
+        with self._transaction() as state:
+            if state["state"] != self.OPEN:
+                self._open(state, time.time(), reason, cooldown_sec or BREAKER_COOLDOWN_SEC, retry_after)
+
+    def reset(self) -> dict[str, Any]:
+        with self._transaction() as state:
+            state.update(state=self.CLOSED, reason=None, cooldown_sec=0.0, next_probe_at=None, probe_started_at=None)
+            state["consecutive_failures"] = 0
+        return self.status()
+
+    def status(self) -> dict[str, Any]:
+        conn = state_connect(self.db_path)
+        try:
+            state = self._load(conn)
+        finally:
+            conn.close()
+        now = time.time()
+
+        def iso(ts):
+            return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
+
+        requests_in_window = state["window_requests"] if now - state["window_started_at"] <= BREAKER_WINDOW_SEC else 0
+        errors_in_window = state["window_errors"] if requests_in_window else 0
+        return {
+            "name": self.name,
+            "enabled": self.enabled,
+            "state": state["state"],
+            "blocked": self.enabled and self._blocked(state, now),
+            "reason": state["reason"],
+            "opened_at": iso(state["opened_at"]) if state["state"] != self.CLOSED else None,
+            "next_probe_at": iso(state["next_probe_at"]) if state["state"] != self.CLOSED else None,
+            "retry_in_sec": round(max(0.0, (state["next_probe_at"] or now) - now), 1) if state["state"] == self.OPEN else 0.0,
+            "cooldown_sec": state["cooldown_sec"],
+            "consecutive_failures": state["consecutive_failures"],
+            "window_requests": requests_in_window,
+            "error_rate": round(errors_in_window / requests_in_window, 3) if requests_in_window else 0.0,
+            "total_opens": state["total_opens"],
+            "last_status": state["last_status"],
+        }
+
+    def summary(self) -> str:
+        st = self.status()
+        if st["state"] == self.CLOSED:
+            return f"circuit closed (error rate {st['error_rate']:.0%} over {st['window_requests']} requests)"
+        return f"circuit {st['state']} ({st['reason']}), next probe at {st['next_probe_at']}"
+
+
+def retry_after_sec(headers: Any) -> float | None:
+    value = (headers or {}).get("Retry-After")
+    return float(value) if value and str(value).strip().isdigit() else None
+
+
+class AimdController:
+    """
+    AIMD controller for how hard one process drives Visual Crossing.
+
+    It owns two knobs: the number of requests allowed in flight (`limit`) and a local
+    spacing between request starts (`interval_sec`, applied on top of the shared token
+    bucket). A 429, 503 or transport failure halves the limit and doubles the interval.
+    A latency EWMA above target trims the limit. After a full window of clean responses
+    it probes upward: the interval first shrinks back to its floor, then one worker is added.
+
+    Every change goes to `log_fn` as an `aimd_adjust` row so it lands in the API NDJSON log.
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        max_workers: int = 4,
+        min_workers: int = 1,
+        interval_sec: float = 0.0,
+        min_interval_sec: float = 0.0,
+        max_interval_sec: float = 30.0,
+        interval_step_sec: float = 0.25,
+        latency_target_sec: float = 8.0,
+        decrease_factor: float = 0.5,
+        cooldown_sec: float = 5.0,
+        log_fn: Callable[[dict[str, Any]], None] | None = None,
+        source: str = "",
+    ):
+        self.min_workers = max(1, int(min_workers))
+        self.max_workers = max(self.min_workers, int(max_workers))
+        self.limit = min(self.max_workers, max(self.min_workers, int(workers)))
+        self.min_interval_sec = max(0.0, float(min_interval_sec))
+        self.max_interval_sec = max(self.min_interval_sec, float(max_interval_sec))
+        self.interval_sec = min(self.max_interval_sec, max(self.min_interval_sec, float(interval_sec)))
+        self.interval_step_sec = max(0.01, float(interval_step_sec))
+        self.latency_target_sec = float(latency_target_sec)
+        self.decrease_factor = min(0.95, max(0.05, float(decrease_factor)))
+        self.cooldown_sec = max(0.0, float(cooldown_sec))
+        self.log_fn = log_fn
+        self.source = source
+        self.in_flight = 0
+        self.latency_ewma = 0.0
+        self.clean_streak = 0
+        self.adjustments = 0
+        self.throttled = 0
+        self._last_decrease = 0.0
+        self._next_start = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def at_floor(self) -> bool:
+        return self.limit <= self.min_workers and self.interval_sec >= self.max_interval_sec
+
+    def try_acquire_slot(self) -> bool:
+        with self._cond:
+            if self.in_flight < self.limit:
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire_slot(self, stop: threading.Event | None = None) -> None:
+        with self._cond:
+            if stop is None:
+                self._cond.wait_for(lambda: self.in_flight < self.limit)
+            else:
+                while not self._cond.wait_for(lambda: self.in_flight < self.limit, STOP_POLL_SEC):
+                    if stop.is_set():
+                        raise Cancelled("stop requested while waiting for a VC request slot")
+            self.in_flight += 1
+
+    def release_slot(self) -> None:
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, stop: threading.Event | None = None):
+        self.acquire_slot(stop)
+        try:
+            yield
+        finally:
+            self.release_slot()
+
+    def pace_delay(self) -> float:
+        """Reserve the next local start time and return how long to wait for it."""
+        with self._cond:
+            if self.interval_sec <= 0:
+                return 0.0
+            now = time.monotonic()
+            delay = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.interval_sec
+        return max(0.0, delay)
+
+    def pace(self, stop: threading.Event | None = None) -> None:
+        delay = self.pace_delay()
+        if delay > 0:
+            wait_or_cancel(delay, stop, "the VC request spacing")
+
+    def record(self, status_code: int | None, latency_sec: float) -> None:
+        """Feed one response (status_code=None for a transport error) into the controller."""
+        event = None
+        with self._cond:
+            now = time.monotonic()
+            latency_sec = max(0.0, float(latency_sec))
+            self.latency_ewma = latency_sec if self.latency_ewma <= 0 else 0.8 * self.latency_ewma + 0.2 * latency_sec
+            prev_limit, prev_interval = self.limit, self.interval_sec
+            can_decrease = now - self._last_decrease >= self.cooldown_sec
+            reason = ""
+            if status_code is None or status_code in (429, 503):
+                self.throttled += 1
+                self.clean_streak = 0
+                if can_decrease:
+                    self.limit = max(self.min_workers, int(self.limit * self.decrease_factor))
+                    self.interval_sec = min(
+                        self.max_interval_sec,
+                        max(self.interval_sec * 2.0, self.interval_step_sec, self.min_interval_sec),
+                    )
+                    reason = "throttled" if status_code is not None else "transport_error"
+            elif status_code >= 500:
+                self.clean_streak = 0
+            elif self.latency_target_sec > 0 and self.latency_ewma > self.latency_target_sec:
+                self.clean_streak = 0
+                if can_decrease and self.limit > self.min_workers:
+                    self.limit = max(self.min_workers, int(self.limit * 0.75))
+                    reason = "latency"
+            else:
+                self.clean_streak += 1
+                if self.clean_streak >= self.limit:
+                    self.clean_streak = 0
+                    if self.interval_sec > self.min_interval_sec:
+                        self.interval_sec = max(self.min_interval_sec, self.interval_sec - self.interval_step_sec)
+                        reason = "probe"
+                    elif self.limit < self.max_workers:
+                        self.limit += 1
+                        reason = "probe"
+            if reason and reason != "probe":
+                self._last_decrease = now
+            if reason and (self.limit != prev_limit or self.interval_sec != prev_interval):
+                self.adjustments += 1
+                event = {
+                    "kind": "aimd_adjust",
+                    "provider": "visualcrossing",
+                    "source": self.source,
+                    "reason": reason,
+                    "status_code": status_code,
+                    "ok": reason == "probe",
+                    "workers": self.limit,
+                    "prev_workers": prev_limit,
+                    "max_workers": self.max_workers,
+                    "interval_sec": round(self.interval_sec, 3),
+                    "prev_interval_sec": round(prev_interval, 3),
+                    "latency_ms": round(latency_sec * 1000.0, 1),
+                    "latency_ewma_ms": round(self.latency_ewma * 1000.0, 1),
+                    "in_flight": self.in_flight,
+                }
+                self._cond.notify_all()
+        if event is not None and self.log_fn is not None:
+            try:
+                self.log_fn(event)
+            except Exception:
+                pass
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "workers": self.limit,
+                "max_workers": self.max_workers,
+                "interval_sec": round(self.interval_sec, 3),
+                "in_flight": self.in_flight,
+                "latency_ewma_ms": round(self.latency_ewma * 1000.0, 1),
+                "adjustments": self.adjustments,
+                "throttled": self.throttled,
+            }
+
+
+def grid_cell(lat: float, lon: float, grid_deg: float = DEFAULT_GRID_DEG) -> tuple[float, float]:
+    """Centre of the grid cell holding (lat, lon); the point itself (to 4 places) when grid_deg <= 0."""
+    if grid_deg <= 0:
+        return round(float(lat), 4), round(float(lon), 4)
+    return (
+        round(round(float(lat) / grid_deg) * grid_deg, 6),
+        round(round(float(lon) / grid_deg) * grid_deg, 6),
+    )
+
+
+def order_by_cell(items: list, point: Callable[[Any], tuple[float, float]], grid_deg: float = DEFAULT_GRID_DEG) -> list:
+    """items with members of each grid cell moved up behind the cell's first item, otherwise in order."""
+    cells: dict[tuple[float, float], list] = {}
+    for item in items:
+        cells.setdefault(grid_cell(*point(item), grid_deg), []).append(item)
+    return [item for members in cells.values() for item in members]
+
+
+class GridShare:
+    """
+    Request sharing for one run across city keys that are aliases or near-duplicates.
+
+    A request is keyed by the grid cell of its coordinates plus a caller-chosen window
+    (dates, include flags). The first caller for a key fetches at the cell centre; callers
+    arriving while that request is in flight, or registered beforehand with expect(), get
+    the same result. A result is dropped once every expected caller has taken it, so a run
+    never holds more than the payloads still owed to later cities.
+    """
+
+    def __init__(self, grid_deg: float | None = None):
+        self.grid_deg = DEFAULT_GRID_DEG if grid_deg is None else max(0.0, float(grid_deg))
+        self.requests = 0
+        self.shared = 0
+        self._results: dict[tuple, Any] = {}
+        self._expected: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def key(self, lat: float, lon: float, window: tuple) -> tuple:
+        return grid_cell(lat, lon, self.grid_deg), window
+
+    def expect(self, lat: float, lon: float, window: tuple) -> None:
+        """Register one later get() for this point and window."""
+        with self._lock:
+            self._expected[self.key(lat, lon, window)] += 1
+
+    def release_expected(self, lat: float, lon: float, window: tuple) -> None:
+        """Undo one expect() whose get() will not come (the city was deferred or cancelled)."""
+        key = self.key(lat, lon, window)
+        with self._lock:
+            if self._expected[key] > 0:
+                self._expected[key] -= 1
+            if self._expected[key] <= 0:
+                del self._expected[key]
+                entry = self._results.get(key)
+                # An in-flight entry is dropped by its owner's _release() once it completes.
+                if entry is not None and entry.done():
+                    del self._results[key]
+
+    def _claim(self, key: tuple, start: Callable[[], Any]) -> Any:
+        with self._lock:
+            if self._expected[key] > 0:
+                self._expected[key] -= 1
+            if self._expected[key] <= 0:
+                del self._expected[key]
+            entry = self._results.get(key)
+            if entry is not None:
+                self.shared += 1
+                return entry, False
+            entry = self._results[key] = start()
+            self.requests += 1
+            return entry, True
+
+    def _release(self, key: tuple, entry: Any) -> None:
+        with self._lock:
+            if key not in self._expected and self._results.get(key) is entry:
+                del self._results[key]
+
+    def get(self, lat: float, lon: float, window: tuple, fetch: Callable[[float, float], Any]) -> Any:
+        """fetch(cell_lat, cell_lon) for this point's cell and window, run at most once while shared."""
+        key = self.key(lat, lon, window)
+        fut, owner = self._claim(key, Future)
+        if owner:
+            try:
+                fut.set_result(fetch(*key[0]))
+            except BaseException as e:
+                fut.set_exception(e)
+        try:
+            return fut.result()
+        finally:
+            self._release(key, fut)
+
+    async def get_async(self, lat: float, lon: float, window: tuple, fetch: Callable[[float, float], Any]) -> Any:
+        """get() for coroutine fetchers; call from a single event loop."""
+        key = self.key(lat, lon, window)
+        task, _owner = self._claim(key, lambda: asyncio.ensure_future(fetch(*key[0])))
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._release(key, task)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            served = self.requests + self.shared
+            return {
+                "grid_deg": self.grid_deg,
+                "requests": self.requests,
+                "saved": self.shared,
+                "saved_pct": round(100.0 * self.shared / served, 1) if served else 0.0,
+            }
+
+    def summary(self) -> str:
+        st = self.stats()
+        return (
+            f"grid sharing ({st['grid_deg']:g} deg): {st['requests']} requests, "
+            f"{st['saved']} saved ({st['saved_pct']:.1f}%)"
+        )
+
+
+class BatchLocationError(RuntimeError):
+    """One location of a multi-location response failed; the rest of the batch is usable."""
+
+
+def location_key(lat: float, lon: float) -> str:
+    """The location string sent for a point, also used to match it in the response."""
+    return f"{float(lat):.4f},{float(lon):.4f}"
+
+
+def multi_location_params(
+    points: list[tuple[float, float]], start: str, end: str, include: str, key: str, elements: str = ""
+) -> dict[str, str]:
+    params = {
+        "locations": "|".join(location_key(lat, lon) for lat, lon in points),
+        "datestart": start,
+        "dateend": end,
+        "unitGroup": "metric",
+        "include": include,
+        "key": key,
+        "contentType": "json",
+    }
+    if elements:
+        params["elements"] = elements
+    return params
+
+
+def split_multi_location(
+    payload: Any, points: list[tuple[float, float]], tolerance_deg: float = 1e-3
+) -> list[Any]:
+    """
+    Per-point single-location payloads from a multi-location response, in the order of
+    `points`. An entry is matched by the location string sent, else by its returned
+    latitude/longitude within tolerance_deg, and serves one point at most; a point left
+    unmatched, or whose entry reports an error, gets a BatchLocationError. Position in
+    the response is never used, so a dropped or reordered location cannot be stored
+    under another city.
+    """
+    locations = payload.get("locations", []) if isinstance(payload, dict) else list(payload or [])
+    locations = [loc for loc in locations if isinstance(loc, dict)]
+    unused = set(range(len(locations)))
+    by_address: dict[str, int] = {}
+    for j, loc in enumerate(locations):
+        by_address.setdefault(str(loc.get("address")), j)
+
+    def near(j: int, lat: float, lon: float) -> bool:
+        try:
+            rlat, rlon = float(locations[j]["latitude"]), float(locations[j]["longitude"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        return abs(rlat - lat) <= tolerance_deg and abs(rlon - lon) <= tolerance_deg
+
+    matched: list[int | None] = []
+    for lat, lon in points:
+        j = by_address.get(location_key(lat, lon))
+        if j is not None and j in unused:
+            unused.discard(j)
+        else:
+            j = next((k for k in sorted(unused) if near(k, lat, lon)), None)
+            if j is not None:
+                unused.discard(j)
+        matched.append(j)
+
+    out: list[Any] = []
+    for (lat, lon), j in zip(points, matched):
+        loc = locations[j] if j is not None else None
+        if loc is None:
+            out.append(BatchLocationError(f"{location_key(lat, lon)} missing from multi-location response"))
+        elif loc.get("errorCode") or loc.get("error"):
+            out.append(BatchLocationError(str(loc.get("message") or loc.get("error") or f"error {loc.get('errorCode')}")))
+        elif "days" not in loc and "currentConditions" not in loc:
+            out.append(BatchLocationError(f"{location_key(lat, lon)} returned no data"))
+        else:
+            out.append(loc)
+    return out
+
+
+def take_prefetched(prefetched: dict | None, key: Any, stats: "BatchStats | None" = None) -> Any:
+    """
+    The batched result stored under key, or None when the caller must fetch on its own: the
+    key was not prefetched, or only its location failed inside the batch (counted as a
+    fallback on stats). A failure of the whole batch request is raised.
+    """
+    hit = prefetched.get(key) if prefetched else None
+    if isinstance(hit, BatchLocationError):
+        if stats is not None:
+            stats.fallback()
+        return None
+    if isinstance(hit, BaseException):
+        raise hit
+    return hit
+
+
+def chunked(items: list, size: int) -> list[list]:
+    """items in order, in chunks of at most `size` (callers group by window and include set first)."""
+    size = max(1, size)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class BatchStats:
+    """Counts for one run's multi-location requests; thread-safe."""
+
+    def __init__(self, size: int = VC_BATCH_SIZE):
+        self.size = max(1, size)
+        self.requests = 0
+        self.locations = 0
+        self.failed = 0
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+
+    def record(self, locations: int, failed: int = 0) -> None:
+        with self._lock:
+            self.requests += 1
+            self.locations += locations
+            self.failed += failed
+
+    def fallback(self) -> None:
+        """A location that failed in its batch was fetched on its own."""
+        with self._lock:
+            self.fallbacks += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "batch_size": self.size,
+                "requests": self.requests,
+                "locations": self.locations,
+                "failed_locations": self.failed,
+                "fallbacks": self.fallbacks,
+                "mean_batch": round(self.locations / self.requests, 1) if self.requests else 0.0,
+            }
+
+    def summary(self) -> str:
+        st = self.stats()
+        if st["batch_size"] <= 1:
+            return "batching off"
+        return (
+            f"batching (size {st['batch_size']}): {st['locations']} locations in {st['requests']} requests "
+            f"(mean {st['mean_batch']:.1f}), {st['failed_locations']} failed, {st['fallbacks']} refetched singly"
+        )
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Inspect or configure the shared Visual Crossing provider state.")
+    ap.add_argument("--db", default=PROVIDER_STATE_DB)
+    ap.add_argument("--bucket", default=DEFAULT_BUCKET)
+    sub = ap.add_subparsers(dest="cmd")
+    sub.add_parser("stats", help="Print token bucket stats as JSON")
+    sub.add_parser("health", help="Print the circuit breaker state as JSON")
+    sub.add_parser("reset", help="Close the circuit breaker")
+    cfg = sub.add_parser("configure", help="Persist the shared request rate and burst for every process")
+    cfg.add_argument("--rate-per-sec", type=float, default=None)
+    cfg.add_argument("--burst", type=float, default=None)
+    args = ap.parse_args()
+
+    if args.cmd in ("health", "reset"):
+        breaker = CircuitBreaker(args.bucket, db_path=args.db)
+        print(json.dumps(breaker.reset() if args.cmd == "reset" else breaker.status(), indent=2))
+        return 0
+    bucket = TokenBucket(args.bucket, db_path=args.db)
+    if args.cmd == "configure":
+        if args.rate_per_sec is None and args.burst is None:
+            print("configure needs --rate-per-sec and/or --burst", file=sys.stderr)
+            return 2
+        print(json.dumps(bucket.configure(args.rate_per_sec, args.burst), indent=2))
+        return 0
+    print(json.dumps(bucket.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Visual Crossing timeline API, for offline load tests and benchmarks.
+
+It serves GET {VC_BASE_URL}/VisualCrossingWebServices/rest/services/timeline/{lat},{lon}/{start}/{end}
+and answers from, in order, the raw response cache (--replay-cache, exact recorded
+payloads), or a deterministic synthetic timeline for the point and dates. Synthetic
+values can be anchored to an API call log (--seed-log, the sync_api_calls.ndjson shape),
+so a point's first day matches its recorded sample temperatures. The multi-location
+.../timelinemulti?locations=LAT,LON|LAT,LON&datestart=..&dateend=.. endpoint answers
+{"locations": [...]} with one such timeline per location.
+
+Faults are injected per request: a latency distribution, random 429 and 5xx responses,
+a per-key quota and a concurrent-request limit, all drawn from one seeded RNG; multi-location
+requests can also fail single locations (--error-location).
+GET /__stats returns counters as JSON.
+
+Point the pipeline at it with VC_BASE_URL=http://127.0.0.1:8765.
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import zlib
+from collections import Counter, deque
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+
+TIMELINE_PATH = "/VisualCrossingWebServices/rest/services/timeline/"
+MULTI_PATH = "/VisualCrossingWebServices/rest/services/timelinemulti"
+# Without an end date the real API returns a 15-day forecast.
+DEFAULT_FORECAST_DAYS = 15
+SEED_DECIMALS = 2
+# API call log sample columns -> the day-one fields they pin.
+SEED_FIELDS = {
+    "sample_tmax_c": "tempmax",
+    "sample_tmin_c": "tempmin",
+    "sample_precip_mm": "precip",
+    "sample_precip_prob_pct": "precipprob",
+    "sample_solarradiation_wm2": "solarradiation",
+}
+
+
+@dataclass
+class SimConfig:
+    latency: str = "0"
+    error_429: float = 0.0
+    error_5xx: float = 0.0
+    quota: int = 0
+    quota_window_sec: float = 0.0
+    max_concurrent: int = 0
+    # Share of locations in a multi-location request answered with a per-location error.
+    error_location: float = 0.0
+    seed: int = 1
+    replay_cache: str = ""
+    seed_log: str = ""
+
+
+def _parse_date(value: str, today: date) -> date:
+    """A timeline path date: ISO, or the dynamic names the provider accepts (today, yesterday, tomorrow)."""
+    dynamic = {"today": 0, "yesterday": -1, "tomorrow": 1}
+    if value.lower() in dynamic:
+        return today + timedelta(days=dynamic[value.lower()])
+    return date.fromisoformat(value)
+
+
+def parse_latency(spec: str):
+    """
+    A sampler (rng -> seconds) for "0", "fixed:MS", "uniform:LO,HI", "lognormal:MEDIAN,SIGMA"
+    or "exp:MEAN"; all times in milliseconds.
+    """
+    name, _, params = (spec or "0").partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()]
+    if name in ("0", "", "none"):
+        return lambda rng: 0.0
+    if name == "fixed":
+        return lambda rng: values[0] / 1000.0
+    if name == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000.0
+    if name == "lognormal":
+        return lambda rng: values[0] * math.exp(rng.gauss(0.0, values[1])) / 1000.0
+    if name == "exp":
+        return lambda rng: rng.expovariate(1000.0 / values[0]) if values[0] > 0 else 0.0
+    raise ValueError(f"unknown latency distribution {spec!r}")
+
+
+def load_seed_log(path: str) -> dict[tuple[float, float], dict[str, float]]:
+    """(lat, lon) rounded to SEED_DECIMALS -> last recorded sample values from an API call NDJSON log."""
+    anchors: dict[tuple[float, float], dict[str, float]] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+                point = (round(float(row["lat"]), SEED_DECIMALS), round(float(row["lon"]), SEED_DECIMALS))
+            except (ValueError, KeyError, TypeError):
+                continue
+            if not row.get("ok"):
+                continue
+            sample = {k: row[k] for k in SEED_FIELDS if row.get(k) is not None}
+            if sample:
+                anchors[point] = sample
+    return anchors
+
+
+def _day_length_hours(lat: float, doy: int) -> float:
+    decl = math.radians(23.44) * math.sin(2 * math.pi * (284 + doy) / 365.0)
+    x = -math.tan(math.radians(max(-89.0, min(89.0, lat)))) * math.tan(decl)
+    return 24.0 * math.acos(max(-1.0, min(1.0, x))) / math.pi
+
+
+def synthetic_day(lat: float, lon: float, day: date) -> dict[str, Any]:
+    """One VC-shaped day for (lat, lon), the same on every call."""
+    rng = random.Random(zlib.crc32(f"{lat:.4f},{lon:.4f},{day.isoformat()}".encode("ascii")))
+    doy = day.timetuple().tm_yday
+    # Warmest around day 200 in the north and day 15 in the south.
+    season = math.cos(2 * math.pi * (doy - (200 if lat >= 0 else 15)) / 365.0)
+    tmax = 29.0 - 0.4 * abs(lat) + 0.22 * abs(lat) * season + rng.gauss(0.0, 2.5)
+    tmin = tmax - 6.0 - rng.uniform(0.0, 6.0)
+    precipprob = max(0.0, min(100.0, rng.gauss(35.0, 25.0)))
+    precip = round(rng.expovariate(0.4), 1) if precipprob > 50 else 0.0
+    cloud = max(0.0, min(100.0, precipprob + rng.gauss(0.0, 15.0)))
+    icon = "rain" if precip > 0 else ("partly-cloudy-day" if cloud > 40 else "clear-day")
+    conditions = {"rain": "Rain, Partially cloudy", "partly-cloudy-day": "Partially cloudy", "clear-day": "Clear"}[icon]
+    hours = _day_length_hours(lat, doy)
+    midnight = int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+    noon = midnight + int((12.0 - lon / 15.0) * 3600)
+    sunrise = noon - int(hours * 1800)
+    sunset = noon + int(hours * 1800)
+    return {
+        "datetime": day.isoformat(),
+        "datetimeEpoch": midnight,
+        "tempmax": round(tmax, 1),
+        "tempmin": round(tmin, 1),
+        "temp": round((tmax + tmin) / 2, 1),
+        "feelslikemax": round(tmax + rng.uniform(-1.0, 2.0), 1),
+        "feelslikemin": round(tmin - rng.uniform(0.0, 2.0), 1),
+        "feelslike": round((tmax + tmin) / 2, 1),
+        "dew": round(tmin - rng.uniform(0.0, 4.0), 1),
+        "humidity": round(rng.uniform(30.0, 90.0), 1),
+        "precip": precip,
+        "precipprob": round(precipprob, 1),
+        "precipcover": round(min(100.0, precip * 8.0), 1),
+        "preciptype": ["rain"] if precip > 0 else None,
+        "snow": 0.0,
+        "snowdepth": 0.0,
+        "windgust": round(rng.uniform(10.0, 50.0), 1),
+        "windspeed": round(rng.uniform(5.0, 30.0), 1),
+        "winddir": round(rng.uniform(0.0, 360.0), 1),
+        "pressure": round(rng.gauss(1013.0, 6.0), 1),
+        "cloudcover": round(cloud, 1),
+        "visibility": round(rng.uniform(8.0, 24.0), 1),
+        "solarradiation": round(max(0.0, 320.0 * hours / 24.0 * (1 - cloud / 150.0)), 1),
+        "solarenergy": round(max(0.0, 27.0 * hours / 24.0 * (1 - cloud / 150.0)), 1),
+        "uvindex": round(max(0.0, 10.0 * hours / 24.0 * (1 - cloud / 150.0)), 1),
+        "severerisk": round(rng.uniform(0.0, 30.0), 1),
+        "sunrise": datetime.fromtimestamp(sunrise, timezone.utc).strftime("%H:%M:%S"),
+        "sunriseEpoch": sunrise,
+        "sunset": datetime.fromtimestamp(sunset, timezone.utc).strftime("%H:%M:%S"),
+        "sunsetEpoch": sunset,
+        "moonphase": round((doy % 29.53) / 29.53, 2),
+        "conditions": conditions,
+        "description": f"Simulated: {conditions.lower()}.",
+        "icon": icon,
+        "stations": ["SIM"],
+        "source": "sim",
+    }
+
+
+class VCSimulator:
+    def __init__(self, config: Optional[SimConfig] = None):
+        self.config = config or SimConfig()
+        self.latency = parse_latency(self.config.latency)
+        self.anchors = load_seed_log(self.config.seed_log) if self.config.seed_log else {}
+        self.replay = None
+        if self.config.replay_cache:
+            # Imported here: response_cache pulls in vc_provider, which reads VC_BASE_URL at import,
+            # and callers usually point that at this simulator only after start().
+            import response_cache
+
+            self.replay = response_cache.ResponseCache(
+                self.config.replay_cache, ttls={k: math.inf for k in response_cache.DEFAULT_TTLS}, enabled=True
+            )
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._key_calls: dict[str, deque] = {}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.statuses: Counter = Counter()
+        self.sources: Counter = Counter()
+        self.days_served = 0
+        self.records = 0
+        self.locations_served = 0
+        self.bytes_served = 0
+        self.started = time.monotonic()
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    # ------------------------------------------------------------------ payloads
+
+    def timeline(self, lat: float, lon: float, start: date, end: date, include: str) -> dict[str, Any]:
+        with_days = "days" in include.split(",")
+        if "current" not in include:
+            kind = "estimated_window"
+        else:
+            kind = "forecast_bundle" if with_days else "current_conditions"
+        if self.replay is not None:
+            payload = self.replay.get(kind, lat, lon, start.isoformat(), end.isoformat(), include)
+            if payload is not None:
+                with self._lock:
+                    self.sources["replay"] += 1
+                return payload
+        days = [synthetic_day(lat, lon, start + timedelta(days=i)) for i in range((end - start).days + 1)]
+        anchor = self.anchors.get((round(lat, SEED_DECIMALS), round(lon, SEED_DECIMALS)))
+        if anchor and days:
+            shift_max = anchor.get("sample_tmax_c", days[0]["tempmax"]) - days[0]["tempmax"]
+            shift_min = anchor.get("sample_tmin_c", days[0]["tempmin"]) - days[0]["tempmin"]
+            for d in days:
+                d["tempmax"] = round(d["tempmax"] + shift_max, 1)
+                d["tempmin"] = round(d["tempmin"] + shift_min, 1)
+                d["temp"] = round((d["tempmax"] + d["tempmin"]) / 2, 1)
+                d["feelslikemax"] = round(d["feelslikemax"] + shift_max, 1)
+                d["feelslikemin"] = round(d["feelslikemin"] + shift_min, 1)
+                d["feelslike"] = d["temp"]
+            for col in ("sample_precip_mm", "sample_precip_prob_pct", "sample_solarradiation_wm2"):
+                if col in anchor:
+                    days[0][SEED_FIELDS[col]] = anchor[col]
+        payload = {
+            # A current-only request is billed as one record, like the real API.
+            "queryCost": len(days) if with_days else 1,
+            "latitude": lat,
+            "longitude": lon,
+            "resolvedAddress": f"{lat},{lon}",
+            "address": f"{lat},{lon}",
+            "timezone": "UTC",
+            "tzoffset": 0.0,
+            "days": days,
+        }
+        if "current" in include and days:
+            d = days[0]
+            payload["currentConditions"] = {
+                "datetime": datetime.now(timezone.utc).strftime("%H:%M:%S"),
+                "temp": d["temp"],
+                "feelslike": d["feelslike"],
+                "humidity": d["humidity"],
+                "conditions": d["conditions"],
+                "icon": d["icon"],
+            }
+        if not with_days:
+            del payload["days"]
+        with self._lock:
+            self.sources["anchored" if anchor else "synthetic"] += 1
+        return payload
+
+    # ------------------------------------------------------------------ faults
+
+    def _admit(self, key: str) -> tuple[Optional[int], float]:
+        """(status to fail with or None, latency to apply) for one request."""
+        cfg = self.config
+        with self._lock:
+            latency = self.latency(self._rng)
+            roll = self._rng.random()
+            if cfg.max_concurrent and self.in_flight >= cfg.max_concurrent:
+                return 429, latency
+            if cfg.quota:
+                calls = self._key_calls.setdefault(key, deque())
+                now = time.monotonic()
+                if cfg.quota_window_sec > 0:
+                    while calls and now - calls[0] > cfg.quota_window_sec:
+                        calls.popleft()
+                if len(calls) >= cfg.quota:
+                    return 429, latency
+                calls.append(now)
+            if roll < cfg.error_429:
+                return 429, latency
+            if roll < cfg.error_429 + cfg.error_5xx:
+                return self._rng.choice((500, 502, 503)), latency
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return None, latency
+
+    def handle(self, raw_path: str) -> tuple[int, dict[str, str], bytes]:
+        parsed = urlparse(raw_path)
+        if parsed.path == "/__stats":
+            return 200, {"Content-Type": "application/json"}, json.dumps(self.stats()).encode("utf-8")
+        if parsed.path.rstrip("/") == MULTI_PATH:
+            return self.handle_multi({k: v[-1] for k, v in parse_qs(parsed.query).items()})
+        if not parsed.path.startswith(TIMELINE_PATH):
+            return self._finish(404, b"Not found")
+        parts = [unquote(p) for p in parsed.path[len(TIMELINE_PATH):].split("/") if p]
+        qs = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        try:
+            lat_s, lon_s = parts[0].split(",")
+            lat, lon = float(lat_s), float(lon_s)
+            today = datetime.now(timezone.utc).date()
+            start = _parse_date(parts[1], today) if len(parts) > 1 else today
+            end = _parse_date(parts[2], today) if len(parts) > 2 else (
+                start if len(parts) > 1 else start + timedelta(days=DEFAULT_FORECAST_DAYS - 1)
+            )
+        except (IndexError, ValueError):
+            return self._finish(400, b"Bad API Request:Invalid location or date parameter")
+        if end < start:
+            return self._finish(400, b"Bad API Request:End date is before start date")
+
+        status, latency = self._admit(qs.get("key", ""))
+        if latency > 0:
+            time.sleep(latency)
+        if status is not None:
+            headers = {"Retry-After": "1"} if status == 429 else {}
+            return self._finish(status, b"Simulated failure", headers)
+        try:
+            payload = self.timeline(lat, lon, start, end, qs.get("include", "days"))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        body = json.dumps(payload).encode("utf-8")
+        with self._lock:
+            self.days_served += len(payload.get("days", []))
+            self.records += payload.get("queryCost", 0)
+            self.bytes_served += len(body)
+        return self._finish(200, body, {"Content-Type": "application/json"})
+
+    def handle_multi(self, qs: dict[str, str]) -> tuple[int, dict[str, str], bytes]:
+        """timelinemulti: one admission (faults, latency, quota) for the request, one timeline per location."""
+        try:
+            points = []
+            for loc in qs.get("locations", "").split("|"):
+                lat_s, lon_s = loc.split(",")
+                points.append((loc, float(lat_s), float(lon_s)))
+            today = datetime.now(timezone.utc).date()
+            start = _parse_date(qs["datestart"], today) if qs.get("datestart") else today
+            end = _parse_date(qs["dateend"], today) if qs.get("dateend") else (
+                start if qs.get("datestart") else start + timedelta(days=DEFAULT_FORECAST_DAYS - 1)
+            )
+        except (KeyError, ValueError):
+            return self._finish(400, b"Bad API Request:Invalid locations or date parameter")
+        if end < start:
+            return self._finish(400, b"Bad API Request:End date is before start date")
+
+        status, latency = self._admit(qs.get("key", ""))
+        if latency > 0:
+            time.sleep(latency)
+        if status is not None:
+            headers = {"Retry-After": "1"} if status == 429 else {}
+            return self._finish(status, b"Simulated failure", headers)
+        locations = []
+        try:
+            for address, lat, lon in points:
+                with self._lock:
+                    failed = self._rng.random() < self.config.error_location
+                if failed:
+                    locations.append({"address": address, "errorCode": 999, "message": "Simulated location failure"})
+                    continue
+                locations.append({**self.timeline(lat, lon, start, end, qs.get("include", "days")), "address": address})
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        payload = {"queryCost": sum(loc.get("queryCost", 0) for loc in locations), "locations": locations}
+        body = json.dumps(payload).encode("utf-8")
+        with self._lock:
+            self.days_served += sum(len(loc.get("days", [])) for loc in locations)
+            self.records += payload["queryCost"]
+            self.bytes_served += len(body)
+            self.locations_served += len(locations)
+        return self._finish(200, body, {"Content-Type": "application/json"})
+
+    def _finish(self, status: int, body: bytes, headers: Optional[dict[str, str]] = None):
+        with self._lock:
+            self.statuses[status] += 1
+        return status, headers or {"Content-Type": "text/plain"}, body
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            requests_total = sum(self.statuses.values())
+            elapsed = time.monotonic() - self.started
+            return {
+                "requests": requests_total,
+                "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+                "sources": dict(self.sources),
+                "days_served": self.days_served,
+                "records": self.records,
+                "locations_served": self.locations_served,
+                "bytes_served": self.bytes_served,
+                "peak_in_flight": self.peak_in_flight,
+                "keys": len(self._key_calls),
+                "elapsed_sec": round(elapsed, 2),
+                "requests_per_sec": round(requests_total / elapsed, 2) if elapsed > 0 else 0.0,
+            }
+
+    # ------------------------------------------------------------------ server
+
+    def make_server(self, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+        sim = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, headers, body = sim.handle(self.path)
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_args):
+                return
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        return server
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve on a background thread; returns the base URL to use as VC_BASE_URL."""
+        self.server = self.make_server(host, port)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self.server.server_address[1]}"
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Local Visual Crossing timeline API simulator.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", default="0", help='"fixed:MS", "uniform:LO,HI", "lognormal:MEDIAN_MS,SIGMA" or "exp:MEAN_MS"')
+    ap.add_argument("--error-429", type=float, default=0.0, help="Share of requests answered 429")
+    ap.add_argument("--error-5xx", type=float, default=0.0, help="Share of requests answered 500/502/503")
+    ap.add_argument("--quota", type=int, default=0, help="Requests allowed per key per window (0: unlimited)")
+    ap.add_argument("--quota-window-sec", type=float, default=0.0, help="Quota window (0: the server's lifetime)")
+    ap.add_argument("--max-concurrent", type=int, default=0, help="Concurrent requests above this get 429")
+    ap.add_argument("--error-location", type=float, default=0.0, help="Share of multi-location entries answered with an error")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--replay-cache", default="", help="Serve exact payloads from this response cache directory")
+    ap.add_argument("--seed-log", default="", help="Anchor synthetic timelines to an API call NDJSON log")
+    args = ap.parse_args()
+
+    sim = VCSimulator(
+        SimConfig(
+            latency=args.latency,
+            error_429=args.error_429,
+            error_5xx=args.error_5xx,
+            quota=args.quota,
+            quota_window_sec=args.quota_window_sec,
+            max_concurrent=args.max_concurrent,
+            error_location=args.error_location,
+            seed=args.seed,
+            replay_cache=args.replay_cache,
+            seed_log=args.seed_log,
+        )
+    )
+    server = sim.make_server(args.host, args.port)
+    print(f"Visual Crossing simulator: VC_BASE_URL=http://{args.host}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(sim.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the daily weather tables (daily_data_estimated, daily_data_forecast
+and the daily_data view over them) used by sunseeker, the backfill runner and the dashboard.
+"""
+import sqlite3
+from datetime import date, datetime, timedelta, timezone
+
+# Date coverage index: one bit per (table, city, day), packed into 32-bit words keyed by
+# day offset from COVERAGE_EPOCH. Triggers keep it in step with every writer, including
+# scripts that know nothing about it.
+COVERAGE_EPOCH = "2020-01-01"
+COVERAGE_WORD_BITS = 32
+COVERAGE_TABLES = ("daily_data_estimated", "daily_data_forecast")
+
+# Bound on "?" placeholders per statement, under SQLite's historical 999 default.
+SQLITE_MAX_PARAMS = 900
+
+# Read-only "best available" layer; writers only ever touch the split tables.
+DAILY_VIEW = "daily_data"
+
+
+def upsert_sql(table: str, columns: list[str]) -> str:
+    cols = ", ".join(columns)
+    placeholders = ", ".join(["?"] * len(columns))
+    updates = ", ".join(f"{c}=excluded.{c}" for c in columns if c not in ("city", "date"))
+    return (
+        f"INSERT INTO {table} ({cols}) VALUES ({placeholders}) "
+        f"ON CONFLICT(city, date) DO UPDATE SET {updates}"
+    )
+
+
+def upsert_weather_rows(conn: sqlite3.Connection, table: str, columns: list[str], rows: list[tuple]) -> None:
+    """Write a batch of rows (tuples ordered like `columns`) to one weather table in a single executemany."""
+    conn.executemany(upsert_sql(table, columns), rows)
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    return [str(r[1]) for r in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def daily_view_sql(columns: list[str]) -> str:
+    """
+    "Best available" rows per (city, date): a forecast row supersedes the estimated row for
+    the same day. Both arms are primary-key lookups, so city/date filters stay indexed.
+    """
+    cols = ", ".join(columns)
+    est_cols = ", ".join(f"e.{c}" for c in columns)
+    return (
+        f"CREATE VIEW {DAILY_VIEW} AS "
+        f"SELECT {cols} FROM daily_data_forecast "
+        f"UNION ALL "
+        f"SELECT {est_cols} FROM daily_data_estimated e "
+        f"WHERE NOT EXISTS (SELECT 1 FROM daily_data_forecast f WHERE f.city=e.city AND f.date=e.date)"
+    )
+
+
+def ensure_daily_view(conn: sqlite3.Connection) -> None:
+    """
+    Make daily_data the priority-resolving view over the split tables. A legacy materialized
+    daily_data table is migrated first: rows missing from the split tables are copied across
+    by data_source, then the table is dropped. The view is recreated when the split tables
+    gain columns.
+    """
+    kinds = dict(conn.execute("SELECT name, type FROM sqlite_master WHERE type IN ('table', 'view')").fetchall())
+    if kinds.get("daily_data_estimated") != "table" or kinds.get("daily_data_forecast") != "table":
+        return
+    fc_cols = set(_table_columns(conn, "daily_data_forecast"))
+    columns = [c for c in _table_columns(conn, "daily_data_estimated") if c in fc_cols]
+
+    if kinds.get(DAILY_VIEW) == "table":
+        legacy_cols = set(_table_columns(conn, DAILY_VIEW))
+        cols = ", ".join(c for c in columns if c in legacy_cols)
+        conn.execute(
+            f"INSERT OR IGNORE INTO daily_data_forecast ({cols}) "
+            f"SELECT {cols} FROM {DAILY_VIEW} WHERE data_source='forecast'"
+        )
+        conn.execute(
+            f"INSERT OR IGNORE INTO daily_data_estimated ({cols}) "
+            f"SELECT {cols} FROM {DAILY_VIEW} WHERE COALESCE(data_source, 'estimated') <> 'forecast'"
+        )
+        conn.execute(f"DROP TABLE {DAILY_VIEW}")
+
+    sql = daily_view_sql(columns)
+    current = conn.execute("SELECT sql FROM sqlite_master WHERE type='view' AND name=?", (DAILY_VIEW,)).fetchone()
+    if current is None or current[0] != sql:
+        conn.execute(f"DROP VIEW IF EXISTS {DAILY_VIEW}")
+        conn.execute(sql)
+
+
+def _day(value: str) -> date:
+    return date.fromisoformat(str(value)[:10])
+
+
+def _day_index(value: str) -> int:
+    return (_day(value) - _day(COVERAGE_EPOCH)).days
+
+
+def ensure_coverage(conn: sqlite3.Connection) -> None:
+    """Create the date_coverage table and its triggers, seeding it from existing rows on first use."""
+    created = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='date_coverage'"
+    ).fetchone() is None
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS date_coverage (
+            tbl TEXT NOT NULL,
+            city TEXT NOT NULL,
+            word INTEGER NOT NULL,
+            bits INTEGER NOT NULL,
+            PRIMARY KEY (tbl, city, word)
+        ) WITHOUT ROWID
+        """
+    )
+    existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    day_idx = f"CAST(julianday({{ref}}.date) - julianday('{COVERAGE_EPOCH}') AS INTEGER)"
+    for table in COVERAGE_TABLES:
+        if table not in existing:
+            continue
+        new_idx = day_idx.format(ref="NEW")
+        old_idx = day_idx.format(ref="OLD")
+        set_bit = f"""
+            INSERT INTO date_coverage(tbl, city, word, bits)
+            VALUES ('{table}', NEW.city, {new_idx} / {COVERAGE_WORD_BITS}, 1 << ({new_idx} % {COVERAGE_WORD_BITS}))
+            ON CONFLICT(tbl, city, word) DO UPDATE SET bits = bits | excluded.bits;
+        """
+        clear_bit = f"""
+            UPDATE date_coverage SET bits = bits & ~(1 << ({old_idx} % {COVERAGE_WORD_BITS}))
+            WHERE tbl='{table}' AND city=OLD.city AND word={old_idx} / {COVERAGE_WORD_BITS};
+        """
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_coverage_ins AFTER INSERT ON {table}
+            WHEN NEW.date >= '{COVERAGE_EPOCH}'
+            BEGIN {set_bit} END
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_coverage_del AFTER DELETE ON {table}
+            WHEN OLD.date >= '{COVERAGE_EPOCH}'
+            BEGIN {clear_bit} END
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_coverage_upd AFTER UPDATE OF city, date ON {table}
+            BEGIN
+                UPDATE date_coverage SET bits = bits & ~(1 << ({old_idx} % {COVERAGE_WORD_BITS}))
+                WHERE tbl='{table}' AND city=OLD.city AND word={old_idx} / {COVERAGE_WORD_BITS}
+                    AND OLD.date >= '{COVERAGE_EPOCH}';
+                INSERT INTO date_coverage(tbl, city, word, bits)
+                SELECT '{table}', NEW.city, {new_idx} / {COVERAGE_WORD_BITS}, 1 << ({new_idx} % {COVERAGE_WORD_BITS})
+                WHERE NEW.date >= '{COVERAGE_EPOCH}'
+                ON CONFLICT(tbl, city, word) DO UPDATE SET bits = bits | excluded.bits;
+            END
+            """
+        )
+    if created:
+        rebuild_coverage(conn)
+
+
+def rebuild_coverage(conn: sqlite3.Connection) -> None:
+    """Recompute date_coverage from the weather tables (rows have a unique date per city, so SUM acts as OR)."""
+    conn.execute("DELETE FROM date_coverage")
+    existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    for table in COVERAGE_TABLES:
+        if table not in existing:
+            continue
+        conn.execute(
+            f"""
+            INSERT INTO date_coverage(tbl, city, word, bits)
+            SELECT '{table}', city, idx / {COVERAGE_WORD_BITS}, SUM(1 << (idx % {COVERAGE_WORD_BITS}))
+            FROM (
+                SELECT DISTINCT city, CAST(julianday(date) - julianday('{COVERAGE_EPOCH}') AS INTEGER) AS idx
+                FROM {table}
+                WHERE date >= '{COVERAGE_EPOCH}'
+            )
+            GROUP BY city, idx / {COVERAGE_WORD_BITS}
+            """
+        )
+
+
+def _window_bits(words: dict[int, int], start_idx: int, span: int) -> int:
+    """Re-base packed words onto a window: bit i of the result is day start_idx + i."""
+    out = 0
+    for word, bits in words.items():
+        shift = word * COVERAGE_WORD_BITS - start_idx
+        out |= (bits << shift) if shift >= 0 else (bits >> -shift)
+    return out & ((1 << span) - 1)
+
+
+def coverage_bitmap(conn: sqlite3.Connection, table: str, city: str, start_date: str, end_date: str) -> int:
+    """Bitmap of stored days for one city; bit i set means start_date + i is present."""
+    start_idx, end_idx = _day_index(start_date), _day_index(end_date)
+    rows = conn.execute(
+        "SELECT word, bits FROM date_coverage WHERE tbl=? AND city=? AND word>=? AND word<=?",
+        (table, city, start_idx // COVERAGE_WORD_BITS, end_idx // COVERAGE_WORD_BITS),
+    ).fetchall()
+    return _window_bits({int(w): int(b) for w, b in rows}, start_idx, end_idx - start_idx + 1)
+
+
+def coverage_bitmap_map(conn: sqlite3.Connection, table: str, start_date: str, end_date: str) -> dict[str, int]:
+    """coverage_bitmap() for every city with any coverage, in one indexed scan."""
+    start_idx, end_idx = _day_index(start_date), _day_index(end_date)
+    by_city: dict[str, dict[int, int]] = {}
+    for city, word, bits in conn.execute(
+        "SELECT city, word, bits FROM date_coverage WHERE tbl=? AND word>=? AND word<=?",
+        (table, start_idx // COVERAGE_WORD_BITS, end_idx // COVERAGE_WORD_BITS),
+    ):
+        by_city.setdefault(str(city), {})[int(word)] = int(bits)
+    span = end_idx - start_idx + 1
+    return {city: _window_bits(words, start_idx, span) for city, words in by_city.items()}
+
+
+def coverage_count(bitmap: int) -> int:
+    return bin(bitmap).count("1")
+
+
+def window_days(start_date: str, end_date: str) -> int:
+    return (_day(end_date) - _day(start_date)).days + 1
+
+
+def gap_ranges(bitmap: int, start_date: str, end_date: str, merge_gap_days: int = 0) -> list[tuple[str, str]]:
+    """
+    Turn missing bits into the minimal list of contiguous (start, end) date ranges.
+    Gaps separated by at most `merge_gap_days` present days are requested as one range.
+    """
+    span = window_days(start_date, end_date)
+    start = _day(start_date)
+    if bitmap == (1 << span) - 1:
+        return []
+    runs: list[list[int]] = []
+    day = 0
+    while day < span:
+        if (bitmap >> day) & 1:
+            day += 1
+            continue
+        run_start = day
+        while day < span and not (bitmap >> day) & 1:
+            day += 1
+        if runs and run_start - runs[-1][1] - 1 <= merge_gap_days:
+            runs[-1][1] = day - 1
+        else:
+            runs.append([run_start, day - 1])
+    return [((start + timedelta(days=a)).isoformat(), (start + timedelta(days=b)).isoformat()) for a, b in runs]
+
+
+# Monthly aggregates: running sums per (city, month, source) over each city's window of the
+# daily_data view. Source is the split table the visible row comes from. Triggers apply
+# row deltas while a city is clean; dirty cities are skipped and rebuilt on the next refresh.
+MONTHLY_AGG_SUMS = ("days", "tmax_sum", "tmax_days", "tmin_sum", "tmin_days", "sunny_days", "daylen_sum", "daylen_days")
+SUNNY_WEATHERCODES = (0, 1, 2)
+
+
+def _agg_value_exprs(ref: str) -> list[str]:
+    """One row's contribution to each of MONTHLY_AGG_SUMS."""
+    codes = ", ".join(str(c) for c in SUNNY_WEATHERCODES)
+    daylen = f"(julianday({ref}.sunset) - julianday({ref}.sunrise)) * 24.0"
+    return [
+        "1",
+        f"COALESCE({ref}.tmax_c, 0)",
+        f"({ref}.tmax_c IS NOT NULL)",
+        f"COALESCE({ref}.tmin_c, 0)",
+        f"({ref}.tmin_c IS NOT NULL)",
+        f"(COALESCE({ref}.weathercode, -1) IN ({codes}))",
+        f"COALESCE({daylen}, 0)",
+        f"({daylen} IS NOT NULL)",
+    ]
+
+
+def _agg_upsert_clause() -> str:
+    updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in MONTHLY_AGG_SUMS)
+    return f"ON CONFLICT(city, month, source) DO UPDATE SET {updates}"
+
+
+def _agg_row_delta_sql(ref: str, source: str, sign: int, from_sql: str = "", where: str = "1") -> str:
+    """Trigger statement adding (sign=1) or removing (sign=-1) one visible row from a clean city's sums."""
+    in_window = (
+        f"EXISTS (SELECT 1 FROM city_monthly_agg_state s WHERE s.city={ref}.city AND s.dirty=0 "
+        f"AND {ref}.date BETWEEN s.window_start AND s.window_end)"
+    )
+    return f"""
+        INSERT INTO city_monthly_agg(city, month, source, {", ".join(MONTHLY_AGG_SUMS)})
+        SELECT {ref}.city, CAST(SUBSTR({ref}.date, 6, 2) AS INTEGER), '{source}',
+            {", ".join(f"{sign} * {v}" for v in _agg_value_exprs(ref))}
+        {from_sql} WHERE {where} AND {in_window}
+        {_agg_upsert_clause()};
+    """
+
+
+def _agg_row_change_sql(source: str, where: str = "1") -> str:
+    """Trigger statement applying NEW - OLD for an update that keeps (city, date); the day count is unchanged."""
+    in_window = (
+        "EXISTS (SELECT 1 FROM city_monthly_agg_state s WHERE s.city=NEW.city AND s.dirty=0 "
+        "AND NEW.date BETWEEN s.window_start AND s.window_end)"
+    )
+    changes = [f"{new} - {old}" for new, old in zip(_agg_value_exprs("NEW"), _agg_value_exprs("OLD"))]
+    return f"""
+        INSERT INTO city_monthly_agg(city, month, source, {", ".join(MONTHLY_AGG_SUMS)})
+        SELECT NEW.city, CAST(SUBSTR(NEW.date, 6, 2) AS INTEGER), '{source}', {", ".join(changes)}
+        WHERE {where} AND {in_window}
+        {_agg_upsert_clause()};
+    """
+
+
+def ensure_monthly_agg(conn: sqlite3.Connection) -> None:
+    """Create city_monthly_agg, its per-city state table and the maintenance triggers on the split tables."""
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS city_monthly_agg (
+            city TEXT NOT NULL,
+            month INTEGER NOT NULL,
+            source TEXT NOT NULL,
+            {", ".join(f"{c} REAL NOT NULL DEFAULT 0" for c in MONTHLY_AGG_SUMS)},
+            PRIMARY KEY (city, month, source)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS city_monthly_agg_state (
+            city TEXT PRIMARY KEY,
+            window_start TEXT,
+            window_end TEXT,
+            dirty INTEGER NOT NULL DEFAULT 1,
+            updated_at TEXT
+        )
+        """
+    )
+    existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    if "daily_data_estimated" not in existing or "daily_data_forecast" not in existing:
+        return
+
+    est_from = "FROM daily_data_estimated e"
+    est_new_where = "e.city=NEW.city AND e.date=NEW.date"
+    est_old_where = "e.city=OLD.city AND e.date=OLD.date"
+
+    def no_forecast(ref: str) -> str:
+        return f"NOT EXISTS (SELECT 1 FROM daily_data_forecast f WHERE f.city={ref}.city AND f.date={ref}.date)"
+
+    triggers = {
+        # A forecast row hides the estimated row for the same day.
+        "daily_data_forecast_monthly_agg_ins": (
+            "AFTER INSERT ON daily_data_forecast",
+            _agg_row_delta_sql("e", "estimated", -1, est_from, est_new_where)
+            + _agg_row_delta_sql("NEW", "forecast", 1),
+        ),
+        "daily_data_forecast_monthly_agg_del": (
+            "AFTER DELETE ON daily_data_forecast",
+            _agg_row_delta_sql("OLD", "forecast", -1)
+            + _agg_row_delta_sql("e", "estimated", 1, est_from, est_old_where),
+        ),
+        # Upserts rewrite a row in place; only a moved row changes which estimated row is hidden.
+        "daily_data_forecast_monthly_agg_upd": (
+            "AFTER UPDATE ON daily_data_forecast WHEN NEW.city IS OLD.city AND NEW.date IS OLD.date",
+            _agg_row_change_sql("forecast"),
+        ),
+        "daily_data_forecast_monthly_agg_move": (
+            "AFTER UPDATE OF city, date ON daily_data_forecast WHEN NEW.city IS NOT OLD.city OR NEW.date IS NOT OLD.date",
+            _agg_row_delta_sql("OLD", "forecast", -1)
+            + _agg_row_delta_sql("e", "estimated", 1, est_from, est_old_where)
+            + _agg_row_delta_sql("e", "estimated", -1, est_from, est_new_where)
+            + _agg_row_delta_sql("NEW", "forecast", 1),
+        ),
+        "daily_data_estimated_monthly_agg_ins": (
+            "AFTER INSERT ON daily_data_estimated",
+            _agg_row_delta_sql("NEW", "estimated", 1, where=no_forecast("NEW")),
+        ),
+        "daily_data_estimated_monthly_agg_del": (
+            "AFTER DELETE ON daily_data_estimated",
+            _agg_row_delta_sql("OLD", "estimated", -1, where=no_forecast("OLD")),
+        ),
+        "daily_data_estimated_monthly_agg_upd": (
+            "AFTER UPDATE ON daily_data_estimated WHEN NEW.city IS OLD.city AND NEW.date IS OLD.date",
+            _agg_row_change_sql("estimated", where=no_forecast("NEW")),
+        ),
+        "daily_data_estimated_monthly_agg_move": (
+            "AFTER UPDATE OF city, date ON daily_data_estimated WHEN NEW.city IS NOT OLD.city OR NEW.date IS NOT OLD.date",
+            _agg_row_delta_sql("OLD", "estimated", -1, where=no_forecast("OLD"))
+            + _agg_row_delta_sql("NEW", "estimated", 1, where=no_forecast("NEW")),
+        ),
+    }
+    for name, (event, body) in triggers.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+
+
+def _apply_monthly_range(conn: sqlite3.Connection, city: str, start_date: str, end_date: str, sign: int) -> None:
+    """Add (sign=1) or remove (sign=-1) every visible row of `city` dated start_date..end_date."""
+    if start_date > end_date:
+        return
+    month = "CAST(SUBSTR(date, 6, 2) AS INTEGER)"
+    totals = ", ".join(f"{sign} * TOTAL({v})" for v in _agg_value_exprs("r"))
+    conn.execute(
+        f"""
+        INSERT INTO city_monthly_agg(city, month, source, {", ".join(MONTHLY_AGG_SUMS)})
+        SELECT city, {month}, source, {totals}
+        FROM (
+            SELECT r.*, 'forecast' AS source FROM daily_data_forecast r
+            WHERE r.city=? AND r.date BETWEEN ? AND ?
+            UNION ALL
+            SELECT r.*, 'estimated' AS source FROM daily_data_estimated r
+            WHERE r.city=? AND r.date BETWEEN ? AND ?
+              AND NOT EXISTS (SELECT 1 FROM daily_data_forecast f WHERE f.city=r.city AND f.date=r.date)
+        ) r
+        WHERE 1
+        GROUP BY city, {month}, source
+        {_agg_upsert_clause()}
+        """,
+        (city, start_date, end_date, city, start_date, end_date),
+    )
+
+
+def _window_minus(a_start: str, a_end: str, b_start: str, b_end: str) -> list[tuple[str, str]]:
+    """Date ranges of window a that fall outside window b (the windows overlap)."""
+    out = []
+    if a_start < b_start:
+        out.append((a_start, min(a_end, (_day(b_start) - timedelta(days=1)).isoformat())))
+    if a_end > b_end:
+        out.append((max(a_start, (_day(b_end) + timedelta(days=1)).isoformat()), a_end))
+    return out
+
+
+def refresh_monthly_agg(conn: sqlite3.Connection, city: str, start_date: str, end_date: str) -> str:
+    """
+    Bring one city's aggregates to the start_date..end_date window. A clean city whose window
+    only moved is rolled (days leaving subtracted, days entering added); dirty, unknown or
+    disjoint ones are rebuilt. Returns "fresh", "rolled" or "rebuilt".
+    """
+    row = conn.execute(
+        "SELECT window_start, window_end, dirty FROM city_monthly_agg_state WHERE city=?", (city,)
+    ).fetchone()
+    clean = row is not None and not row[2]
+    if clean and (row[0], row[1]) == (start_date, end_date):
+        return "fresh"
+    if clean and row[0] <= end_date and start_date <= row[1]:
+        for a, b in _window_minus(row[0], row[1], start_date, end_date):
+            _apply_monthly_range(conn, city, a, b, -1)
+        for a, b in _window_minus(start_date, end_date, row[0], row[1]):
+            _apply_monthly_range(conn, city, a, b, 1)
+        conn.execute("DELETE FROM city_monthly_agg WHERE city=? AND days < 0.5", (city,))
+        action = "rolled"
+    else:
+        conn.execute("DELETE FROM city_monthly_agg WHERE city=?", (city,))
+        _apply_monthly_range(conn, city, start_date, end_date, 1)
+        action = "rebuilt"
+    conn.execute(
+        """
+        INSERT INTO city_monthly_agg_state(city, window_start, window_end, dirty, updated_at)
+        VALUES (?, ?, ?, 0, ?)
+        ON CONFLICT(city) DO UPDATE SET
+            window_start=excluded.window_start, window_end=excluded.window_end, dirty=0, updated_at=excluded.updated_at
+        """,
+        (city, start_date, end_date, datetime.now(timezone.utc).isoformat()),
+    )
+    return action
+
+
+def refresh_monthly_agg_all(
+    conn: sqlite3.Connection, start_date: str, end_date: str, cities: list[str] | None = None
+) -> dict[str, int]:
+    """refresh_monthly_agg() for every city with weather rows (or just `cities`); returns counts per action."""
+    if cities is None:
+        cities = [
+            str(r[0])
+            for r in conn.execute("SELECT city FROM daily_data_estimated UNION SELECT city FROM daily_data_forecast")
+        ]
+    fresh = {
+        str(r[0])
+        for r in conn.execute(
+            "SELECT city FROM city_monthly_agg_state WHERE dirty=0 AND window_start=? AND window_end=?",
+            (start_date, end_date),
+        )
+    }
+    counts = {"fresh": 0, "rolled": 0, "rebuilt": 0}
+    for city in cities:
+        action = "fresh" if city in fresh else refresh_monthly_agg(conn, city, start_date, end_date)
+        counts[action] += 1
+    return counts
+
+
+def mark_monthly_agg_dirty(conn: sqlite3.Connection, cities: list[str] | None = None) -> None:
+    """Flag cities (all when None) for a rebuild; triggers stop maintaining them until then."""
+    if cities is None:
+        conn.execute("UPDATE city_monthly_agg_state SET dirty=1")
+        return
+    conn.executemany(
+        "INSERT INTO city_monthly_agg_state(city, dirty) VALUES (?, 1) ON CONFLICT(city) DO UPDATE SET dirty=1",
+        [(c,) for c in cities],
+    )
+
+
+def monthly_agg_map(conn: sqlite3.Connection, city: str | None = None) -> dict[str, dict[int, dict[str, float]]]:
+    """Stored sums per city and month, summed across sources (the visible daily_data rows)."""
+    sums = ", ".join(f"SUM({c})" for c in MONTHLY_AGG_SUMS)
+    sql = f"SELECT city, month, {sums} FROM city_monthly_agg"
+    params: tuple = ()
+    if city is not None:
+        sql += " WHERE city=?"
+        params = (city,)
+    out: dict[str, dict[int, dict[str, float]]] = {}
+    for row in conn.execute(sql + " GROUP BY city, month", params):
+        out.setdefault(str(row[0]), {})[int(row[1])] = dict(zip(MONTHLY_AGG_SUMS, row[2:]))
+    return out
+
+
+def prune_before(conn: sqlite3.Connection, table: str, before_date: str, data_source: str | None = None) -> int:
+    """Delete rows dated before `before_date` (optionally only one data_source); returns rows removed."""
+    if data_source is None:
+        cur = conn.execute(f"DELETE FROM {table} WHERE date<?", (before_date,))
+    else:
+        cur = conn.execute(f"DELETE FROM {table} WHERE date<? AND data_source=?", (before_date, data_source))
+    return cur.rowcount or 0
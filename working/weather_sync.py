@@ -0,0 +1,2011 @@
+#!/usr/bin/env python3
+"""
+The daily sync pipeline without Qt: provider fetches, storage, monthly aggregates,
+forecast rows, caches and sync_runs bookkeeping. sunseeker.py builds its window on
+top of this module; `python -m sunseeker sync` runs it headless as a daemon.
+
+    python -m sunseeker sync                  # one run every --interval seconds until SIGINT/SIGTERM
+    python -m sunseeker sync --once
+"""
+import argparse
+import fcntl
+import json
+import os
+import pickle
+import signal
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict
+
+import pandas as pd
+import requests
+
+import fetch_scheduler
+import geo_boundaries
+import geonames_index
+import response_cache
+import vc_provider
+import weather_store
+from climate_cube import ClimateCube
+
+DATABASE = "weather_data_v2.db"
+CACHE_FILE = "forecast_cache.pkl"
+CACHE_MAX_AGE = timedelta(hours=1)
+ALL_CITIES_UI_CACHE_FILE = "all_cities_ui_cache.pkl"
+ALL_CITIES_UI_CACHE_MAX_AGE = timedelta(hours=24)
+ALLCOUNTRIES_FILE = "allcountries.txt"
+# City catalog walked by run_catalog_backfill.py and offered by Add City; see load_catalog().
+CATALOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "all_city_data.json")
+# "Place, CC" -> (lat, lon) from allcountries.txt; compiled and memory-mapped on first lookup.
+GEONAMES = geonames_index.GeoNamesIndex(ALLCOUNTRIES_FILE)
+GEONAMES_POSTAL = geonames_index.GeoNamesIndex(ALLCOUNTRIES_FILE, by="postal")
+GEONAMES_SEARCH = geonames_index.GeoNamesIndex(ALLCOUNTRIES_FILE, by="search")
+# Country polygons for offline continent/country lookups: the bundled Natural Earth 1:110m admin 0
+# countries (public domain), trimmed to the CONTINENT/ISO_A2/ISO_A3/NAME fields.
+BOUNDARIES_FILE = os.environ.get("SUNSEEKER_BOUNDARIES", "ne_110m_admin_0_countries.shp")
+BOUNDARIES = geo_boundaries.BoundaryIndex(BOUNDARIES_FILE)
+SYNC_LOG_FILE = "sync_runs.log"
+API_CALL_LOG_FILE = "sync_api_calls.ndjson"
+RUN_LOCK_FILE = "weather_data_v2.sync.lock"
+VISUAL_CROSSING_KEY = os.environ.get("VISUAL_CROSSING_API_KEY", "").strip()
+WEATHER_PROVIDER = "visualcrossing"
+# Shared with run_catalog_backfill.py and city_weather_dashboard.py (see vc_provider.py).
+VC_RATE_LIMITER = vc_provider.TokenBucket()
+# Outage state lives in the provider state DB, so a new run starts out knowing VC is down.
+VC_BREAKER = vc_provider.CircuitBreaker()
+# Stop event of the run_daily_sync() in progress; request waits give up once it is set.
+_RUN_STOP = threading.Event()
+# Raw payloads by request; fresh ones replace the fetch, all of them can be re-ingested offline.
+RESPONSE_CACHE = response_cache.ResponseCache()
+VC_MAX_WORKERS = int(os.environ.get("VC_MAX_WORKERS", "1"))
+VC_MAX_WORKERS_LIMIT = int(os.environ.get("VC_MAX_WORKERS_LIMIT", str(max(4, VC_MAX_WORKERS))))
+# Adapts in-flight requests and local spacing from 429s/latency; adjustments go to the API log.
+VC_CONTROLLER = vc_provider.AimdController(
+    workers=VC_MAX_WORKERS,
+    max_workers=VC_MAX_WORKERS_LIMIT,
+    latency_target_sec=float(os.environ.get("VC_LATENCY_TARGET_SEC", "8")),
+    log_fn=lambda row: append_api_call_log(row),
+    source="sunseeker",
+)
+ESTIMATED_WINDOW_DAYS = int(os.environ.get("ESTIMATED_WINDOW_DAYS", "365"))
+# Incremental mode keeps stored estimated rows and only fetches dates newly entering the window.
+ESTIMATED_INCREMENTAL = os.environ.get("ESTIMATED_INCREMENTAL", "1") != "0"
+ESTIMATED_PRUNE = os.environ.get("ESTIMATED_PRUNE", "0") == "1"
+# Gaps separated by this many stored days are fetched as one request.
+ESTIMATED_MERGE_GAP_DAYS = int(os.environ.get("ESTIMATED_MERGE_GAP_DAYS", "0"))
+# Refresh tiers: the 16-day forecast is refetched after FORECAST_TTL_HOURS; in between, runs
+# refresh only current conditions (one-day, include=current request) once they are CURRENT_TTL_SEC old.
+FORECAST_TTL_HOURS = float(os.environ.get("FORECAST_TTL_HOURS", "24"))
+CURRENT_TTL_SEC = float(os.environ.get("CURRENT_TTL_SEC", "3600"))
+CURRENT_TIER = os.environ.get("CURRENT_TIER", "1") != "0"
+CURRENT_ELEMENTS = "datetime,datetimeEpoch,temp,feelslike,humidity,conditions,icon"
+# Locations per multi-location request in the forecast phase (1 = one request per city).
+VC_BATCH_SIZE = vc_provider.VC_BATCH_SIZE
+# Per-run limits (0 = none); cities are dispatched by priority, so what runs out is the least wanted work.
+SYNC_DEADLINE_SEC = float(os.environ.get("SYNC_DEADLINE_SEC", "0"))
+SYNC_REQUEST_BUDGET = int(os.environ.get("SYNC_REQUEST_BUDGET", "0"))
+# Itinerary cities (top N for this and the next months) count as user interest for scheduling.
+ITINERARY_INTEREST_N = int(os.environ.get("ITINERARY_INTEREST_N", "10"))
+ITINERARY_INTEREST_MONTHS = 3
+WEATHER_COLUMNS = [
+    "city", "date", "tmax_c", "tmin_c", "tavg_c", "feelslike_max_c", "feelslike_min_c", "feelslike_c", "dewpoint_c",
+    "humidity_pct", "cloudcover_pct", "visibility_km", "precip_mm", "precip_prob_pct", "precip_cover_pct", "precip_type",
+    "snow_mm", "snowdepth_mm", "windspeed_kph", "windgust_kph", "winddir_deg", "pressure_mb", "solarradiation_wm2",
+    "solarenergy_mj_m2", "uvindex", "moonphase", "conditions_text", "icon", "description_text", "source_provider",
+    "stations_text", "severerisk", "weathercode", "sunrise", "sunset", "data_source", "updated_at",
+]
+
+CITY_COORDS = {
+    "Honolulu":        (21.3069, -157.8583),
+    "Todos Santos":    (23.4469, -110.2231),
+    "Tenerife":        (28.2916, -16.6291),
+    "Los Angeles":     (34.0522, -118.2437),
+    "Medellin":        (6.2442, -75.5812),
+    "Mexico City":     (19.4326, -99.1332),
+    "Rio de Janeiro":  (-22.9068, -43.1729),
+    "Fortaleza":       (-3.7319, -38.5267),
+    "Abu Dhabi":       (24.4539, 54.3773),
+    "Las Vegas":       (36.1699, -115.1398),
+    "Tucson":          (32.2226, -110.9747),
+    "Buenos Aires":    (-34.6037, -58.3816),
+    "Sydney":          (-33.8688, 151.2093),
+    "Sao Paolo":       (-23.5505, -46.6333),
+    "Berlin":          (52.5200, 13.4050),
+    "Copenhagen":      (55.6761, 12.5683),
+    "Santa Fe":        (35.6870, -105.9378),
+    "Amsterdam":       (52.3676, 4.9041),
+    "New York":        (40.7128, -74.0060),
+    "London":          (51.5074, -0.1278),
+    "Tokyo":           (35.6762, 139.6503),
+    "Barcelona":       (41.3851, 2.1734),
+    "Athens":          (37.9838, 23.7275),
+    "Valencia":        (39.4699, -0.3763),
+    "Shanghai":        (31.2304, 121.4737),
+    "Austin":          (30.2672, -97.7431),
+    "Milos":           (36.7260, 24.4443),
+    "Santiago":        (-33.4489, -70.6693),
+    "Lisbon":          (38.7223, -9.1393),
+    "El Paso":         (31.7619, -106.4850),
+    "Palm Springs":    (33.8303, -116.5453)
+}
+
+# Explicit disambiguation map for ambiguous city names that collide globally.
+# Key: (catalog city, catalog country) -> DB/API city key
+CITY_COUNTRY_DISAMBIGUATION: dict[tuple[str, str], str] = {
+    ("Hong Kong", "China (Hong Kong SAR)"): "Hong Kong, China",
+    ("Macau", "China (Macau SAR)"): "Macau, China",
+    ("George Town", "Cayman Islands"): "George Town, Cayman Islands",
+    ("Granada", "Nicaragua"): "Granada, Nicaragua",
+    ("Hamilton", "Bermuda"): "Hamilton, Bermuda",
+    ("San Juan", "United States"): "San Juan, United States",
+    ("Alexandria", "United States"): "Alexandria, United States",
+    ("Georgetown, TX", "United States"): "Georgetown, TX",
+}
+
+def get_estimated_window_dates():
+    """
+    Rolling one-year expected-data window starting today (UTC), inclusive.
+    Default is 365 days including today.
+    """
+    start_dt = datetime.now(timezone.utc).date()
+    span = max(1, ESTIMATED_WINDOW_DAYS)
+    end_dt = start_dt + timedelta(days=span - 1)
+    return start_dt.isoformat(), end_dt.isoformat()
+
+START_DATE, END_DATE = get_estimated_window_dates()
+SUNNY_CODES = [0,1,2]
+
+def c_to_f(c):
+    return (c * 9/5) + 32
+
+def append_sync_log(message: str):
+    ts = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+    line = f"[{ts}] {message}"
+    print(line)
+    try:
+        with open(SYNC_LOG_FILE, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except Exception:
+        pass
+
+def _scrub_api_key(text: str) -> str:
+    if not text:
+        return text
+    if VISUAL_CROSSING_KEY:
+        return text.replace(VISUAL_CROSSING_KEY, "***")
+    return text
+
+def append_api_call_log(payload: dict):
+    entry = dict(payload or {})
+    entry["ts"] = datetime.now(timezone.utc).isoformat()
+    for k in ("url", "error"):
+        if k in entry and isinstance(entry[k], str):
+            entry[k] = _scrub_api_key(entry[k])
+    try:
+        with open(API_CALL_LOG_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    except Exception:
+        pass
+
+def _column_exists(conn, table_name: str, column_name: str) -> bool:
+    c = conn.cursor()
+    c.execute(f"PRAGMA table_info({table_name})")
+    return any(row[1] == column_name for row in c.fetchall())
+
+def _ensure_column(conn, table_name: str, column_name: str, col_type: str):
+    if not _column_exists(conn, table_name, column_name):
+        c = conn.cursor()
+        c.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {col_type}")
+
+def _create_weather_table(conn, table_name: str):
+    c = conn.cursor()
+    c.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            city TEXT,
+            date TEXT,
+            tmax_c REAL,
+            tmin_c REAL,
+            weathercode INT,
+            sunrise TEXT,
+            sunset TEXT,
+            PRIMARY KEY (city, date)
+        )
+        """
+    )
+    _ensure_column(conn, table_name, "data_source", "TEXT DEFAULT 'estimated'")
+    _ensure_column(conn, table_name, "updated_at", "TEXT")
+    _ensure_column(conn, table_name, "tavg_c", "REAL")
+    _ensure_column(conn, table_name, "feelslike_max_c", "REAL")
+    _ensure_column(conn, table_name, "feelslike_min_c", "REAL")
+    _ensure_column(conn, table_name, "feelslike_c", "REAL")
+    _ensure_column(conn, table_name, "dewpoint_c", "REAL")
+    _ensure_column(conn, table_name, "humidity_pct", "REAL")
+    _ensure_column(conn, table_name, "cloudcover_pct", "REAL")
+    _ensure_column(conn, table_name, "visibility_km", "REAL")
+    _ensure_column(conn, table_name, "precip_mm", "REAL")
+    _ensure_column(conn, table_name, "precip_prob_pct", "REAL")
+    _ensure_column(conn, table_name, "precip_cover_pct", "REAL")
+    _ensure_column(conn, table_name, "precip_type", "TEXT")
+    _ensure_column(conn, table_name, "snow_mm", "REAL")
+    _ensure_column(conn, table_name, "snowdepth_mm", "REAL")
+    _ensure_column(conn, table_name, "windspeed_kph", "REAL")
+    _ensure_column(conn, table_name, "windgust_kph", "REAL")
+    _ensure_column(conn, table_name, "winddir_deg", "REAL")
+    _ensure_column(conn, table_name, "pressure_mb", "REAL")
+    _ensure_column(conn, table_name, "solarradiation_wm2", "REAL")
+    _ensure_column(conn, table_name, "solarenergy_mj_m2", "REAL")
+    _ensure_column(conn, table_name, "uvindex", "REAL")
+    _ensure_column(conn, table_name, "moonphase", "REAL")
+    _ensure_column(conn, table_name, "conditions_text", "TEXT")
+    _ensure_column(conn, table_name, "icon", "TEXT")
+    _ensure_column(conn, table_name, "description_text", "TEXT")
+    _ensure_column(conn, table_name, "source_provider", "TEXT")
+    _ensure_column(conn, table_name, "stations_text", "TEXT")
+    _ensure_column(conn, table_name, "severerisk", "REAL")
+
+def _vc_gate():
+    """
+    Global Visual Crossing pacing gate.
+    Takes a token from the cross-process bucket so the GUI sync, the backfill runner and
+    the dashboard share one request budget instead of bursting into 429s together.
+    """
+    VC_RATE_LIMITER.acquire(stop=_RUN_STOP)
+
+def _vc_request(url: str, params: dict):
+    """
+    Issue one Visual Crossing request under the adaptive controller: wait for an
+    in-flight slot, apply its local spacing and the shared token bucket, then report
+    the status and latency back so the controller can back off or probe upward.
+    """
+    VC_BREAKER.check(wait_for_probe=True, stop=_RUN_STOP)
+    with VC_CONTROLLER.slot(_RUN_STOP):
+        VC_CONTROLLER.pace(_RUN_STOP)
+        _vc_gate()
+        t0 = time.monotonic()
+        try:
+            r = requests.get(url, params=params, timeout=60)
+        except requests.RequestException:
+            VC_CONTROLLER.record(None, time.monotonic() - t0)
+            VC_BREAKER.record(None)
+            raise
+        VC_CONTROLLER.record(r.status_code, time.monotonic() - t0)
+    VC_BREAKER.record(r.status_code, vc_provider.retry_after_sec(r.headers))
+    return r
+
+def get_db_conn(path: str = DATABASE) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=60)
+    conn.execute("PRAGMA busy_timeout=60000")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+def acquire_run_lock(lock_path: str):
+    fh = open(lock_path, "w", encoding="utf-8")
+    try:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        fh.write(f"{os.getpid()}\n")
+        fh.flush()
+        return fh
+    except Exception:
+        try:
+            fh.close()
+        except Exception:
+            pass
+        return None
+
+def init_db():
+    """Initialize all database tables"""
+    conn = get_db_conn(DATABASE)
+    c = conn.cursor()
+    # Weather tables:
+    # - daily_data_estimated: full 1-year expected baseline
+    # - daily_data_forecast: short-horizon forecast snapshots by city/date
+    # - daily_data: view of the "best available" row (forecast overrides estimated) for read paths;
+    #   migrates a legacy materialized daily_data table on first run
+    _create_weather_table(conn, "daily_data_estimated")
+    _create_weather_table(conn, "daily_data_forecast")
+    weather_store.ensure_daily_view(conn)
+    # Running monthly sums per city over the same window, kept current by triggers.
+    weather_store.ensure_monthly_agg(conn)
+
+    # City coordinates table
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS city_coords (
+            city TEXT PRIMARY KEY,
+            lat REAL,
+            lon REAL
+        )
+    """)
+
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS sync_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS sync_runs (
+            run_id TEXT PRIMARY KEY,
+            started_at TEXT,
+            finished_at TEXT,
+            status TEXT,
+            total_cities INTEGER,
+            historical_complete INTEGER,
+            historical_missing INTEGER,
+            forecast_fresh INTEGER,
+            forecast_stale INTEGER,
+            historical_updated INTEGER,
+            forecast_updated INTEGER,
+            errors INTEGER,
+            notes TEXT
+        )
+    """)
+
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS sync_city_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id TEXT,
+            city TEXT,
+            stage TEXT,
+            status TEXT,
+            message TEXT,
+            ts TEXT
+        )
+    """)
+
+    # Per-city date coverage bitmaps (kept current by triggers) for gap planning.
+    weather_store.ensure_coverage(conn)
+    # (lat, lon) -> continent/country results of the boundary index.
+    geo_boundaries.ensure_cache(conn)
+    
+    conn.commit()
+    
+    # Populate city_coords from the compiled allcountries.txt index if needed, in one transaction.
+    c.execute("SELECT COUNT(*) FROM city_coords")
+    if c.fetchone()[0] == 0 and len(GEONAMES):
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO city_coords (city, lat, lon) VALUES (?, ?, ?)", GEONAMES.rows())
+
+    conn.close()
+
+def get_sync_meta(conn, key: str, default: str = "") -> str:
+    c = conn.cursor()
+    c.execute("SELECT value FROM sync_meta WHERE key=?", (key,))
+    row = c.fetchone()
+    return row[0] if row else default
+
+def set_sync_meta(conn, key: str, value: str):
+    c = conn.cursor()
+    c.execute(
+        "INSERT INTO sync_meta (key, value) VALUES (?, ?) "
+        "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+        (key, value),
+    )
+    conn.commit()
+
+def insert_sync_city_log(conn, run_id: str, city: str, stage: str, status: str, message: str):
+    c = conn.cursor()
+    c.execute(
+        "INSERT INTO sync_city_log (run_id, city, stage, status, message, ts) VALUES (?, ?, ?, ?, ?, ?)",
+        (run_id, city, stage, status, message, datetime.now(timezone.utc).isoformat()),
+    )
+
+def get_city_coords(city_name):
+    """Get coordinates for a city from the database"""
+    conn = get_db_conn(DATABASE)
+    c = conn.cursor()
+    c.execute("SELECT lat, lon FROM city_coords WHERE city = ?", (city_name,))
+    row = c.fetchone()
+    conn.close()
+    if row:
+        return row[0], row[1]
+    return None
+
+def db_city_key(city: str, country: str) -> str:
+    city_s = str(city or "").strip()
+    country_s = str(country or "").strip()
+    if not city_s:
+        return ""
+    mapped = CITY_COUNTRY_DISAMBIGUATION.get((city_s, country_s))
+    if mapped:
+        return mapped
+    return city_s
+
+def load_catalog(path: str) -> list[dict[str, Any]]:
+    """Unique (city, country) rows of an all_city_data.json catalog, with their DB city key."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    out = []
+    seen = set()
+    for row in data:
+        city = str(row.get("city", "")).strip()
+        country = str(row.get("country", "")).strip()
+        if not city or not country:
+            continue
+        key = (city, country)
+        if key in seen:
+            continue
+        seen.add(key)
+        out.append(
+            {
+                "city": city,
+                "country": country,
+                "db_city": db_city_key(city, country),
+                "continent": str(row.get("continent", "Unknown")).strip() or "Unknown",
+                "lat": float(row.get("lat", 0.0)),
+                "lng": float(row.get("lng", 0.0)),
+            }
+        )
+    return out
+
+def have_data_for_city(conn, city):
+    bitmap = weather_store.coverage_bitmap(conn, "daily_data_estimated", city, START_DATE, END_DATE)
+    return weather_store.coverage_count(bitmap) == weather_store.window_days(START_DATE, END_DATE)
+
+def estimated_ranges_to_fetch(conn, city):
+    """
+    Date ranges still missing from the rolling estimated window for `city` ([] when complete).
+    Incremental mode asks only for the gaps in the city's coverage bitmap.
+    """
+    if not ESTIMATED_INCREMENTAL:
+        return [] if have_data_for_city(conn, city) else [(START_DATE, END_DATE)]
+    bitmap = weather_store.coverage_bitmap(conn, "daily_data_estimated", city, START_DATE, END_DATE)
+    return weather_store.gap_ranges(bitmap, START_DATE, END_DATE, merge_gap_days=ESTIMATED_MERGE_GAP_DAYS)
+
+def estimated_gap_share(ranges) -> float:
+    """Fraction of the estimated window covered by the date ranges still to fetch."""
+    missing = sum(weather_store.window_days(start, end) for start, end in ranges)
+    return min(1.0, missing / max(1, weather_store.window_days(START_DATE, END_DATE)))
+
+def save_itinerary_interest(conn, climate):
+    """Record this and the next months' itinerary cities as scheduling interest."""
+    if climate is None:
+        return
+    month = datetime.now().month
+    top = climate.top_by_month(ITINERARY_INTEREST_N)
+    cities = []
+    for k in range(ITINERARY_INTEREST_MONTHS):
+        cities += [name for name, _ in top.get((month - 1 + k) % 12 + 1, [])]
+    fetch_scheduler.save_interest(conn, itinerary=cities)
+
+def prune_estimated_window(conn):
+    """Drop estimated rows that have rolled out of the window; returns rows removed."""
+    removed = weather_store.prune_before(conn, "daily_data_estimated", START_DATE)
+    conn.commit()
+    return removed
+
+
+def fetch_historical(lat: float, lon: float, start_date: str, end_date: str) -> Dict[str, Any]:
+    url = "https://archive-api.open-meteo.com/v1/era5"
+    params = {
+        "latitude": lat,
+        "longitude": lon,
+        "start_date": start_date,
+        "end_date": end_date,
+        "daily": "temperature_2m_max,temperature_2m_min,weathercode,sunrise,sunset",
+        "timezone": "UTC"
+    }
+    
+    max_retries = 5
+    base_delay = 1  # Start with 1 second delay
+    
+    for attempt in range(max_retries):
+        try:
+            r = requests.get(url, params=params)
+            r.raise_for_status()
+            return r.json()
+        except requests.exceptions.HTTPError as e:
+            if e.response.status_code == 429:  # Too Many Requests
+                if attempt < max_retries - 1:  # Don't sleep on the last attempt
+                    delay = base_delay * (2 ** attempt)  # Exponential backoff
+                    time.sleep(delay)
+                    continue
+            raise  # Re-raise the exception if it's not a 429 or we're out of retries
+
+def _visualcrossing_weathercode(icon: str, conditions: str, precip_prob: float) -> int:
+    icon_l = (icon or "").lower()
+    cond_l = (conditions or "").lower()
+    if "clear" in icon_l or "sunny" in cond_l:
+        return 0
+    if "partly" in icon_l:
+        return 1
+    if "cloud" in icon_l:
+        return 3
+    if any(x in icon_l or x in cond_l for x in ["rain", "drizzle", "shower"]):
+        return 61
+    if any(x in icon_l or x in cond_l for x in ["snow", "sleet", "ice"]):
+        return 71
+    if any(x in icon_l or x in cond_l for x in ["thunder", "storm"]):
+        return 95
+    if "fog" in icon_l or "fog" in cond_l:
+        return 45
+    if precip_prob is not None and precip_prob >= 50:
+        return 61
+    return 3
+
+def fetch_visualcrossing_estimated_window(lat: float, lon: float, start_date: str, end_date: str, city: str = "") -> Dict[str, Any]:
+    cached = RESPONSE_CACHE.get("estimated_window", lat, lon, start_date, end_date, "days", city=city)
+    if cached is not None:
+        return cached
+    if not VISUAL_CROSSING_KEY:
+        raise RuntimeError("VISUAL_CROSSING_API_KEY is not set")
+    location = f"{lat},{lon}"
+    url = f"{vc_provider.VC_TIMELINE_URL}/{location}/{start_date}/{end_date}"
+    params = {
+        "unitGroup": "metric",
+        "include": "days",
+        "key": VISUAL_CROSSING_KEY,
+        "contentType": "json",
+    }
+    r = _vc_request(url, params)
+    called_url = r.url if hasattr(r, "url") else url
+    if r.status_code == 429:
+        # The controller has already backed off; only open the circuit for everyone once it is at its floor.
+        tripped = VC_CONTROLLER.at_floor
+        if tripped:
+            VC_BREAKER.trip("rate_limited", retry_after=vc_provider.retry_after_sec(r.headers))
+        append_api_call_log({
+            "city": city,
+            "kind": "estimated_window",
+            "provider": WEATHER_PROVIDER,
+            "status_code": 429,
+            "ok": False,
+            "url": called_url,
+            "start_date": start_date,
+            "end_date": end_date,
+            "lat": lat,
+            "lon": lon,
+            "records": 0,
+            "error": "rate_limited",
+        })
+        if tripped:
+            raise requests.HTTPError(
+                f"429 rate limited; VC circuit open until {VC_BREAKER.status()['next_probe_at']}",
+                response=r,
+            )
+        vc_state = VC_CONTROLLER.snapshot()
+        raise requests.HTTPError(
+            f"429 rate limited; backing off to workers={vc_state['workers']} interval={vc_state['interval_sec']:.2f}s",
+            response=r,
+        )
+    r.raise_for_status()
+    data = r.json()
+    RESPONSE_CACHE.put("estimated_window", lat, lon, start_date, end_date, "days", data, city=city)
+    days = data.get("days", []) if isinstance(data, dict) else []
+    sample_tmax = None
+    sample_tmin = None
+    sample_date = None
+    if days:
+        sample = days[0]
+        sample_tmax = sample.get("tempmax")
+        sample_tmin = sample.get("tempmin")
+        sample_date = sample.get("datetime")
+        sample_precip = sample.get("precip")
+        sample_precipprob = sample.get("precipprob")
+        sample_solar = sample.get("solarradiation")
+    else:
+        sample_precip = None
+        sample_precipprob = None
+        sample_solar = None
+    append_api_call_log({
+        "city": city,
+        "kind": "estimated_window",
+        "provider": WEATHER_PROVIDER,
+        "status_code": r.status_code,
+        "ok": True,
+        "url": called_url,
+        "start_date": start_date,
+        "end_date": end_date,
+        "lat": lat,
+        "lon": lon,
+        "records": len(days),
+        "sample_tmax_c": sample_tmax,
+        "sample_tmin_c": sample_tmin,
+        "sample_date": sample_date,
+        "sample_precip_mm": sample_precip,
+        "sample_precip_prob_pct": sample_precipprob,
+        "sample_solarradiation_wm2": sample_solar,
+    })
+    return data
+
+def process_visualcrossing_days(days: list[dict]) -> pd.DataFrame:
+    rows = []
+    for d in days:
+        # Dates and epochs are converted per column below; per-value pd.to_datetime dominated the cost.
+        dt = d.get("datetime")
+        sunrise = d.get("sunriseEpoch")
+        sunset = d.get("sunsetEpoch")
+        tmax_c = d.get("tempmax")
+        tmin_c = d.get("tempmin")
+        icon = d.get("icon", "")
+        conditions = d.get("conditions", "")
+        precip_prob = d.get("precipprob")
+        code = _visualcrossing_weathercode(icon, conditions, precip_prob)
+        rows.append(
+            {
+                "time": dt,
+                "tmax_c": tmax_c,
+                "tmin_c": tmin_c,
+                "tavg_c": d.get("temp"),
+                "feelslike_max_c": d.get("feelslikemax"),
+                "feelslike_min_c": d.get("feelslikemin"),
+                "feelslike_c": d.get("feelslike"),
+                "dewpoint_c": d.get("dew"),
+                "humidity_pct": d.get("humidity"),
+                "cloudcover_pct": d.get("cloudcover"),
+                "visibility_km": d.get("visibility"),
+                "precip_mm": d.get("precip"),
+                "precip_prob_pct": d.get("precipprob"),
+                "precip_cover_pct": d.get("precipcover"),
+                "precip_type": ",".join(d.get("preciptype", [])) if isinstance(d.get("preciptype"), list) else (d.get("preciptype") or ""),
+                "snow_mm": d.get("snow"),
+                "snowdepth_mm": d.get("snowdepth"),
+                "windspeed_kph": d.get("windspeed"),
+                "windgust_kph": d.get("windgust"),
+                "winddir_deg": d.get("winddir"),
+                "pressure_mb": d.get("pressure"),
+                "solarradiation_wm2": d.get("solarradiation"),
+                "solarenergy_mj_m2": d.get("solarenergy"),
+                "uvindex": d.get("uvindex"),
+                "moonphase": d.get("moonphase"),
+                "conditions_text": d.get("conditions", ""),
+                "icon": d.get("icon", ""),
+                "description_text": d.get("description", ""),
+                "source_provider": d.get("source", ""),
+                "stations_text": ",".join(d.get("stations", [])) if isinstance(d.get("stations"), list) else (d.get("stations") or ""),
+                "severerisk": d.get("severerisk"),
+                "weathercode": code,
+                "sunrise": sunrise,
+                "sunset": sunset,
+            }
+        )
+    df = pd.DataFrame(rows)
+    if not df.empty:
+        df["time"] = pd.to_datetime(df["time"], utc=True)
+        for name in ("sunrise", "sunset"):
+            df[name] = pd.to_datetime(pd.to_numeric(df[name], errors="coerce"), unit="s", utc=True)
+    return df
+
+def fetch_estimated_history(lat: float, lon: float, start_date: str, end_date: str, city: str = "") -> pd.DataFrame:
+    # Visual Crossing only.
+    if VISUAL_CROSSING_KEY:
+        try:
+            vc = fetch_visualcrossing_estimated_window(lat, lon, start_date, end_date, city=city)
+            days = vc.get("days", [])
+            if days:
+                return process_visualcrossing_days(days)
+        except vc_provider.ProviderUnavailable:
+            # Avoid flooding logs once VC is known unavailable.
+            pass
+        except Exception as e:
+            append_sync_log(f"[estimated] Visual Crossing failed for {lat},{lon}: {e}.")
+            if "circuit open" in str(e):
+                append_sync_log("[estimated] Visual Crossing quota/rate limit hit. Remaining cities will skip estimated history until the circuit closes.")
+    return pd.DataFrame()
+
+def estimated_window_key(start: str, end: str) -> tuple:
+    return ("estimated", start, end)
+
+def forecast_window_key(days: int = 16) -> tuple:
+    return ("forecast", datetime.now(timezone.utc).date().isoformat(), days)
+
+def current_window_key() -> tuple:
+    return ("current", datetime.now(timezone.utc).date().isoformat())
+
+def fetch_estimated_ranges(lat: float, lon: float, ranges, city: str = "", share=None) -> pd.DataFrame:
+    """Estimated history for ranges; with a vc_provider.GridShare, aliases in one grid cell share requests."""
+    def fetch(start, end):
+        if share is None:
+            return fetch_estimated_history(lat, lon, start, end, city=city)
+        return share.get(
+            lat, lon, estimated_window_key(start, end),
+            lambda cell_lat, cell_lon: fetch_estimated_history(cell_lat, cell_lon, start, end, city=city),
+        )
+
+    frames = [fetch(start, end) for start, end in ranges]
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+def _frame_to_rows(df: pd.DataFrame, city: str, source: str) -> list[tuple]:
+    """Convert a daily frame into WEATHER_COLUMNS-ordered tuples with whole-frame operations (NaN/NaT -> None)."""
+    pos = {name: i for i, name in enumerate(WEATHER_COLUMNS)}
+    values = df.reindex(columns=WEATHER_COLUMNS).to_numpy(dtype=object)
+    values[pd.isna(values)] = None
+    values[:, pos["city"]] = city
+    values[:, pos["date"]] = df["time"].dt.strftime("%Y-%m-%d").to_numpy()
+    for name in ("sunrise", "sunset"):
+        if name in df.columns:
+            values[:, pos[name]] = [None if pd.isna(v) else v.isoformat() for v in df[name]]
+    values[:, pos["data_source"]] = source
+    values[:, pos["updated_at"]] = datetime.now(timezone.utc).isoformat()
+    return [tuple(row) for row in values.tolist()]
+
+def store_data(conn, city, df, source: str = "estimated"):
+    """
+    Bulk write path: one executemany into the source's split table. The daily_data view
+    resolves source priority (forecast supersedes estimated) at read time.
+    """
+    if df.empty:
+        return
+    split_table = "daily_data_forecast" if source == "forecast" else "daily_data_estimated"
+    rows = _frame_to_rows(df, city, source)
+    weather_store.upsert_weather_rows(conn, split_table, WEATHER_COLUMNS, rows)
+    conn.commit()
+
+def process_daily_data(daily_data: Dict[str, Any]) -> pd.DataFrame:
+    df = pd.DataFrame({
+        "time": daily_data["time"],
+        "tmax_c": daily_data["temperature_2m_max"],
+        "tmin_c": daily_data["temperature_2m_min"],
+        "weathercode": daily_data["weathercode"],
+        "sunrise": daily_data["sunrise"],
+        "sunset": daily_data["sunset"]
+    })
+    df["time"] = pd.to_datetime(df["time"])
+    df["sunrise"] = pd.to_datetime(df["sunrise"])
+    df["sunset"] = pd.to_datetime(df["sunset"])
+    return df
+
+def process_forecast_daily_data(fore_daily: Dict[str, Any]) -> pd.DataFrame:
+    def col(key, default=None):
+        return fore_daily.get(key, default if default is not None else [None] * len(fore_daily.get("time", [])))
+
+    df = pd.DataFrame({
+        "time": fore_daily["time"],
+        "tmax_c": fore_daily["temperature_2m_max"],
+        "tmin_c": fore_daily["temperature_2m_min"],
+        "tavg_c": col("temperature_2m_mean"),
+        "feelslike_max_c": col("feelslike_max_c"),
+        "feelslike_min_c": col("feelslike_min_c"),
+        "feelslike_c": col("feelslike_c"),
+        "dewpoint_c": col("dewpoint_c"),
+        "humidity_pct": col("humidity_pct"),
+        "cloudcover_pct": col("cloudcover_pct"),
+        "visibility_km": col("visibility_km"),
+        "precip_mm": col("precip_mm"),
+        "precip_prob_pct": col("precip_prob_pct"),
+        "precip_cover_pct": col("precip_cover_pct"),
+        "precip_type": col("precip_type", [""] * len(fore_daily.get("time", []))),
+        "snow_mm": col("snow_mm"),
+        "snowdepth_mm": col("snowdepth_mm"),
+        "windspeed_kph": col("windspeed_kph"),
+        "windgust_kph": col("windgust_kph"),
+        "winddir_deg": col("winddir_deg"),
+        "pressure_mb": col("pressure_mb"),
+        "solarradiation_wm2": col("solarradiation_wm2"),
+        "solarenergy_mj_m2": col("solarenergy_mj_m2"),
+        "uvindex": col("uvindex"),
+        "moonphase": col("moonphase"),
+        "conditions_text": col("conditions_text", [""] * len(fore_daily.get("time", []))),
+        "icon": col("icon", [""] * len(fore_daily.get("time", []))),
+        "description_text": col("description_text", [""] * len(fore_daily.get("time", []))),
+        "source_provider": col("source_provider", [""] * len(fore_daily.get("time", []))),
+        "stations_text": col("stations_text", [""] * len(fore_daily.get("time", []))),
+        "severerisk": col("severerisk"),
+        "weathercode": fore_daily["weathercode"],
+        "sunrise": fore_daily["sunrise"],
+        "sunset": fore_daily["sunset"]
+    })
+    df["time"] = pd.to_datetime(df["time"])
+    df["sunrise"] = pd.to_datetime(df["sunrise"])
+    df["sunset"] = pd.to_datetime(df["sunset"])
+    return df
+
+def load_data_from_db(conn, city):
+    c = conn.cursor()
+    c.execute("SELECT date,tmax_c,tmin_c,weathercode,sunrise,sunset FROM daily_data WHERE city=? AND date>=? AND date<=? ORDER BY date",
+              (city, START_DATE, END_DATE))
+    rows = c.fetchall()
+    df = pd.DataFrame(rows, columns=["date", "tmax_c", "tmin_c", "weathercode", "sunrise", "sunset"])
+    df["time"] = pd.to_datetime(df["date"])
+    df["sunrise"] = pd.to_datetime(df["sunrise"])
+    df["sunset"] = pd.to_datetime(df["sunset"])
+    return df
+
+MONTHLY_COLUMNS = ["month", "avg_day_f", "sunny_day", "day_length_hrs", "tmax_mean", "tmin_mean"]
+
+def _monthly_rows_from_sums(by_month):
+    """12 MONTHLY_COLUMNS tuples from city_monthly_agg sums, or None when the city has no rows in the window."""
+    if not by_month:
+        return None
+    nan = float("nan")
+    monthly_data = []
+    for m in range(1, 13):
+        sums = by_month.get(m)
+        if not sums or sums["days"] < 0.5:
+            monthly_data.append((m, nan, nan, nan, nan, nan))
+            continue
+        tmax_mean = c_to_f(sums["tmax_sum"] / sums["tmax_days"]) if sums["tmax_days"] else nan
+        tmin_mean = c_to_f(sums["tmin_sum"] / sums["tmin_days"]) if sums["tmin_days"] else nan
+        avg_day_f = (tmax_mean + tmin_mean) / 2 if not pd.isna(tmax_mean) and not pd.isna(tmin_mean) else nan
+        sunny_day = max(0.0, min(sums["sunny_days"] / sums["days"] * 30.0, 30.0))
+        day_length_hrs = sums["daylen_sum"] / sums["daylen_days"] if sums["daylen_days"] else nan
+        monthly_data.append((m, avg_day_f, sunny_day, day_length_hrs, tmax_mean, tmin_mean))
+    return monthly_data
+
+def monthly_frame_from_sums(by_month):
+    """
+    Monthly frame (same shape as monthly_aggregates()) from city_monthly_agg sums,
+    or None when the city has no rows in the window.
+    """
+    monthly_data = _monthly_rows_from_sums(by_month)
+    if monthly_data is None:
+        return None
+    return pd.DataFrame(monthly_data, columns=MONTHLY_COLUMNS)
+
+def monthly_cube_from_sums(monthly_sums, cities):
+    """
+    ClimateCube for many cities straight from city_monthly_agg sums, scored in one
+    vectorized pass. Cities without sums are left out.
+    """
+    cube = ClimateCube(capacity=len(cities))
+    for city in cities:
+        monthly_data = _monthly_rows_from_sums(monthly_sums.get(city))
+        if monthly_data is not None:
+            cube.set_city(city, [row[1:] for row in monthly_data], MONTHLY_COLUMNS[1:])
+    cube.rescore()
+    return cube
+
+def monthly_aggregates_from_db(conn, city):
+    """
+    Monthly aggregates from the 12 precomputed city_monthly_agg rows (rolled or rebuilt
+    first if the city's window moved or it was flagged dirty).
+    Returns the same shape as monthly_aggregates().
+    """
+    weather_store.refresh_monthly_agg(conn, city, START_DATE, END_DATE)
+    conn.commit()
+    return monthly_frame_from_sums(weather_store.monthly_agg_map(conn, city).get(city))
+
+def monthly_aggregates(df: pd.DataFrame) -> pd.DataFrame:
+    df["month"] = df["time"].dt.month
+    df["tmax_f"] = c_to_f(df["tmax_c"])
+    df["tmin_f"] = c_to_f(df["tmin_c"])
+    df["avg_day_f"] = (df["tmax_f"] + df["tmin_f"]) / 2
+    df["sunny_day"] = df["weathercode"].apply(lambda w: 1 if w in SUNNY_CODES else 0)
+    df["day_length_hrs"] = (df["sunset"] - df["sunrise"]).dt.total_seconds() / 3600.0
+
+    monthly_data = []
+    for m in range(1, 13):
+        mdf = df[df["month"] == m]
+        if mdf.empty:
+            monthly_data.append((m, float('nan'), float('nan'), float('nan'), float('nan'), float('nan'), float('nan'), float('nan'), float('nan')))
+            continue
+
+        avg_day_f_m = mdf["avg_day_f"].mean()
+        tmax_mean = mdf["tmax_f"].mean()
+        tmin_mean = mdf["tmin_f"].mean()
+
+        # Normalize to an expected sunny-days-per-30-days value for this month.
+        # Historical data spans multiple years, so raw sums can exceed 30.
+        sunny_days_avg = mdf["sunny_day"].mean() * 30.0
+        sunny_days_avg = max(0.0, min(float(sunny_days_avg), 30.0))
+
+        day_length_avg = mdf["day_length_hrs"].mean()
+        monthly_data.append((m, avg_day_f_m, sunny_days_avg, day_length_avg, tmax_mean, tmin_mean))
+
+    monthly_df = pd.DataFrame(
+        monthly_data,
+        columns=["month", "avg_day_f", "sunny_day", "day_length_hrs", "tmax_mean", "tmin_mean"]
+    )
+    return monthly_df
+
+def month_name(m):
+    return ["Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"][m-1]
+
+def forecast_bundle_from_payload(vc: Dict[str, Any], lat: float, lon: float, days: int = 16):
+    """(fore_json, cur_json) in the Open-Meteo-like shape the UI reads, from a raw VC timeline payload."""
+    rows = vc.get("days", [])[:days]
+    daily = {
+        "time": [],
+        "weathercode": [],
+        "sunrise": [],
+        "sunset": [],
+        "temperature_2m_max": [],
+        "temperature_2m_min": [],
+        "temperature_2m_mean": [],
+        "feelslike_max_c": [],
+        "feelslike_min_c": [],
+        "feelslike_c": [],
+        "dewpoint_c": [],
+        "humidity_pct": [],
+        "cloudcover_pct": [],
+        "visibility_km": [],
+        "precip_mm": [],
+        "precip_prob_pct": [],
+        "precip_cover_pct": [],
+        "precip_type": [],
+        "snow_mm": [],
+        "snowdepth_mm": [],
+        "windspeed_kph": [],
+        "windgust_kph": [],
+        "winddir_deg": [],
+        "pressure_mb": [],
+        "solarradiation_wm2": [],
+        "solarenergy_mj_m2": [],
+        "uvindex": [],
+        "moonphase": [],
+        "conditions_text": [],
+        "icon": [],
+        "description_text": [],
+        "source_provider": [],
+        "stations_text": [],
+        "severerisk": [],
+    }
+    for d in rows:
+        daily["time"].append(str(d.get("datetime")))
+        sunrise_epoch = d.get("sunriseEpoch")
+        sunset_epoch = d.get("sunsetEpoch")
+        sunrise_iso = pd.to_datetime(sunrise_epoch, unit="s", utc=True).isoformat() if sunrise_epoch is not None else None
+        sunset_iso = pd.to_datetime(sunset_epoch, unit="s", utc=True).isoformat() if sunset_epoch is not None else None
+        daily["sunrise"].append(sunrise_iso)
+        daily["sunset"].append(sunset_iso)
+        daily["temperature_2m_max"].append(d.get("tempmax"))
+        daily["temperature_2m_min"].append(d.get("tempmin"))
+        daily["temperature_2m_mean"].append(d.get("temp"))
+        daily["feelslike_max_c"].append(d.get("feelslikemax"))
+        daily["feelslike_min_c"].append(d.get("feelslikemin"))
+        daily["feelslike_c"].append(d.get("feelslike"))
+        daily["dewpoint_c"].append(d.get("dew"))
+        daily["humidity_pct"].append(d.get("humidity"))
+        daily["cloudcover_pct"].append(d.get("cloudcover"))
+        daily["visibility_km"].append(d.get("visibility"))
+        daily["precip_mm"].append(d.get("precip"))
+        daily["precip_prob_pct"].append(d.get("precipprob"))
+        daily["precip_cover_pct"].append(d.get("precipcover"))
+        daily["precip_type"].append(",".join(d.get("preciptype", [])) if isinstance(d.get("preciptype"), list) else (d.get("preciptype") or ""))
+        daily["snow_mm"].append(d.get("snow"))
+        daily["snowdepth_mm"].append(d.get("snowdepth"))
+        daily["windspeed_kph"].append(d.get("windspeed"))
+        daily["windgust_kph"].append(d.get("windgust"))
+        daily["winddir_deg"].append(d.get("winddir"))
+        daily["pressure_mb"].append(d.get("pressure"))
+        daily["solarradiation_wm2"].append(d.get("solarradiation"))
+        daily["solarenergy_mj_m2"].append(d.get("solarenergy"))
+        daily["uvindex"].append(d.get("uvindex"))
+        daily["moonphase"].append(d.get("moonphase"))
+        daily["conditions_text"].append(d.get("conditions", ""))
+        daily["icon"].append(d.get("icon", ""))
+        daily["description_text"].append(d.get("description", ""))
+        daily["source_provider"].append(d.get("source", ""))
+        daily["stations_text"].append(",".join(d.get("stations", [])) if isinstance(d.get("stations"), list) else (d.get("stations") or ""))
+        daily["severerisk"].append(d.get("severerisk"))
+        daily["weathercode"].append(_visualcrossing_weathercode(d.get("icon", ""), d.get("conditions", ""), d.get("precipprob")))
+
+    fore_json = {
+        "latitude": lat,
+        "longitude": lon,
+        "daily": daily,
+    }
+    return fore_json, current_from_payload(vc, rows[0] if rows else None)
+
+def current_from_payload(vc: dict, fallback_day: dict | None = None) -> dict:
+    """cur_json for the UI from a timeline payload's currentConditions (today's mean when absent)."""
+    cur = vc.get("currentConditions", {}) or {}
+    cur_temp_c = cur.get("temp")
+    if cur_temp_c is None and fallback_day:
+        cur_temp_c = fallback_day.get("temp")
+    return {
+        "current_weather": {
+            "temperature": cur_temp_c
+        }
+    }
+
+def _fetch_visualcrossing_forecast_bundle(lat: float, lon: float, days: int = 16, city: str = ""):
+    start_dt = datetime.now(timezone.utc).date()
+    end_dt = start_dt + timedelta(days=max(1, days) - 1)
+    cached = RESPONSE_CACHE.get(
+        "forecast_bundle", lat, lon, start_dt.isoformat(), end_dt.isoformat(), "days,current", city=city
+    )
+    if cached is not None:
+        return forecast_bundle_from_payload(cached, lat, lon, days)
+    if not VISUAL_CROSSING_KEY:
+        raise RuntimeError("VISUAL_CROSSING_API_KEY is not set")
+    location = f"{lat},{lon}"
+    url = f"{vc_provider.VC_TIMELINE_URL}/{location}/{start_dt.isoformat()}/{end_dt.isoformat()}"
+    params = {
+        "unitGroup": "metric",
+        "include": "days,current",
+        "key": VISUAL_CROSSING_KEY,
+        "contentType": "json",
+    }
+    r = _vc_request(url, params)
+    called_url = r.url if hasattr(r, "url") else url
+    if r.status_code >= 400:
+        append_api_call_log({
+            "city": city,
+            "kind": "forecast_bundle",
+            "provider": WEATHER_PROVIDER,
+            "status_code": r.status_code,
+            "ok": False,
+            "url": called_url,
+            "lat": lat,
+            "lon": lon,
+            "records": 0,
+            "error": f"http_{r.status_code}",
+        })
+    r.raise_for_status()
+    vc = r.json()
+
+    RESPONSE_CACHE.put("forecast_bundle", lat, lon, start_dt.isoformat(), end_dt.isoformat(), "days,current", vc, city=city)
+    fore_json, cur_json = forecast_bundle_from_payload(vc, lat, lon, days)
+    daily = fore_json["daily"]
+    cur_temp_c = cur_json["current_weather"]["temperature"]
+    append_api_call_log({
+        "city": city,
+        "kind": "forecast_bundle",
+        "provider": WEATHER_PROVIDER,
+        "status_code": r.status_code,
+        "ok": True,
+        "url": called_url,
+        "lat": lat,
+        "lon": lon,
+        "records": len(daily["time"]),
+        "current_temp_c": cur_temp_c,
+        "sample_tmax_c": daily["temperature_2m_max"][0] if daily["temperature_2m_max"] else None,
+        "sample_tmin_c": daily["temperature_2m_min"][0] if daily["temperature_2m_min"] else None,
+        "sample_precip_mm": daily["precip_mm"][0] if daily["precip_mm"] else None,
+        "sample_precip_prob_pct": daily["precip_prob_pct"][0] if daily["precip_prob_pct"] else None,
+        "sample_solarradiation_wm2": daily["solarradiation_wm2"][0] if daily["solarradiation_wm2"] else None,
+    })
+    return fore_json, cur_json
+
+def fetch_forecast_bundle(lat: float, lon: float, days: int = 16, city: str = "", share=None,
+                          prefetched=None, batch_stats=None):
+    """
+    (fore_json, cur_json); with a vc_provider.GridShare, aliases in one grid cell share the request,
+    which is served from `prefetched` (batched payloads by share key) when the cell was batched.
+    """
+    if share is None:
+        return _fetch_visualcrossing_forecast_bundle(lat, lon, days=days, city=city)
+    window = forecast_window_key(days)
+
+    def fetch(cell_lat, cell_lon):
+        vc = vc_provider.take_prefetched(prefetched, ((cell_lat, cell_lon), window), batch_stats)
+        if vc is not None:
+            return forecast_bundle_from_payload(vc, cell_lat, cell_lon, days)
+        return _fetch_visualcrossing_forecast_bundle(cell_lat, cell_lon, days=days, city=city)
+
+    fore_json, cur_json = share.get(lat, lon, window, fetch)
+    # The shared bundle was fetched at the cell centre; keep each city's own coordinates.
+    return {**fore_json, "latitude": lat, "longitude": lon}, cur_json
+
+def _fetch_visualcrossing_current(lat: float, lon: float, city: str = ""):
+    """Current conditions only: a one-day request with include=current and a trimmed element list."""
+    today = datetime.now(timezone.utc).date().isoformat()
+    cached = RESPONSE_CACHE.get("current_conditions", lat, lon, today, today, "current", city=city)
+    if cached is not None:
+        return current_from_payload(cached)
+    if not VISUAL_CROSSING_KEY:
+        raise RuntimeError("VISUAL_CROSSING_API_KEY is not set")
+    url = f"{vc_provider.VC_TIMELINE_URL}/{lat},{lon}/today"
+    params = {
+        "unitGroup": "metric",
+        "include": "current",
+        "elements": CURRENT_ELEMENTS,
+        "key": VISUAL_CROSSING_KEY,
+        "contentType": "json",
+    }
+    r = _vc_request(url, params)
+    called_url = r.url if hasattr(r, "url") else url
+    row = {
+        "city": city,
+        "kind": "current_conditions",
+        "provider": WEATHER_PROVIDER,
+        "status_code": r.status_code,
+        "ok": r.status_code < 400,
+        "url": called_url,
+        "lat": lat,
+        "lon": lon,
+    }
+    if r.status_code >= 400:
+        append_api_call_log({**row, "records": 0, "error": f"http_{r.status_code}"})
+    r.raise_for_status()
+    vc = r.json()
+
+    RESPONSE_CACHE.put("current_conditions", lat, lon, today, today, "current", vc, city=city)
+    cur_json = current_from_payload(vc)
+    append_api_call_log({**row, "records": 1, "current_temp_c": cur_json["current_weather"]["temperature"]})
+    return cur_json
+
+def fetch_current_conditions(lat: float, lon: float, city: str = "", share=None, prefetched=None, batch_stats=None):
+    """cur_json; with a vc_provider.GridShare, as fetch_forecast_bundle()."""
+    if share is None:
+        return _fetch_visualcrossing_current(lat, lon, city=city)
+    window = current_window_key()
+
+    def fetch(cell_lat, cell_lon):
+        vc = vc_provider.take_prefetched(prefetched, ((cell_lat, cell_lon), window), batch_stats)
+        if vc is not None:
+            return current_from_payload(vc)
+        return _fetch_visualcrossing_current(cell_lat, cell_lon, city=city)
+
+    return share.get(lat, lon, window, fetch)
+
+def _fetch_visualcrossing_multi(points, start: str, end: str, include: str, kind: str, elements: str = "",
+                                 cities=None, stats=None):
+    """
+    One multi-location request for `points`; a payload or vc_provider.BatchLocationError per point,
+    in order. Points with a fresh cached response are served from the cache and not sent.
+    Every sent location gets its own API log row with the batch size and its outcome.
+    """
+    cities = cities or [""] * len(points)
+    results = [None] * len(points)
+    pending = []
+    for i, (lat, lon) in enumerate(points):
+        results[i] = RESPONSE_CACHE.get(kind, lat, lon, start, end, include, city=cities[i])
+        if results[i] is None:
+            pending.append(i)
+    if not pending:
+        return results
+    if not VISUAL_CROSSING_KEY:
+        raise RuntimeError("VISUAL_CROSSING_API_KEY is not set")
+    sent = [points[i] for i in pending]
+    batch_id = uuid.uuid4().hex[:8]
+    params = vc_provider.multi_location_params(sent, start, end, include, VISUAL_CROSSING_KEY, elements)
+    r = _vc_request(vc_provider.VC_MULTI_URL, params)
+    called_url = r.url if hasattr(r, "url") else vc_provider.VC_MULTI_URL
+
+    def log_row(n, i, **extra):
+        lat, lon = points[i]
+        append_api_call_log({
+            "city": cities[i],
+            "kind": kind,
+            "provider": WEATHER_PROVIDER,
+            "status_code": r.status_code,
+            "url": called_url,
+            "lat": lat,
+            "lon": lon,
+            "start_date": start,
+            "end_date": end,
+            "batch_id": batch_id,
+            "batch_size": len(sent),
+            "batch_index": n,
+            **extra,
+        })
+
+    if r.status_code >= 400:
+        for n, i in enumerate(pending):
+            log_row(n, i, ok=False, records=0, error=f"http_{r.status_code}")
+        if stats is not None:
+            stats.record(len(sent), failed=len(sent))
+        r.raise_for_status()
+    split = vc_provider.split_multi_location(r.json(), sent)
+    failed = 0
+    for n, (i, loc) in enumerate(zip(pending, split)):
+        results[i] = loc
+        if isinstance(loc, vc_provider.BatchLocationError):
+            failed += 1
+            log_row(n, i, ok=False, records=0, error=str(loc))
+            continue
+        lat, lon = points[i]
+        RESPONSE_CACHE.put(kind, lat, lon, start, end, include, loc, city=cities[i])
+        days = loc.get("days", []) or []
+        log_row(
+            n, i, ok=True, records=len(days) or 1,
+            current_temp_c=(loc.get("currentConditions") or {}).get("temp"),
+            sample_tmax_c=days[0].get("tempmax") if days else None,
+            sample_tmin_c=days[0].get("tempmin") if days else None,
+        )
+    if stats is not None:
+        stats.record(len(sent), failed=failed)
+    return results
+
+def fetch_batched(items, start: str, end: str, include: str, kind: str, elements: str = "",
+                  stats=None, grid_deg: float = vc_provider.DEFAULT_GRID_DEG) -> dict:
+    """
+    {grid cell: payload or exception} for (city, lat, lon) items, VC_BATCH_SIZE cells per request,
+    each fetched at the cell centre as GridShare does; requests run under the controller.
+    """
+    cells = {}
+    for city, lat, lon in items:
+        cells.setdefault(vc_provider.grid_cell(lat, lon, grid_deg), []).append(city)
+    chunks = vc_provider.chunked(list(cells), VC_BATCH_SIZE)
+
+    def run(chunk):
+        try:
+            return chunk, _fetch_visualcrossing_multi(
+                chunk, start, end, include, kind, elements, cities=[cells[c][0] for c in chunk], stats=stats
+            )
+        except Exception as e:
+            return chunk, [e] * len(chunk)
+
+    out = {}
+    with ThreadPoolExecutor(max_workers=max(1, VC_CONTROLLER.max_workers)) as pool:
+        for chunk, results in pool.map(run, chunks):
+            out.update(zip(chunk, results))
+    return out
+
+def fetch_current_forecast_data(lat, lon):
+    fore_json, _ = _fetch_visualcrossing_forecast_bundle(lat, lon, days=16)
+    return fore_json
+
+def fetch_current(lat, lon):
+    return fetch_current_conditions(lat, lon)
+
+def compute_daytime_avg_temp(tmax_f, tmin_f):
+    # Approximate a daytime low temperature closer to the high.
+    daytime_low_f = tmax_f - (tmax_f - tmin_f) / 4.0
+    daytime_avg_f = (tmax_f + daytime_low_f) / 2.0
+    return daytime_avg_f
+
+def compute_niceness(temp_f, sunny_days, day_length_hrs):
+    """
+    Default niceness computation with temperature range 50F - 105F,
+    including partial scoring.
+    """
+    if temp_f < 50 or temp_f > 105:
+        temp_score = 0.0
+    elif 50 <= temp_f < 70:
+        temp_score = (temp_f - 50) / 20.0 * 0.5
+    elif 70 <= temp_f < 75:
+        temp_score = 0.5 + ((temp_f - 70) / 5.0) * 0.5
+    elif 75 <= temp_f <= 85:
+        temp_score = 1.0
+    elif 85 < temp_f <= 90:
+        temp_score = 1.0 - ((temp_f - 85) / 5.0) * 0.5
+    else:  # 90 < temp_f <= 105
+        temp_score = 0.5 - ((temp_f - 90) / 15.0) * 0.5
+
+    sunny_score = max(0.0, min(sunny_days / 30.0, 1.0))
+    day_length_score = max(0.0, min(day_length_hrs / 24.0, 1.0))
+    sun_day_score = (sunny_score + day_length_score) / 2.0
+
+    niceness = 0.5 * temp_score + 0.5 * sun_day_score
+    return niceness
+
+def compute_city_niceness(tmax_f, tmin_f, sunny_days, day_length_hrs):
+    # Uses an approximate daytime average in the niceness calculation.
+    daytime_avg_f = compute_daytime_avg_temp(tmax_f, tmin_f)
+    return compute_niceness(daytime_avg_f, sunny_days, day_length_hrs)
+
+def current_row_from_forecast(city, climate, fore_json, cur_json):
+    """Current Weather row for one city from its cached forecast bundle and the cube's next-month normals."""
+    today = datetime.now(timezone.utc)
+    next_month = (today.month % 12) + 1
+    historical_sunny_avg = climate.value(city, next_month, "sunny_day", 15.0)
+
+    current_temp_f = float('nan')
+    tmax_f = float('nan')
+    tmin_f = float('nan')
+    forecast_sunny_count = 0
+    forecast_days = 0
+
+    if "current_weather" in cur_json:
+        current_temp_c = cur_json["current_weather"]["temperature"]
+        current_temp_f = c_to_f(current_temp_c)
+
+    if "daily" in fore_json and "temperature_2m_max" in fore_json["daily"]:
+        daily_dates = pd.to_datetime(fore_json["daily"]["time"])
+        daily_tmax = fore_json["daily"]["temperature_2m_max"]
+        daily_tmin = fore_json["daily"]["temperature_2m_min"]
+        daily_codes = fore_json["daily"]["weathercode"]
+
+        forecast_sunny_count = sum(1 for c in daily_codes if c in SUNNY_CODES)
+        forecast_days = len(daily_codes)
+
+        today_str = today.strftime("%Y-%m-%d")
+        idx_today = None
+        for i2, d in enumerate(daily_dates):
+            if d.strftime("%Y-%m-%d") == today_str:
+                idx_today = i2
+                break
+        if idx_today is not None:
+            tmax_f = c_to_f(daily_tmax[idx_today])
+            tmin_f = c_to_f(daily_tmin[idx_today])
+        elif len(daily_tmax) > 0:
+            tmax_f = c_to_f(daily_tmax[0])
+            tmin_f = c_to_f(daily_tmin[0])
+
+        sunny_fraction_hist = historical_sunny_avg / 30.0
+        if forecast_days < 30:
+            remainder = 30 - forecast_days
+            remainder_sunny = remainder * sunny_fraction_hist
+            next_month_sunny_days = forecast_sunny_count + remainder_sunny
+        else:
+            next_month_sunny_days = forecast_sunny_count
+    else:
+        next_month_sunny_days = historical_sunny_avg
+    next_month_sunny_days = max(0.0, min(float(next_month_sunny_days), 30.0))
+
+    est_next_month_day_length = climate.value(city, next_month, "day_length_hrs", 12.0)
+
+    ref_temp = (tmax_f + tmin_f) / 2 if not pd.isna(tmax_f) and not pd.isna(tmin_f) else current_temp_f
+    niceness = compute_niceness(ref_temp, next_month_sunny_days, est_next_month_day_length)
+
+    return {
+        "city": city,
+        "current_temp_f": current_temp_f,
+        "next_month_sunny_days": next_month_sunny_days,
+        "est_next_month_day_length": est_next_month_day_length,
+        "niceness": niceness,
+        "tmax_f": tmax_f,
+        "tmin_f": tmin_f,
+        "forecast_sunny_count": forecast_sunny_count,
+        "forecast_days": forecast_days
+    }
+
+def load_forecast_cache():
+    if os.path.exists(CACHE_FILE):
+        with open(CACHE_FILE, 'rb') as f:
+            data = pickle.load(f)
+            return data
+    return {}
+
+def save_forecast_cache(cache):
+    with open(CACHE_FILE, 'wb') as f:
+        pickle.dump(cache, f)
+
+def load_all_cities_ui_cache(max_age: timedelta | None = ALL_CITIES_UI_CACHE_MAX_AGE):
+    if not os.path.exists(ALL_CITIES_UI_CACHE_FILE):
+        return None
+    try:
+        with open(ALL_CITIES_UI_CACHE_FILE, "rb") as f:
+            payload = pickle.load(f)
+        saved_at = payload.get("saved_at")
+        if isinstance(saved_at, str):
+            saved_at = datetime.fromisoformat(saved_at)
+        if not isinstance(saved_at, datetime):
+            return None
+        if saved_at.tzinfo is None:
+            saved_at = saved_at.replace(tzinfo=timezone.utc)
+        if max_age is not None and datetime.now(timezone.utc) - saved_at > max_age:
+            return None
+        if not isinstance(payload.get("current_data_list"), list):
+            return None
+        if not isinstance(payload.get("climate"), ClimateCube):
+            return None
+        return payload
+    except Exception:
+        return None
+
+def save_all_cities_ui_cache(current_data_list, climate):
+    payload = {
+        "saved_at": datetime.now(timezone.utc).isoformat(),
+        "current_data_list": current_data_list,
+        "climate": climate,
+    }
+    with open(ALL_CITIES_UI_CACHE_FILE, "wb") as f:
+        pickle.dump(payload, f)
+
+def is_forecast_fresh(city: str, cache: dict, hours: int = 24) -> bool:
+    """
+    Returns True if 'city' forecast data in 'cache' was fetched within 'hours' hours.
+    """
+    now = datetime.now(timezone.utc)
+    if city not in cache or 'time' not in cache[city]:
+        return False
+    provider = cache[city].get("provider")
+    if provider != WEATHER_PROVIDER:
+        return False
+    last_fetch = cache[city]['time']
+    return (now - last_fetch) < timedelta(hours=hours)
+
+def is_current_fresh(city: str, cache: dict, seconds: float | None = None) -> bool:
+    """True if `city`'s current conditions (from either tier) are younger than `seconds` (CURRENT_TTL_SEC)."""
+    fetched_at = cache_entry_time(cache, city, current=True)
+    if fetched_at is None:
+        return False
+    ttl = CURRENT_TTL_SEC if seconds is None else seconds
+    return (datetime.now(timezone.utc) - fetched_at).total_seconds() < ttl
+
+def cache_entry_time(cache: dict, city: str, current: bool = False):
+    """When `city`'s forecast (or, with current=True, its current conditions) was fetched; None if never."""
+    entry = cache.get(city) or {}
+    if entry.get("provider") != WEATHER_PROVIDER:
+        return None
+    times = [entry.get("time")] + ([entry.get("cur_time")] if current else [])
+    times = [t for t in times if t is not None]
+    return max(times) if times else None
+
+def forecast_cache_entry(fore_json: dict, cur_json: dict, fetched_at=None) -> dict:
+    """forecast_cache value for a freshly fetched bundle (it carries current conditions too)."""
+    fetched_at = fetched_at or datetime.now(timezone.utc)
+    return {
+        'fore_json': fore_json,
+        'cur_json': cur_json,
+        'time': fetched_at,
+        'cur_time': fetched_at,
+        'provider': WEATHER_PROVIDER,
+    }
+
+def build_target_city_map(forecast_cache: dict) -> dict[str, tuple[float, float]]:
+    """
+    Build the full sync target set.
+    Priority:
+    1) Existing forecast cache coordinates (typically the largest set; e.g. ~2431 cities)
+    2) Hardcoded CITY_COORDS fallback entries
+    """
+    targets: dict[str, tuple[float, float]] = {}
+
+    for city, payload in forecast_cache.items():
+        if not isinstance(city, str) or not isinstance(payload, dict):
+            continue
+        fore = payload.get("fore_json", {})
+        try:
+            lat = float(fore.get("latitude"))
+            lon = float(fore.get("longitude"))
+            targets[city] = (lat, lon)
+        except Exception:
+            continue
+
+    for city, latlon in CITY_COORDS.items():
+        if city not in targets and isinstance(latlon, tuple) and len(latlon) == 2:
+            targets[city] = latlon
+
+    return targets
+
+def sync_status_snapshot(conn, city_names: list[str], forecast_cache: dict):
+    hist_complete = 0
+    hist_missing = 0
+    forecast_fresh = 0
+    forecast_stale = 0
+    for city in city_names:
+        if have_data_for_city(conn, city):
+            hist_complete += 1
+        else:
+            hist_missing += 1
+        if is_forecast_fresh(city, forecast_cache, hours=FORECAST_TTL_HOURS):
+            forecast_fresh += 1
+        else:
+            forecast_stale += 1
+    return {
+        "hist_complete": hist_complete,
+        "hist_missing": hist_missing,
+        "forecast_fresh": forecast_fresh,
+        "forecast_stale": forecast_stale,
+    }
+
+class SyncProgress:
+    """
+    Receives run_daily_sync() progress. Hooks run on the thread driving the sync, so GUI
+    implementations must hand results to the window through queued signals.
+    """
+
+    def phase(self, name, total):
+        pass
+
+    def advance(self, name, done):
+        pass
+
+    def city_climate(self, city, monthly_rows):
+        """Fresh _monthly_rows_from_sums() rows for a city whose estimated history just changed."""
+
+    def climate_ready(self, climate):
+        """The run's full ClimateCube, once every city's monthly aggregates are refreshed."""
+
+    def current_row(self, row):
+        pass
+
+def run_daily_sync(conn, forecast_cache, city_list, progress=None, stop=None):
+    """
+    One sync run over city_list: estimated backfill (once per day), monthly aggregates,
+    forecast refresh, sync_runs bookkeeping and the last_daily_sync_date marker. Results go
+    to `progress` city by city as they land. Setting `stop` abandons the run between cities
+    and phases and cuts short any request still waiting on the controller, token bucket or
+    circuit probe; the run is recorded as 'cancelled' and leaves the UI cache and daily marker alone.
+    """
+    global _RUN_STOP
+    stop = stop or threading.Event()
+    _RUN_STOP = stop
+    try:
+        return _run_daily_sync(conn, forecast_cache, city_list, progress or SyncProgress(), stop)
+    finally:
+        _RUN_STOP = threading.Event()
+
+def _run_daily_sync(conn, forecast_cache, city_list, progress, stop):
+    city_names = [c for c, _ in city_list]
+
+    before = sync_status_snapshot(conn, city_names, forecast_cache)
+    append_sync_log(
+        "Before sync: "
+        f"estimated complete={before['hist_complete']}, missing={before['hist_missing']}; "
+        f"forecast fresh={before['forecast_fresh']}, stale={before['forecast_stale']}"
+    )
+
+    today_key = datetime.now(timezone.utc).date().isoformat()
+    last_daily_sync = get_sync_meta(conn, "last_daily_sync_date", "")
+    should_sync = (last_daily_sync != today_key)
+    if should_sync:
+        append_sync_log("Daily sync: enabled (not yet run today).")
+    else:
+        append_sync_log("Daily sync: skipped (already ran today).")
+    # Checked once up front: while VC is known to be down, serve cached data instead of queueing doomed fetches.
+    provider_down = should_sync and VC_BREAKER.is_open()
+    if provider_down:
+        append_sync_log(f"VC {VC_BREAKER.summary()}; deferring network fetches to a later run.")
+
+    run_id = str(uuid.uuid4())
+    c_meta = conn.cursor()
+    c_meta.execute(
+        "UPDATE sync_runs SET status='abandoned', finished_at=?, notes=COALESCE(notes,'') || ' ; superseded_by=' || ? "
+        "WHERE status='running'",
+        (datetime.now(timezone.utc).isoformat(), run_id),
+    )
+    c_meta.execute(
+        "INSERT OR REPLACE INTO sync_runs (run_id, started_at, status, total_cities) VALUES (?, ?, ?, ?)",
+        (run_id, datetime.now(timezone.utc).isoformat(), "running", len(city_list)),
+    )
+    conn.commit()
+
+    historical_updated = 0
+    forecast_updated = 0
+    current_updated = 0
+    errors = 0
+    deferred = 0
+    failed = set()
+    share = vc_provider.GridShare()
+    # Highest-priority cities are submitted first; the deadline and budget cut off the tail.
+    deadline = fetch_scheduler.deadline_from(SYNC_DEADLINE_SEC)
+    interest = fetch_scheduler.load_interest(conn)
+
+    print("Fetching estimated baseline data...")
+    # city -> date ranges missing from the rolling window (planned here; sqlite conn stays on this thread).
+    estimated_plan = {}
+    if should_sync:
+        if ESTIMATED_PRUNE:
+            removed = prune_estimated_window(conn)
+            append_sync_log(f"Pruned {removed} estimated rows before {START_DATE}.")
+        for city_name in city_names:
+            ranges = estimated_ranges_to_fetch(conn, city_name)
+            if ranges:
+                estimated_plan[city_name] = ranges
+        plan_days = sum(
+            (datetime.strptime(e, "%Y-%m-%d") - datetime.strptime(s, "%Y-%m-%d")).days + 1
+            for ranges in estimated_plan.values()
+            for s, e in ranges
+        )
+        append_sync_log(
+            f"Estimated plan ({'incremental' if ESTIMATED_INCREMENTAL else 'full'}): "
+            f"{len(estimated_plan)} cities, {sum(len(r) for r in estimated_plan.values())} requests, {plan_days} days"
+        )
+
+    def fetch_city_data(city, latlon):
+        lat, lon = latlon
+        keys = [share.key(lat, lon, estimated_window_key(start, end)) for start, end in estimated_plan[city]]
+        if stop.is_set() or not est_sched.admit(city, share_keys=keys):
+            for start, end in estimated_plan[city]:
+                share.release_expected(lat, lon, estimated_window_key(start, end))
+            return city, None, None
+        try:
+            df_est = fetch_estimated_ranges(lat, lon, estimated_plan[city], city=city, share=share)
+            return city, df_est, None
+        except Exception as e:
+            return city, pd.DataFrame(), str(e)
+
+    for city_name in city_names:
+        if city_name not in estimated_plan:
+            insert_sync_city_log(conn, run_id, city_name, "estimated", "complete", "already complete")
+        elif provider_down:
+            deferred += 1
+            insert_sync_city_log(conn, run_id, city_name, "estimated", "deferred", "provider circuit open")
+    planned = [] if provider_down else [(c, l) for c, l in city_list if c in estimated_plan]
+    est_sched = fetch_scheduler.FetchScheduler(
+        fetch_scheduler.prioritize(
+            [c for c, _ in planned],
+            gap={c: estimated_gap_share(estimated_plan[c]) for c, _ in planned},
+            interest=interest,
+            error_rate=fetch_scheduler.error_rates(conn, "estimated"),
+        ),
+        deadline=deadline,
+        budget=SYNC_REQUEST_BUDGET or None,
+    )
+    planned_map = dict(planned)
+    planned = [(c, planned_map[c]) for c in est_sched.order()]
+    for city_name, (lat, lon) in planned:
+        for start, end in estimated_plan[city_name]:
+            share.expect(lat, lon, estimated_window_key(start, end))
+    progress.phase("estimated", len(city_list))
+    done_count = len(city_list) - len(planned)
+    progress.advance("estimated", done_count)
+    # Sized for the controller's ceiling; VC_CONTROLLER decides how many requests actually run.
+    with ThreadPoolExecutor(max_workers=VC_CONTROLLER.max_workers) as executor:
+        futures = {executor.submit(fetch_city_data, c, l): c for c, l in planned}
+        for fut in as_completed(futures):
+            city_name, df_est, err_msg = fut.result()
+            hist_rows = 0
+            if df_est is None:
+                deferred += 1
+                reason = "sync cancelled" if stop.is_set() else "deadline or request budget reached"
+                insert_sync_city_log(conn, run_id, city_name, "estimated", "deferred", reason)
+            elif err_msg:
+                errors += 1
+                failed.add(city_name)
+                insert_sync_city_log(conn, run_id, city_name, "estimated", "error", err_msg)
+            elif not df_est.empty:
+                try:
+                    store_data(conn, city_name, df_est, source="estimated")
+                    hist_rows = len(df_est)
+                except Exception as e:
+                    errors += 1
+                    failed.add(city_name)
+                    insert_sync_city_log(conn, run_id, city_name, "estimated", "error", f"store_failed: {e}")
+            else:
+                insert_sync_city_log(conn, run_id, city_name, "estimated", "no_data", "provider returned no rows")
+
+            if hist_rows > 0:
+                historical_updated += 1
+                insert_sync_city_log(conn, run_id, city_name, "estimated", "updated", f"rows={hist_rows}")
+                weather_store.refresh_monthly_agg(conn, city_name, START_DATE, END_DATE)
+                conn.commit()
+                monthly_rows = _monthly_rows_from_sums(weather_store.monthly_agg_map(conn, city_name).get(city_name))
+                if monthly_rows is not None:
+                    progress.city_climate(city_name, monthly_rows)
+            done_count += 1
+            progress.advance("estimated", done_count)
+            if done_count % 50 == 0:
+                append_sync_log(f"Estimated progress: {done_count}/{len(city_list)}")
+            if stop.is_set():
+                executor.shutdown(wait=False, cancel_futures=True)
+                break
+
+    climate = ClimateCube()
+    current_data_list = []
+    fc_sched = None
+    current_due = set()
+    batch_stats = vc_provider.BatchStats(VC_BATCH_SIZE)
+    if not stop.is_set():
+        print("Processing monthly data...")
+        progress.phase("monthly", len(city_names))
+        agg_counts = weather_store.refresh_monthly_agg_all(conn, START_DATE, END_DATE, cities=city_names)
+        conn.commit()
+        append_sync_log(
+            f"Monthly aggregates: {agg_counts['fresh']} fresh, {agg_counts['rolled']} rolled, {agg_counts['rebuilt']} rebuilt"
+        )
+        climate = monthly_cube_from_sums(weather_store.monthly_agg_map(conn), city_names)
+        progress.advance("monthly", len(city_names))
+        progress.climate_ready(climate)
+        save_itinerary_interest(conn, climate)
+        interest = fetch_scheduler.load_interest(conn)
+
+        print("Fetching current & forecast data...")
+
+        def fetch_current_data(city, latlon):
+            lat, lon = latlon
+            now = datetime.now(timezone.utc)
+
+            entry = forecast_cache.get(city, {})
+            fore_json = entry.get('fore_json', {})
+            cur_json = entry.get('cur_json', {})
+            forecast_was_updated = False
+            current_was_updated = False
+            forecast_err = None
+            forecast_deferred = False
+            try:
+                if city in admitted:
+                    forecast_deferred = not admitted[city]
+                elif city in forecast_due or city in current_due:
+                    forecast_deferred = not fc_sched.admit(city, share_keys=[share_key(city)])
+                if forecast_deferred or stop.is_set():
+                    if city in forecast_due or city in current_due:
+                        share.release_expected(lat, lon, share_key(city)[1])
+                elif city in forecast_due:
+                    fore_json, cur_json = fetch_forecast_bundle(
+                        lat, lon, days=16, city=city, share=share, prefetched=prefetched, batch_stats=batch_stats
+                    )
+                    forecast_cache[city] = forecast_cache_entry(fore_json, cur_json, now)
+                    forecast_was_updated = True
+                elif city in current_due:
+                    # Forecast still fresh: only the lightweight current-conditions tier is due.
+                    cur_json = fetch_current_conditions(
+                        lat, lon, city=city, share=share, prefetched=prefetched, batch_stats=batch_stats
+                    )
+                    forecast_cache[city] = {
+                        **entry,
+                        'fore_json': fore_json,
+                        'cur_json': cur_json,
+                        'cur_time': now,
+                        'provider': WEATHER_PROVIDER,
+                    }
+                    current_was_updated = True
+            except Exception as e:
+                forecast_err = str(e)
+
+            forecast_df = pd.DataFrame()
+            if "daily" in fore_json and "temperature_2m_max" in fore_json["daily"]:
+                forecast_df = process_forecast_daily_data(fore_json["daily"])
+
+            row = current_row_from_forecast(city, climate, fore_json, cur_json)
+            return row, forecast_was_updated, current_was_updated, forecast_df, forecast_err, forecast_deferred
+
+        # Tiers: the 16-day forecast is due after FORECAST_TTL_HOURS on the daily run, current
+        # conditions after CURRENT_TTL_SEC on any run; a forecast fetch refreshes both.
+        # A stop during the monthly phase skips the fetches; cached rows still stream out below.
+        fetch_forecasts = should_sync and not provider_down and not stop.is_set()
+        refresh_current = CURRENT_TIER and not (provider_down or stop.is_set() or VC_BREAKER.is_open())
+        forecast_due = set()
+        if fetch_forecasts:
+            forecast_due = {c for c, _ in city_list if not is_forecast_fresh(c, forecast_cache, hours=FORECAST_TTL_HOURS)}
+        current_due = set()
+        if refresh_current:
+            current_due = {c for c, _ in city_list if c not in forecast_due and not is_current_fresh(c, forecast_cache)}
+        due = [c for c, _ in city_list if c in forecast_due or c in current_due]
+        fc_sched = fetch_scheduler.FetchScheduler(
+            fetch_scheduler.prioritize(
+                due,
+                staleness={c: fetch_scheduler.staleness_from_age(cache_entry_time(forecast_cache, c, current=c in current_due)) for c in due},
+                interest=interest,
+                # Both tiers hit the same endpoint, so a city failing its current refreshes ranks down too.
+                error_rate=fetch_scheduler.error_rates(conn, "forecast", "current"),
+            ),
+            deadline=deadline,
+            budget=max(0, SYNC_REQUEST_BUDGET - est_sched.spent) if SYNC_REQUEST_BUDGET else None,
+            batch_size=VC_BATCH_SIZE,
+        )
+        # Due cities go first, most wanted at the front; the rest are served from the cache.
+        city_map = dict(city_list)
+
+        def share_key(city):
+            """The city's GridShare key; the budget charges one request per key, not per alias."""
+            return share.key(*city_map[city], forecast_window_key(16) if city in forecast_due else current_window_key())
+
+        fc_order = [(c, city_map[c]) for c in fc_sched.order()] + [(c, l) for c, l in city_list if c not in fc_sched.by_city]
+        # Batching: admit the due cities up front, then pull them VC_BATCH_SIZE cells per request;
+        # the per-city workers below claim the prefetched payloads through the grid share.
+        admitted = {}
+        prefetched = {}
+        if VC_BATCH_SIZE > 1 and due and not stop.is_set():
+            admitted = {c: fc_sched.admit(c, share_keys=[share_key(c)]) for c in fc_sched.order()}
+            today = datetime.now(timezone.utc).date()
+            fc_items = [(c, *city_map[c]) for c in due if admitted[c] and c in forecast_due]
+            cur_items = [(c, *city_map[c]) for c in due if admitted[c] and c in current_due]
+            if fc_items:
+                window = forecast_window_key(16)
+                for cell, result in fetch_batched(
+                    fc_items, today.isoformat(), (today + timedelta(days=15)).isoformat(),
+                    "days,current", "forecast_bundle", stats=batch_stats, grid_deg=share.grid_deg,
+                ).items():
+                    prefetched[(cell, window)] = result
+            if cur_items and not stop.is_set():
+                window = current_window_key()
+                for cell, result in fetch_batched(
+                    cur_items, today.isoformat(), today.isoformat(),
+                    "current", "current_conditions", CURRENT_ELEMENTS, stats=batch_stats, grid_deg=share.grid_deg,
+                ).items():
+                    prefetched[(cell, window)] = result
+        for city_name in due:
+            lat, lon = city_map[city_name]
+            share.expect(lat, lon, forecast_window_key(16) if city_name in forecast_due else current_window_key())
+        progress.phase("forecast", len(city_list))
+        done_count = 0
+        with ThreadPoolExecutor(max_workers=max(8, VC_CONTROLLER.max_workers)) as executor:
+            futures = {executor.submit(fetch_current_data, c, l): c for c, l in fc_order}
+            for fut in as_completed(futures):
+                row, was_updated, current_was_updated, forecast_df, forecast_err, was_deferred = fut.result()
+                city_name = row.get("city", "")
+                stage = "current" if city_name in current_due else "forecast"
+                if was_deferred:
+                    deferred += 1
+                    insert_sync_city_log(conn, run_id, city_name, stage, "deferred", "deadline or request budget reached")
+                if not forecast_df.empty:
+                    try:
+                        store_data(conn, city_name, forecast_df, source="forecast")
+                    except Exception as e:
+                        errors += 1
+                        failed.add(city_name)
+                        insert_sync_city_log(conn, run_id, city_name, "forecast", "error", f"store_failed: {e}")
+                elif forecast_err:
+                    errors += 1
+                    failed.add(city_name)
+                    insert_sync_city_log(conn, run_id, city_name, stage, "error", forecast_err)
+
+                current_data_list.append(row)
+                progress.current_row(row)
+                if was_updated:
+                    forecast_updated += 1
+                    insert_sync_city_log(conn, run_id, city_name, "forecast", "updated", "refreshed")
+                elif current_was_updated:
+                    current_updated += 1
+                    insert_sync_city_log(conn, run_id, city_name, "current", "updated", "refreshed")
+                done_count += 1
+                progress.advance("forecast", done_count)
+                if done_count % 50 == 0:
+                    append_sync_log(f"Forecast progress: {done_count}/{len(city_list)}")
+                if stop.is_set():
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    break
+
+    cancelled = stop.is_set()
+    save_forecast_cache(forecast_cache)
+    if not cancelled:
+        save_all_cities_ui_cache(current_data_list, climate)
+
+    after = sync_status_snapshot(conn, city_names, forecast_cache)
+    append_sync_log(
+        "After sync: "
+        f"estimated complete={after['hist_complete']}, missing={after['hist_missing']}; "
+        f"forecast fresh={after['forecast_fresh']}, stale={after['forecast_stale']}"
+    )
+    vc_state = VC_CONTROLLER.snapshot()
+    append_sync_log(
+        f"VC controller: workers={vc_state['workers']}/{vc_state['max_workers']} "
+        f"interval={vc_state['interval_sec']:.2f}s latency_ewma={vc_state['latency_ewma_ms']:.0f}ms "
+        f"adjustments={vc_state['adjustments']} throttled={vc_state['throttled']}"
+    )
+    share_stats = share.stats()
+    append_sync_log(f"VC {share.summary()}")
+    append_sync_log(f"VC {VC_BREAKER.summary()}")
+    append_sync_log(f"VC {batch_stats.summary()}")
+    priority = {"estimated": est_sched.stats(), "forecast": fc_sched.stats() if fc_sched else None}
+    append_sync_log(
+        f"Priority estimated: {est_sched.summary()}"
+        + (f"; forecast: {fc_sched.summary()}" if fc_sched else "")
+    )
+
+    if cancelled:
+        status = "cancelled"
+    else:
+        status = "ok" if errors == 0 and not provider_down and not deferred else "partial"
+    c_meta.execute(
+        """
+        UPDATE sync_runs
+        SET finished_at=?, status=?, historical_complete=?, historical_missing=?, forecast_fresh=?, forecast_stale=?,
+            historical_updated=?, forecast_updated=?, errors=?, notes=?
+        WHERE run_id=?
+        """,
+        (
+            datetime.now(timezone.utc).isoformat(),
+            status,
+            after["hist_complete"],
+            after["hist_missing"],
+            after["forecast_fresh"],
+            after["forecast_stale"],
+            historical_updated,
+            forecast_updated,
+            errors,
+            f"window={START_DATE}..{END_DATE} vc_requests={share_stats['requests']} vc_saved={share_stats['saved']}"
+            f" vc_circuit={VC_BREAKER.status()['state']} deferred={deferred} current_updated={current_updated}"
+            f" priority_est=[{est_sched.summary()}]"
+            + (f" priority_fc=[{fc_sched.summary()}]" if fc_sched else "")
+            + f" batch=[{batch_stats.summary()}]",
+            run_id,
+        ),
+    )
+    conn.commit()
+    # Mark daily sync complete only when estimated coverage is complete.
+    # This preserves resume semantics when a run is partial due to rate limits.
+    if should_sync and not cancelled and after["hist_missing"] == 0:
+        set_sync_meta(conn, "last_daily_sync_date", today_key)
+        append_sync_log("Daily sync marker set for today (estimated backfill complete).")
+    elif should_sync:
+        append_sync_log("Daily sync marker NOT set (estimated backfill still incomplete; resume allowed).")
+
+    return {
+        "run_id": run_id,
+        "status": status,
+        "climate": climate,
+        "current_data_list": current_data_list,
+        "forecast_cache": forecast_cache,
+        "failed": failed,
+        "historical_updated": historical_updated,
+        "forecast_updated": forecast_updated,
+        "current_updated": current_updated,
+        "errors": errors,
+        "api_calls_saved": share_stats["saved"],
+        "deferred": deferred,
+        "priority": priority,
+        "batching": batch_stats.stats(),
+    }
+
+def forecast_until(forecast_cache):
+    for c in forecast_cache:
+        fore_json = forecast_cache[c]['fore_json']
+        if "daily" in fore_json and "time" in fore_json["daily"]:
+            times = pd.to_datetime(fore_json["daily"]["time"])
+            return times.max().strftime("%Y-%m-%d")
+    return "N/A"
+
+
+def roll_estimated_window():
+    """Move START_DATE/END_DATE to the window starting today (long-running processes call this per run)."""
+    global START_DATE, END_DATE
+    START_DATE, END_DATE = get_estimated_window_dates()
+    return START_DATE, END_DATE
+
+
+class SyncDaemon:
+    """
+    run_daily_sync() every `interval` seconds. The sqlite connection, forecast cache and target
+    city map stay warm between runs; cache and targets are reloaded only when the cache file was
+    rewritten by someone else (e.g. the window added a city). The run lock is taken per run, so
+    runs are skipped while a sunseeker window holds it.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stop = threading.Event()
+        self.conn = None
+        self.forecast_cache = {}
+        self.city_list = []
+        self._cache_mtime = None
+
+    def _cache_file_mtime(self):
+        return os.path.getmtime(CACHE_FILE) if os.path.exists(CACHE_FILE) else None
+
+    def _refresh_targets(self):
+        mtime = self._cache_file_mtime()
+        if self.city_list and mtime == self._cache_mtime:
+            return
+        self.forecast_cache = load_forecast_cache()
+        self.city_list = list(build_target_city_map(self.forecast_cache).items())
+        self._cache_mtime = mtime
+        append_sync_log(f"Daemon: loaded {len(self.city_list)} target cities")
+
+    def run_once(self):
+        lock_fh = acquire_run_lock(RUN_LOCK_FILE)
+        if lock_fh is None:
+            append_sync_log("Daemon: another sync process holds the run lock; skipping this run.")
+            return None
+        try:
+            if self.conn is None:
+                init_db()
+                self.conn = get_db_conn(DATABASE)
+            self._refresh_targets()
+            start_date, end_date = roll_estimated_window()
+            append_sync_log(f"Estimated window: {start_date} .. {end_date}")
+            t0 = time.perf_counter()
+            result = run_daily_sync(self.conn, self.forecast_cache, self.city_list, stop=self.stop)
+            self._cache_mtime = self._cache_file_mtime()
+            append_sync_log(
+                f"Daemon: run {result['status']} in {time.perf_counter() - t0:.1f}s "
+                f"({len(self.city_list)} cities, {result['errors']} errors)"
+            )
+            return result
+        except Exception:
+            append_sync_log(f"Daemon: run failed: {traceback.format_exc()}")
+            # Start the next run from a fresh connection.
+            self.close()
+            return None
+        finally:
+            lock_fh.close()
+
+    def serve(self):
+        while not self.stop.is_set():
+            self.run_once()
+            self.stop.wait(self.interval)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(
+        prog="sunseeker sync",
+        description="Headless daily sync: estimated backfill, forecast refresh and sync_runs bookkeeping (no Qt).",
+    )
+    ap.add_argument("--once", action="store_true", help="Run one sync and exit")
+    ap.add_argument(
+        "--interval",
+        type=float,
+        default=float(os.environ.get("SYNC_INTERVAL_SEC", "3600")),
+        help="Seconds between runs (the daily marker keeps the estimated backfill to once a day)",
+    )
+    args = ap.parse_args(argv)
+
+    daemon = SyncDaemon(args.interval)
+
+    def on_signal(signum, frame):
+        append_sync_log(f"Daemon: {signal.Signals(signum).name} received; stopping.")
+        daemon.stop.set()
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+    append_sync_log(f"Daemon: started (pid={os.getpid()}, interval={args.interval:g}s, db={DATABASE})")
+    try:
+        if args.once:
+            return 0 if daemon.run_once() is not None else 1
+        daemon.serve()
+    finally:
+        daemon.close()
+        append_sync_log("Daemon: stopped.")
+    return 0